@@ -44,6 +44,11 @@ USER_MANAGEMENT_BASE_URL = f"http://{SERVICES['user-management']['host']}:" \
                   f"{SERVICES['user-management']['port']}" \
                   f"/user-management/api/v1"
 CLASSROOM_ADMIN_EMAIL = os.getenv("CLASSROOM_ADMIN_EMAIL")
+# Google API clients of common.utils.classroom_crud, cached per user and per
+# thread, and the number of requests sent per batch HTTP request
+CLASSROOM_CLIENT_CACHE_SIZE = int(
+  os.getenv("CLASSROOM_CLIENT_CACHE_SIZE", "100"))
+CLASSROOM_BATCH_SIZE = int(os.getenv("CLASSROOM_BATCH_SIZE", "50"))
 
 CONTAINER_NAME = os.getenv("CONTAINER_NAME")
 DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
@@ -51,3 +56,20 @@ API_BASE_URL = os.getenv("API_BASE_URL")
 SERVICE_NAME = os.getenv("SERVICE_NAME")
 
 MEMORYSTORE_ENABLED = os.environ.get("MEMORYSTORE_ENABLED", "false")
+
+# Process local read-through cache for models which enable it
+MODEL_CACHE_ENABLED = bool(
+  os.getenv("MODEL_CACHE_ENABLED", "true").lower() in ("true",))
+MODEL_CACHE_TTL = int(os.getenv("MODEL_CACHE_TTL", "60"))
+MODEL_CACHE_MAX_SIZE = int(os.getenv("MODEL_CACHE_MAX_SIZE", "1000"))
+
+# Redis connection pool and in process tier of common.utils.cache_service
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL", "30"))
+LOCAL_CACHE_MAX_SIZE = int(os.getenv("LOCAL_CACHE_MAX_SIZE", "2000"))
+# values are written as JSON until every service reads msgpack values, turn
+# on once the release reading both encodings is deployed everywhere
+CACHE_MSGPACK_ENABLED = bool(
+  os.getenv("CACHE_MSGPACK_ENABLED", "false").lower() in ("true",))
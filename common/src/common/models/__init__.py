@@ -46,3 +46,4 @@ from .lms_job import *
 from .prior_learning_assessment import *
 from .employer import *
 from .grade_exception import *
+from .section_progress import *
@@ -2,6 +2,7 @@
 
 from common.models import NodeItem, BaseModel
 from common.utils.errors import ResourceNotFoundException
+from common.utils.model_cache import cached_lookup
 from fireo.fields import TextField, ListField, MapField, NumberField, BooleanField, DateTime
 
 
@@ -125,11 +126,14 @@ class AssessmentItem(NodeItem):
   is_optional = BooleanField(default=False)
   prerequisites = MapField()
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "assessment_items"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid, is_deleted=False):
     assessment_item = AssessmentItem.collection.filter(
         "uuid", "==", uuid).filter("is_deleted", "==", is_deleted).get()
@@ -183,11 +187,14 @@ class Assessment(NodeItem):
   is_archived = BooleanField(default=False)
   is_deleted = BooleanField(default=False)
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "assessments"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid, is_deleted=False):
     assessment = Assessment.collection.filter(
         "uuid", "==", uuid).filter("is_deleted", "==", is_deleted).get()
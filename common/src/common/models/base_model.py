@@ -17,11 +17,18 @@ FireO BaseModel to be inherited by all other objects in ORM
 
 import datetime
 import fireo
+from fireo.database import db
 from fireo.models import Model
 from fireo.fields import DateTime, TextField
+from fireo.queries.query_wrapper import ModelWrapper
+from common.utils import cursor_pagination
 from common.utils.errors import ResourceNotFoundException
+from common.utils.model_cache import cached_lookup, get_model_cache
 import common.config
 
+# Maximum number of document references sent in a single batched read
+BATCH_GET_SIZE = 300
+
 
 # pylint: disable = too-few-public-methods
 class BaseModel(Model):
@@ -39,6 +46,11 @@ class BaseModel(Model):
   created_by = TextField(default="")
   last_modified_by = TextField(default="")
   DATABASE_PREFIX = common.config.DATABASE_PREFIX
+  # Models holding hot, mostly immutable documents set CACHE_ENABLED to
+  # serve find_by_id and @cached_lookup methods from a process local cache
+  CACHE_ENABLED = False
+  CACHE_TTL = common.config.MODEL_CACHE_TTL
+  CACHE_MAX_SIZE = common.config.MODEL_CACHE_MAX_SIZE
 
   def save(self,
            input_datetime=None,
@@ -62,7 +74,9 @@ class BaseModel(Model):
       date_timestamp = datetime.datetime.utcnow()
     self.created_time = date_timestamp
     self.last_modified_time = date_timestamp
-    return super().save(transaction, batch, merge, no_return)
+    result = super().save(transaction, batch, merge, no_return)
+    self.invalidate_cache(getattr(self, "id", None))
+    return result
 
   def update(self,
              input_datetime=None,
@@ -83,7 +97,9 @@ class BaseModel(Model):
     else:
       date_timestamp = datetime.datetime.utcnow()
     self.last_modified_time = date_timestamp
-    return super().update(key, transaction, batch)
+    result = super().update(key, transaction, batch)
+    self.invalidate_cache(getattr(self, "id", None))
+    return result
 
   def get_fields(self, reformat_datetime=False):
     """overrides default method to fix data type for datetime fields"""
@@ -105,6 +121,30 @@ class BaseModel(Model):
     abstract = True
 
   @classmethod
+  def get_model_cache(cls):
+    """Returns the process local cache of this model or None if the model
+    is not cacheable"""
+    if not (cls.CACHE_ENABLED and common.config.MODEL_CACHE_ENABLED):
+      return None
+    return get_model_cache(cls.collection_name, cls.CACHE_TTL,
+                           cls.CACHE_MAX_SIZE)
+
+  @classmethod
+  def invalidate_cache(cls, object_id):
+    """Removes all the cached lookups of the document with given id"""
+    cache = cls.get_model_cache()
+    if cache is not None and object_id is not None:
+      cache.invalidate(object_id)
+
+  @classmethod
+  def cache_stats(cls):
+    """Returns the hit/miss counters of the model cache or None if the model
+    is not cacheable"""
+    cache = cls.get_model_cache()
+    return cache.stats() if cache is not None else None
+
+  @classmethod
+  @cached_lookup("id")
   def find_by_id(cls, object_id):
     """Looks up in the Database and returns an object of this type by id
        (not key)
@@ -124,6 +164,59 @@ class BaseModel(Model):
           f"{cls.collection_name} with id {object_id} is not found")
     return obj
 
+  @classmethod
+  def find_by_ids(cls, object_ids, chunk_size=BATCH_GET_SIZE):
+    """Looks up multiple documents of this type by id using batched reads
+
+        Documents are fetched with one Firestore `get_all` call per chunk of
+        ids instead of one query per id. Ids that do not exist are skipped.
+        Args:
+            object_ids (list): document ids without collection_name
+            chunk_size (int): number of ids fetched per round trip
+        Returns:
+            dict: document id to object of the subclassed Model
+        """
+    objects = {}
+    unique_ids = list(dict.fromkeys(object_ids))
+    collection_ref = db.conn.collection(cls.collection_name)
+    for start in range(0, len(unique_ids), chunk_size):
+      doc_refs = [
+          collection_ref.document(object_id)
+          for object_id in unique_ids[start:start + chunk_size]
+      ]
+      for snapshot in db.conn.get_all(doc_refs):
+        if not snapshot.exists:
+          continue
+        obj = ModelWrapper.from_query_result(cls(), snapshot)
+        if obj is not None:
+          objects[snapshot.id] = obj
+    return objects
+
+  @classmethod
+  def find_by_uuids(cls, uuids, chunk_size=BATCH_GET_SIZE):
+    """Looks up multiple non deleted documents of this type by uuid
+
+        Node documents store their uuid as the document id, so uuids are
+        first resolved with batched reads through `find_by_ids`. Any uuid
+        that cannot be resolved that way falls back to `find_by_uuid`.
+        Args:
+            uuids (list): list of uuids
+            chunk_size (int): number of ids fetched per round trip
+        Raises:
+            ResourceNotFoundException: If any of the uuids does not exist
+        Returns:
+            dict: uuid to object of the subclassed Model
+        """
+    objects = {}
+    for doc_id, obj in cls.find_by_ids(uuids, chunk_size).items():
+      if getattr(obj, "uuid", None) == doc_id and \
+          not getattr(obj, "is_deleted", False):
+        objects[doc_id] = obj
+    for uuid in uuids:
+      if uuid not in objects:
+        objects[uuid] = cls.find_by_uuid(uuid)
+    return objects
+
   @classmethod
   def delete_by_id(cls, doc_id):
     """Deletes from the Database the object of this type by id (not key)
@@ -136,6 +229,7 @@ class BaseModel(Model):
             None
         """
     key = fireo.utils.utils.generateKeyFromId(cls, doc_id)
+    cls.invalidate_cache(doc_id)
     return cls.collection.delete(key)
 
   @classmethod
@@ -191,6 +285,24 @@ class BaseModel(Model):
         None).order(order_by).offset(skip).fetch(limit)
     return list(objects)
 
+  @classmethod
+  def fetch_page(cls, page_token=None, limit=1000, order_by="-created_time"):
+    """ fetch a page of documents, resuming after the last document of the
+    previous page instead of skipping documents with an offset
+
+    Args:
+        page_token (str, optional): next_page_token returned with the
+          previous page. Defaults to None for the first page.
+        limit (int, optional): _description_. Defaults to 1000.
+        order_by (str, optional): _description_. Defaults to "-created_time".
+
+    Returns:
+        tuple: list of objects and the token of the next page or None
+    """
+    return cursor_pagination.fetch_page(
+        cls.collection.filter("deleted_at_timestamp", "==", None), limit,
+        page_token, order_by)
+
   @classmethod
   def fetch_all_documents(cls, limit=1000):
     """Fetches all documents of the collection in batches
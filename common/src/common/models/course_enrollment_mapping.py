@@ -14,6 +14,7 @@
 """
 Module to add course enrollment in Fireo
 """
+from fireo.database import db
 from fireo.fields import TextField, ReferenceField, IDField
 from common.models import BaseModel, Section, User
 
@@ -142,6 +143,29 @@ class CourseEnrollmentMapping(BaseModel):
     filter("status", "==","active").filter("role","==","learner").\
       filter("section","==",section_key).get()
 
+  @classmethod
+  def find_active_enrolled_student_section_keys(cls, user_id):
+    """Find the sections in which a user is an active learner with a single
+    query, without loading the sections
+
+    Args:
+        user_id(str): user_id from user collection
+
+    Returns:
+        set: keys of the sections
+    """
+    user_ref = db.conn.document(f"{User.collection_name}/{user_id}")
+    snapshots = db.conn.collection(cls.collection_name).where(
+        "user", "==", user_ref).where("status", "==", "active").where(
+            "role", "==", "learner").select(["section"]).stream()
+    section_refs = [
+        snapshot.to_dict().get("section") for snapshot in snapshots
+    ]
+    return {
+        section_ref.path for section_ref in section_refs
+        if section_ref is not None
+    }
+
   @classmethod
   def find_active_enrolled_teacher_record(
       cls,
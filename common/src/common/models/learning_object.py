@@ -3,6 +3,7 @@
 from fireo.fields import TextField, MapField, NumberField, BooleanField, ListField, DateTime
 from common.models import NodeItem, BaseModel
 from common.utils.errors import ResourceNotFoundException
+from common.utils.model_cache import cached_lookup
 
 # pylint: disable = arguments-renamed
 LOS_LITERALS = {
@@ -99,11 +100,14 @@ class CurriculumPathway(NodeItem):
   is_deleted = BooleanField(default=False)
   is_active = BooleanField(default=False)
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "curriculum_pathways"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid, is_deleted=False):
     curriculum_pathway = CurriculumPathway.collection.filter(
         "uuid", "==", uuid).filter("is_deleted", "==", is_deleted).get()
@@ -170,11 +174,14 @@ class LearningExperience(NodeItem):
   is_archived = BooleanField(default=False)
   is_deleted = BooleanField(default=False)
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "learning_experiences"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid, is_deleted=False):
     learning_experience = LearningExperience.collection.filter(
         "uuid", "==", uuid).filter("is_deleted", "==", is_deleted).get()
@@ -225,11 +232,14 @@ class LearningObject(NodeItem):
   is_archived = BooleanField(default=False)
   is_deleted = BooleanField(default=False)
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "learning_objects"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid, is_deleted=False):
     learning_object = LearningObject.collection.filter(
         "uuid", "==", uuid).filter("is_deleted", "==", is_deleted).get()
@@ -294,6 +304,8 @@ class LearningResource(NodeItem):
   is_archived = BooleanField(default=False)
   is_deleted = BooleanField(default=False)
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "learning_resources"
     ignore_none_field = False
@@ -308,6 +320,7 @@ class LearningResource(NodeItem):
     return fields
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid, is_deleted=False):
     learning_resource = LearningResource.collection.filter(
         "uuid", "==", uuid).filter("is_deleted", "==", is_deleted).get()
@@ -3,6 +3,7 @@
 from fireo.fields import TextField, ListField, MapField, BooleanField
 from common.models import NodeItem, BaseModel
 from common.utils.errors import ResourceNotFoundException
+from common.utils.model_cache import cached_lookup
 
 
 def check_object_type(field_val):
@@ -111,11 +112,14 @@ class Verb(NodeItem):
   url = TextField()
   canonical_data = MapField(default={})
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "verbs"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid):
     verb = Verb.collection.filter("uuid", "==", uuid).get()
     if verb is None:
@@ -136,11 +140,14 @@ class Activity(NodeItem):
   canonical_data = MapField(default={})
   authority = TextField()
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "activities"
     ignore_none_field = False
 
   @classmethod
+  @cached_lookup("uuid")
   def find_by_uuid(cls, uuid):
     activity = Activity.collection.filter("uuid", "==", uuid).get()
     if activity is None:
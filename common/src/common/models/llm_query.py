@@ -24,6 +24,9 @@ QUERY_HUMAN = "HumanQuestion"
 QUERY_AI_RESPONSE = "AIResponse"
 QUERY_AI_REFERENCES = "AIReferences"
 
+# maximum number of values in a Firestore "in" filter
+IN_QUERY_LIMIT = 30
+
 class UserQuery(BaseModel):
   """
   UserQuery ORM class
@@ -227,3 +230,28 @@ class QueryDocumentChunk(BaseModel):
             "deleted_at_timestamp", "==",
             None).get()
     return q_chunk
+
+  @classmethod
+  def find_by_indexes(cls, query_engine_id, indexes):
+    """
+    Fetch the document chunks for a query engine with any of the indexes,
+    using one "in" query per IN_QUERY_LIMIT indexes
+
+    Args:
+        query_engine_id (str): Query engine id
+        indexes (list): QueryDocumentChunk indexes
+
+    Returns:
+        dict: index to QueryDocumentChunk, missing indexes are skipped
+
+    """
+    unique_indexes = list(dict.fromkeys(indexes))
+    q_chunks = {}
+    for start in range(0, len(unique_indexes), IN_QUERY_LIMIT):
+      index_batch = unique_indexes[start:start + IN_QUERY_LIMIT]
+      for q_chunk in cls.collection.filter(
+          "query_engine_id", "==", query_engine_id).filter(
+              "index", "in", index_batch).filter(
+              "deleted_at_timestamp", "==", None).fetch():
+        q_chunks[q_chunk.index] = q_chunk
+    return q_chunks
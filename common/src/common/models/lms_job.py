@@ -27,6 +27,7 @@ class LmsJob(BaseModel):
   classroom_id = TextField()
   start_time = DateTime()
   end_time = DateTime()
+  progress = MapField(default={})
 
   class Meta:
     ignore_none_field = False
@@ -36,3 +37,5 @@ class LmsJob(BaseModel):
 # type -> LMS job type would be couse_copy/grade_import/cron_job(specific)
 # status -> ready, running, failed, success
 # logs -> {"errors": ["error1","error2"], "info": ["info1","info2"]}
+# progress -> {"steps": {"step_id": {"status": "done", "seconds": 1.2,
+#   "result": {}}}} for the copy steps of course_copy jobs
@@ -38,6 +38,8 @@ class Tool(BaseModel):
   custom_params = TextField(default=None)
   validate_title_for_grade_sync = BooleanField(default=False)
 
+  CACHE_ENABLED = True
+
   class Meta:
     collection_name = BaseModel.DATABASE_PREFIX + "tools"
     ignore_none_field = False
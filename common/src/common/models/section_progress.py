@@ -0,0 +1,295 @@
+"""
+Module to add the progress of learners in sections in Fireo
+"""
+import datetime
+from fireo.database import db
+from fireo.fields import (TextField, MapField, NumberField, IDField,
+                          BooleanField)
+from google.api_core.exceptions import (Conflict, FailedPrecondition,
+                                        NotFound)
+from google.cloud import firestore
+from common.models import BaseModel
+
+# maximum number of writes of a firestore batch
+BATCH_WRITE_SIZE = 500
+# attempts to commit a batch of the recompute when concurrent events
+# changed its documents
+BATCH_WRITE_MAX_ATTEMPTS = 5
+
+
+def count_submissions(submissions, course_work_ids=None):
+  """returns the number of turned in and of graded submissions of a map of
+  course work id to submission state, counting only the submissions of the
+  given course work ids when given"""
+  turned_in_count = 0
+  graded_count = 0
+  for course_work_id, submission in submissions.items():
+    if course_work_ids is not None and course_work_id not in course_work_ids:
+      continue
+    if submission.get("state") == "TURNED_IN":
+      turned_in_count += 1
+    if submission.get("graded"):
+      graded_count += 1
+  return turned_in_count, graded_count
+
+
+def parse_timestamp(value):
+  """parses a RFC3339 UTC timestamp of the classroom API, which has from 0
+  to 9 fractional digits"""
+  seconds, _, fraction = value.rstrip("Z").partition(".")
+  parsed = datetime.datetime.strptime(seconds, "%Y-%m-%dT%H:%M:%S")
+  if fraction:
+    parsed += datetime.timedelta(microseconds=int(fraction[:6].ljust(6, "0")))
+  return parsed
+
+
+def is_stale(previous, update_time):
+  """checks if a state with the given update time is older than the
+  previously recorded state"""
+  if not previous or not update_time or not previous.get("update_time"):
+    return False
+  return parse_timestamp(update_time) < parse_timestamp(
+      previous["update_time"])
+
+
+def merge_submissions(recorded, submissions):
+  """returns the recorded submissions updated with the given submissions,
+  except where the recorded state is more recent"""
+  merged = dict(recorded)
+  for course_work_id, submission in submissions.items():
+    if not is_stale(recorded.get(course_work_id),
+                    submission.get("update_time")):
+      merged[course_work_id] = submission
+  return merged
+
+
+def get_creation_data(timestamp):
+  """returns the BaseModel fields set when a document is created"""
+  return {
+      "created_time": timestamp,
+      "deleted_at_timestamp": None,
+      "deleted_by": "",
+      "archived_at_timestamp": None,
+      "archived_by": "",
+      "created_by": "",
+      "last_modified_by": ""
+  }
+
+
+class SectionProgress(BaseModel):
+  """Submissions of a learner in the classroom of a section, kept up to date
+  from the student submission events of the classroom notification service
+
+  Documents are keyed by classroom id and gaia id of the learner, the ids
+  found in the submission events.
+  """
+  id = IDField()
+  classroom_id = TextField(required=True)
+  gaia_id = TextField(required=True)
+  # course work id -> {"state": str, "graded": bool, "update_time": str}
+  submissions = MapField(default={})
+  turned_in_count = NumberField(default=0)
+  graded_count = NumberField(default=0)
+
+  class Meta:
+    ignore_none_field = False
+    collection_name = BaseModel.DATABASE_PREFIX + "section_progress"
+
+  @staticmethod
+  def get_progress_id(classroom_id, gaia_id):
+    return f"{classroom_id}_{gaia_id}"
+
+  @classmethod
+  def record_submission(cls, classroom_id, gaia_id, course_work_id, state,
+                        graded, update_time=None):
+    """records the state of a submission and updates the counts of the
+    learner in a transaction. Events older than the recorded state of the
+    submission are ignored, so redelivered events are harmless.
+    Returns:
+      bool: False if the event was stale
+    """
+    doc_ref = db.conn.collection(cls.collection_name).document(
+        cls.get_progress_id(classroom_id, gaia_id))
+
+    @firestore.transactional
+    def update(transaction):
+      snapshot = doc_ref.get(transaction=transaction)
+      submissions = (snapshot.to_dict() or {}).get("submissions") or {}
+      if is_stale(submissions.get(course_work_id), update_time):
+        return False
+      submissions[course_work_id] = {
+          "state": state,
+          "graded": graded,
+          "update_time": update_time
+      }
+      data = cls.get_document_data(classroom_id, gaia_id, submissions)
+      if snapshot.exists:
+        transaction.update(doc_ref, data)
+      else:
+        data.update(get_creation_data(data["last_modified_time"]))
+        transaction.set(doc_ref, data)
+      return True
+
+    recorded = update(db.conn.transaction())
+    cls.invalidate_cache(doc_ref.id)
+    return recorded
+
+  @classmethod
+  def get_document_data(cls, classroom_id, gaia_id, submissions):
+    """returns the fields of the progress of a learner with the counts of
+    the given submissions"""
+    turned_in_count, graded_count = count_submissions(submissions)
+    return {
+        "classroom_id": classroom_id,
+        "gaia_id": gaia_id,
+        "submissions": submissions,
+        "turned_in_count": turned_in_count,
+        "graded_count": graded_count,
+        "last_modified_time": datetime.datetime.utcnow()
+    }
+
+  @classmethod
+  def find_by_classroom_and_gaia_ids(cls, pairs):
+    """Looks up the progress of many (classroom id, gaia id) pairs with
+    batched reads
+    Returns:
+      dict: (classroom id, gaia id) to SectionProgress
+    """
+    found = cls.find_by_ids(
+        [cls.get_progress_id(*pair) for pair in pairs])
+    return {
+        pair: found[cls.get_progress_id(*pair)]
+        for pair in pairs
+        if cls.get_progress_id(*pair) in found
+    }
+
+
+class SectionCourseWork(BaseModel):
+  """Published course work of the classroom of a section, the denominator of
+  the progress of its learners, kept up to date from the course work events
+  of the classroom notification service"""
+  id = IDField()
+  classroom_id = TextField(required=True)
+  # course work id -> True for the published course work
+  course_work = MapField(default={})
+  course_work_count = NumberField(default=0)
+  # set by save_classroom_progress only, the events of the classroom are
+  # recorded once its course work and submissions were backfilled
+  backfilled = BooleanField(default=False)
+
+  class Meta:
+    ignore_none_field = False
+    collection_name = BaseModel.DATABASE_PREFIX + "section_course_work"
+
+  @classmethod
+  def record_course_work(cls, classroom_id, course_work_id, published):
+    """adds a published course work to the classroom or removes a course
+    work which is deleted or not published anymore, in a transaction.
+    Classrooms which were not backfilled yet are skipped, their course work
+    is listed by save_classroom_progress.
+    Returns:
+      bool: False if the classroom was not backfilled
+    """
+    doc_ref = db.conn.collection(cls.collection_name).document(classroom_id)
+
+    @firestore.transactional
+    def update(transaction):
+      snapshot = doc_ref.get(transaction=transaction)
+      if not snapshot.exists:
+        return False
+      course_work = (snapshot.to_dict() or {}).get("course_work") or {}
+      if published:
+        course_work[course_work_id] = True
+      else:
+        course_work.pop(course_work_id, None)
+      data = cls.get_document_data(classroom_id, course_work)
+      transaction.update(doc_ref, data)
+      return True
+
+    recorded = update(db.conn.transaction())
+    cls.invalidate_cache(classroom_id)
+    return recorded
+
+  @classmethod
+  def get_document_data(cls, classroom_id, course_work):
+    return {
+        "classroom_id": classroom_id,
+        "course_work": course_work,
+        "course_work_count": len(course_work),
+        "last_modified_time": datetime.datetime.utcnow()
+    }
+
+
+def commit_progress_batch(classroom_id, submissions, gaia_ids):
+  """merges the given submissions of some learners into their recorded
+  progress and writes them in a batch, with preconditions failing the batch
+  if a notification changed one of the documents since it was read"""
+  collection = db.conn.collection(SectionProgress.collection_name)
+  doc_refs = [
+      collection.document(
+          SectionProgress.get_progress_id(classroom_id, gaia_id))
+      for gaia_id in gaia_ids
+  ]
+  snapshots = {
+      snapshot.id: snapshot for snapshot in db.conn.get_all(doc_refs)
+  }
+  batch = db.conn.batch()
+  for gaia_id, doc_ref in zip(gaia_ids, doc_refs):
+    snapshot = snapshots.get(doc_ref.id)
+    if snapshot is not None and snapshot.exists:
+      recorded = (snapshot.to_dict() or {}).get("submissions") or {}
+      data = SectionProgress.get_document_data(
+          classroom_id, gaia_id,
+          merge_submissions(recorded, submissions[gaia_id]))
+      batch.update(doc_ref, data, option=db.conn.write_option(
+          last_update_time=snapshot.update_time))
+    else:
+      data = SectionProgress.get_document_data(classroom_id, gaia_id,
+                                               submissions[gaia_id])
+      data.update(get_creation_data(data["last_modified_time"]))
+      batch.create(doc_ref, data)
+  batch.commit()
+
+
+def save_classroom_progress(classroom_id, course_work_ids, submissions,
+                            batch_size=BATCH_WRITE_SIZE,
+                            max_attempts=BATCH_WRITE_MAX_ATTEMPTS):
+  """saves the course work and the progress of all the learners of a
+  classroom listed from classroom, with batched writes, and marks the
+  classroom as backfilled
+
+  The listed submissions are merged per course work into the recorded
+  progress, keeping the states recorded by the notifications which are
+  more recent. A batch whose documents were changed by a notification
+  while it was merged is merged again.
+
+  Args:
+    classroom_id: id of the classroom
+    course_work_ids: ids of the published course work of the classroom
+    submissions: dict of gaia id to dict of course work id to submission
+      state, as recorded by SectionProgress.record_submission
+    batch_size: number of documents written per batch
+    max_attempts: number of merges of a batch
+  """
+  gaia_ids = list(submissions)
+  for start in range(0, len(gaia_ids), batch_size):
+    chunk = gaia_ids[start:start + batch_size]
+    for attempt in range(1, max_attempts + 1):
+      try:
+        commit_progress_batch(classroom_id, submissions, chunk)
+        break
+      except (Conflict, FailedPrecondition, NotFound):
+        if attempt == max_attempts:
+          raise
+    for gaia_id in chunk:
+      SectionProgress.invalidate_cache(
+          SectionProgress.get_progress_id(classroom_id, gaia_id))
+
+  data = SectionCourseWork.get_document_data(
+      classroom_id,
+      {course_work_id: True for course_work_id in course_work_ids})
+  data.update(get_creation_data(data["last_modified_time"]))
+  data["backfilled"] = True
+  db.conn.collection(SectionCourseWork.collection_name).document(
+      classroom_id).set(data)
+  SectionCourseWork.invalidate_cache(classroom_id)
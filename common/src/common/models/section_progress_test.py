@@ -0,0 +1,57 @@
+"""
+Unit test for the helpers of section_progress.py
+"""
+from common.models.section_progress import (count_submissions, is_stale,
+                                            merge_submissions,
+                                            parse_timestamp)
+
+SUBMISSIONS = {
+    "cw1": {"state": "TURNED_IN", "graded": True},
+    "cw2": {"state": "CREATED", "graded": False},
+    "cw3": {"state": "RETURNED", "graded": True},
+    "cw4": {"state": "TURNED_IN", "graded": False}
+}
+
+
+def test_count_submissions():
+  assert count_submissions(SUBMISSIONS) == (2, 2)
+  assert count_submissions({}) == (0, 0)
+
+
+def test_count_submissions_of_published_course_work():
+  # the submissions of deleted or unpublished course work are not counted
+  assert count_submissions(SUBMISSIONS, {"cw1": True, "cw2": True}) == (1, 1)
+  assert count_submissions(SUBMISSIONS, {}) == (0, 0)
+
+
+def test_parse_timestamp_fractional_digits():
+  assert parse_timestamp("2023-01-02T15:01:23Z") < \
+    parse_timestamp("2023-01-02T15:01:23.045Z")
+  assert parse_timestamp("2023-01-02T15:01:23.5Z") == \
+    parse_timestamp("2023-01-02T15:01:23.500000000Z")
+
+
+def test_is_stale():
+  previous = {"state": "TURNED_IN", "update_time": "2023-01-02T15:01:23.045Z"}
+  # compared as datetimes, "...23Z" sorts after "...23.045Z" as strings
+  assert is_stale(previous, "2023-01-02T15:01:23Z")
+  assert not is_stale(previous, "2023-01-02T15:01:24Z")
+  assert not is_stale(previous, "2023-01-02T15:01:23.045Z")
+  assert not is_stale(None, "2023-01-02T15:01:23Z")
+  assert not is_stale(previous, None)
+
+
+def test_merge_submissions_keeps_recent_states():
+  recorded = {
+      "cw1": {"state": "TURNED_IN", "update_time": "2023-01-03T00:00:00Z"},
+      "cw2": {"state": "CREATED", "update_time": "2023-01-01T00:00:00Z"}
+  }
+  listed = {
+      "cw1": {"state": "CREATED", "update_time": "2023-01-02T00:00:00Z"},
+      "cw2": {"state": "TURNED_IN", "update_time": "2023-01-02T00:00:00Z"},
+      "cw3": {"state": "CREATED", "update_time": "2023-01-02T00:00:00Z"}
+  }
+  merged = merge_submissions(recorded, listed)
+  assert merged["cw1"]["state"] == "TURNED_IN"
+  assert merged["cw2"]["state"] == "TURNED_IN"
+  assert merged["cw3"]["state"] == "CREATED"
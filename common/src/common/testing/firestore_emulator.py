@@ -21,6 +21,7 @@ import time
 import platform
 import requests
 import pytest
+from common.utils.model_cache import clear_model_caches
 
 # disabling pylint rules that conflict with pytest fixtures
 # pylint: disable=unused-argument,redefined-outer-name,unused-import
@@ -86,3 +87,4 @@ def clean_firestore():
   requests.delete(
       "http://localhost:8080/emulator/v1/projects/fake-project/databases/(default)/documents",
       timeout=10)
+  clear_model_caches()
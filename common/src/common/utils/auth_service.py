@@ -1,14 +1,167 @@
 """Firebase token validation"""
+import hashlib
 import json
+import re
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from fastapi import Depends
 from fastapi.security import HTTPBearer
+from google.auth import jwt
+from common.config import PROJECT_ID
+from common.models import TempUser
 from common.utils.errors import InvalidTokenError
 from common.utils.http_exceptions import Unauthenticated, InternalServerError
-from common.utils.config import SERVICES
+from common.utils.model_cache import ModelCache
+from common.utils.config import (SERVICES, AUTH_LOCAL_TOKEN_VERIFICATION,
+                                 AUTH_TOKEN_CACHE_TTL,
+                                 AUTH_TOKEN_CACHE_MAX_SIZE,
+                                 AUTH_HTTP_POOL_SIZE,
+                                 FIREBASE_PUBLIC_CERTS_URL)
 
 auth_scheme = HTTPBearer(auto_error=False)
 
+VALIDATE_TOKEN_URL = "http://authentication/authentication/api/v1/validate"
+VALIDATE_TOKEN_MESSAGE = "Token validated successfully"
+
+# Keep alive connections to the authentication service are reused across
+# requests instead of opening a new connection per validation
+http_session = requests.Session()
+http_session.mount(
+    "http://",
+    HTTPAdapter(pool_connections=AUTH_HTTP_POOL_SIZE,
+                pool_maxsize=AUTH_HTTP_POOL_SIZE))
+http_session.mount(
+    "https://",
+    HTTPAdapter(pool_connections=AUTH_HTTP_POOL_SIZE,
+                pool_maxsize=AUTH_HTTP_POOL_SIZE))
+
+token_cache = ModelCache(ttl=AUTH_TOKEN_CACHE_TTL,
+                         max_size=AUTH_TOKEN_CACHE_MAX_SIZE)
+
+_public_certs = {"certs": None, "expires_at": 0}
+_public_certs_lock = threading.Lock()
+
+
+def get_firebase_public_certs():
+  """Returns the public certs used to sign Firebase ID tokens, refetching
+  them once the max-age sent by Google has passed"""
+  with _public_certs_lock:
+    if _public_certs["certs"] is None or \
+        _public_certs["expires_at"] <= time.time():
+      res = http_session.get(FIREBASE_PUBLIC_CERTS_URL, timeout=10)
+      res.raise_for_status()
+      max_age = re.search(r"max-age=(\d+)",
+                          res.headers.get("Cache-Control", ""))
+      _public_certs["certs"] = res.json()
+      _public_certs["expires_at"] = time.time() + (
+          int(max_age.group(1)) if max_age else 3600)
+    return _public_certs["certs"]
+
+
+def verify_token_locally(id_token):
+  """Verifies signature, audience, issuer and expiry of a Firebase ID token
+  without calling the authentication service
+
+  Args:
+      id_token (str): Firebase ID token
+
+  Raises:
+      InvalidTokenError: If the token is not valid
+
+  Returns:
+      dict: decoded token claims
+  """
+  try:
+    claims = jwt.decode(id_token,
+                        certs=get_firebase_public_certs(),
+                        audience=PROJECT_ID)
+  except ValueError as e:
+    raise InvalidTokenError(str(e)) from e
+  if claims.get("iss") != f"https://securetoken.google.com/{PROJECT_ID}" \
+      or not claims.get("sub"):
+    raise InvalidTokenError("Invalid token")
+  return claims
+
+
+def get_local_token_validation(id_token):
+  """Validates a token like the authentication service does, without calling
+  it: the token is verified against the Google public certs and the user type
+  and status are read from the users collection
+
+  Args:
+      id_token (str): Firebase ID token
+
+  Raises:
+      InvalidTokenError: If the token is not valid or the user is unknown
+        or inactive
+
+  Returns:
+      dict: success, message and data of a /validate response
+  """
+  claims = verify_token_locally(id_token)
+  user = TempUser.find_by_email(claims.get("email"))
+  if user is None:
+    raise InvalidTokenError("Unauthorized")
+  user_fields = user.get_fields(reformat_datetime=True)
+  if user_fields.get("status") == "inactive":
+    raise InvalidTokenError("Unauthorized")
+  data = {**claims, "uid": claims["sub"]}
+  data["access_api_docs"] = False if user_fields.get(
+      "access_api_docs") is None else user_fields.get("access_api_docs")
+  data["user_type"] = user_fields.get("user_type")
+  return {"success": True, "message": VALIDATE_TOKEN_MESSAGE, "data": data}
+
+
+def get_token_validation(token_dict, timeout):
+  """Returns the /validate response of a bearer token, served from the in
+  process token cache when the same token was validated recently. With
+  AUTH_LOCAL_TOKEN_VERIFICATION a cache miss is validated locally instead of
+  calling the authentication service.
+
+  Args:
+      token_dict (dict): scheme and credentials of the bearer token
+      timeout (int): timeout of the call to the authentication service
+
+  Raises:
+      InvalidTokenError: If the token is not valid
+
+  Returns:
+      dict: success, message and data of the validation
+  """
+  credentials = token_dict["credentials"]
+  cache_key = hashlib.sha256(credentials.encode()).hexdigest()
+  cached_data = token_cache.get(cache_key)
+  if cached_data is not None and cached_data["exp"] > time.time():
+    return cached_data["response"]
+
+  if AUTH_LOCAL_TOKEN_VERIFICATION:
+    response = get_local_token_validation(credentials)
+    exp = response["data"]["exp"]
+  else:
+    res = http_session.get(
+        url=VALIDATE_TOKEN_URL,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"{token_dict['scheme']} {credentials}"
+        },
+        timeout=timeout)
+    response = res.json()
+    if res.status_code != 200 or response["success"] is not True:
+      raise InvalidTokenError(response["message"])
+    try:
+      exp = jwt.decode(credentials, verify=False).get("exp")
+    except ValueError:
+      exp = None
+  # entries never outlive the token itself
+  if exp:
+    token_cache.set(cache_key, {
+        "exp": exp,
+        "response": response
+    }, doc_id=cache_key)
+  return response
+
 
 # pylint: disable = consider-using-f-string
 def validate_token(token: auth_scheme = Depends()):
@@ -30,21 +183,7 @@ def validate_token(token: auth_scheme = Depends()):
       raise InvalidTokenError("Unauthorized")
     token_dict = dict(token)
     if token_dict["credentials"]:
-      api_endpoint = "http://authentication/authentication/api/v1/validate"
-      res = requests.get(
-          url=api_endpoint,
-          headers={
-              "Content-Type":
-                  "application/json",
-              "Authorization":
-                  f"{token_dict['scheme']} {token_dict['credentials']}"
-          },
-          timeout=60)
-      data = res.json()
-      if res.status_code == 200 and data["success"] is True:
-        return data.get("data")
-      else:
-        raise InvalidTokenError(data["message"])
+      return get_token_validation(token_dict, timeout=60).get("data")
     else:
       raise InvalidTokenError("Unauthorized")
   except InvalidTokenError as e:
@@ -73,22 +212,11 @@ def validate_user_type_and_token(accepted_user_types: list,
       raise InvalidTokenError("Unauthorized")
     token_dict = dict(token)
     if token_dict["credentials"]:
-      api_endpoint = "http://authentication/authentication/api/v1/validate"
-      res = requests.get(
-          url=api_endpoint,
-          headers={
-              "Content-Type":
-                  "application/json",
-              "Authorization":
-                  f"{token_dict['scheme']} {token_dict['credentials']}"
-          },
-          timeout=300)
-      data = res.json()
-      if res.status_code == 200 and data["success"] is True and data["data"][
-          "user_type"] in accepted_user_types:
-        return data.get("data")
+      response = get_token_validation(token_dict, timeout=300)
+      if response["data"]["user_type"] in accepted_user_types:
+        return response.get("data")
       else:
-        raise InvalidTokenError(data["message"])
+        raise InvalidTokenError(response["message"])
     else:
       raise InvalidTokenError("Unauthorized")
   except InvalidTokenError as e:
@@ -0,0 +1,93 @@
+"""Benchmark of the latency of the auth dependency
+
+Compares validate_token on a token cache miss with the pooled /validate
+fallback and with local verification, and on a token cache hit. The call to
+the authentication service and the Firestore read of the user are mocked
+with a fixed latency, the signature of the token is really verified.
+
+Usage: python -m common.utils.auth_service_benchmark [iterations]
+"""
+import sys
+import time
+from unittest import mock
+import rsa
+from google.auth import crypt, jwt
+from common.utils import auth_service
+
+# latency of a call to the authentication service in the cluster
+VALIDATE_LATENCY = 0.005
+# latency of the Firestore read of the user
+FIRESTORE_LATENCY = 0.003
+KEY_ID = "benchmark-key"
+USER_DATA = {"user_id": "user-1", "email": "user@example.com",
+             "user_type": "learner"}
+
+
+def get_signed_token(private_key):
+  """Returns a Firebase like ID token signed with the private key"""
+  now = int(time.time())
+  signer = crypt.RSASigner.from_string(
+      private_key.save_pkcs1().decode(), KEY_ID)
+  return jwt.encode(signer, {
+      "iss": f"https://securetoken.google.com/{auth_service.PROJECT_ID}",
+      "aud": auth_service.PROJECT_ID,
+      "sub": USER_DATA["user_id"],
+      "email": USER_DATA["email"],
+      "iat": now,
+      "exp": now + 3600
+  }).decode()
+
+
+def validate_response(*args, **kwargs):
+  time.sleep(VALIDATE_LATENCY)
+  res = mock.Mock(status_code=200)
+  res.json.return_value = {"success": True,
+                           "message": auth_service.VALIDATE_TOKEN_MESSAGE,
+                           "data": USER_DATA}
+  return res
+
+
+def find_user_by_email(email):
+  time.sleep(FIRESTORE_LATENCY)
+  return mock.Mock(get_fields=mock.Mock(return_value=USER_DATA))
+
+
+def time_validate_token(token, iterations, clear_cache):
+  """Returns the mean latency of validate_token in milliseconds"""
+  total = 0.
+  for _ in range(iterations):
+    if clear_cache:
+      auth_service.token_cache.clear()
+    start_time = time.perf_counter()
+    auth_service.validate_token(token)
+    total += time.perf_counter() - start_time
+  return total / iterations * 1000
+
+
+def run_benchmark(iterations):
+  """Times the auth dependency with and without local verification and
+  the token cache"""
+  # 2048 bits like the Firebase signing keys, slow to generate without the
+  # cryptography package
+  public_key, private_key = rsa.newkeys(2048)
+  token = {"scheme": "Bearer", "credentials": get_signed_token(private_key)}
+  certs = {KEY_ID: public_key.save_pkcs1().decode()}
+
+  with mock.patch.object(auth_service.http_session, "get",
+                         side_effect=validate_response), \
+      mock.patch.object(auth_service, "get_firebase_public_certs",
+                        return_value=certs), \
+      mock.patch.object(auth_service.TempUser, "find_by_email",
+                        side_effect=find_user_by_email):
+    for local_verification in [False, True]:
+      with mock.patch.object(auth_service, "AUTH_LOCAL_TOKEN_VERIFICATION",
+                             local_verification):
+        name = "local verification" if local_verification else "/validate"
+        latency = time_validate_token(token, iterations, clear_cache=True)
+        print(f"{name}, token cache miss: {latency:.3f} ms")
+        latency = time_validate_token(token, iterations, clear_cache=False)
+        print(f"{name}, token cache hit: {latency:.3f} ms")
+
+
+if __name__ == "__main__":
+  run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
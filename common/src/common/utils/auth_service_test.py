@@ -0,0 +1,102 @@
+"""Unit test cases for auth service"""
+import time
+from unittest import mock
+import pytest
+from common.utils import auth_service
+from common.utils.http_exceptions import Unauthenticated
+
+TOKEN = {"scheme": "Bearer", "credentials": "test-token"}
+USER_DATA = {"user_id": "user-1", "email": "user@example.com",
+             "user_type": "learner"}
+
+
+def validate_response(*args, **kwargs):
+  res = mock.Mock(status_code=200)
+  res.json.return_value = {"success": True,
+                           "message": "Token validated successfully",
+                           "data": USER_DATA}
+  return res
+
+
+@pytest.fixture(name="mock_validate")
+def fixture_mock_validate():
+  auth_service.token_cache.clear()
+  with mock.patch.object(auth_service.http_session, "get",
+                         side_effect=validate_response) as mock_get, \
+      mock.patch("common.utils.auth_service.jwt.decode",
+                 return_value={"exp": time.time() + 3600}):
+    yield mock_get
+
+
+def test_validate_token_uses_cache(mock_validate):
+  assert auth_service.validate_token(TOKEN) == USER_DATA
+  assert auth_service.validate_token(TOKEN) == USER_DATA
+  assert mock_validate.call_count == 1
+
+
+def test_validate_user_type_and_token(mock_validate):
+  assert auth_service.validate_user_type_and_token(["learner"],
+                                                   TOKEN) == USER_DATA
+  with pytest.raises(Unauthenticated):
+    auth_service.validate_user_type_and_token(["admin"], TOKEN)
+
+
+def test_expired_token_is_revalidated(mock_validate):
+  with mock.patch("common.utils.auth_service.jwt.decode",
+                  return_value={"exp": time.time() - 1}):
+    auth_service.validate_token(TOKEN)
+    auth_service.validate_token(TOKEN)
+  assert mock_validate.call_count == 2
+
+
+def test_invalid_token_is_not_cached():
+  auth_service.token_cache.clear()
+  res = mock.Mock(status_code=401)
+  res.json.return_value = {"success": False, "message": "Token expired"}
+  with mock.patch.object(auth_service.http_session, "get",
+                         return_value=res) as mock_get:
+    for _ in range(2):
+      with pytest.raises(Unauthenticated):
+        auth_service.validate_token(TOKEN)
+  assert mock_get.call_count == 2
+
+
+def test_local_verification_rejects_token_without_network(mock_validate):
+  with mock.patch("common.utils.auth_service.AUTH_LOCAL_TOKEN_VERIFICATION",
+                  True), \
+      mock.patch("common.utils.auth_service.get_firebase_public_certs",
+                 return_value={}), \
+      mock.patch("common.utils.auth_service.jwt.decode",
+                 side_effect=ValueError("Token expired")):
+    with pytest.raises(Unauthenticated):
+      auth_service.validate_token(TOKEN)
+  mock_validate.assert_not_called()
+
+
+def test_local_verification_skips_authentication_service(mock_validate):
+  claims = {"sub": "user-1", "email": "user@example.com",
+            "exp": time.time() + 3600}
+  user = mock.Mock()
+  user.get_fields.return_value = {"user_type": "learner",
+                                  "status": "active"}
+  with mock.patch("common.utils.auth_service.AUTH_LOCAL_TOKEN_VERIFICATION",
+                  True), \
+      mock.patch("common.utils.auth_service.verify_token_locally",
+                 return_value=claims), \
+      mock.patch("common.utils.auth_service.TempUser.find_by_email",
+                 return_value=user) as find_by_email:
+    data = auth_service.validate_user_type_and_token(["learner"], TOKEN)
+    assert auth_service.validate_token(TOKEN) == data
+    with pytest.raises(Unauthenticated,
+                       match="Token validated successfully"):
+      auth_service.validate_user_type_and_token(["admin"], TOKEN)
+
+    user.get_fields.return_value["status"] = "inactive"
+    auth_service.token_cache.clear()
+    with pytest.raises(Unauthenticated, match="Unauthorized"):
+      auth_service.validate_token(TOKEN)
+  assert data["user_type"] == "learner"
+  assert data["uid"] == "user-1"
+  assert data["access_api_docs"] is False
+  assert find_by_email.call_count == 2
+  mock_validate.assert_not_called()
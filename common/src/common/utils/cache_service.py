@@ -1,18 +1,43 @@
-"""Utility methods for caching related operations."""
+"""Utility methods for caching related operations.
+
+Values are cached in two tiers, an optional small in-process tier (L1) in
+front of Redis (L2). Values are read whether they were encoded with
+msgpack or as JSON, and are written as JSON unless CACHE_MSGPACK_ENABLED is
+set, so that the services still reading JSON only are not broken while the
+release is rolled out.
+"""
 import datetime
 import json
+import msgpack
 import redis
-from common.config import MEMORYSTORE_ENABLED
+from common.config import (MEMORYSTORE_ENABLED, REDIS_SOCKET_TIMEOUT,
+                           REDIS_CONNECT_TIMEOUT, REDIS_MAX_CONNECTIONS,
+                           LOCAL_CACHE_TTL, LOCAL_CACHE_MAX_SIZE,
+                           CACHE_MSGPACK_ENABLED)
+from common.utils.model_cache import ModelCache
 from common.utils.secrets import get_secret
 
+# Marks values encoded with msgpack, JSON encoded values never start with it
+MSGPACK_PREFIX = b"\x00mp"
+
 if MEMORYSTORE_ENABLED == "true":
   host = get_secret("memorystore-master-host")
   host = host.split(":")
   host_ip = host[0]
   host_port = host[1]
-  r = redis.Redis(host=host_ip, port=host_port, db=0)
 else:
-  r = redis.Redis(host="redis-master", port=6379, db=0)
+  host_ip = "redis-master"
+  host_port = 6379
+
+connection_pool = redis.BlockingConnectionPool(
+    host=host_ip,
+    port=host_port,
+    db=0,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT)
+r = redis.Redis(connection_pool=connection_pool)
+local_cache = ModelCache(ttl=LOCAL_CACHE_TTL, max_size=LOCAL_CACHE_MAX_SIZE)
 
 
 def json_serial(obj):
@@ -22,35 +47,114 @@ def json_serial(obj):
   raise TypeError(f"Type {type(obj)} not serializable")
 
 
-def set_key(key, value, expiry_time=3600):
+def encode_value(value, use_msgpack=None):
+  """Encodes a value with msgpack or as JSON, datetimes are stored as ISO
+  strings"""
+  if use_msgpack is None:
+    use_msgpack = CACHE_MSGPACK_ENABLED
+  if use_msgpack:
+    return MSGPACK_PREFIX + msgpack.packb(value, default=json_serial)
+  return json.dumps(value, default=json_serial)
+
+
+def decode_value(value):
+  """Decodes a value written by encode_value or by the older JSON encoding"""
+  if value is None:
+    return None
+  if isinstance(value, bytes) and value.startswith(MSGPACK_PREFIX):
+    # dicts with int keys are accepted, as written before by JSON
+    return msgpack.unpackb(value[len(MSGPACK_PREFIX):],
+                           strict_map_key=False)
+  return json.loads(value)
+
+
+def set_key(key, value, expiry_time=3600, local_cache_enabled=False):
   """
         Stores value against key in cache with default expiry time of 1hr
         Args:
             key: String
             value: String or Dict or Number
             exp: Number(Expiry time in Secs, default 3600)
+            local_cache_enabled: Boolean, also keep the value in process
         Returns:
             True or False
     """
-  value = json.dumps(value, default=json_serial)
-  return r.set(key, value, ex=expiry_time)
+  result = r.set(key, encode_value(value), ex=expiry_time)
+  if local_cache_enabled:
+    local_cache.set(key, value, doc_id=key)
+  return result
 
 
-def get_key(key):
+def get_key(key, local_cache_enabled=False):
   """
         Checks for key in cache, if found then, Returns value against that key
         else Returns None
         Args:
             key: String
+            local_cache_enabled: Boolean, look up the in process cache first
+              and keep the value fetched from Redis in it
         Returns:
             value: String or Dict or Number or None
     """
-  value = r.get(key)
-  return_value = json.loads(value) if value is not None else None
-  return return_value
+  if local_cache_enabled:
+    value = local_cache.get(key)
+    if value is not None:
+      return value
+  value = decode_value(r.get(key))
+  if local_cache_enabled and value is not None:
+    local_cache.set(key, value, doc_id=key)
+  return value
+
+
+def get_many(keys, local_cache_enabled=False):
+  """
+        Fetches multiple keys in one round trip
+        Args:
+            keys: List of Strings
+            local_cache_enabled: Boolean, look up the in process cache first
+        Returns:
+            values: Dict of key to value for every key found in cache
+    """
+  values = {}
+  remote_keys = []
+  for key in keys:
+    value = local_cache.get(key) if local_cache_enabled else None
+    if value is not None:
+      values[key] = value
+    else:
+      remote_keys.append(key)
+  if remote_keys:
+    for key, value in zip(remote_keys, r.mget(remote_keys)):
+      if value is None:
+        continue
+      values[key] = decode_value(value)
+      if local_cache_enabled:
+        local_cache.set(key, values[key], doc_id=key)
+  return values
+
+
+def set_many(mapping, expiry_time=3600, local_cache_enabled=False):
+  """
+        Stores multiple values in one round trip using a Redis pipeline
+        Args:
+            mapping: Dict of key to value
+            exp: Number(Expiry time in Secs, default 3600)
+            local_cache_enabled: Boolean, also keep the values in process
+        Returns:
+            List of True or False per key
+    """
+  with r.pipeline(transaction=False) as pipe:
+    for key, value in mapping.items():
+      pipe.set(key, encode_value(value), ex=expiry_time)
+    result = pipe.execute()
+  if local_cache_enabled:
+    for key, value in mapping.items():
+      local_cache.set(key, value, doc_id=key)
+  return result
 
 
 def delete_key(key):
+  local_cache.invalidate(key)
   r.delete(key)
 
 
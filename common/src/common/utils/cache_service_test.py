@@ -0,0 +1,67 @@
+"""Unit test cases for cache service"""
+import datetime
+import json
+import sys
+from unittest import mock
+
+# common.utils.secrets imports the config of the service it runs in
+with mock.patch.dict(sys.modules,
+                     {"config": mock.Mock(PROJECT_ID="fake-project")}):
+  from common.utils import cache_service # pylint: disable=wrong-import-position
+
+
+def test_encode_decode_value():
+  value = {
+      "name": "test",
+      "count": 3,
+      "tags": ["a", "b"],
+      "created_time": datetime.datetime(2023, 1, 1, 10, 30)
+  }
+  for use_msgpack in (True, False):
+    decoded_value = cache_service.decode_value(
+        cache_service.encode_value(value, use_msgpack=use_msgpack))
+    assert decoded_value == {**value, "created_time": "2023-01-01T10:30:00"}
+
+
+def test_decode_msgpack_value_with_int_keys():
+  value = cache_service.encode_value({1: "a"}, use_msgpack=True)
+  assert cache_service.decode_value(value) == {1: "a"}
+
+
+def test_decode_json_value():
+  value = {"name": "test", "count": 3}
+  assert cache_service.decode_value(json.dumps(value).encode()) == value
+  assert cache_service.decode_value(None) is None
+
+
+@mock.patch("common.utils.cache_service.r")
+def test_get_key_with_local_cache(mock_redis):
+  cache_service.local_cache.clear()
+  mock_redis.get.return_value = cache_service.encode_value({"a": 1})
+  assert cache_service.get_key("key1", local_cache_enabled=True) == {"a": 1}
+  assert cache_service.get_key("key1", local_cache_enabled=True) == {"a": 1}
+  assert mock_redis.get.call_count == 1
+
+  cache_service.delete_key("key1")
+  assert cache_service.get_key("key1", local_cache_enabled=True) == {"a": 1}
+  assert mock_redis.get.call_count == 2
+
+
+@mock.patch("common.utils.cache_service.r")
+def test_get_many(mock_redis):
+  cache_service.local_cache.clear()
+  cache_service.local_cache.set("key1", "local", doc_id="key1")
+  mock_redis.mget.return_value = [cache_service.encode_value("remote"), None]
+  values = cache_service.get_many(["key1", "key2", "key3"],
+                                  local_cache_enabled=True)
+  mock_redis.mget.assert_called_once_with(["key2", "key3"])
+  assert values == {"key1": "local", "key2": "remote"}
+
+
+@mock.patch("common.utils.cache_service.r")
+def test_set_many(mock_redis):
+  pipe = mock_redis.pipeline.return_value.__enter__.return_value
+  cache_service.set_many({"key1": 1, "key2": 2}, expiry_time=60)
+  pipe.set.assert_any_call("key1", cache_service.encode_value(1), ex=60)
+  pipe.set.assert_any_call("key2", cache_service.encode_value(2), ex=60)
+  pipe.execute.assert_called_once()
@@ -1,6 +1,8 @@
 """ Helper functions for classroom crud API """
 import requests
+import threading
 import traceback
+from collections import OrderedDict
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
@@ -12,7 +14,8 @@ from common.utils.logging_handler import Logger
 from common.utils.secrets import get_secret
 from common.models import Section
 from common.config import (CLASSROOM_ADMIN_EMAIL, USER_MANAGEMENT_BASE_URL,
-                           PUB_SUB_PROJECT_ID, DATABASE_PREFIX)
+                           PUB_SUB_PROJECT_ID, DATABASE_PREFIX,
+                           CLASSROOM_BATCH_SIZE, CLASSROOM_CLIENT_CACHE_SIZE)
 # pylint: disable=line-too-long, redefined-outer-name, broad-exception-caught
 
 SUCCESS_RESPONSE = {"status": "Success"}
@@ -59,23 +62,112 @@ SCOPES = [
     "https://www.googleapis.com/auth/classroom.rosters.readonly"
 ]
 
+# delegated credentials are shared by all the threads and refresh their
+# token when it expires, service clients wrap an httplib2 connection which
+# is not thread safe so every thread builds its own
+_service_account_email = None
+_credentials = OrderedDict()
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_cached(cache, key, create, max_size):
+  """returns the value of a key of a LRU cache, created on a miss"""
+  if key in cache:
+    cache.move_to_end(key)
+    return cache[key]
+  value = cache[key] = create()
+  while len(cache) > max_size:
+    cache.popitem(last=False)
+  return value
+
+
 def get_default_service_account_email():
-  metadata_url = "http://metadata.google.internal/computeMetadata/v1/"
-  metadata_headers = {"Metadata-Flavor": "Google"}
-  url = f"{metadata_url}instance/service-accounts"
-  r = requests.get(url, headers=metadata_headers, timeout=10)
-  service_account_email = r.text.split("/")[1].strip()
-  return service_account_email
+  """returns the email of the service account of the instance, read once
+  from the metadata server"""
+  global _service_account_email
+  if _service_account_email is None:
+    metadata_url = "http://metadata.google.internal/computeMetadata/v1/"
+    metadata_headers = {"Metadata-Flavor": "Google"}
+    url = f"{metadata_url}instance/service-accounts"
+    r = requests.get(url, headers=metadata_headers, timeout=10)
+    _service_account_email = r.text.split("/")[1].strip()
+  return _service_account_email
 
 def get_credentials(email=CLASSROOM_ADMIN_EMAIL):
-  google_oauth_token_endpoint = "https://oauth2.googleapis.com/token"
-  service_account_email = get_default_service_account_email()
-  creds = JwtCredentials.from_default_with_subject(
-    subject=email,
-    service_account_email=service_account_email,
-    token_uri=google_oauth_token_endpoint,
-    scopes=SCOPES)
-  return creds
+  """returns the credentials of the service account delegated to a user,
+  cached by user"""
+  def create_credentials():
+    return JwtCredentials.from_default_with_subject(
+      subject=email,
+      service_account_email=get_default_service_account_email(),
+      token_uri="https://oauth2.googleapis.com/token",
+      scopes=SCOPES)
+  with _credentials_lock:
+    return _get_cached(_credentials, email, create_credentials,
+                       CLASSROOM_CLIENT_CACHE_SIZE)
+
+
+def get_service(name="classroom", version="v1", email=CLASSROOM_ADMIN_EMAIL,
+                discovery_url=None):
+  """returns the client of a google API for a user, built once per thread
+
+  Args:
+    name: name of the API
+    version: version of the API
+    email: user the service account is delegated to
+    discovery_url: discovery document of the API, for preview versions of
+      the API which are not part of the static discovery documents
+  """
+  services = getattr(_local, "services", None)
+  if services is None:
+    services = _local.services = OrderedDict()
+  def create_service():
+    if discovery_url:
+      return build(name, version, credentials=get_credentials(email),
+                   static_discovery=False, discoveryServiceUrl=discovery_url)
+    return build(name, version, credentials=get_credentials(email))
+  return _get_cached(services, (name, version, email, discovery_url),
+                     create_service, CLASSROOM_CLIENT_CACHE_SIZE)
+
+
+def list_all(list_method, items_key, **kwargs):
+  """yields the items of every page of a list method of a google API
+
+  Args:
+    list_method: list method of a resource of a service client, like
+      service.courses().list
+    items_key: key of the items in the responses, like courses
+    kwargs: arguments of the list method
+  """
+  page_token = None
+  while True:
+    response = list_method(pageToken=page_token, **kwargs).execute()
+    yield from response.get(items_key, [])
+    page_token = response.get("nextPageToken")
+    if not page_token:
+      break
+
+
+def execute_batch(service, requests_list, batch_size=CLASSROOM_BATCH_SIZE):
+  """executes API requests in batch HTTP requests of `batch_size` requests
+
+  Args:
+    service: service client the requests were created with
+    requests_list: list of HttpRequest
+  Returns:
+    list of (response, HttpError) of the requests, the HttpError is None for
+    the successful requests
+  """
+  results = [None] * len(requests_list)
+  def callback(request_id, response, exception):
+    results[int(request_id)] = (response, exception)
+  for start in range(0, len(requests_list), batch_size):
+    batch = service.new_batch_http_request(callback=callback)
+    for index in range(start, min(start + batch_size, len(requests_list))):
+      batch.add(requests_list[index], request_id=str(index))
+    batch.execute()
+  return results
 
 def create_course(name, description, section, owner_id):
   """Create course Function in classroom
@@ -85,7 +177,7 @@ def create_course(name, description, section, owner_id):
     new created course details
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   new_course = {}
   new_course["name"] = name
   new_course["section"] = section
@@ -105,7 +197,7 @@ def get_course_by_id(course_id):
   """
 
   try:
-    service = build("classroom", "v1", credentials=get_credentials())
+    service = get_service()
     course = service.courses().get(id=course_id).execute()
     return course
 
@@ -126,7 +218,7 @@ def drive_copy(file_id, target_folder_id, name):
   """
 
   copied_file = {"name": name, "parents": [target_folder_id]}
-  service = build("drive", "v3", credentials=get_credentials())
+  service = get_service("drive", "v3")
   form_copy = service.files().copy(fileId=file_id,
                                    fields="webViewLink,name,mimeType,id",
                                    body=copied_file).execute()
@@ -165,7 +257,7 @@ def update_course(course_id, section_name, description, course_name=None):
     new created course details
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
 
   course = service.courses().get(id=course_id).execute()
   if course_name is not None:
@@ -187,7 +279,7 @@ def update_course_state(course_id, course_state):
   Returns:
     new created course details
   """
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   course = service.courses().get(id=course_id).execute()
   course["course_state"] = course_state
   course = service.courses().update(id=course_id, body=course).execute()
@@ -200,13 +292,11 @@ def get_course_list():
 
   Args:
   Returns:
-    list of courses in classroom
+    generator of the courses in classroom
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
-  results = service.courses().list().execute()
-  courses = results.get("courses", [])
-  return courses
+  service = get_service()
+  return list_all(service.courses().list, "courses")
 
 
 def get_topics(course_id):
@@ -217,20 +307,11 @@ def get_topics(course_id):
     returns list of topics of given course in classroom
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   try:
-    topics = []
-    page_token = None
-    while True:
-      response = service.courses().topics().list(pageToken=page_token,
-                                                 courseId=course_id).execute()
-      topics = topics.extend(response.get("topic", []))
-      page_token = response.get("nextPageToken", None)
-      if not page_token:
-        break
-    if response:
-      topics = response["topic"]
-      return topics
+    topics = list(list_all(service.courses().topics().list, "topic",
+                           courseId=course_id))
+    return topics or None
   except HttpError as error:
     Logger.error(error)
     return None
@@ -246,7 +327,7 @@ def create_topics(course_id, topics):
     returns success
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   topic_id_map = {}
   for topic in topics:
     old_topic_id = topic["topicId"]
@@ -267,18 +348,11 @@ def get_coursework_list(course_id,coursework_state="PUBLISHED"):
     returns list of coursework of given course in classroom
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
-  page_token = None
-  coursework_list=[]
+  service = get_service()
   try:
-    while True:
-      response = service.courses().courseWork().list(
-          courseId=course_id,pageToken=page_token,courseWorkStates=coursework_state).execute()
-      coursework_list.extend(response.get("courseWork", []))
-      page_token = response.get("nextPageToken", None)
-      if not page_token:
-        break
-    return coursework_list
+    return list(list_all(service.courses().courseWork().list, "courseWork",
+                         courseId=course_id,
+                         courseWorkStates=coursework_state))
   except HttpError as error:
     Logger.error(error)
     return None
@@ -294,19 +368,57 @@ def list_coursework_submissions_user(course_id, coursework_id, user_id):
     returns list of coursework of given course in classroom
     """ ""
 
-  service = build("classroom", "v1", credentials=get_credentials())
-  submissions = []
-  page_token = None
-  while True:
-    coursework = service.courses().courseWork()
-    response = coursework.studentSubmissions().list(pageToken=page_token,
-                                                    courseId=course_id,
-                                                    courseWorkId=coursework_id,
-                                                    userId=user_id).execute()
-    submissions.extend(response.get("studentSubmissions", []))
-    page_token = response.get("nextPageToken", None)
-    if not page_token:
-      break
+  service = get_service()
+  return list(list_all(
+      service.courses().courseWork().studentSubmissions().list,
+      "studentSubmissions", courseId=course_id, courseWorkId=coursework_id,
+      userId=user_id))
+
+
+def list_course_submissions(course_id):
+  """Get the submissions of all the students to all the coursework of a
+  course, with a single paginated listing
+
+  Args: course_id: classroom course_id
+  Returns:
+    generator of the student submissions of the course
+  """
+
+  service = get_service()
+  return list_all(service.courses().courseWork().studentSubmissions().list,
+                  "studentSubmissions", courseId=course_id, courseWorkId="-")
+
+
+def list_coursework_submissions_users(course_id, coursework_id, user_ids):
+  """Get the coursework submissions of many users with batch requests
+
+  Args: course_id: classroom course_id
+  coursework_id: coursework_id of classroom coursework
+  user_ids : emails or numeric identifiers of the users
+  Returns:
+    dict of user id to the list of its submissions, the users whose
+    submissions could not be listed are left out
+  """
+  service = get_service()
+  submissions_api = service.courses().courseWork().studentSubmissions()
+  submissions = {user_id: [] for user_id in user_ids}
+  page_tokens = {user_id: None for user_id in submissions}
+  while page_tokens:
+    batch_user_ids = list(page_tokens)
+    results = execute_batch(service, [
+        submissions_api.list(courseId=course_id, courseWorkId=coursework_id,
+                             userId=user_id, pageToken=page_tokens[user_id])
+        for user_id in batch_user_ids
+    ])
+    page_tokens = {}
+    for user_id, (response, error) in zip(batch_user_ids, results):
+      if error is not None:
+        Logger.error(f"Failed to list the submissions of {user_id}: {error}")
+        submissions.pop(user_id)
+        continue
+      submissions[user_id].extend(response.get("studentSubmissions", []))
+      if response.get("nextPageToken"):
+        page_tokens[user_id] = response["nextPageToken"]
   return submissions
 
 
@@ -318,7 +430,7 @@ def patch_student_submission(course_id, coursework_id, student_submission_id,
   Returns:
     returns list of coursework of given course in classroom
     """ ""
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   student_submission = {
       "assignedGrade": assigned_grade,
       "draftGrade": draft_grade
@@ -339,19 +451,12 @@ def get_coursework_material_list(course_id,coursework_material_state="PUBLISHED"
   Returns:
     returns list of coursework of given course in classroom
   """
-  service = build("classroom", "v1", credentials=get_credentials())
-  page_token = None
-  coursework_material_list=[]
+  service = get_service()
   try:
-    while True:
-      response = service.courses().courseWorkMaterials().list(
-       courseId=course_id,pageToken=page_token,
-       courseWorkMaterialStates=coursework_material_state).execute()
-      coursework_material_list.extend(response.get("courseWorkMaterial", []))
-      page_token = response.get("nextPageToken", None)
-      if not page_token:
-        break
-    return coursework_material_list
+    return list(list_all(
+        service.courses().courseWorkMaterials().list, "courseWorkMaterial",
+        courseId=course_id,
+        courseWorkMaterialStates=coursework_material_state))
   except HttpError as error:
     Logger.error(error)
     return None
@@ -367,7 +472,7 @@ def create_coursework(course_id, coursework):
     returns success
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   data = service.courses().courseWork().create(courseId=course_id,
                                                body=coursework).execute()
   Logger.info("Create coursework method worked")
@@ -385,12 +490,7 @@ def patch_coursework_alpha(course_id, coursework_id, update_mask, updated_data):
   Returns:
     returns success
   """
-  service = build(
-      "classroom",
-      "v1",
-      credentials=get_credentials(),
-      static_discovery=False,
-      discoveryServiceUrl=DISCOVERY_SERVICE_URL)
+  service = get_service(discovery_url=DISCOVERY_SERVICE_URL)
   data = service.courses().courseWork().patch(
       courseId=course_id,
       id=coursework_id,
@@ -412,12 +512,7 @@ def patch_coursework_material_alpha(course_id, coursework_material_id,
   Returns:
     returns success
   """
-  service = build(
-      "classroom",
-      "v1",
-      credentials=get_credentials(),
-      static_discovery=False,
-      discoveryServiceUrl=DISCOVERY_SERVICE_URL)
+  service = get_service(discovery_url=DISCOVERY_SERVICE_URL)
   data = service.courses().courseWorkMaterials().patch(
       courseId=course_id,
       id=coursework_material_id,
@@ -437,7 +532,7 @@ def create_coursework_material(course_id, coursework_material):
     returns success
   """
   Logger.info("In Create coursework Material")
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
 
   data = service.courses().courseWorkMaterials().create(courseId=course_id,
                                                body=coursework_material).execute()
@@ -453,7 +548,7 @@ def delete_course_by_id(course_id):
     []
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   course = service.courses().delete(id=course_id).execute()
   return course
 
@@ -470,13 +565,9 @@ def get_course_work_list(section_id):
   """
 
   section_details = Section.find_by_id(section_id)
-  service = build("classroom", "v1", credentials=get_credentials())
-
-  coursework_list = service.courses().courseWork().list(
-      courseId=section_details.classroom_id).execute()
-  if coursework_list:
-    coursework_list = coursework_list["courseWork"]
-  return coursework_list
+  service = get_service()
+  return list(list_all(service.courses().courseWork().list, "courseWork",
+                       courseId=section_details.classroom_id))
 
 
 def get_submitted_course_work_list(section_id,
@@ -501,16 +592,12 @@ def get_submitted_course_work_list(section_id,
                           headers=headers,
                           timeout=60)
   user_email = response.json()["data"]["email"]
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
 
-  submitted_course_work_list = service.courses().courseWork(
-  ).studentSubmissions().list(courseId=section_details.classroom_id,
-                              courseWorkId=course_work_id,
-                              userId=user_email).execute()
-  if submitted_course_work_list:
-    submitted_course_work_list = submitted_course_work_list[
-        "studentSubmissions"]
-  return submitted_course_work_list
+  return list(list_all(
+      service.courses().courseWork().studentSubmissions().list,
+      "studentSubmissions", courseId=section_details.classroom_id,
+      courseWorkId=course_work_id, userId=user_email))
 
 
 def add_teacher(course_id, teacher_email):
@@ -522,7 +609,7 @@ def add_teacher(course_id, teacher_email):
     course(dict): returns a dict which contains classroom details
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   teacher = {"userId": teacher_email}
   course = service.courses().teachers().create(courseId=course_id,
                                                body=teacher).execute()
@@ -538,7 +625,7 @@ def delete_teacher(course_id, teacher_email):
     course(dict): returns a dict which contains classroom details
   """
 
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   course = service.courses().teachers().delete(courseId=course_id,
                                                userId=teacher_email).execute()
   return course
@@ -676,18 +763,9 @@ def list_folders_children(folder_id,search_query=""):
   filters according to search query if given else gets all the 
   childrens of folder
   """
-  service = build("drive", "v2", credentials=get_credentials())
-  page_token = None
-  while True:
-    param = {}
-    if page_token:
-      param["pageToken"] = page_token
-    children = service.children().list(
-          folderId=folder_id,q=search_query, **param).execute()
-    page_token = children.get("nextPageToken")
-    if not page_token:
-      break
-  return children.get("items", [])
+  service = get_service("drive", "v2")
+  return list(list_all(service.children().list, "items",
+                       folderId=folder_id, q=search_query))
 
 def get_edit_url_and_view_url_mapping_of_folder(folder_id):
   """  Query google drive api and get all the forms a inside the given 
@@ -712,38 +790,26 @@ def get_edit_url_and_view_url_mapping_of_form():
   """  Query google drive api and get all the forms a user owns
       return a dictionary of view link as keys and edit link as values
   """
-  service = build("drive", "v3", credentials=get_credentials())
-  page_token = None
+  service = get_service("drive", "v3")
   count =0
   view_link_and_edit_link_matching = {}
-  while True:
-    page_size = 75
-    response = service.files().list(
-        q="mimeType=\"application/vnd.google-apps.form\"",
-        spaces="drive",
-        pageSize=page_size,
-        fields="nextPageToken, "
-        "files(id, name,webViewLink,thumbnailLink)",
-        pageToken=page_token).execute()
-    for file in response.get("files", []):
-      count=count+1
-      result = get_view_link_from_id(file.get("id"))
-      view_link_and_edit_link_matching[result["responderUri"]] = \
-      {"webViewLink":file.get("webViewLink"),"file_id":file.get("id")}
-    if "nextPageToken" in response.keys():
-      Logger.info(f"Listed google forms count is {count}")
-      page_token = response["nextPageToken"]
-    else:
-      Logger.info(f"Listed all  google forms {count}")
-      page_token = None
-    if page_token is None:
-      break
+  files = list_all(service.files().list, "files",
+                   q="mimeType=\"application/vnd.google-apps.form\"",
+                   spaces="drive",
+                   pageSize=75,
+                   fields="nextPageToken, "
+                   "files(id, name,webViewLink,thumbnailLink)")
+  for file in files:
+    count=count+1
+    result = get_view_link_from_id(file.get("id"))
+    view_link_and_edit_link_matching[result["responderUri"]] = \
+    {"webViewLink":file.get("webViewLink"),"file_id":file.get("id")}
   Logger.info(f"Total count of google forms {count}")
   return view_link_and_edit_link_matching
 
 
 def get_file(file_id):
-  service = build("drive", "v3", credentials=get_credentials())
+  service = get_service("drive", "v3")
   response = service.files().get(fileId=file_id, fields="*").execute()
   return response
 
@@ -751,7 +817,7 @@ def get_file(file_id):
 def get_view_link_from_id(form_id):
   """Query google forms api using form id and get view url of google form"""
 
-  service = build("forms", "v1", credentials=get_credentials())
+  service = get_service("forms", "v1")
   result = service.forms().get(formId=form_id).execute()
   return result
 
@@ -759,13 +825,10 @@ def get_view_link_from_id(form_id):
 def retrieve_all_form_responses(form_id):
   "Query google forms api  using form id and get view url of  google form"
   discovery_doc = "https://forms.googleapis.com/$discovery/rest?version=v1"
-  service = build("forms",
-                  "v1",
-                  credentials=get_credentials(),
-                  discoveryServiceUrl=discovery_doc,
-                  static_discovery=False)
-  result = service.forms().responses().list(formId=form_id).execute()
-  return result
+  service = get_service("forms", "v1", discovery_url=discovery_doc)
+  responses = list(list_all(service.forms().responses().list, "responses",
+                            formId=form_id))
+  return {"responses": responses} if responses else {}
 
 
 def invite_user(course_id, email, role):
@@ -779,12 +842,34 @@ def invite_user(course_id, email, role):
       dict: response from create invitation method
   """
   Logger.info(f"Inviting User {email} in course {course_id} as {role}")
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   body = {"courseId": course_id, "role": role, "userId": email}
   invitation = service.invitations().create(body=body).execute()
   return invitation
 
 
+def invite_users(course_id, emails, role):
+  """Invite many users to google classroom with batch requests
+
+  Args:
+      course_id (str): google classroom unique id
+      emails (list): user email ids
+      role (str): role of the users in the course
+
+  Returns:
+      dict: email to (invitation, HttpError) of every user, the HttpError is
+      None for the users invited successfully
+  """
+  Logger.info(f"Inviting {len(emails)} users in course {course_id} as {role}")
+  service = get_service()
+  results = execute_batch(service, [
+      service.invitations().create(
+          body={"courseId": course_id, "role": role, "userId": email})
+      for email in emails
+  ])
+  return dict(zip(emails, results))
+
+
 def get_invite(invitation_id):
   """Invite teacher to google classroom using course id and email
 
@@ -795,7 +880,7 @@ def get_invite(invitation_id):
   Returns:
       dict: response from create invitation method
   """
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   invitation = service.invitations().get(id=invitation_id).execute()
   return invitation
 
@@ -813,8 +898,7 @@ def enable_notifications(course_id, feed_type):
   Returns:
       _type_: _description_
   """
-  creds = get_credentials(CLASSROOM_ADMIN_EMAIL)
-  service = build("classroom", "v1", credentials=creds)
+  service = get_service(email=CLASSROOM_ADMIN_EMAIL)
   body = {
       "feed": {
           "feedType": feed_type,
@@ -838,7 +922,7 @@ def delete_student(course_id, student_email):
   Returns:
       dict: response from create invitation method
   """
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   student = {"userId": student_email}
   student = service.courses().students().delete(
       courseId=course_id, userId=student_email).execute()
@@ -894,8 +978,7 @@ def acceept_invite(invitation_id, email):
   Returns:
       dict: response from create invitation method
   """
-  service = build("classroom", "v1",
-    credentials=get_credentials(email))
+  service = get_service(email=email)
   course = service.invitations().accept(id=invitation_id).execute()
   return course
 
@@ -907,7 +990,7 @@ def get_user_profile_information(user_email):
     Returns:
       profile_information: User profile information of the user
   """
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
 
   profile_information = service.userProfiles().get(userId=user_email).execute()
   if not profile_information["photoUrl"].startswith("https:"):
@@ -924,7 +1007,7 @@ def get_course_work(course_id, course_work_id):
   Returns:
     dict: _description_
   """
-  service = service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
 
   response =  service.courses().courseWork().get(courseId=course_id,
                                             id=course_work_id).execute()
@@ -938,7 +1021,7 @@ def delete_course_work(course_id, course_work_id):
   Returns:
     dict: empty dict if success
   """
-  service = service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   data = service.courses().courseWork().delete(courseId=course_id,
                                                id=course_work_id).execute()
   Logger.info(
@@ -953,7 +1036,7 @@ def delete_course_work_material(course_id, course_work_material_id):
   Returns:
     dict: empty dict if success
   """
-  service = service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   data = service.courses().courseWorkMaterials().delete(courseId=course_id,
                                                id=course_work_material_id).execute()
   Logger.info(
@@ -971,7 +1054,7 @@ def update_course_work(course_id, course_work_id, update_mask, updated_body):
   Returns:
     dict: empty dict if success
   """
-  service = service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   data = service.courses().courseWork().patch(
       courseId=course_id,
       id=course_work_id,
@@ -993,7 +1076,7 @@ def update_course_work_material(course_id, course_work_material_id, update_mask,
   Returns:
     dict: empty dict if success
   """
-  service = service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
   data = service.courses().courseWorkMaterials().patch(
       courseId=course_id,
       id=course_work_material_id,
@@ -1018,7 +1101,7 @@ def post_grade_of_the_user(section_id: str,
   Returns:
       dict: Output response from the classroom for post grade
   """
-  service = build("classroom", "v1", credentials=get_credentials())
+  service = get_service()
 
   section_details = Section.find_by_id(section_id)
   course_id = section_details.classroom_id
@@ -1041,7 +1124,7 @@ def post_grade_of_the_user(section_id: str,
   return output
 
 def delete_drive_folder(folder_id):
-  service= build("drive", "v3", credentials=get_credentials())
+  service= get_service("drive", "v3")
   result=service.files().delete(fileId=folder_id).execute()
   return result
 
@@ -1054,19 +1137,10 @@ def list_coursework_submissions(course_id, coursework_id):
     returns list of coursework submissions for a coursework
     """ ""
 
-  service = build("classroom", "v1", credentials=get_credentials())
-  submissions = []
-  page_token = None
-  while True:
-    coursework = service.courses().courseWork()
-    response = coursework.studentSubmissions().list(pageToken=page_token,
-                                                    courseId=course_id,
-                                                    courseWorkId=coursework_id).execute()
-    submissions.extend(response.get("studentSubmissions", []))
-    page_token = response.get("nextPageToken", None)
-    if not page_token:
-      break
-  return submissions
+  service = get_service()
+  return list(list_all(
+      service.courses().courseWork().studentSubmissions().list,
+      "studentSubmissions", courseId=course_id, courseWorkId=coursework_id))
 
 def copy_classroom_course(source_classroom_id, name):
   """Copy classroom course from given classroom id
@@ -1076,12 +1150,7 @@ def copy_classroom_course(source_classroom_id, name):
   Returns:
       dict: Output response of the classroom course
   """
-  alpha_service = build(
-      "classroom",
-      "v1",
-      credentials=get_credentials(),
-      static_discovery=False,
-      discoveryServiceUrl=DISCOVERY_SERVICE_URL)
+  alpha_service = get_service(discovery_url=DISCOVERY_SERVICE_URL)
 
   input_data = {
       "sourceCourseId": source_classroom_id,
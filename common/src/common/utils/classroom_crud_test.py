@@ -0,0 +1,89 @@
+"""Unit test cases for the client layer of classroom_crud"""
+import sys
+from unittest import mock
+
+# common.utils.secrets imports the config of the service it runs in
+with mock.patch.dict(sys.modules,
+                     {"config": mock.Mock(PROJECT_ID="fake-project")}):
+  from common.utils import classroom_crud # pylint: disable=wrong-import-position
+
+
+class FakeRequest():
+  """Stands in for a googleapiclient HttpRequest"""
+
+  def __init__(self, response):
+    self.response = response
+
+  def execute(self):
+    return self.response
+
+
+class FakeBatch():
+  """Stands in for a BatchHttpRequest, failing the requests of ids in
+  `failing_ids`"""
+  sizes = []
+
+  def __init__(self, callback, failing_ids=()):
+    self.callback = callback
+    self.failing_ids = failing_ids
+    self.requests = []
+
+  def add(self, request, request_id):
+    self.requests.append((request_id, request))
+
+  def execute(self):
+    FakeBatch.sizes.append(len(self.requests))
+    for request_id, request in self.requests:
+      if request_id in self.failing_ids:
+        self.callback(request_id, None, Exception("failed"))
+      else:
+        self.callback(request_id, request.execute(), None)
+
+
+def test_list_all_follows_page_tokens():
+  pages = {
+      None: {"courses": [1, 2], "nextPageToken": "a"},
+      "a": {"courses": [3], "nextPageToken": "b"},
+      "b": {}
+  }
+  calls = []
+
+  def list_method(pageToken, **kwargs):
+    calls.append((pageToken, kwargs))
+    return FakeRequest(pages[pageToken])
+
+  items = classroom_crud.list_all(list_method, "courses", courseId="c1")
+  assert list(items) == [1, 2, 3]
+  assert calls == [(None, {"courseId": "c1"}), ("a", {"courseId": "c1"}),
+                   ("b", {"courseId": "c1"})]
+
+
+def test_execute_batch_keeps_request_order():
+  FakeBatch.sizes = []
+  service = mock.Mock()
+  service.new_batch_http_request.side_effect = \
+    lambda callback: FakeBatch(callback, failing_ids=("3",))
+  requests = [FakeRequest({"id": i}) for i in range(5)]
+
+  results = classroom_crud.execute_batch(service, requests, batch_size=2)
+  assert FakeBatch.sizes == [2, 2, 1]
+  assert [response for response, _ in results] == \
+    [{"id": 0}, {"id": 1}, {"id": 2}, None, {"id": 4}]
+  assert [error is None for _, error in results] == \
+    [True, True, True, False, True]
+
+
+def test_get_service_is_built_once_per_user():
+  with mock.patch("common.utils.classroom_crud.build") as build, \
+      mock.patch("common.utils.classroom_crud.JwtCredentials") as creds, \
+      mock.patch(
+          "common.utils.classroom_crud.get_default_service_account_email",
+          return_value="sa@example.com"):
+    build.side_effect = lambda *args, **kwargs: object()
+    service = classroom_crud.get_service("classroom", "v1", "a@example.com")
+    assert classroom_crud.get_service(
+        "classroom", "v1", "a@example.com") is service
+    assert classroom_crud.get_service(
+        "classroom", "v1", "b@example.com") is not service
+    assert build.call_count == 2
+    assert creds.from_default_with_subject.call_count == 2
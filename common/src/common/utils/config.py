@@ -120,3 +120,14 @@ SERVICES = {
 STAFF_USERS = ["assessor", "instructor", "coach"]
 
 EXTERNAL_USER_PROPERTY_PREFIX = os.getenv("EXTERNAL_USER_PROPERTY_PREFIX")
+
+# Verify Firebase ID tokens locally against Google public certs and read the
+# user type from Firestore instead of calling the authentication service
+AUTH_LOCAL_TOKEN_VERIFICATION = bool(os.getenv(
+  "AUTH_LOCAL_TOKEN_VERIFICATION", "false").lower() in ("true",))
+# Seconds for which validated token claims are kept in process, 0 disables
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "60"))
+AUTH_TOKEN_CACHE_MAX_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_MAX_SIZE", "5000"))
+AUTH_HTTP_POOL_SIZE = int(os.getenv("AUTH_HTTP_POOL_SIZE", "20"))
+FIREBASE_PUBLIC_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/" \
+  "x509/securetoken@system.gserviceaccount.com"
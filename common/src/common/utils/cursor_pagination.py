@@ -0,0 +1,143 @@
+"""
+Functions for keyset (cursor) based pagination of Firestore queries
+
+Pages are fetched with `start_after` on the last seen value of the order by
+field plus the document id instead of `offset`, so Firestore does not read
+and bill every skipped document and deep pages are as fast as the first one.
+"""
+import base64
+import datetime
+import json
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from fireo.queries.query_wrapper import ModelWrapper
+from common.utils.errors import ValidationError
+
+
+def _get_filter_query(collection_manager):
+  """Returns a fireo filter query for a collection manager or filter query"""
+  if not hasattr(collection_manager, "query"):
+    collection_manager = collection_manager.filter()
+  return collection_manager
+
+
+def _parse_order_by(filter_query, order_by):
+  """Returns the db column name and firestore direction of an order by
+  string such as "-created_time" """
+  direction = firestore.Query.ASCENDING
+  field_name = order_by
+  if order_by.startswith("-"):
+    direction = firestore.Query.DESCENDING
+    field_name = order_by[1:]
+  column_name = filter_query.model._meta.get_field(field_name).db_column_name
+  return column_name, direction
+
+
+def _encode_value(value):
+  if isinstance(value, datetime.datetime):
+    return {"type": "datetime", "value": value.isoformat()}
+  return {"type": "value", "value": value}
+
+
+def _decode_value(value):
+  if value["type"] == "datetime":
+    return datetime.datetime.fromisoformat(value["value"])
+  return value["value"]
+
+
+def encode_page_token(order_by, last_value, last_id):
+  """
+    Builds an opaque page token from the last document of a page
+    --------------------------------------------------------
+        Input:
+            order_by `str`: order by string the page was fetched with
+            last_value: value of the order by field of the last document
+            last_id `str`: id of the last document
+        Output:
+            page_token `str`: url safe token
+  """
+  token = {"order_by": order_by, "last": _encode_value(last_value),
+           "id": last_id}
+  return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+def decode_page_token(page_token, order_by):
+  """
+    Reads the cursor from a page token built by encode_page_token
+    --------------------------------------------------------
+        Input:
+            page_token `str`: token returned with the previous page
+            order_by `str`: order by string of the current request
+        Output:
+            (last_value, last_id) `tuple`
+  """
+  try:
+    token = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+    if token["order_by"] != order_by:
+      raise ValueError("order_by does not match")
+    return _decode_value(token["last"]), token["id"]
+  except (ValueError, KeyError, TypeError) as e:
+    raise ValidationError("Invalid value passed to \"page_token\"") from e
+
+
+def fetch_page(collection_manager,
+               limit,
+               page_token=None,
+               order_by="-created_time"):
+  """
+    Fetches one page of documents ordered by a field and the document id
+    --------------------------------------------------------
+        Input:
+            collection_manager: model collection or collection.filter()
+            limit `int`: number of documents in the page
+            page_token `str`: token returned with the previous page
+            order_by `str`: field to order by, prefix with - for descending
+        Output:
+            (documents `list`, next_page_token `str` or None)
+  """
+  filter_query = _get_filter_query(collection_manager)
+  column_name, direction = _parse_order_by(filter_query, order_by)
+  query = filter_query.query().order_by(
+      column_name, direction=direction).order_by(
+          FieldPath.document_id(), direction=direction)
+  if page_token:
+    last_value, last_id = decode_page_token(page_token, order_by)
+    query = query.start_after({
+        column_name: last_value,
+        FieldPath.document_id(): filter_query.get_ref().document(last_id)
+    })
+
+  # one extra document tells whether there is a next page
+  snapshots = list(query.limit(limit + 1).stream())
+  documents = []
+  for snapshot in snapshots[:limit]:
+    document = ModelWrapper.from_query_result(filter_query.model_cls(),
+                                              snapshot)
+    # pylint: disable=protected-access
+    document._update_doc = filter_query._update_doc_key(document)
+    documents.append(document)
+  next_page_token = None
+  if len(snapshots) > limit:
+    last_snapshot = snapshots[limit - 1]
+    next_page_token = encode_page_token(order_by,
+                                        last_snapshot.get(column_name),
+                                        last_snapshot.id)
+  return documents, next_page_token
+
+
+def get_total_count(collection_manager):
+  """
+    Counts the documents matched by a query with a count aggregation query.
+    Firestore clients without count aggregation would have to read every
+    matched document, so no count is returned for them and callers return
+    pages without a total.
+    --------------------------------------------------------
+        Input:
+            collection_manager: model collection or collection.filter()
+        Output:
+            count `int` or None
+  """
+  query = _get_filter_query(collection_manager).query()
+  if not hasattr(query, "count"):
+    return None
+  return query.count().get()[0][0].value
@@ -0,0 +1,150 @@
+"""Unit test cases for cursor pagination"""
+import datetime
+from unittest import mock
+import pytest
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from common.utils.cursor_pagination import (encode_page_token,
+                                            decode_page_token, fetch_page,
+                                            get_total_count)
+from common.utils.errors import ValidationError
+
+DOCUMENT_ID = FieldPath.document_id()
+
+
+class FakeSnapshot():
+  def __init__(self, doc_id, fields):
+    self.id = doc_id
+    self.fields = fields
+
+  def get(self, field):
+    return self.fields[field]
+
+
+class FakeQuery():
+  """Firestore query over in memory snapshots, ordered like Firestore by the
+  order by fields with the document id as the last order"""
+
+  def __init__(self, snapshots, count=None):
+    self.snapshots = snapshots
+    self.orders = []
+    self.cursor = None
+    self.limit_count = None
+    if count is not None:
+      self.count = mock.Mock(return_value=mock.Mock(
+          get=mock.Mock(return_value=[[mock.Mock(value=count)]])))
+
+  def order_by(self, field, direction):
+    self.orders.append((field, direction))
+    return self
+
+  def start_after(self, values):
+    self.cursor = values
+    return self
+
+  def limit(self, count):
+    self.limit_count = count
+    return self
+
+  def _key(self, snapshot):
+    return tuple(snapshot.id if field == DOCUMENT_ID else snapshot.get(field)
+                 for field, _ in self.orders)
+
+  def stream(self):
+    descending = self.orders[0][1] == firestore.Query.DESCENDING
+    snapshots = sorted(self.snapshots, key=self._key, reverse=descending)
+    if self.cursor is not None:
+      cursor = tuple(self.cursor[field] for field, _ in self.orders)
+      snapshots = [
+          snapshot for snapshot in snapshots
+          if (self._key(snapshot) < cursor if descending else
+              self._key(snapshot) > cursor)
+      ]
+    return iter(snapshots[:self.limit_count])
+
+
+class FakeFilterQuery():
+  """fireo filter query of a model with a created_time field"""
+
+  def __init__(self, query):
+    self._query = query
+    self.model = mock.Mock()
+    self.model._meta.get_field.return_value = mock.Mock(
+        db_column_name="created_time")
+    self.model_cls = mock.Mock
+    self.get_ref = mock.Mock(return_value=mock.Mock(
+        document=lambda doc_id: doc_id))
+
+  def query(self):
+    return self._query
+
+  def _update_doc_key(self, document):
+    return None
+
+
+def get_snapshots():
+  # created_time ties between documents b, c and d
+  times = {"a": 1, "b": 2, "c": 2, "d": 2, "e": 3}
+  return [FakeSnapshot(doc_id, {"created_time": value})
+          for doc_id, value in times.items()]
+
+
+def fetch_all_pages(order_by, limit):
+  pages = []
+  page_token = None
+  with mock.patch(
+      "common.utils.cursor_pagination.ModelWrapper.from_query_result",
+      side_effect=lambda model, snapshot: mock.Mock(id=snapshot.id)):
+    # bounded so that a cursor which does not advance fails the test
+    for _ in range(10):
+      documents, page_token = fetch_page(
+          FakeFilterQuery(FakeQuery(get_snapshots())), limit, page_token,
+          order_by)
+      pages.append([document.id for document in documents])
+      if page_token is None:
+        return pages
+  raise AssertionError(f"pages do not end: {pages}")
+
+
+def test_page_token_round_trip():
+  last_value = datetime.datetime(2023, 5, 1, 10, 30,
+                                 tzinfo=datetime.timezone.utc)
+  page_token = encode_page_token("-created_time", last_value, "doc-id")
+  assert decode_page_token(page_token, "-created_time") == (last_value,
+                                                            "doc-id")
+
+  page_token = encode_page_token("name", "Kubernetes", "doc-id")
+  assert decode_page_token(page_token, "name") == ("Kubernetes", "doc-id")
+
+
+def test_page_token_for_other_order_is_rejected():
+  page_token = encode_page_token("name", "Kubernetes", "doc-id")
+  with pytest.raises(ValidationError):
+    decode_page_token(page_token, "-created_time")
+
+
+def test_invalid_page_token_is_rejected():
+  with pytest.raises(ValidationError):
+    decode_page_token("not-a-token", "-created_time")
+
+
+def test_fetch_page_continues_after_ties():
+  assert fetch_all_pages("created_time", 2) == [["a", "b"], ["c", "d"],
+                                                ["e"]]
+  assert fetch_all_pages("-created_time", 2) == [["e", "d"], ["c", "b"],
+                                                 ["a"]]
+
+
+def test_fetch_page_last_page_has_no_token():
+  # the extra document read tells that a full last page is the last one
+  assert fetch_all_pages("created_time", 5) == [["a", "b", "c", "d", "e"]]
+  assert fetch_all_pages("-created_time", 10) == [["e", "d", "c", "b", "a"]]
+
+
+def test_get_total_count():
+  assert get_total_count(FakeFilterQuery(FakeQuery([], count=42))) == 42
+  # clients without count aggregation do not scan the matches
+  query = FakeQuery(get_snapshots())
+  query.stream = mock.Mock()
+  assert get_total_count(FakeFilterQuery(query)) is None
+  query.stream.assert_not_called()
@@ -99,6 +99,15 @@ class PayloadTooLargeError(Exception):
     self.message = message
     super().__init__(self.message)
 
+class ResourceExhaustedError(Exception):
+  """Error class to be raised when a resource limit of the server is reached
+  and the request should be retried later"""
+
+  def __init__(self, message="Resource Exhausted"):
+    self.message = message
+    super().__init__(self.message)
+
+
 class InternalServerError(Exception):
   """Error class to be raised when internal server failure occurs"""
 
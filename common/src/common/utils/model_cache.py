@@ -0,0 +1,141 @@
+"""Process local LRU cache with TTL used by cacheable FireO models"""
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+# Process local caches of the cacheable models, keyed by collection name
+_model_caches = {}
+_model_caches_lock = threading.Lock()
+
+
+class ModelCache():
+  """Thread safe LRU cache where every entry expires after a TTL
+
+  Every entry is tagged with the id of the document it holds so that all the
+  lookups (by id, by uuid, ...) resolving to a document can be invalidated
+  together when that document is written.
+  """
+
+  def __init__(self, ttl=60, max_size=1000, timer=time.monotonic):
+    self.ttl = ttl
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._timer = timer
+    self._entries = OrderedDict()
+    self._keys_by_doc_id = {}
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    """Returns a copy of the value cached against key or None if the key is
+    missing or has expired"""
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry[0] <= self._timer():
+        self._remove(key)
+        entry = None
+      if entry is None:
+        self.misses += 1
+        return None
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return copy.deepcopy(entry[2])
+
+  def set(self, key, value, doc_id=None):
+    """Stores a copy of value against key, evicting the least recently used
+    entries when the cache is full"""
+    if self.max_size <= 0:
+      return
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+      self._entries[key] = (self._timer() + self.ttl, doc_id,
+                            copy.deepcopy(value))
+      if doc_id is not None:
+        self._keys_by_doc_id.setdefault(doc_id, set()).add(key)
+      while len(self._entries) > self.max_size:
+        self._remove(next(iter(self._entries)))
+        self.evictions += 1
+
+  def invalidate(self, doc_id):
+    """Removes every entry holding the document with the given id"""
+    with self._lock:
+      for key in list(self._keys_by_doc_id.get(doc_id, ())):
+        self._remove(key)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._keys_by_doc_id.clear()
+
+  def stats(self):
+    """Returns the hit, miss and eviction counters of the cache"""
+    with self._lock:
+      return {
+          "size": len(self._entries),
+          "max_size": self.max_size,
+          "ttl": self.ttl,
+          "hits": self.hits,
+          "misses": self.misses,
+          "evictions": self.evictions
+      }
+
+  def _remove(self, key):
+    _, doc_id, _ = self._entries.pop(key)
+    keys = self._keys_by_doc_id.get(doc_id)
+    if keys is not None:
+      keys.discard(key)
+      if not keys:
+        del self._keys_by_doc_id[doc_id]
+
+
+def get_model_cache(collection_name, ttl, max_size):
+  """Returns the cache of a collection, creating it on first use"""
+  with _model_caches_lock:
+    cache = _model_caches.get(collection_name)
+    if cache is None:
+      cache = _model_caches[collection_name] = ModelCache(
+          ttl=ttl, max_size=max_size)
+    return cache
+
+
+def clear_model_caches():
+  """Empties the caches of all the collections"""
+  with _model_caches_lock:
+    for cache in _model_caches.values():
+      cache.clear()
+
+
+def cached_lookup(lookup_field):
+  """Decorator to serve a `find_by_<lookup_field>` classmethod of a model
+  from the model cache.
+
+  Only calls made with the lookup value alone are cached, calls passing any
+  other argument (e.g. is_deleted=True) always go to Firestore. The decorator
+  has to be placed below @classmethod.
+  Args:
+    lookup_field: str - name of the field used for the lookup
+  """
+
+  def decorator(func):
+
+    @functools.wraps(func)
+    def wrapper(cls, lookup_value, *args, **kwargs):
+      cache = cls.get_model_cache()
+      if cache is None or args or kwargs:
+        return func(cls, lookup_value, *args, **kwargs)
+      key = (lookup_field, lookup_value)
+      obj = cache.get(key)
+      if obj is None:
+        obj = func(cls, lookup_value)
+        doc_id = getattr(obj, "id", None)
+        if doc_id is not None:
+          cache.set(key, obj, doc_id=doc_id)
+      return obj
+
+    return wrapper
+
+  return decorator
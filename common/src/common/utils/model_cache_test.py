@@ -0,0 +1,95 @@
+"""Unit test cases for the model cache"""
+from common.utils.model_cache import ModelCache, cached_lookup
+
+
+class FakeTimer():
+  """Timer which only moves when told to"""
+
+  def __init__(self):
+    self.now = 0
+
+  def __call__(self):
+    return self.now
+
+
+class FakeDocument():
+
+  def __init__(self, doc_id, name):
+    self.id = doc_id
+    self.name = name
+
+
+class FakeModel():
+  """Stands in for a cacheable model"""
+  cache = ModelCache(ttl=60, max_size=10)
+  lookups = 0
+
+  @classmethod
+  def get_model_cache(cls):
+    return cls.cache
+
+  @classmethod
+  @cached_lookup("uuid")
+  def find_by_uuid(cls, uuid, is_deleted=False):
+    cls.lookups += 1
+    return FakeDocument(uuid, f"{uuid}-{is_deleted}")
+
+
+def test_get_set_returns_copies():
+  cache = ModelCache()
+  doc = {"child_nodes": {"learning_objects": ["lo1"]}}
+  cache.set("key", doc, doc_id="doc1")
+  cached_doc = cache.get("key")
+  assert cached_doc == doc
+  cached_doc["child_nodes"]["learning_objects"].append("lo2")
+  assert cache.get("key") == doc
+  assert cache.stats()["hits"] == 2
+
+
+def test_entries_expire_after_ttl():
+  timer = FakeTimer()
+  cache = ModelCache(ttl=10, timer=timer)
+  cache.set("key", "value", doc_id="doc1")
+  timer.now = 9
+  assert cache.get("key") == "value"
+  timer.now = 10
+  assert cache.get("key") is None
+  stats = cache.stats()
+  assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted():
+  cache = ModelCache(max_size=2)
+  cache.set("a", 1)
+  cache.set("b", 2)
+  assert cache.get("a") == 1
+  cache.set("c", 3)
+  assert cache.get("b") is None
+  assert cache.get("a") == 1
+  assert cache.get("c") == 3
+  assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_removes_every_lookup_of_document():
+  cache = ModelCache()
+  cache.set(("id", "doc1"), "value", doc_id="doc1")
+  cache.set(("uuid", "doc1"), "value", doc_id="doc1")
+  cache.set(("uuid", "doc2"), "other", doc_id="doc2")
+  cache.invalidate("doc1")
+  assert cache.get(("id", "doc1")) is None
+  assert cache.get(("uuid", "doc1")) is None
+  assert cache.get(("uuid", "doc2")) == "other"
+
+
+def test_cached_lookup():
+  FakeModel.cache.clear()
+  FakeModel.lookups = 0
+  assert FakeModel.find_by_uuid("doc1").name == "doc1-False"
+  assert FakeModel.find_by_uuid("doc1").name == "doc1-False"
+  assert FakeModel.lookups == 1
+  # calls with extra arguments are not served from the cache
+  assert FakeModel.find_by_uuid("doc1", is_deleted=True).name == "doc1-True"
+  assert FakeModel.lookups == 2
+  FakeModel.cache.invalidate("doc1")
+  FakeModel.find_by_uuid("doc1")
+  assert FakeModel.lookups == 3
@@ -70,6 +70,70 @@ class ParentChildNodesHandler():
                 list_to_expand)
     return document_fields
 
+  @classmethod
+  def load_nodes_data_by_level(cls,
+                               document_fields,
+                               coll_name,
+                               learner_profile,
+                               keys_to_expand,
+                               list_to_expand):
+    """To fetch the data of the child nodes for a given document
+        and their subsequent ones level by level.
+    Returns the same nested output as load_nodes_data, but all the node
+    references found at one depth of the tree are fetched together with one
+    batched read per collection instead of one read per node.
+    Args:
+      document_fields: dict - dictionary of fields of the root node
+      coll_name: str - collection name of the root node
+      learner_profile: LearnerProfile - learner profile object or None
+      keys_to_expand: list - dict type keys to expand (e.g. child_nodes)
+      list_to_expand: list - list type keys to expand (e.g. achievements)
+    Returns:
+      dict - nested dictionary of the expanded hierarchy
+    """
+    document_fields = cls.update_hierarchy_with_profile_data(
+        learner_profile, document_fields, coll_name, document_fields["uuid"])
+    current_level = [document_fields]
+    while current_level:
+      # (node references list, index in list, collection name, uuid)
+      node_slots = []
+      uuids_to_fetch = {}
+      for node_fields in current_level:
+        for key in dict.fromkeys(keys_to_expand + list_to_expand):
+          nodes = cls.get_nodes_by_key(node_fields, key)
+          if key in list_to_expand:
+            node_references = [(key, nodes)]
+          else:
+            node_references = nodes.items()
+          for collection_name, document_id_list in node_references:
+            for list_index, node_document_id in enumerate(document_id_list):
+              node_slots.append((document_id_list, list_index,
+                                 collection_name, node_document_id))
+              uuids_to_fetch.setdefault(collection_name,
+                                        []).append(node_document_id)
+
+      fetched_documents = {}
+      for collection_name, uuids in uuids_to_fetch.items():
+        collection = collection_references[collection_name]
+        fetched_documents[collection_name] = {
+            uuid: document.get_fields(reformat_datetime=True)
+            for uuid, document in collection.find_by_uuids(uuids).items()
+        }
+
+      next_level = []
+      for document_id_list, list_index, collection_name, node_document_id \
+          in node_slots:
+        # the same node can be referenced more than once in a level
+        child_document_fields = copy.deepcopy(
+            fetched_documents[collection_name][node_document_id])
+        child_document_fields = cls.update_hierarchy_with_profile_data(
+            learner_profile, child_document_fields, collection_name,
+            node_document_id)
+        document_id_list[list_index] = child_document_fields
+        next_level.append(child_document_fields)
+      current_level = next_level
+    return document_fields
+
   @classmethod
   def load_hierarchy_progress(cls, document_fields, coll_name, learner_profile,
     is_progress_updated = False):
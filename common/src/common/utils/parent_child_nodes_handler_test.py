@@ -1,6 +1,7 @@
 """Unit test cases for get child and parent nodes functions"""
 import pytest
 import copy
+from fireo.database import db
 from common.models import LearningObject, CurriculumPathway
 # disabling pylint rules that conflict with pytest fixtures
 # pylint: disable=unused-argument,redefined-outer-name,unused-import
@@ -267,3 +268,70 @@ def test_load_nodes_data(clean_firestore, insert_cirriculum_data_to_db):
                 expansion_list)
   assert func_output != {}
 
+
+
+@pytest.fixture(name="insert_five_level_tree_to_db")
+def test_insert_five_level_tree_to_db():
+  ids = []
+
+  def create_node(depth, branching_factor=3):
+    cp = CurriculumPathway.from_dict(
+        copy.deepcopy(PARENT_CURRICULUM_PATHWAY_OBJECT))
+    cp.version = 1
+    cp.save()
+    cp.uuid = cp.id
+    ids.append(cp.id)
+    if depth > 1:
+      cp.child_nodes["curriculum_pathways"] = [
+          create_node(depth - 1, branching_factor)
+          for _ in range(branching_factor)
+      ]
+    cp.update()
+    return cp.id
+
+  root_id = create_node(5)
+  yield CurriculumPathway.find_by_uuid(root_id), ids
+  #teardown part
+  for each_id in ids:
+    CurriculumPathway.delete_by_id(each_id)
+
+
+def test_load_nodes_data_by_level(clean_firestore,
+                                  insert_cirriculum_data_to_db):
+  document = insert_cirriculum_data_to_db[0]
+  base_doc_dict = document.get_fields(reformat_datetime=True)
+  expected_output = ParentChildNodesHandler.load_nodes_data(
+      copy.deepcopy(base_doc_dict), "curriculum_pathways", None,
+      ["child_nodes"], [])
+  func_output = ParentChildNodesHandler.load_nodes_data_by_level(
+      copy.deepcopy(base_doc_dict), "curriculum_pathways", None,
+      ["child_nodes"], [])
+  assert func_output == expected_output
+
+
+def test_load_nodes_data_by_level_round_trips(clean_firestore, mocker,
+                                              insert_five_level_tree_to_db):
+  """Checks the number of Firestore round trips needed to expand a
+  5 level tree with and without level by level batching"""
+  document, ids = insert_five_level_tree_to_db
+  base_doc_dict = document.get_fields(reformat_datetime=True)
+
+  find_by_uuid_spy = mocker.spy(CurriculumPathway, "find_by_uuid")
+  expected_output = ParentChildNodesHandler.load_nodes_data(
+      copy.deepcopy(base_doc_dict), "curriculum_pathways", None,
+      ["child_nodes"], [])
+  recursive_round_trips = find_by_uuid_spy.call_count
+  find_by_uuid_spy.reset_mock()
+
+  get_all_spy = mocker.spy(db.conn, "get_all")
+  func_output = ParentChildNodesHandler.load_nodes_data_by_level(
+      copy.deepcopy(base_doc_dict), "curriculum_pathways", None,
+      ["child_nodes"], [])
+  batched_round_trips = get_all_spy.call_count + find_by_uuid_spy.call_count
+
+  assert func_output == expected_output
+  # one read per node below the root, 3 + 9 + 27 + 81 nodes
+  assert len(ids) == 121
+  assert recursive_round_trips == 120
+  # one batched read per level below the root
+  assert batched_round_trips == 4
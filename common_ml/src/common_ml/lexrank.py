@@ -1,14 +1,52 @@
 """LexRank Module"""
+import logging
 import numpy as np
-from scipy.sparse.csgraph import connected_components
+from scipy import sparse
+
+MAX_ITERATIONS = 1000
+TOLERANCE = 1e-8
 
 
 def degree_centrality_scores(
     similarity_matrix,
     threshold=None,
-    increase_power=True,
+    max_iter=MAX_ITERATIONS,
+    tol=TOLERANCE,
+):
+  """Function to Calculate degree centrality scores
+
+  The similarity matrix can be a dense array or a scipy sparse matrix.
+  With a threshold the markov matrix is built as a sparse matrix, so the
+  cost of every power iteration is linear in the number of similar
+  sentence pairs.
+  """
+  return batch_degree_centrality_scores(
+      [similarity_matrix],
+      threshold=threshold,
+      max_iter=max_iter,
+      tol=tol,
+  )[0]
+
+
+def batch_degree_centrality_scores(
+    similarity_matrices,
+    threshold=None,
+    max_iter=MAX_ITERATIONS,
+    tol=TOLERANCE,
 ):
-  """Function to Calculate degree centrality scores"""
+  """Function to Calculate degree centrality scores of many documents
+
+  With a threshold the sparse markov matrices of all the documents are
+  stacked in one block diagonal matrix and the stationary distributions of
+  all of them are computed by the same power iterations.
+  Args:
+    similarity_matrices: list of square similarity matrices, one per document
+    threshold: similarity threshold of the discrete markov matrices
+    max_iter: maximum number of power iterations
+    tol: convergence tolerance of the power iterations
+  Returns:
+    list of numpy arrays with the centrality scores of every document
+  """
   if not (threshold is None or
           isinstance(threshold, float) and 0 <= threshold < 1):
     raise ValueError(
@@ -16,53 +54,62 @@ def degree_centrality_scores(
         "from the interval [0, 1) or None",)
 
   if threshold is None:
-    markov_matrix = create_markov_matrix(similarity_matrix)
-
-  else:
-    markov_matrix = create_markov_matrix_discrete(
-        similarity_matrix,
-        threshold,
-    )
-
+    # dense markov matrices are not stacked, a sparse copy of them would
+    # take more memory and time than the dense products
+    return [
+        stationary_distribution(
+            create_markov_matrix(similarity_matrix),
+            normalized=False,
+            max_iter=max_iter,
+            tol=tol,
+        ) for similarity_matrix in similarity_matrices
+    ]
+
+  markov_matrices = [
+      create_markov_matrix_discrete(similarity_matrix, threshold)
+      for similarity_matrix in similarity_matrices
+  ]
+  if not markov_matrices:
+    return []
+  transition_matrix = sparse.block_diag(markov_matrices, format="csr")
   scores = stationary_distribution(
-      markov_matrix,
-      increase_power=increase_power,
+      transition_matrix,
       normalized=False,
+      max_iter=max_iter,
+      tol=tol,
   )
+  offsets = np.cumsum([i.shape[0] for i in markov_matrices])[:-1]
+  return np.split(scores, offsets)
 
-  return scores
 
+def _power_method(transition_matrix, max_iter=MAX_ITERATIONS, tol=TOLERANCE):
+  """Returns the stationary distribution of every connected component of a
+  markov matrix, scaled to the size of the component
 
-def _power_method(transition_matrix, increase_power=True):
-  eigenvector = np.ones(len(transition_matrix))
+  Iterates the lazy chain (I + P) / 2, which has the same stationary
+  distribution as P but also converges for periodic chains. Each iteration
+  is a single (sparse) matrix vector product and the number of iterations
+  is capped by `max_iter`, a warning is logged when the distribution has
+  not converged by then.
+  """
+  eigenvector = np.ones(transition_matrix.shape[0])
 
-  if len(eigenvector) == 1:
+  if len(eigenvector) <= 1:
     return eigenvector
 
   transition = transition_matrix.transpose()
+  if sparse.issparse(transition):
+    transition = transition.tocsr()
 
-  while True:
-    eigenvector_next = np.dot(transition, eigenvector)
-
-    if np.allclose(eigenvector_next, eigenvector):
+  for _ in range(max_iter):
+    eigenvector_next = 0.5 * (eigenvector + transition @ eigenvector)
+    if np.abs(eigenvector_next - eigenvector).max() <= tol:
       return eigenvector_next
-
     eigenvector = eigenvector_next
 
-    if increase_power:
-      transition = np.dot(transition, transition)
-
-
-def connected_nodes(matrix):
-  _, labels = connected_components(matrix)
-
-  groups = []
-
-  for tag in np.unique(labels):
-    group = np.where(labels == tag)[0]
-    groups.append(group)
-
-  return groups
+  logging.warning(
+      "LexRank power method did not converge within %d iterations", max_iter)
+  return eigenvector
 
 
 def create_markov_matrix(weights_matrix):
@@ -70,36 +117,48 @@ def create_markov_matrix(weights_matrix):
   if n_1 != n_2:
     raise ValueError("\"weights_matrix\" should be square")
 
+  if sparse.issparse(weights_matrix):
+    row_sum = np.asarray(weights_matrix.sum(axis=1)).ravel()
+    row_sum[row_sum == 0] = 1
+    return sparse.diags(1 / row_sum) @ weights_matrix
+
   row_sum = weights_matrix.sum(axis=1, keepdims=True)
 
   return weights_matrix / row_sum
 
 
 def create_markov_matrix_discrete(weights_matrix, threshold):
-  discrete_weights_matrix = np.zeros(weights_matrix.shape)
-  ixs = np.where(weights_matrix >= threshold)
-  discrete_weights_matrix[ixs] = 1
+  """Returns the sparse markov matrix of the pairs with a similarity of at
+  least `threshold`"""
+  if sparse.issparse(weights_matrix):
+    weights_matrix = weights_matrix.tocoo()
+    mask = weights_matrix.data >= threshold
+    rows, cols = weights_matrix.row[mask], weights_matrix.col[mask]
+  else:
+    rows, cols = np.nonzero(np.asarray(weights_matrix) >= threshold)
+  discrete_weights_matrix = sparse.csr_matrix(
+      (np.ones(len(rows)), (rows, cols)), shape=weights_matrix.shape)
 
   return create_markov_matrix(discrete_weights_matrix)
 
 
 def stationary_distribution(
     transition_matrix,
-    increase_power=True,
     normalized=True,
+    max_iter=MAX_ITERATIONS,
+    tol=TOLERANCE,
 ):
+  """Returns the stationary distribution of a (sparse) markov matrix
+
+  All connected components are iterated together: a component keeps the
+  probability mass it starts with, so the result is the stationary
+  distribution of every component scaled to its size.
+  """
   n_1, n_2 = transition_matrix.shape
   if n_1 != n_2:
     raise ValueError("\"transition_matrix\" should be square")
 
-  distribution = np.zeros(n_1)
-
-  grouped_indices = connected_nodes(transition_matrix)
-
-  for group in grouped_indices:
-    t_matrix = transition_matrix[np.ix_(group, group)]
-    eigenvector = _power_method(t_matrix, increase_power=increase_power)
-    distribution[group] = eigenvector
+  distribution = _power_method(transition_matrix, max_iter=max_iter, tol=tol)
 
   if normalized:
     distribution /= n_1
@@ -0,0 +1,46 @@
+"""Benchmark of the LexRank centrality scores
+
+Usage: python -m common_ml.lexrank_benchmark [sizes ...]
+"""
+import sys
+import time
+import numpy as np
+from common_ml.lexrank import (degree_centrality_scores,
+                               batch_degree_centrality_scores)
+
+THRESHOLD = 0.85
+BATCH_DOCUMENTS = 20
+
+
+def get_similarity_matrix(count, seed=0):
+  """Returns a LexRank similarity matrix of random sentence embeddings"""
+  embeddings = np.random.default_rng(seed).normal(size=(count, 384))
+  embeddings /= np.linalg.norm(embeddings, axis=1)[:, None]
+  similarity_matrix = embeddings @ embeddings.T * 0.5 + 0.5
+  return np.clip(similarity_matrix, 0, 1)
+
+
+def run_benchmark(sizes):
+  """Times the centrality scores of one document of every size and of a
+  batch of smaller documents with the same number of sentences"""
+  for size in sizes:
+    similarity_matrix = get_similarity_matrix(size)
+    for threshold in [None, THRESHOLD]:
+      start_time = time.perf_counter()
+      degree_centrality_scores(similarity_matrix, threshold=threshold)
+      print(f"{size} sentences, threshold {threshold}: "
+            f"{time.perf_counter() - start_time:.3f}s")
+
+    similarity_matrices = [
+        get_similarity_matrix(size // BATCH_DOCUMENTS, seed)
+        for seed in range(BATCH_DOCUMENTS)
+    ]
+    start_time = time.perf_counter()
+    batch_degree_centrality_scores(similarity_matrices, threshold=THRESHOLD)
+    print(f"{BATCH_DOCUMENTS} documents of {size // BATCH_DOCUMENTS} "
+          f"sentences in one batch, threshold {THRESHOLD}: "
+          f"{time.perf_counter() - start_time:.3f}s")
+
+
+if __name__ == "__main__":
+  run_benchmark([int(i) for i in sys.argv[1:]] or [1000, 5000])
@@ -0,0 +1,57 @@
+"""Unit tests for the LexRank module"""
+import logging
+import numpy as np
+import pytest
+from scipy import sparse
+from common_ml.lexrank import (degree_centrality_scores,
+                               batch_degree_centrality_scores)
+
+
+def get_similarity_matrix(count, seed=0):
+  embeddings = np.random.default_rng(seed).normal(size=(count, 16))
+  embeddings /= np.linalg.norm(embeddings, axis=1)[:, None]
+  return np.clip(embeddings @ embeddings.T * 0.5 + 0.5, 0, 1)
+
+
+def get_stationary_distribution(markov_matrix):
+  eigenvalues, eigenvectors = np.linalg.eig(markov_matrix.T)
+  eigenvector = np.real(eigenvectors[:, np.argmax(np.real(eigenvalues))])
+  return eigenvector / eigenvector.sum() * len(markov_matrix)
+
+
+def test_degree_centrality_scores():
+  similarity_matrix = get_similarity_matrix(40)
+  markov_matrix = similarity_matrix / similarity_matrix.sum(axis=1,
+                                                             keepdims=True)
+  scores = degree_centrality_scores(similarity_matrix)
+  assert np.allclose(scores, get_stationary_distribution(markov_matrix),
+                     atol=1e-6)
+
+  # disconnected components are scaled to their size
+  similarity_matrix = np.array([[1, 1, 0, 0], [1, 1, 0, 0], [0, 0, 1, 0.9],
+                                [0, 0, 0.9, 1]])
+  scores = degree_centrality_scores(sparse.csr_matrix(similarity_matrix),
+                                    threshold=0.5)
+  assert np.allclose(scores, [1, 1, 1, 1])
+
+  with pytest.raises(ValueError):
+    degree_centrality_scores(similarity_matrix, threshold=1.5)
+
+
+def test_batch_degree_centrality_scores():
+  similarity_matrices = [get_similarity_matrix(count, seed)
+                         for seed, count in enumerate([30, 1, 12])]
+  for threshold in [None, 0.75]:
+    batch_scores = batch_degree_centrality_scores(similarity_matrices,
+                                                  threshold=threshold)
+    assert [len(i) for i in batch_scores] == [30, 1, 12]
+    for similarity_matrix, scores in zip(similarity_matrices, batch_scores):
+      assert np.allclose(
+          scores, degree_centrality_scores(similarity_matrix, threshold))
+
+
+def test_degree_centrality_scores_warns_without_convergence(caplog):
+  similarity_matrix = get_similarity_matrix(20)
+  with caplog.at_level(logging.WARNING):
+    degree_centrality_scores(similarity_matrix, max_iter=1)
+  assert "did not converge" in caplog.text
@@ -13,7 +13,7 @@ from nltk.corpus import stopwords, wordnet
 from retrying import retry
 from sentence_transformers import SentenceTransformer, util
 from sklearn.linear_model import LogisticRegression
-from common_ml.lexrank import degree_centrality_scores
+from common_ml.lexrank import batch_degree_centrality_scores
 from common_ml.config import (SERVICES, LONG_SENT_THRESHOLD, SPLIT_THRESHOLD,
                               FEEDBACK_FACT_KEYBERT_THRESHOLD, RETRY_EXCEPTIONS,
                               SPACY_MODEL_TYPES)
@@ -595,20 +595,45 @@ def get_ranked_sentences(model, sent_text):
   Returns:
     A list of tuples in the format [(idx, sentence, sentence_score)]
   """
-  sent_text = sentence_split(sent_text)
-  embeddings = model.encode(sent_text, convert_to_tensor=True)
-  cosine_scores = util.pytorch_cos_sim(embeddings, embeddings)
-  cosine_scores = cosine_scores * 0.5 + 0.5
-  cosine_scores[cosine_scores > 1.0] = 1.0
-  cosine_scores[cosine_scores < 0.0] = 0.0
-  centrality_scores = degree_centrality_scores(
-      cosine_scores.cpu().numpy(), threshold=None)
-  sorted_centrality_scores = np.sort(centrality_scores)[::-1]
-  most_central_sentence_indices = np.argsort(-centrality_scores)
-  sentence_scores = [(i, sent_text[i], sorted_centrality_scores[i])
-                     for i in most_central_sentence_indices
-                     if len(sent_text[i]) > 20]
-  return sentence_scores
+  return get_ranked_sentences_batch(model, [sent_text])[0]
+
+
+def get_ranked_sentences_batch(model, texts):
+  """Function to get ranked sentences of many texts, the sentences of all
+  the texts are encoded together
+  Args:
+    model: KeyBERT model
+    texts: list of texts of type string
+  Returns:
+    A list with a list of tuples in the format
+    [(idx, sentence, sentence_score)] for every text
+  """
+  sent_texts = [sentence_split(text) for text in texts]
+  embeddings = model.encode(
+      [sent for sent_text in sent_texts for sent in sent_text],
+      convert_to_tensor=True)
+  similarity_matrices = []
+  start = 0
+  for sent_text in sent_texts:
+    text_embeddings = embeddings[start:start + len(sent_text)]
+    start += len(sent_text)
+    cosine_scores = util.pytorch_cos_sim(text_embeddings, text_embeddings)
+    cosine_scores = cosine_scores * 0.5 + 0.5
+    cosine_scores[cosine_scores > 1.0] = 1.0
+    cosine_scores[cosine_scores < 0.0] = 0.0
+    similarity_matrices.append(cosine_scores.cpu().numpy())
+
+  ranked_sentences = []
+  for sent_text, centrality_scores in zip(
+      sent_texts,
+      batch_degree_centrality_scores(similarity_matrices, threshold=None)):
+    sorted_centrality_scores = np.sort(centrality_scores)[::-1]
+    most_central_sentence_indices = np.argsort(-centrality_scores)
+    sentence_scores = [(i, sent_text[i], sorted_centrality_scores[i])
+                       for i in most_central_sentence_indices
+                       if len(sent_text[i]) > 20]
+    ranked_sentences.append(sentence_scores)
+  return ranked_sentences
 
 
 def softmax(x):
@@ -115,3 +115,10 @@ AUTHORED_ASSESSMENT_TYPES = {
 # Temp Folder
 TEMP_FOLDER = "temp"
 DOWNLOADS_FOLDER = "downloads"
+
+# Process local index of assessment -> unit -> discipline -> instructor used
+# to filter and sort submitted assessments
+ASSESSMENT_HIERARCHY_INDEX_TTL = int(
+    os.getenv("ASSESSMENT_HIERARCHY_INDEX_TTL", "600"))
+ASSESSMENT_HIERARCHY_INDEX_MAX_SIZE = int(
+    os.getenv("ASSESSMENT_HIERARCHY_INDEX_MAX_SIZE", "10000"))
@@ -336,7 +336,7 @@ def get_latest_submission(learner_id, assessment_id,
 
 def get_submitted_assessment_data(submitted_assessment,
     get_unit_discipline_instructor_data=True, header=None,
-    assessment_node=None, assessor_map = None):
+    assessment_node=None, assessor_map = None, learner_node=None):
   """
   Function to get all data for a submitted assessment to be returned to assessor
   Args:
@@ -347,14 +347,16 @@ def get_submitted_assessment_data(submitted_assessment,
     header: Authorization header
     assessment_node: pre fetched Assessment object
     assessor_map: hashmap to store existing assessors
+    learner_node: pre fetched Learner object
   Returns:
     submitted_assessment: all submitted assessment required by assessor
   """
 
   submitted_assessment = submitted_assessment.get_fields(reformat_datetime=True)
   # Fetching and Validating Learner, Assessment, Assessor and Instructor data
-  learner = Learner.find_by_uuid(submitted_assessment[
-    "learner_id"]).get_fields()
+  if learner_node is None:
+    learner_node = Learner.find_by_uuid(submitted_assessment["learner_id"])
+  learner = learner_node.get_fields()
   if assessment_node is None:
     assessment_node = Assessment.find_by_uuid(
       submitted_assessment["assessment_id"])
@@ -0,0 +1,399 @@
+"""Query planner for the filtered submitted assessments endpoint.
+
+Filters and sorts on SubmittedAssessment fields are pushed into Firestore.
+Filters and sorts that depend on the assessment hierarchy (assessment name,
+unit name, discipline name) or on the learner are resolved from a projection
+of the matching submissions and a process local index of
+assessment -> unit -> discipline -> instructor, so only the requested page of
+submissions is fully loaded.
+"""
+import traceback
+from common.models import Assessment, Learner, SubmittedAssessment, User
+from common.utils.collection_references import collection_references
+from common.utils.cursor_pagination import get_total_count
+from common.utils.logging_handler import Logger
+from common.utils.model_cache import get_model_cache
+from config import (ASSESSMENT_HIERARCHY_INDEX_TTL,
+                    ASSESSMENT_HIERARCHY_INDEX_MAX_SIZE)
+from services.data_utils import get_user_name
+from services.submitted_assessment import (get_submitted_assessment_data,
+                                           instructor_handler)
+
+#pylint: disable=broad-exception-caught
+
+# Maximum number of values in a Firestore "in" filter
+IN_QUERY_LIMIT = 30
+FIRESTORE_SORT_FIELDS = ["result", "attempt_no", "timer_start_time"]
+PROJECTION_FIELDS = ["assessment_id", "learner_id", "status", "type",
+                     "result", "attempt_no", "timer_start_time"]
+# Guards against cycles in malformed parent_nodes
+MAX_TRAVERSE_DEPTH = 10
+
+
+def get_hierarchy_index():
+  """Returns the process local assessment hierarchy index"""
+  return get_model_cache("assessment_hierarchy_index",
+                         ASSESSMENT_HIERARCHY_INDEX_TTL,
+                         ASSESSMENT_HIERARCHY_INDEX_MAX_SIZE)
+
+
+def find_nodes_by_uuids(model, uuids):
+  """Batch fetches nodes of a model, uuids that cannot be found are skipped"""
+  nodes = {}
+  for doc_id, node in model.find_by_ids(uuids).items():
+    if getattr(node, "uuid", None) == doc_id and \
+        not getattr(node, "is_deleted", False):
+      nodes[doc_id] = node
+  for uuid in uuids:
+    if uuid not in nodes:
+      try:
+        nodes[uuid] = model.find_by_uuid(uuid)
+      except Exception as e:
+        Logger.error(e)
+  return nodes
+
+
+def traverse_up_batch(nodes, level: str, parent_alias: str):
+  """Batched version of traverse_up for many nodes of the same level.
+
+  Every step up the hierarchy fetches the parents of all the nodes still
+  being traversed with one batched read per collection.
+
+  Args:
+    nodes (dict): uuid to node to start from
+    level (str): collection of the starting nodes
+    parent_alias (str): alias of the parent to find
+  Returns:
+    dict: uuid of the starting node to the parent node, starting nodes
+      without such a parent are left out
+  """
+  parents = {}
+  # starting uuid -> (level, node) currently reached
+  frontier = {uuid: (level, node) for uuid, node in nodes.items()
+              if node is not None}
+  for _ in range(MAX_TRAVERSE_DEPTH):
+    if not frontier:
+      break
+    to_fetch = {}
+    for start_uuid, (node_level, node) in frontier.items():
+      if node_level not in ["assessments", "learning_resources"] and \
+          node.alias == parent_alias:
+        parents[start_uuid] = node
+        continue
+      for parent_level, parent_uuids in (node.parent_nodes or {}).items():
+        if parent_uuids:
+          to_fetch[start_uuid] = (parent_level, parent_uuids[0])
+          break
+
+    fetched = {}
+    for parent_level in {parent_level for parent_level, _ in
+                         to_fetch.values()}:
+      uuids = list({uuid for fetch_level, uuid in to_fetch.values()
+                    if fetch_level == parent_level})
+      fetched[parent_level] = find_nodes_by_uuids(
+          collection_references[parent_level], uuids)
+
+    frontier = {}
+    for start_uuid, (parent_level, parent_uuid) in to_fetch.items():
+      parent_node = fetched[parent_level].get(parent_uuid)
+      if parent_node is not None:
+        frontier[start_uuid] = (parent_level, parent_node)
+  return parents
+
+
+def get_assessment_hierarchy(assessment_ids):
+  """Returns the denormalized hierarchy entry of every assessment.
+
+  Entries hold the assessment, unit (learning experience) and discipline
+  names and uuids. Entries missing from the index are built with batched
+  reads and added to it.
+
+  Args:
+    assessment_ids (list): uuids of assessments
+  Returns:
+    dict: assessment uuid to hierarchy entry
+  """
+  index = get_hierarchy_index()
+  entries = {}
+  missing_ids = []
+  for assessment_id in dict.fromkeys(assessment_ids):
+    entry = index.get(f"assessment::{assessment_id}")
+    if entry is None:
+      missing_ids.append(assessment_id)
+    else:
+      entries[assessment_id] = entry
+  if not missing_ids:
+    return entries
+
+  assessments = find_nodes_by_uuids(Assessment, missing_ids)
+  les = traverse_up_batch(assessments, "assessments", "learning_experience")
+  le_nodes = {le.uuid: le for le in les.values()}
+  disciplines = traverse_up_batch(le_nodes, "learning_experiences",
+                                  "discipline")
+  for assessment_id in missing_ids:
+    assessment = assessments.get(assessment_id)
+    le = les.get(assessment_id)
+    discipline = disciplines.get(le.uuid) if le else None
+    entry = {
+        "assessment_name": getattr(assessment, "name", "") or "",
+        "unit_uuid": le.uuid if le else None,
+        "unit_name": (le.name or "") if le else "",
+        "discipline_uuid": discipline.uuid if discipline else None,
+        "discipline_name": (discipline.name or "") if discipline else ""
+    }
+    entries[assessment_id] = entry
+    # assessments that could not be found are looked up again next time
+    if assessment is not None:
+      index.set(f"assessment::{assessment_id}", entry, doc_id=assessment_id)
+  return entries
+
+
+def get_users_by_user_ids(user_ids):
+  """Batch fetches users by user_id using "in" queries
+
+  Args:
+    user_ids (list): list of user_id
+  Returns:
+    dict: user_id to user fields
+  """
+  user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+  users = {}
+  for start in range(0, len(user_ids), IN_QUERY_LIMIT):
+    chunk = user_ids[start:start + IN_QUERY_LIMIT]
+    for user in User.collection.filter("user_id", "in", chunk).filter(
+        "is_deleted", "==", False).fetch():
+      users[user.user_id] = user.get_fields()
+  return users
+
+
+def get_discipline_instructors(header, discipline_ids):
+  """Returns the instructor assigned to every discipline
+
+  Instructors are kept in the hierarchy index so the user management service
+  is called once per discipline while the index entry is alive.
+
+  Args:
+    header (dict): Authorization header
+    discipline_ids (list): uuids of disciplines
+  Returns:
+    dict: discipline uuid to instructor fields, disciplines without an
+      instructor are left out
+  """
+  index = get_hierarchy_index()
+  instructors = {}
+  instructor_ids = {}
+  for discipline_id in dict.fromkeys(discipline_ids):
+    if not discipline_id:
+      continue
+    instructor = index.get(f"instructor::{discipline_id}")
+    if instructor is not None:
+      instructors[discipline_id] = instructor
+      continue
+    try:
+      instructor_ids[discipline_id] = instructor_handler(header, discipline_id)
+    except Exception as e:
+      Logger.error(e)
+      Logger.error(traceback.print_exc())
+
+  users = get_users_by_user_ids(list(instructor_ids.values()))
+  for discipline_id, instructor_id in instructor_ids.items():
+    user = users.get(instructor_id)
+    if user is None:
+      continue
+    instructors[discipline_id] = {
+        "first_name": user.get("first_name", ""),
+        "last_name": user.get("last_name", ""),
+        "user_id": user.get("user_id")
+    }
+    index.set(f"instructor::{discipline_id}", instructors[discipline_id],
+              doc_id=discipline_id)
+  return instructors
+
+
+def build_submitted_assessment_query(learner_ids=None, assessor_id=None,
+                                     is_flagged=None, is_autogradable=None,
+                                     result=None, status=None, type_=None):
+  """Pushes as many filters as possible into a Firestore query.
+
+  Firestore allows a single "in" filter per query, so the multi valued filter
+  with the fewest values is sent to Firestore and the others are returned
+  as residual filters to be applied in memory.
+
+  Returns:
+    tuple: (collection_manager, residual filters as dict of field to values)
+  """
+  collection_manager = SubmittedAssessment.collection.filter(
+      "is_deleted", "==", False)
+  if assessor_id:
+    collection_manager = collection_manager.filter("assessor_id", "==",
+                                                   assessor_id)
+  if is_flagged is not None:
+    collection_manager = collection_manager.filter("is_flagged", "==",
+                                                   is_flagged)
+  if is_autogradable is not None:
+    collection_manager = collection_manager.filter("is_autogradable", "==",
+                                                   is_autogradable)
+
+  in_candidates = {}
+  for field, values in [("learner_id", learner_ids), ("result", result),
+                        ("status", status), ("type", type_)]:
+    if values is None:
+      continue
+    values = list(dict.fromkeys(values))
+    if len(values) == 1:
+      collection_manager = collection_manager.filter(field, "==", values[0])
+    else:
+      in_candidates[field] = values
+
+  residual_filters = {}
+  pushed_candidates = [field for field, values in in_candidates.items()
+                       if len(values) <= IN_QUERY_LIMIT]
+  in_field = min(pushed_candidates, key=lambda i: len(in_candidates[i]),
+                 default=None)
+  for field, values in in_candidates.items():
+    if field == in_field:
+      collection_manager = collection_manager.filter(field, "in", values)
+    else:
+      residual_filters[field] = set(values)
+  return collection_manager, residual_filters
+
+
+def _sort_key(value):
+  # None sorts first, the same as in Firestore
+  return (value is not None, value if value is not None else "")
+
+
+def get_submitted_assessments_page(header, collection_manager,
+                                   residual_filters, sort_by, sort_order,
+                                   skip, limit, name=None, unit_name=None,
+                                   discipline_name=None, instructor=None):
+  """Returns one page of submitted assessments and the total count.
+
+  When every filter and the sort could be pushed into Firestore and the
+  client supports count aggregation, the page is fetched directly with
+  offset/limit. Otherwise a projection of the matching
+  submissions is streamed, filtered and sorted in memory with the
+  hierarchy index, and only the documents of the requested page are loaded.
+
+  Args:
+    header (dict): Authorization header
+    collection_manager: query built by build_submitted_assessment_query
+    residual_filters (dict): filters that could not be pushed to Firestore
+    sort_by (str): field to sort on
+    sort_order (str): ascending or descending
+    skip (int): number of records to skip
+    limit (int): number of records to return
+    name (str): keyword to search in the assessment name
+    unit_name (list): unit names to filter on
+    discipline_name (list): discipline names to filter on
+    instructor (dict): fields of the instructor when the request is made by
+      an instructor
+  Returns:
+    tuple: (list of submitted assessment dicts, total count)
+  """
+  descending = sort_order == "descending"
+  hierarchy_filtered = bool(name or unit_name or discipline_name)
+
+  total_count = None
+  if not residual_filters and not hierarchy_filtered and \
+      sort_by in FIRESTORE_SORT_FIELDS:
+    # without count aggregation the total is counted from the projection
+    total_count = get_total_count(collection_manager)
+
+  if total_count is not None:
+    order_by = "-" + sort_by if descending else sort_by
+    page = list(collection_manager.order(order_by).offset(skip).fetch(limit))
+  else:
+    rows = []
+    projection = collection_manager.query().select(PROJECTION_FIELDS)
+    for snapshot in projection.stream():
+      row = snapshot.to_dict() or {}
+      if all(row.get(field) in values
+             for field, values in residual_filters.items()):
+        row["id"] = snapshot.id
+        rows.append(row)
+
+    hierarchy = get_assessment_hierarchy(
+        [row["assessment_id"] for row in rows if row.get("assessment_id")])
+    if hierarchy_filtered:
+      keyword = name.lower() if name else None
+      filtered_rows = []
+      for row in rows:
+        entry = hierarchy.get(row.get("assessment_id"), {})
+        if keyword and keyword not in entry.get("assessment_name",
+                                                "").lower():
+          continue
+        if unit_name and entry.get("unit_name", "") not in unit_name:
+          continue
+        if discipline_name and \
+            entry.get("discipline_name", "") not in discipline_name:
+          continue
+        filtered_rows.append(row)
+      rows = filtered_rows
+
+    if sort_by == "unit_name":
+      for row in rows:
+        row[sort_by] = hierarchy.get(row.get("assessment_id"),
+                                     {}).get("unit_name", "")
+    elif sort_by == "learner_name":
+      learners = Learner.find_by_ids(
+          [row["learner_id"] for row in rows if row.get("learner_id")])
+      for row in rows:
+        learner = learners.get(row.get("learner_id"))
+        row[sort_by] = get_user_name(learner.get_fields()) if learner else ""
+    rows.sort(key=lambda i: (_sort_key(i.get(sort_by)), i["id"]),
+              reverse=descending)
+
+    total_count = len(rows)
+    page_ids = [row["id"] for row in rows[skip:skip + limit]]
+    documents = SubmittedAssessment.find_by_ids(page_ids)
+    page = [documents[doc_id] for doc_id in page_ids if doc_id in documents]
+
+  return build_page_records(header, page, instructor), total_count
+
+
+def build_page_records(header, submitted_assessments, instructor=None):
+  """Builds the response records of a page of submitted assessments with
+  batched lookups of assessments, learners, assessors and instructors"""
+  assessment_ids = [i.assessment_id for i in submitted_assessments]
+  hierarchy = get_assessment_hierarchy(assessment_ids)
+  assessments = find_nodes_by_uuids(Assessment,
+                                    list(dict.fromkeys(assessment_ids)))
+  learners = find_nodes_by_uuids(
+      Learner,
+      list(dict.fromkeys(i.learner_id for i in submitted_assessments)))
+  assessor_map = {
+      user_id: {"first_name": user.get("first_name", ""),
+                "last_name": user.get("last_name", "")}
+      for user_id, user in get_users_by_user_ids(
+          [i.assessor_id for i in submitted_assessments]).items()
+  }
+  if instructor is None:
+    instructors = get_discipline_instructors(
+        header, [entry["discipline_uuid"] for entry in hierarchy.values()])
+  else:
+    instructors = {}
+
+  records = []
+  for submitted_assessment in submitted_assessments:
+    entry = hierarchy.get(submitted_assessment.assessment_id, {})
+    submitted_assessment_data = get_submitted_assessment_data(
+        submitted_assessment, False, None,
+        assessments.get(submitted_assessment.assessment_id), assessor_map,
+        learners.get(submitted_assessment.learner_id))
+    submitted_assessment_data["unit_name"] = entry.get("unit_name", "")
+    submitted_assessment_data["discipline_name"] = entry.get(
+        "discipline_name", "")
+    instructor_data = instructor or instructors.get(
+        entry.get("discipline_uuid"))
+    if instructor_data:
+      submitted_assessment_data["instructor_id"] = instructor_data.get(
+          "user_id", "")
+      submitted_assessment_data["instructor_name"] = \
+        (instructor_data.get("first_name", "") + " " +
+         instructor_data.get("last_name", "")).lstrip()
+    else:
+      submitted_assessment_data["instructor_id"] = ""
+      submitted_assessment_data["instructor_name"] = "Unassigned"
+    records.append(submitted_assessment_data)
+  return records
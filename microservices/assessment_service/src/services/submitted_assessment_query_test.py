@@ -0,0 +1,110 @@
+"""Test file for the submitted assessments query planner."""
+# pylint: disable=unused-argument,redefined-outer-name,unused-import
+import os
+import json
+from unittest import mock
+from common.models import LearningExperience, SubmittedAssessment
+from common.testing.firestore_emulator import (firestore_emulator,
+                                               clean_firestore)
+from services.submitted_assessment_test import (create_single_assessment,
+                                                create_single_learner)
+with mock.patch(
+    "google.cloud.secretmanager.SecretManagerServiceClient",
+    side_effect=mock.MagicMock()) as mok:
+  from services.submitted_assessment_query import (
+      build_submitted_assessment_query, get_submitted_assessments_page,
+      get_assessment_hierarchy)
+
+os.environ["FIRESTORE_EMULATOR_HOST"] = "localhost:8080"
+os.environ["GOOGLE_CLOUD_PROJECT"] = "fake-project"
+RELATIVE_PATH = "../../../e2e/testing_objects/"
+
+
+def create_learning_experience(name, assessment_ids):
+  with open(
+      RELATIVE_PATH + "learning_experiences.json",
+      encoding="UTF-8") as json_file:
+    le_fields = json.load(json_file)[0]
+  le_fields["name"] = name
+  le_fields["child_nodes"] = {"assessments": assessment_ids}
+  le_fields["parent_nodes"] = {}
+  learning_experience = LearningExperience()
+  learning_experience = learning_experience.from_dict(le_fields)
+  learning_experience.uuid = ""
+  learning_experience.save()
+  learning_experience.uuid = learning_experience.id
+  learning_experience.update()
+  return learning_experience
+
+
+def create_submissions(assessment, learner, count, status="evaluated"):
+  with open(
+      "./testing/submitted_assessment.json", encoding="UTF-8") as json_file:
+    sa_fields = json.load(json_file)[0]
+  submissions = []
+  for attempt_no in range(1, count + 1):
+    sa_fields["assessment_id"] = assessment.uuid
+    sa_fields["learner_id"] = learner.uuid
+    sa_fields["attempt_no"] = attempt_no
+    sa_fields["status"] = status
+    submitted_assessment = SubmittedAssessment()
+    submitted_assessment = submitted_assessment.from_dict(sa_fields)
+    submitted_assessment.uuid = ""
+    submitted_assessment.save()
+    submitted_assessment.uuid = submitted_assessment.id
+    submitted_assessment.update()
+    submissions.append(submitted_assessment)
+  return submissions
+
+
+def test_build_submitted_assessment_query():
+  # the "in" filter with the fewest values is pushed to Firestore
+  _, residual_filters = build_submitted_assessment_query(
+      result=["Exemplary", "Proficient"],
+      status=["evaluated", "evaluation_pending", "non_evaluated"],
+      type_=["practice"])
+  assert residual_filters == {
+      "status": {"evaluated", "evaluation_pending", "non_evaluated"}}
+
+  # more learners than an "in" filter accepts are filtered in memory
+  learner_ids = [f"learner_{i}" for i in range(31)]
+  _, residual_filters = build_submitted_assessment_query(
+      learner_ids=learner_ids, status=["evaluated", "evaluation_pending"])
+  assert residual_filters == {"learner_id": set(learner_ids)}
+
+
+def test_get_submitted_assessments_page(clean_firestore):
+  learner = create_single_learner()
+  learner.uuid = learner.id
+  learner.update()
+  assessment_1 = create_single_assessment()
+  assessment_2 = create_single_assessment()
+  unit_1 = create_learning_experience("Unit 1", [assessment_1.uuid])
+  unit_2 = create_learning_experience("Unit 2", [assessment_2.uuid])
+  assessment_1.parent_nodes = {"learning_experiences": [unit_1.uuid]}
+  assessment_1.update()
+  assessment_2.parent_nodes = {"learning_experiences": [unit_2.uuid]}
+  assessment_2.update()
+  create_submissions(assessment_1, learner, 3)
+  create_submissions(assessment_2, learner, 2)
+
+  # sort on a SubmittedAssessment field is served by Firestore
+  collection_manager, residual_filters = build_submitted_assessment_query()
+  records, total_count = get_submitted_assessments_page(
+      {}, collection_manager, residual_filters, "attempt_no", "descending",
+      1, 2)
+  assert total_count == 5
+  assert [i["attempt_no"] for i in records] == [2, 2]
+
+  # filter and sort on the unit are resolved from the hierarchy index
+  collection_manager, residual_filters = build_submitted_assessment_query()
+  records, total_count = get_submitted_assessments_page(
+      {}, collection_manager, residual_filters, "unit_name", "ascending",
+      0, 10, unit_name=["Unit 2"])
+  assert total_count == 2
+  assert {i["unit_name"] for i in records} == {"Unit 2"}
+  assert {i["instructor_name"] for i in records} == {"Unassigned"}
+
+  hierarchy = get_assessment_hierarchy([assessment_1.uuid])
+  assert hierarchy[assessment_1.uuid]["unit_name"] == "Unit 1"
+  assert hierarchy[assessment_1.uuid]["unit_uuid"] == unit_1.uuid
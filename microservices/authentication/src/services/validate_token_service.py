@@ -18,10 +18,11 @@ def validate_token(bearer_token):
         Decoded Token and User type: Dict
   """
   token = bearer_token
-  cached_token = get_key(f"cache::{token}")
+  cached_token = get_key(f"cache::{token}", local_cache_enabled=True)
   if cached_token is None:
     decoded_token = verify_token(token)
-    cache_token = set_key(f"cache::{token}", decoded_token, 1800)
+    cache_token = set_key(f"cache::{token}", decoded_token, 1800,
+                          local_cache_enabled=True)
     Logger.info(f"Id Token caching status: {cache_token}")
   else:
     decoded_token = cached_token
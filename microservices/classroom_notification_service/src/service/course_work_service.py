@@ -19,6 +19,7 @@ import json
 import uuid
 from common.utils.logging_handler import Logger
 from common.utils.bq_helper import insert_rows_to_bq
+from common.models import SectionProgress, SectionCourseWork
 from googleapiclient.errors import HttpError
 from helper.classroom_helper import (get_course_work, get_student_submissions,
                                      get_course_work_material, get_user)
@@ -60,10 +61,16 @@ def save_course_work(data):
     log_flag = insert_rows_to_bq(rows=rows,
                                  dataset=BQ_DATASET,
                                  table_name=BQ_TABLE_DICT["BQ_LOG_CW_TABLE"])
+    is_submission = len(data["collection"].split(".")) == 3
     if data["eventType"] == "DELETED":
+      if not is_submission:
+        SectionCourseWork.record_course_work(
+            classroom_id=data["resourceId"]["courseId"],
+            course_work_id=data["resourceId"]["id"],
+            published=False)
       return log_flag, None
     course_work_flag = False
-    if len(data["collection"].split(".")) == 3:
+    if is_submission:
       if data["collection"].split(".")[2] == "studentSubmissions":
         course_work_flag, notification_message = save_student_submission(
             course_id=data["resourceId"]["courseId"],
@@ -102,6 +109,10 @@ def save_course_work_collection(course_id, course_work_id, message_id,
   try:
     course_work = get_course_work(course_id=course_id,
                                   course_work_id=course_work_id)
+    SectionCourseWork.record_course_work(
+        classroom_id=course_id,
+        course_work_id=course_work_id,
+        published=course_work["state"] == "PUBLISHED")
     course_work["uuid"] = str(uuid.uuid4())
     course_work["message_id"] = message_id
     course_work["assignment"] = convert_to_json(course_work, "assignment")
@@ -164,6 +175,13 @@ def save_student_submission(course_id, course_work_id, submissions_id,
   """
   submission = get_student_submissions(course_id, course_work_id,
                                        submissions_id)
+  SectionProgress.record_submission(
+      classroom_id=course_id,
+      gaia_id=submission["userId"],
+      course_work_id=course_work_id,
+      state=submission["state"],
+      graded="assignedGrade" in submission,
+      update_time=submission.get("updateTime"))
   submission_details = submission.copy()
   submission["uuid"] = str(uuid.uuid4())
   submission["message_id"] = message_id
@@ -15,7 +15,8 @@
 Roster Service Unit Test
 """
 import mock
-from service.course_work_service import save_course_work
+from service.course_work_service import (save_course_work,
+                                        save_student_submission)
 
 
 def test_save_course_work_collection():
@@ -104,3 +105,56 @@ def test_save_student_submission_collection_negative():
 
   assert result_1 is False
   assert result_2 is False
+
+
+def test_save_student_submission_records_progress():
+  submission = {
+      "courseId": "550005555",
+      "courseWorkId": "12345678900",
+      "id": "AC56Vg722HC9U",
+      "userId": "1234567",
+      "state": "TURNED_IN",
+      "updateTime": "2023-01-02T15:01:23.045Z"
+  }
+  with mock.patch("service.course_work_service.get_student_submissions",
+                  return_value=submission):
+    with mock.patch("service.course_work_service.insert_rows_to_bq",
+                    return_value=True):
+      with mock.patch("service.course_work_service.SectionProgress."
+                      "record_submission") as record_submission:
+        result, message = save_student_submission(
+            course_id="550005555",
+            course_work_id="12345678900",
+            submissions_id="AC56Vg722HC9U",
+            message_id="90000003344",
+            event_type="MODIFIED")
+  assert result is True
+  assert message is None
+  record_submission.assert_called_once_with(
+      classroom_id="550005555",
+      gaia_id="1234567",
+      course_work_id="12345678900",
+      state="TURNED_IN",
+      graded=False,
+      update_time="2023-01-02T15:01:23.045Z")
+
+
+def test_deleted_course_work_is_removed_from_progress():
+  data = {
+      "message_id": "90000003344",
+      "collection": "courses.courseWork",
+      "eventType": "DELETED",
+      "publish_time": "2014-10-02T15:01:23Z",
+      "resourceId": {
+          "id": "12345678900",
+          "courseId": "550005555"
+      }}
+  with mock.patch("service.course_work_service.insert_rows_to_bq",
+                  return_value=True):
+    with mock.patch("service.course_work_service.SectionCourseWork."
+                    "record_course_work") as record_course_work:
+      result, _ = save_course_work(data)
+  assert result is True
+  record_course_work.assert_called_once_with(
+      classroom_id="550005555", course_work_id="12345678900",
+      published=False)
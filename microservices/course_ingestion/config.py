@@ -61,3 +61,13 @@ BATCH_JOB_REQUESTS = {
   "cpu": "500m",
   "memory": "1500Mi"
 }
+
+# number of processes building the competency subtrees of a topic tree
+TOPIC_TREE_PROCESSES = int(os.getenv("TOPIC_TREE_PROCESSES", "1"))
+# number of documents sampled for the silhouette scores of a tree node
+SILHOUETTE_SAMPLE_SIZE = int(os.getenv("SILHOUETTE_SAMPLE_SIZE", "2000"))
+# number of concurrent requests to the title generation microservice
+TITLE_GENERATION_WORKERS = int(os.getenv("TITLE_GENERATION_WORKERS", "2"))
+# generated titles and summaries are cached by the hash of their input text
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", "86400"))
+GENERATION_CACHE_MAX_SIZE = int(os.getenv("GENERATION_CACHE_MAX_SIZE", "20000"))
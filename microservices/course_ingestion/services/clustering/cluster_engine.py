@@ -0,0 +1,115 @@
+"""Agglomerative clustering engine of the topic tree"""
+import numpy as np
+from scipy import sparse
+from scipy.cluster.hierarchy import linkage, cut_tree
+from scipy.spatial.distance import pdist, squareform
+
+# minimum number of documents per cluster at every level of the topic tree
+LEVEL_CLUSTER_SIZES = {
+    "competency": 20,
+    "sub_competency": 10,
+    "learning_objective": 3,
+    "learning_unit": 1
+}
+
+
+def silhouette_scores(distances, labels_list):
+  """Returns the mean silhouette coefficient of every labelling of the
+  samples of a square distance matrix
+
+  Every score costs a single sparse product with the distance matrix,
+  the within and between cluster distances are read off the per cluster
+  distance sums.
+  Args:
+    distances: square matrix of the pairwise distances of the samples
+    labels_list: list of arrays of cluster labels from 0 to n_clusters - 1
+  Returns:
+    list of silhouette scores, -1 when a labelling has a single cluster
+  """
+  n_samples = distances.shape[0]
+  samples = np.arange(n_samples)
+  scores = []
+  for labels in labels_list:
+    n_clusters = labels.max() + 1
+    if n_clusters < 2 or n_clusters >= n_samples:
+      scores.append(-1)
+      continue
+    membership = sparse.csr_matrix(
+        (np.ones(n_samples, dtype=distances.dtype), (labels, samples)),
+        shape=(n_clusters, n_samples))
+    cluster_sums = np.asarray(membership @ distances)
+    cluster_sizes = np.bincount(labels, minlength=n_clusters)
+    own_sizes = cluster_sizes[labels]
+
+    intra_distances = cluster_sums[labels, samples] / np.maximum(
+        own_sizes - 1, 1)
+    mean_distances = cluster_sums / np.maximum(cluster_sizes, 1)[:, None]
+    mean_distances[labels, samples] = np.inf
+    mean_distances[cluster_sizes == 0] = np.inf
+    inter_distances = mean_distances.min(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+      coefficients = (inter_distances - intra_distances) / np.maximum(
+          intra_distances, inter_distances)
+    coefficients[own_sizes == 1] = 0
+    scores.append(float(np.nan_to_num(coefficients).mean()))
+  return scores
+
+
+class ClusteringEngine():
+  """Complete linkage clustering of document embeddings on cosine
+  distances, with the number of clusters picked by silhouette score
+
+  Only the embeddings are kept. Every node of the topic tree computes the
+  condensed cosine distances of its documents for its dendrogram, which it
+  builds once and cuts at every candidate number of clusters, and the
+  euclidean distances of the silhouette sample only.
+  """
+
+  def __init__(self, embeddings, silhouette_sample_size=None,
+               random_state=42):
+    self.embeddings = np.asarray(embeddings, dtype=np.float64)
+    self.silhouette_sample_size = silhouette_sample_size
+    self.random_state = random_state
+
+  def get_labels(self, doc_ids, n_clusters_list):
+    """Returns the cluster labels of the documents for every number of
+    clusters, cut from a single complete linkage dendrogram"""
+    distances = np.nan_to_num(
+        pdist(self.embeddings[np.asarray(doc_ids)], "cosine"))
+    dendrogram = linkage(distances, method="complete")
+    labels = cut_tree(dendrogram, n_clusters=list(n_clusters_list))
+    return [labels[:, i] for i in range(labels.shape[1])]
+
+  def get_silhouette_scores(self, doc_ids, labels_list):
+    """Returns the silhouette scores of the labellings of the documents,
+    on a fixed random sample of them when there are more documents than
+    the sample size"""
+    doc_ids = np.asarray(doc_ids)
+    samples = np.arange(len(doc_ids))
+    if self.silhouette_sample_size and \
+        len(doc_ids) > self.silhouette_sample_size:
+      samples = np.sort(
+          np.random.RandomState(self.random_state).choice(
+              samples, self.silhouette_sample_size, replace=False))
+    sample_ids = doc_ids[samples]
+    # silhouette scores are computed on euclidean distances
+    distances = squareform(pdist(self.embeddings[sample_ids]))
+    sample_labels = []
+    for labels in labels_list:
+      # relabel so that the labels of the sample are contiguous
+      sample_labels.append(np.unique(labels[samples], return_inverse=True)[1])
+    return silhouette_scores(distances, sample_labels)
+
+  def get_optimum_clusters(self, doc_ids, level):
+    """Returns the cluster labels of the documents with the number of
+    clusters of the best silhouette score for the level of the topic tree"""
+    possible_cluster_count = len(doc_ids) // LEVEL_CLUSTER_SIZES[level]
+    if possible_cluster_count < 2:
+      return np.zeros(len(doc_ids), dtype=int)
+    if possible_cluster_count == 2:
+      return self.get_labels(doc_ids, [2])[0]
+    n_clusters_list = list(range(2, possible_cluster_count))
+    labels_list = self.get_labels(doc_ids, n_clusters_list)
+    scores = self.get_silhouette_scores(doc_ids, labels_list)
+    return labels_list[int(np.argmax(scores))]
@@ -0,0 +1,59 @@
+"""testing the clustering engine"""
+import numpy as np
+from scipy.spatial.distance import pdist, squareform
+from services.clustering.cluster_engine import (ClusteringEngine,
+                                                silhouette_scores)
+
+
+def get_silhouette_score(distances, labels):
+  coefficients = []
+  for i, label in enumerate(labels):
+    own = labels == label
+    if own.sum() == 1:
+      coefficients.append(0)
+      continue
+    intra = distances[i, own].sum() / (own.sum() - 1)
+    inter = min(distances[i, labels == other].mean()
+                for other in set(labels) if other != label)
+    coefficients.append((inter - intra) / max(intra, inter))
+  return np.mean(coefficients)
+
+
+def get_blobs(n_blobs, blob_size, seed=0):
+  rng = np.random.default_rng(seed)
+  centers = rng.normal(size=(n_blobs, 8)) * 10
+  return np.concatenate(
+      [center + rng.normal(size=(blob_size, 8)) for center in centers])
+
+
+def test_silhouette_scores():
+  embeddings = np.random.default_rng(0).normal(size=(30, 4))
+  distances = squareform(pdist(embeddings))
+  labels_list = [np.arange(30) % 2, np.arange(30) // 8,
+                 np.array([0] * 29 + [1])]
+  scores = silhouette_scores(distances, labels_list)
+  for labels, score in zip(labels_list, scores):
+    assert np.isclose(score, get_silhouette_score(distances, labels))
+  assert silhouette_scores(distances, [np.zeros(30, dtype=int)]) == [-1]
+
+
+def test_get_optimum_clusters():
+  embeddings = get_blobs(4, 25)
+  engine = ClusteringEngine(embeddings)
+  labels = engine.get_optimum_clusters(range(100), "sub_competency")
+  assert len(set(labels)) == 4
+  for blob in range(4):
+    assert len(set(labels[blob * 25:(blob + 1) * 25])) == 1
+
+  # documents of a node are clustered on their own distances
+  doc_ids = list(range(25, 75))
+  labels = engine.get_optimum_clusters(doc_ids, "learning_objective")
+  assert len(set(labels)) == 2
+
+  sampled_engine = ClusteringEngine(embeddings, silhouette_sample_size=40)
+  labels = sampled_engine.get_optimum_clusters(range(100), "sub_competency")
+  assert len(set(labels)) == 4
+
+  assert not engine.get_optimum_clusters(range(30), "competency").any()
+  assert len(set(engine.get_optimum_clusters(range(50),
+                                             "competency"))) == 2
@@ -0,0 +1,85 @@
+"""Scheduler of the batched calls to the text generation microservices"""
+import asyncio
+import hashlib
+import json
+import tornado.ioloop
+from common.utils.model_cache import ModelCache
+
+
+class GenerationScheduler():
+  """Batches the texts sent to a text generation function and caches the
+  generated outputs
+
+  Identical texts are generated once, also when they are requested by
+  concurrent calls, and the outputs are cached by the hash of the text and
+  the generation arguments, so regenerating a topic tree after small edits
+  only generates the texts that changed. The texts to generate are sorted by
+  length before they are batched, so every batch holds texts of similar
+  length and the padding of the batched model inference stays low.
+  """
+
+  def __init__(self, executor, batch_size, cache_ttl, cache_max_size):
+    self.executor = executor
+    self.batch_size = batch_size
+    self.cache = ModelCache(ttl=cache_ttl, max_size=cache_max_size)
+    self.pending = {}
+
+  @staticmethod
+  def get_key(text, args):
+    return hashlib.sha256(
+        json.dumps([text, list(args)]).encode("utf-8")).hexdigest()
+
+  async def generate(self, generate, texts, *args, batch_size=None):
+    """Returns the outputs of generate(batch, *args) for every text
+
+    Args:
+      generate: function generating the list of outputs of a batch of texts
+      texts: list of texts
+      args: generation arguments shared by all the texts
+      batch_size: maximum number of texts per batch, defaults to the batch
+        size of the scheduler
+    Returns:
+      list of the outputs of the texts
+    """
+    keys = [self.get_key(text, args) for text in texts]
+    outputs = {}
+    scheduled = {}
+    missing = {}
+    for key, text in zip(keys, texts):
+      if key in outputs or key in scheduled or key in missing:
+        continue
+      if key in self.pending:
+        scheduled[key] = self.pending[key]
+        continue
+      output = self.cache.get(key)
+      if output is None:
+        missing[key] = text
+      else:
+        outputs[key] = output
+
+    batch_size = batch_size or self.batch_size
+    missing_keys = sorted(missing, key=lambda key: len(missing[key]))
+    for i in range(0, len(missing_keys), batch_size):
+      batch_keys = missing_keys[i:i + batch_size]
+      future = asyncio.ensure_future(
+          self.generate_batch(generate, batch_keys,
+                              [missing[key] for key in batch_keys], args))
+      for index, key in enumerate(batch_keys):
+        scheduled[key] = self.pending[key] = (future, index)
+
+    for key, (future, index) in scheduled.items():
+      outputs[key] = (await future)[index]
+    return [outputs[key] for key in keys]
+
+  async def generate_batch(self, generate, keys, texts, args):
+    """Generates the outputs of a batch of texts in the executor and caches
+    them"""
+    try:
+      outputs = await tornado.ioloop.IOLoop.current().run_in_executor(
+          self.executor, generate, texts, *args)
+      for key, output in zip(keys, outputs):
+        self.cache.set(key, output)
+      return outputs
+    finally:
+      for key in keys:
+        self.pending.pop(key, None)
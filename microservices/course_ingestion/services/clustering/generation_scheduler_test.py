@@ -0,0 +1,33 @@
+"""testing the generation scheduler"""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from tornado.gen import multi
+from services.clustering.generation_scheduler import GenerationScheduler
+
+
+@pytest.mark.asyncio
+async def test_generate():
+  batches = []
+
+  def generate(texts, suffix):
+    batches.append(texts)
+    return [text + suffix for text in texts]
+
+  scheduler = GenerationScheduler(ThreadPoolExecutor(max_workers=2), 2, 60,
+                                  100)
+  texts = ["ccc", "a", "bb", "a", "dddd"]
+  outputs = await scheduler.generate(generate, texts, " title")
+  assert outputs == [text + " title" for text in texts]
+  # duplicates are generated once and batches hold texts of similar length
+  assert batches == [["a", "bb"], ["ccc", "dddd"]]
+
+  # cached texts and texts generated by concurrent calls are reused
+  batches.clear()
+  outputs = await multi([
+      scheduler.generate(generate, ["a", "eeeee"], " title"),
+      scheduler.generate(generate, ["eeeee", "ccc"], " title"),
+      scheduler.generate(generate, ["a"], " summary")
+  ])
+  assert outputs == [["a title", "eeeee title"], ["eeeee title", "ccc title"],
+                     ["a summary"]]
+  assert batches == [["eeeee"], ["a"]]
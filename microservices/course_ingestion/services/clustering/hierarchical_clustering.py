@@ -1,19 +1,22 @@
 """hierarchical clustering"""
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import requests
 from umap import UMAP
-from sklearn.cluster import AgglomerativeClustering
-from sklearn.metrics import silhouette_score
 import json
-from config import SERVICES, TITLE_SIMILARITY_CER_THRESHOLD, TITLE_GENERATION_BATCH_SIZE
-import tornado.ioloop
+from config import (SERVICES, TITLE_SIMILARITY_CER_THRESHOLD,
+                    TITLE_GENERATION_BATCH_SIZE, TOPIC_TREE_PROCESSES,
+                    SILHOUETTE_SAMPLE_SIZE, TITLE_GENERATION_WORKERS,
+                    GENERATION_CACHE_TTL, GENERATION_CACHE_MAX_SIZE)
 from string import punctuation
 from tornado.gen import multi
 from transformers import T5Tokenizer
 from textacy.extract import keyterms
 from services.triple_inference import TripleService
+from services.clustering.cluster_engine import ClusteringEngine
+from services.clustering.generation_scheduler import GenerationScheduler
 import spacy
 import editdistance
 nlp = spacy.load("en_core_web_sm")
@@ -22,11 +25,19 @@ triple_service = TripleService()
 tokenizer = T5Tokenizer.from_pretrained("t5-base")
 
 #pylint: disable=consider-using-with,broad-exception-raised
-title_generation_executor = ThreadPoolExecutor(max_workers=1)
+title_generation_executor = ThreadPoolExecutor(
+    max_workers=TITLE_GENERATION_WORKERS)
 summarization_executor = ThreadPoolExecutor(max_workers=8)
+title_scheduler = GenerationScheduler(
+    title_generation_executor, TITLE_GENERATION_BATCH_SIZE,
+    GENERATION_CACHE_TTL, GENERATION_CACHE_MAX_SIZE)
+blooms_title_scheduler = GenerationScheduler(
+    title_generation_executor, TITLE_GENERATION_BATCH_SIZE,
+    GENERATION_CACHE_TTL, GENERATION_CACHE_MAX_SIZE)
+# the summarization microservice takes one text per request
+summary_scheduler = GenerationScheduler(
+    summarization_executor, 1, GENERATION_CACHE_TTL, GENERATION_CACHE_MAX_SIZE)
 
-hierarchical_clustering = AgglomerativeClustering(
-    affinity="cosine", linkage="complete")
 umap_model = UMAP(random_state=42,
     n_neighbors=5,
     n_components=20,
@@ -34,6 +45,8 @@ umap_model = UMAP(random_state=42,
     metric="cosine",
     verbose=False)
 sentence_model = SentenceTransformer("distilbert-base-nli-stsb-mean-tokens")
+# clustering engine and documents of the subtrees built in worker processes
+subtree_context = None
 
 
 def is_nan(num):
@@ -129,6 +142,10 @@ def get_summary(text, ratio=0.3):
     raise Exception("Internal server error") from e
 
 
+def get_summaries(texts, ratio=0.3):
+  return [get_summary(text, ratio) for text in texts]
+
+
 def join_texts(texts):
   if texts:
     joined_text = texts[0].strip()
@@ -151,11 +168,10 @@ async def compress_text_for_title_generation(texts):
                        for n_token in tokens_count]
     if total_tokens > 512:
       summarised_docs = await multi([
-          tornado.ioloop.IOLoop.current().run_in_executor(
-              summarization_executor, get_summary, text, ratio)
+          summary_scheduler.generate(get_summaries, [text], ratio)
           for text, ratio in zip(texts, sentence_ratios)
       ])
-      text = join_texts(summarised_docs)
+      text = join_texts([docs[0] for docs in summarised_docs])
     else:
       text = join_texts(texts)
   return text
@@ -174,23 +190,13 @@ async def get_all_titles(combined_text_list,
                          batch_size=32,
                          blooms_title=False,
                          n_titles=5):
-  #combined_text_list = [item for sublist in texts_list for item in sublist]
   if blooms_title:
-    all_titles = await multi([
-        tornado.ioloop.IOLoop.current().run_in_executor(
-            title_generation_executor, get_blooms_titles, batch,
-            max_title_length, n_titles)
-        for batch in get_batches(combined_text_list, batch_size)
-    ])
-  else:
-    all_titles = await multi([
-        tornado.ioloop.IOLoop.current().run_in_executor(
-            title_generation_executor, get_titles, batch,
-            max_title_length, n_titles)
-        for batch in get_batches(combined_text_list, batch_size)
-    ])
-  all_titles = [item for sublist in all_titles for item in sublist]
-  return all_titles
+    return await blooms_title_scheduler.generate(
+        get_blooms_titles, combined_text_list, max_title_length, n_titles,
+        batch_size=batch_size)
+  return await title_scheduler.generate(
+      get_titles, combined_text_list, max_title_length, n_titles,
+      batch_size=batch_size)
 
 
 def update_titles(topic_tree, titles_dict, level, next_indices):
@@ -228,40 +234,12 @@ def update_titles(topic_tree, titles_dict, level, next_indices):
     raise Exception("Internal server Error") from e
 
 
-def get_optimum_clusters(model, data, level):
-  sil_score_max = -1
-  level_map = {
-      "competency": 20,
-      "sub_competency": 10,
-      "learning_objective": 3,
-      "learning_unit": 1
-  }
-  possible_cluster_count = len(data) // level_map[level]
-  if possible_cluster_count < 2:
-    return [0 for i in range(len(data))]
-  elif possible_cluster_count == 2:
-    model.n_clusters = 2
-    labels = model.fit_predict(data)
-    return labels
-  else:
-    for n_clusters in range(2, possible_cluster_count):
-      model.n_clusters = n_clusters
-      labels = model.fit_predict(data)
-      sil_score = silhouette_score(data, labels)
-      if sil_score > sil_score_max:
-        sil_score_max = sil_score
-        best_n_clusters = n_clusters
-    model.n_clusters = best_n_clusters
-    clusters = model.fit_predict(data)
-    return clusters
-
-
-def get_recursive_tree(clustering_model, embeddings, node_level, documents,
+def get_recursive_tree(clustering_engine, node_level, documents,
                        doc_ids, text_list, create_learning_units,
                        create_triples):
   if node_level == "course":
-    clusters = get_optimum_clusters(
-        clustering_model, embeddings[doc_ids], level="competency")
+    clusters = clustering_engine.get_optimum_clusters(
+        doc_ids, level="competency")
     comps = []
     for comp_cluster in set(clusters):
       comp = {}
@@ -271,20 +249,23 @@ def get_recursive_tree(clustering_model, embeddings, node_level, documents,
           if cluster_id == comp_cluster
       ]
       comp["text"] = join_texts([documents[i] for i in comp["document_ids"]])
+      comps.append(comp)
+    subtrees = get_subtrees(clustering_engine, "competency", documents,
+                            [comp["document_ids"] for comp in comps],
+                            create_learning_units, create_triples)
+    for comp, (sub_competencies, subtree_text_list) in zip(comps, subtrees):
       comp["title"] = len(text_list)
       text_list.append({
           "docs": [documents[i] for i in comp["document_ids"]],
           "blooms_title": False
       })
-      comp["sub_competencies"], text_list = get_recursive_tree(
-          clustering_model, embeddings, "competency", documents,
-          comp["document_ids"], text_list, create_learning_units,
-          create_triples)
-      comps.append(comp)
+      comp["sub_competencies"] = offset_titles(sub_competencies,
+                                               len(text_list))
+      text_list.extend(subtree_text_list)
     return comps, text_list
   elif node_level == "competency":
-    clusters = get_optimum_clusters(
-        clustering_model, embeddings[doc_ids], level="sub_competency")
+    clusters = clustering_engine.get_optimum_clusters(
+        doc_ids, level="sub_competency")
     scs = []
     for sc_cluster in set(clusters):
       sc = {}
@@ -300,14 +281,14 @@ def get_recursive_tree(clustering_model, embeddings, node_level, documents,
           "blooms_title": False
       })
       sc["learning_objectives"], text_list = get_recursive_tree(
-          clustering_model, embeddings, "sub_competency", documents,
+          clustering_engine, "sub_competency", documents,
           sc["document_ids"], text_list, create_learning_units,
           create_triples)
       scs.append(sc)
     return scs, text_list
   elif node_level == "sub_competency":
-    clusters = get_optimum_clusters(
-        clustering_model, embeddings[doc_ids], level="learning_objective")
+    clusters = clustering_engine.get_optimum_clusters(
+        doc_ids, level="learning_objective")
     los = []
     for lo_cluster in set(clusters):
       lo = {}
@@ -324,13 +305,13 @@ def get_recursive_tree(clustering_model, embeddings, node_level, documents,
       })
       if create_learning_units:
         lo["learning_units"], text_list = get_recursive_tree(
-            clustering_model, embeddings, "learning_objective", documents,
+            clustering_engine, "learning_objective", documents,
             lo["document_ids"], text_list, False, create_triples)
       los.append(lo)
     return los, text_list
   elif node_level == "learning_objective":
-    clusters = get_optimum_clusters(
-        clustering_model, embeddings[doc_ids], level="learning_unit")
+    clusters = clustering_engine.get_optimum_clusters(
+        doc_ids, level="learning_unit")
     lus = []
     for lu_cluster in set(clusters):
       lu = {}
@@ -348,7 +329,7 @@ def get_recursive_tree(clustering_model, embeddings, node_level, documents,
       })
       if create_triples:
         lu["triples"], text_list = get_recursive_tree(
-            clustering_model, embeddings, "learning_unit", documents,
+            clustering_engine, "learning_unit", documents,
             lu["document_ids"], text_list, False, create_triples)
       lus.append(lu)
     return lus, text_list
@@ -359,6 +340,54 @@ def get_recursive_tree(clustering_model, embeddings, node_level, documents,
     return triples, text_list
 
 
+def offset_titles(nodes, offset):
+  """Shifts the text list indices of the titles of a subtree built with its
+  own text list, by the length of the text list it is appended to"""
+  for node in nodes:
+    node["title"] += offset
+    for key in ["sub_competencies", "learning_objectives", "learning_units"]:
+      offset_titles(node.get(key, []), offset)
+  return nodes
+
+
+def get_subtree(node_level, doc_ids, create_learning_units, create_triples):
+  """Builds a subtree in a worker process from the clustering engine and the
+  documents inherited from the parent process"""
+  clustering_engine, documents = subtree_context
+  return get_recursive_tree(clustering_engine, node_level, documents, doc_ids,
+                            [], create_learning_units, create_triples)
+
+
+def get_subtrees(clustering_engine, node_level, documents, doc_ids_list,
+                 create_learning_units, create_triples):
+  """Builds the independent subtrees of the documents of every node, each
+  with its own text list
+
+  With TOPIC_TREE_PROCESSES greater than 1 the subtrees are built in a pool
+  of forked processes, which share the document embeddings of the
+  clustering engine with the parent process instead of pickling them for
+  every task.
+  """
+  if TOPIC_TREE_PROCESSES <= 1 or len(doc_ids_list) <= 1:
+    return [
+        get_recursive_tree(clustering_engine, node_level, documents, doc_ids,
+                           [], create_learning_units, create_triples)
+        for doc_ids in doc_ids_list
+    ]
+  global subtree_context # pylint: disable=global-statement
+  subtree_context = (clustering_engine, documents)
+  try:
+    with ProcessPoolExecutor(
+        max_workers=min(TOPIC_TREE_PROCESSES, len(doc_ids_list)),
+        mp_context=multiprocessing.get_context("fork")) as executor:
+      return list(
+          executor.map(get_subtree, [node_level] * len(doc_ids_list),
+                       doc_ids_list, [create_learning_units] * len(doc_ids_list),
+                       [create_triples] * len(doc_ids_list)))
+  finally:
+    subtree_context = None
+
+
 # pylint: disable=broad-except
 async def create_recursive_topic_tree(documents,
                                       node_level="course",
@@ -376,9 +405,10 @@ async def create_recursive_topic_tree(documents,
       reduced_embeddings = umap_model_modified.fit_transform(embeddings)
     except Exception:
       reduced_embeddings = embeddings
+  clustering_engine = ClusteringEngine(
+      reduced_embeddings, silhouette_sample_size=SILHOUETTE_SAMPLE_SIZE)
   topic_tree, text_list = get_recursive_tree(
-      hierarchical_clustering,
-      reduced_embeddings,
+      clustering_engine,
       node_level,
       documents,
       range(len(documents)),
@@ -531,8 +561,11 @@ def get_topics(text):
 
 
 async def get_summarized_texts(text_list):
-  for i in text_list:
-    i["summarised_text"] = await compress_text_for_title_generation(i["docs"])
+  summarised_texts = await multi([
+      compress_text_for_title_generation(i["docs"]) for i in text_list
+  ])
+  for i, summarised_text in zip(text_list, summarised_texts):
+    i["summarised_text"] = summarised_text
   return text_list
 
 
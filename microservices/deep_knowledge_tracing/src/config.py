@@ -37,6 +37,25 @@ IS_DEVELOPMENT = bool(os.getenv("IS_DEVELOPMENT", "").lower() \
     in ("True", "true"))
 DKT_JOB_TYPE = "deep-knowledge-tracing"
 
+# bounds of the cache of course models used for inference
+DKT_MAX_CACHED_MODELS = int(os.getenv("DKT_MAX_CACHED_MODELS", "50"))
+DKT_MAX_CACHED_MODEL_BYTES = int(os.getenv(
+  "DKT_MAX_CACHED_MODEL_BYTES", str(1024 * 1024 * 1024)))
+# concurrent predictions of a course are batched into one model call
+DKT_MAX_BATCH_SIZE = int(os.getenv("DKT_MAX_BATCH_SIZE", "32"))
+DKT_BATCH_WAIT_SECONDS = float(os.getenv("DKT_BATCH_WAIT_SECONDS", "0.005"))
+DKT_WARM_WORKERS = int(os.getenv("DKT_WARM_WORKERS", "2"))
+DKT_PRELOAD_MODELS = bool(os.getenv("DKT_PRELOAD_MODELS", "").lower() \
+    in ("True", "true"))
+# seconds between the checks for model files replaced in GCS, 0 disables
+DKT_MODEL_REFRESH_SECONDS = int(os.getenv("DKT_MODEL_REFRESH_SECONDS", "600"))
+# user events are streamed from firestore in pages to build the datasets,
+# which are cached as npz shards locally and in GCS
+DKT_EVENTS_PAGE_SIZE = int(os.getenv("DKT_EVENTS_PAGE_SIZE", "1000"))
+DKT_DATASET_CACHE_DIR = os.getenv("DKT_DATASET_CACHE_DIR", "dkt_datasets")
+DKT_DATASET_SHARD_SIZE = int(os.getenv("DKT_DATASET_SHARD_SIZE", "10000"))
+DKT_DATASET_CACHE_TTL = int(os.getenv("DKT_DATASET_CACHE_TTL", "86400"))
+
 SERVICES = {}
 
 BATCH_JOB_LIMITS = {
@@ -3,7 +3,8 @@ import uvicorn
 import config
 from fastapi import FastAPI,Depends
 from routes import dkt_routes, job_status, user_events
-from common.utils.gcs_adapter import download_blob
+from services.inference import (Inference, sync_model_files,
+                                start_model_refresh)
 from common.utils.http_exceptions import add_exception_handlers
 from common.utils.auth_service import validate_token
 
@@ -18,7 +19,15 @@ os.environ["GOOGLE_CLOUD_PROJECT"] = "fake-project"
 
 app = FastAPI()
 
-download_blob(config.MODEL_WEIGHTS_PATH, config.MODEL_PARAMS_DIR)
+sync_model_files()
+
+
+@app.on_event("startup")
+def preload_models():
+  if config.DKT_PRELOAD_MODELS:
+    Inference.load_all_models()
+  if config.DKT_MODEL_REFRESH_SECONDS:
+    start_model_refresh(config.DKT_MODEL_REFRESH_SECONDS)
 
 
 @app.get("/ping")
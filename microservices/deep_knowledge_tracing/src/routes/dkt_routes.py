@@ -6,7 +6,7 @@ from fastapi import APIRouter  #, HTTPException
 from schemas.dkt_schema import (TrainDKTRequest, TrainDKTResponse,
                                 CreateDataDKTRequest, CreateDataDKTResponse,
                                 PredictDKTRequest,InferenceDKTRequest,
-                                PredictDKTResponse)
+                                PredictDKTResponse,InferenceMetricsResponse)
 from schemas.error_schema import (InternalServerErrorResponseModel,
                                   ValidationErrorResponseModel)
 from services.create_fake_data import generate_dkt_data
@@ -79,6 +79,22 @@ def inference_dkt(request_body: InferenceDKTRequest):
       "data": response
   }
 
+@router.get("/inference/metrics/",
+ response_model=InferenceMetricsResponse)
+def inference_metrics():
+  """Returns the model cache usage and the latency metrics per course"""
+  try:
+    response = Inference.get_metrics()
+  except Exception as e:
+    Logger.error(e)
+    Logger.error(traceback.print_exc())
+    raise InternalServerError(str(e)) from e
+  return {
+      "success": True,
+      "message": "Successfully fetched the dkt inference metrics",
+      "data": response
+  }
+
 @router.post("/predict/",include_in_schema=False,
  response_model=PredictDKTResponse)
 def predict_dkt(request_body: PredictDKTRequest):
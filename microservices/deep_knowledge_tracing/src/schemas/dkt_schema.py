@@ -42,13 +42,15 @@ class Data(BaseModel):
 class TrainDKTRequest(BaseModel):
   course_id: Optional[str]
   title: Optional[str]
+  refresh_dataset: Optional[bool] = False
 
   class Config:
     orm_mode = True
     schema_extra = {
         "example": {
             "course_id": "sample_course_id",
-            "title": "sample_title_to_track_training"
+            "title": "sample_title_to_track_training",
+            "refresh_dataset": False
         }
     }
 
@@ -102,6 +104,44 @@ class PredictDKTResponse(BaseModel):
         }
     }
 
+class InferenceMetricsResponse(BaseModel):
+  success: bool
+  message: str
+  data: dict
+
+  class Config:
+    orm_mode = True
+    schema_extra = {
+        "example": {
+            "success": True,
+            "message": "Successfully fetched the dkt inference metrics",
+            "data": {
+                "cache": {
+                    "models": 1,
+                    "max_models": 50,
+                    "bytes": 204800,
+                    "max_bytes": 1073741824
+                },
+                "courses": {
+                    "sample_course_id": {
+                        "requests": 120,
+                        "errors": 0,
+                        "batches": 40,
+                        "mean_batch_size": 3.0,
+                        "loads": 1,
+                        "load_seconds": 1.2,
+                        "evictions": 0,
+                        "p50_ms": 21.5,
+                        "p95_ms": 48.1,
+                        "p99_ms": 60.3,
+                        "max_ms": 75.0,
+                        "cached": True
+                    }
+                }
+            }
+        }
+    }
+
 class UserEventModel(BaseModel):
   learning_unit : str
   is_correct : Literal[0, 1]
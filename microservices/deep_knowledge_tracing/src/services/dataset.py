@@ -1,11 +1,23 @@
 """to load and process dataset"""
-import pandas as pd
+import json
+import os
+import shutil
+import time
 import tensorflow as tf
 import numpy as np
+from google.cloud.firestore_v1.field_path import FieldPath
 from common.models import UserEvent
+from common.utils.gcs_adapter import download_blob, upload_folder
+from common.utils.logging_handler import Logger
 from services.data_models_utils import filter_events_with_empty_feedback
 from sklearn.preprocessing import LabelEncoder
-#pylint: disable=no-value-for-parameter,unexpected-keyword-arg,redundant-keyword-arg
+from config import (GCS_BUCKET, DKT_EVENTS_PAGE_SIZE, DKT_DATASET_CACHE_DIR,
+                    DKT_DATASET_SHARD_SIZE, DKT_DATASET_CACHE_TTL)
+#pylint: disable=no-value-for-parameter,unexpected-keyword-arg,redundant-keyword-arg,broad-exception-raised
+
+# fields of the user events used to build the dataset
+EVENT_FIELDS = ["user_id", "session_ref", "learning_unit", "feedback",
+                "last_modified_time"]
 class Dataset():
   """docstring for Dataset class"""
   verbose = 1 # Verbose = {0,1,2}
@@ -14,65 +26,203 @@ class Dataset():
   MASK_VALUE = -1.
   all_lu_ids = []
   @staticmethod
-  def import_dataset(course_id=None):
-    """imports user events from firestore and
-    creates dataset with required fields"""
+  def iter_user_event_pages(collection_manager,
+                            page_size=DKT_EVENTS_PAGE_SIZE):
+    """streams user events from firestore in pages of dicts holding only the
+    fields used to build the dataset"""
+    query = collection_manager.query().select(EVENT_FIELDS).order_by(
+      FieldPath.document_id())
+    last_snapshot = None
+    while True:
+      page_query = query.limit(page_size)
+      if last_snapshot is not None:
+        page_query = page_query.start_after(last_snapshot)
+      snapshots = list(page_query.stream())
+      if not snapshots:
+        return
+      yield [snapshot.to_dict() for snapshot in snapshots]
+      if len(snapshots) < page_size:
+        return
+      last_snapshot = snapshots[-1]
+
+  @staticmethod
+  def get_event_columns(pages):
+    """returns numpy columns of the user events that have a feedback
+    evaluation"""
+    user_ids, session_refs, lu_ids, correct, times = [], [], [], [], []
+    for page in pages:
+      for event in page:
+        event.setdefault("feedback", {})
+        if not filter_events_with_empty_feedback(event):
+          continue
+        feedback = event["feedback"]
+        evaluation_flag = feedback["second_attempt"]["evaluation_flag"] \
+          if "second_attempt" in feedback.keys() else \
+            feedback["first_attempt"]["evaluation_flag"]
+        user_ids.append(event.get("user_id"))
+        session_refs.append(event.get("session_ref") or "")
+        lu_ids.append(event.get("learning_unit"))
+        correct.append(1.0 if evaluation_flag=="correct" else 0.0)
+        last_modified_time = event.get("last_modified_time")
+        times.append(
+          last_modified_time.timestamp() if last_modified_time else 0.)
+    return {
+      "user_ids": np.array(user_ids, dtype=str),
+      "session_refs": np.array(session_refs, dtype=str),
+      "lu_ids": np.array(lu_ids, dtype=str),
+      "correct": np.array(correct, dtype=np.float32),
+      "times": np.array(times, dtype=np.float64)
+    }
+
+  @staticmethod
+  def build_sequences(columns):
+    """groups the events by user and session with one sort and returns the
+    encoded sequences of the sessions with more than one event
+
+    The features of a sequence are the encoded learning units with their
+    answers of all but the last event, the skills and labels are the
+    learning units and answers of all but the first event. The sequences
+    are concatenated, `row_lengths` holds the length of every sequence.
+    """
+    if len(columns["lu_ids"]) == 0:
+      raise Exception("No user events found to create the dataset")
+    # learning units are listed in the order of their first event
+    time_order = np.argsort(columns["times"], kind="stable")
+    unique_lu_ids, first_indices = np.unique(
+      columns["lu_ids"][time_order], return_index=True)
+    all_lu_ids = unique_lu_ids[np.argsort(first_indices)].tolist()
+    # same encoding as a LabelEncoder fit on the learning units
+    encoded_lu = np.searchsorted(unique_lu_ids, columns["lu_ids"])
+    _, user_codes = np.unique(columns["user_ids"], return_inverse=True)
+    _, session_codes = np.unique(columns["session_refs"], return_inverse=True)
+
+    order = np.lexsort((columns["times"], session_codes, user_codes))
+    user_codes, session_codes = user_codes[order], session_codes[order]
+    encoded_lu = encoded_lu[order]
+    correct = columns["correct"][order]
+    lu_skill_with_answer = encoded_lu * 2 + correct.astype(np.int64)
+
+    nb_events = len(order)
+    starts = np.flatnonzero(np.r_[
+      True, (user_codes[1:] != user_codes[:-1]) |
+      (session_codes[1:] != session_codes[:-1])])
+    lengths = np.diff(np.r_[starts, nb_events])
+    group_ids = np.repeat(np.arange(len(starts)), lengths)
+    positions = np.arange(nb_events) - starts[group_ids]
+    keep = lengths[group_ids] > 1
+    if not keep.any():
+      raise Exception("No sessions with more than one user event found")
+    is_first = positions == 0
+    is_last = positions == lengths[group_ids] - 1
+
+    return {
+      "features": lu_skill_with_answer[keep & ~is_last].astype(np.int32),
+      "skills": encoded_lu[keep & ~is_first].astype(np.int32),
+      "labels": correct[keep & ~is_first],
+      "row_lengths": (lengths[lengths > 1] - 1).astype(np.int64),
+      "features_depth": int(lu_skill_with_answer[keep].max() + 1),
+      "skill_depth": int(encoded_lu[keep].max() + 1),
+      "all_lu_ids": all_lu_ids
+    }
+
+  @staticmethod
+  def save_shards(path, sequences, shard_size=DKT_DATASET_SHARD_SIZE):
+    """saves encoded sequences as npz shards of `shard_size` sequences"""
+    if os.path.exists(path):
+      shutil.rmtree(path)
+    os.makedirs(path)
+    row_lengths = sequences["row_lengths"]
+    offsets = np.r_[0, np.cumsum(row_lengths)]
+    shards = []
+    for shard, start in enumerate(range(0, len(row_lengths), shard_size)):
+      end = min(start + shard_size, len(row_lengths))
+      shard_name = "shard-%05d.npz" % shard
+      np.savez_compressed(
+        os.path.join(path, shard_name),
+        features=sequences["features"][offsets[start]:offsets[end]],
+        skills=sequences["skills"][offsets[start]:offsets[end]],
+        labels=sequences["labels"][offsets[start]:offsets[end]],
+        row_lengths=row_lengths[start:end])
+      shards.append(shard_name)
+    meta = {
+      "shards": shards,
+      "created_time": time.time(),
+      "features_depth": sequences["features_depth"],
+      "skill_depth": sequences["skill_depth"],
+      "all_lu_ids": sequences["all_lu_ids"]
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as fp:
+      json.dump(meta, fp)
+
+  @staticmethod
+  def load_shards(path):
+    """loads the encoded sequences saved by save_shards"""
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as fp:
+      sequences = json.load(fp)
+    arrays = {"features": [], "skills": [], "labels": [], "row_lengths": []}
+    for shard_name in sequences["shards"]:
+      with np.load(os.path.join(path, shard_name)) as shard:
+        for key, values in arrays.items():
+          values.append(shard[key])
+    for key, values in arrays.items():
+      sequences[key] = np.concatenate(values)
+    return sequences
+
+  @staticmethod
+  def is_cache_valid(path):
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+      return False
+    with open(meta_path, "r", encoding="utf-8") as fp:
+      created_time = json.load(fp)["created_time"]
+    return time.time() - created_time < DKT_DATASET_CACHE_TTL
+
+  @staticmethod
+  def import_dataset(course_id=None, refresh=False):
+    """returns the encoded sequences of a course, from the shards cached
+    locally or in GCS when they are recent enough, otherwise streamed from
+    firestore and cached as shards"""
+    cache_key = course_id or "all_courses"
+    path = os.path.join(DKT_DATASET_CACHE_DIR, cache_key)
+    gcs_path = "ml-models/dkt-datasets/" + cache_key
+    if not refresh:
+      if not Dataset.is_cache_valid(path):
+        try:
+          download_blob("gs://" + GCS_BUCKET + "/" + gcs_path, path)
+        except Exception as e: #pylint: disable=broad-except
+          Logger.info("No cached dataset downloaded: %s" % str(e))
+      if Dataset.is_cache_valid(path):
+        Logger.info("Loading the dataset from the shards in %s" % path)
+        return Dataset.load_shards(path)
 
     if course_id:
-      events =  list(UserEvent.collection.filter(
-        "course_id","==",course_id).fetch())
+      collection_manager = UserEvent.collection.filter(
+        "course_id","==",course_id)
     else:
-      events = list(UserEvent.collection.fetch())
-    events_list = []
-    for i in events:
-      #TODO logic to be removed
-      #temporary logic for transition parent_node to user_id
-      event_dict = i.get_fields()
-      if i.parent_node:
-        event_dict["user_id"] = i.parent_node
-      events_list.append(event_dict)
-
-    events_df = pd.DataFrame(events_list)
-    events_df = events_df[events_df.apply(
-      filter_events_with_empty_feedback,axis=1)]
-    events_df["correct"] = events_df["feedback"].apply(
-      lambda x : x["second_attempt"]["evaluation_flag"]
-       if "second_attempt" in x.keys() else
-        x["first_attempt"]["evaluation_flag"])
-    events_df["correct"] = events_df["correct"].apply(
-      lambda x: 1.0 if x=="correct" else 0.0)
-    events_df["user_ids"] = events_df["user_id"]
-    events_df["lu_ids"] = events_df["learning_unit"]
-    events_df = events_df.sort_values(by=["last_modified_time"])
-    #TODO to be replaced with all lus from lu collection
-    all_lu_ids = list(events_df["lu_ids"].unique())
-    events_df = events_df.groupby(["user_ids","session_ref"]).filter(
-      lambda q: len(q) > 1)
-    Dataset.lu_id_encoder.fit(all_lu_ids)
-    events_df["encoded_lu"] = events_df["lu_ids"].apply(
-      lambda x : Dataset.lu_id_encoder.transform([x])[0])
-    events_df["lu_skill_with_answer"] =  events_df.apply(
-      lambda x: x["encoded_lu"]* 2 + x["correct"],axis=1)
-    return events_df,all_lu_ids
+      collection_manager = UserEvent.collection.filter()
+    sequences = Dataset.build_sequences(Dataset.get_event_columns(
+      Dataset.iter_user_event_pages(collection_manager)))
+    Dataset.save_shards(path, sequences)
+    try:
+      upload_folder(GCS_BUCKET, path, gcs_path)
+    except Exception as e: #pylint: disable=broad-except
+      Logger.error("Failed to upload the dataset shards: %s" % str(e))
+    return sequences
 
   @staticmethod
-  def load_dataset(course_id=None, batch_size=None, shuffle=True):
+  def load_dataset(course_id=None, batch_size=None, shuffle=True,
+                   refresh=False):
     """imports dataset, encodes and creates TF dataset"""
     if batch_size is not None:
       Dataset.batch_size = batch_size
-    df,all_lu_ids = Dataset.import_dataset(course_id)
-    seq = df.groupby(["user_ids","session_ref"]).apply(
-      lambda r: (
-          r["lu_skill_with_answer"].values[:-1],
-          r["encoded_lu"].values[1:],
-          r["correct"].values[1:],
-      ))
-
-    nb_users = len(seq)
-    dataset = tf.data.Dataset.from_generator(
-        generator=lambda: seq,
-        output_types=(tf.int32, tf.int32, tf.float32)
-    )
+    sequences = Dataset.import_dataset(course_id, refresh=refresh)
+
+    nb_users = len(sequences["row_lengths"])
+    dataset = tf.data.Dataset.from_tensor_slices(tuple(
+      tf.RaggedTensor.from_row_lengths(
+        tf.constant(sequences[key], dtype=dtype), sequences["row_lengths"])
+      for key, dtype in [("features", tf.int32), ("skills", tf.int32),
+                         ("labels", tf.float32)]))
 
     if shuffle:
       dataset = dataset.shuffle(buffer_size=nb_users)
@@ -80,9 +230,10 @@ class Dataset():
     # Step 6 - Encode categorical features and merge skills with labels to
     #compute target loss.
     # More info: https://github.com/tensorflow/tensorflow/issues/32142
-    Dataset.features_depth = int(df["lu_skill_with_answer"].max()+1)
-    Dataset.skill_depth = int(df["encoded_lu"].max()+1)
-    Dataset.all_lu_ids = all_lu_ids
+    Dataset.features_depth = sequences["features_depth"]
+    Dataset.skill_depth = sequences["skill_depth"]
+    Dataset.all_lu_ids = sequences["all_lu_ids"]
+    Dataset.lu_id_encoder = LabelEncoder().fit(sequences["all_lu_ids"])
     dataset = dataset.map(
       lambda feat, skill, label: (
           tf.one_hot(feat, depth=Dataset.features_depth),
@@ -93,7 +244,7 @@ class Dataset():
               ],
               axis=-1
           )
-      ))
+      ), num_parallel_calls=tf.data.AUTOTUNE)
 
     # Step 7 - Pad sequences per batch
     dataset = dataset.padded_batch(
@@ -158,14 +309,11 @@ class Dataset():
   def process_request_user_events(lu_encoder,user_id, user_events,
   features_depth):
     """returns encoded user events passed through API request"""
-    events_df = pd.DataFrame(user_events)
-
-    events_df["encoded_lu"] = events_df["learning_unit"].apply(
-      lambda x : lu_encoder.transform([x])[0])
-    events_df["lu_skill_with_answer"] =  events_df.apply(
-      lambda x: x["encoded_lu"]* 2 + x["is_correct"],axis=1)
-    casted_input = tf.cast(
-    [events_df["lu_skill_with_answer"]], tf.int32, name=None)
+    encoded_lu = lu_encoder.transform(
+      [event["learning_unit"] for event in user_events])
+    lu_skill_with_answer = encoded_lu * 2 + np.array(
+      [event["is_correct"] for event in user_events], dtype=np.int64)
+    casted_input = tf.cast([lu_skill_with_answer], tf.int32, name=None)
     encoded_input = tf.one_hot(casted_input,depth=features_depth)
     return encoded_input
 
@@ -173,27 +321,13 @@ class Dataset():
   def process_db_user_events(lu_encoder,user_id=None,
   session_id=None,features_depth=None):
     """returns preprocessed, encoded data taken from database for inference"""
-    user_events = UserEvent.collection.filter(user_id=user_id).filter(
-      session_ref=session_id).fetch()
-    events_list = []
-    for i in user_events:
-      events_list.append(i.get_fields())
-    events_df = pd.DataFrame(events_list)
-    events_df = events_df[events_df.apply(
-      filter_events_with_empty_feedback,axis=1)]
-    events_df["correct"] = events_df["feedback"].apply(
-      lambda x : x["second_attempt"]["evaluation_flag"
-      ] if "second_attempt" in x.keys() else x[
-        "first_attempt"]["evaluation_flag"])
-    events_df["correct"] = events_df["correct"].apply(
-      lambda x : 1.0 if x=="correct" else 0.0)
-    events_df["lu_ids"] = events_df["learning_unit"]
-    events_df = events_df.sort_values(by=["last_modified_time"])
-    events_df["encoded_lu"] = events_df["lu_ids"].apply(
-      lambda x : lu_encoder.transform([x])[0])
-    events_df["lu_skill_with_answer"] =  events_df.apply(
-      lambda x: x["encoded_lu"]* 2 + x["correct"],axis=1)
-    casted_input = tf.cast(
-    [events_df["lu_skill_with_answer"]], tf.int32, name=None)
+    columns = Dataset.get_event_columns(Dataset.iter_user_event_pages(
+      UserEvent.collection.filter(user_id=user_id).filter(
+        session_ref=session_id)))
+    order = np.argsort(columns["times"], kind="stable")
+    encoded_lu = lu_encoder.transform(columns["lu_ids"][order])
+    lu_skill_with_answer = encoded_lu * 2 + columns["correct"][order].astype(
+      np.int64)
+    casted_input = tf.cast([lu_skill_with_answer], tf.int32, name=None)
     encoded_input = tf.one_hot(casted_input,depth=features_depth)
     return encoded_input
@@ -4,56 +4,165 @@ from services.metrics import (BinaryAccuracy,AUC,Precision,
 Recall)
 from services.dkt import DKTModel
 from services.train import Trainer
+from services.model_server import CourseModel, ModelServer
 from services.data_models_utils import get_learning_units,get_all_courses
-from config import MODEL_PARAMS_DIR,MODEL_WEIGHTS_PATH
+from config import (MODEL_PARAMS_DIR,MODEL_WEIGHTS_PATH,DKT_MAX_CACHED_MODELS,
+DKT_MAX_CACHED_MODEL_BYTES,DKT_MAX_BATCH_SIZE,DKT_BATCH_WAIT_SECONDS,
+DKT_WARM_WORKERS)
 from sklearn.preprocessing import LabelEncoder
+import hashlib
 import json
 import pickle
 import os
 import ast
+import shutil
+import threading
+import time
+from google.cloud import storage
 from common.utils.logging_handler import Logger
 from common.utils.gcs_adapter import download_blob
 #pylint: disable=unnecessary-comprehension,broad-exception-raised
+
+MODEL_VERSION_FILE = ".gcs_version"
+MODEL_STAGING_DIR = ".staging"
+
+
+def get_remote_model_versions():
+  """returns the version of the model files of every course in GCS, built
+  from their names and generations, with a single listing of the bucket"""
+  bucket_name, _, prefix = MODEL_WEIGHTS_PATH.replace(
+    "gs://", "").partition("/")
+  generations = {}
+  for blob in storage.Client().list_blobs(bucket_name, prefix=prefix+"/"):
+    course_id, _, file_name = blob.name[len(prefix)+1:].partition("/")
+    if file_name:
+      generations.setdefault(course_id, []).append(
+        f"{blob.name}:{blob.generation}")
+  return {
+    course_id: hashlib.sha1(
+      "\n".join(sorted(names)).encode("utf-8")).hexdigest()
+    for course_id, names in generations.items()
+  }
+
+
+def get_local_model_version(course_id):
+  """returns the version of the local model files of a course or None"""
+  version_path = MODEL_PARAMS_DIR+"/"+course_id+"/"+MODEL_VERSION_FILE
+  if not os.path.exists(version_path):
+    return None
+  with open(version_path, "r", encoding="utf-8") as version_file:
+    return version_file.read()
+
+
+def set_model_version(model_dir, version):
+  """records the version of the model files of a local folder"""
+  os.makedirs(model_dir, exist_ok=True)
+  with open(model_dir+"/"+MODEL_VERSION_FILE, "w",
+            encoding="utf-8") as version_file:
+    version_file.write(version)
+
+
+def download_course_model_files(course_id, version):
+  """downloads the model files of a course into a staging folder, which then
+  replaces the local folder so that loads never see a partial download"""
+  model_dir = MODEL_PARAMS_DIR+"/"+course_id
+  staging_dir = MODEL_PARAMS_DIR+"/"+MODEL_STAGING_DIR+"/"+course_id
+  shutil.rmtree(staging_dir, ignore_errors=True)
+  download_blob(MODEL_WEIGHTS_PATH+"/"+course_id, staging_dir)
+  set_model_version(staging_dir, version)
+  old_dir = staging_dir+".old"
+  shutil.rmtree(old_dir, ignore_errors=True)
+  if os.path.exists(model_dir):
+    os.rename(model_dir, old_dir)
+  os.rename(staging_dir, model_dir)
+  shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def sync_model_files():
+  """downloads the model files of all the courses at startup and records
+  their versions, so that refreshes only download the replaced models"""
+  versions = get_remote_model_versions()
+  for course_id, version in versions.items():
+    if get_local_model_version(course_id) != version:
+      shutil.rmtree(MODEL_PARAMS_DIR+"/"+course_id, ignore_errors=True)
+  download_blob(MODEL_WEIGHTS_PATH, MODEL_PARAMS_DIR)
+  for course_id, version in versions.items():
+    set_model_version(MODEL_PARAMS_DIR+"/"+course_id, version)
+
+
+def refresh_models():
+  """downloads the model files replaced in GCS since they were downloaded,
+  such as the files uploaded by a training job, and reloads the cached
+  models of these courses in the background
+
+  Returns:
+    list of the ids of the courses whose files were downloaded
+  """
+  try:
+    versions = get_remote_model_versions()
+  except Exception as e: # pylint: disable=broad-except
+    Logger.error(f"Failed to list the model files in GCS: {e}")
+    return []
+  refreshed = []
+  for course_id, version in versions.items():
+    if get_local_model_version(course_id) == version:
+      continue
+    Logger.info(f"Downloading the model files of course {course_id}")
+    try:
+      download_course_model_files(course_id, version)
+    except Exception as e: # pylint: disable=broad-except
+      Logger.error(
+        f"Failed to download the model files of course {course_id}: {e}")
+      continue
+    refreshed.append(course_id)
+  model_server.reload(refreshed)
+  return refreshed
+
+
+def start_model_refresh(interval):
+  """refreshes the model files every `interval` seconds in a daemon
+  thread, off the request path"""
+  def run():
+    while True:
+      time.sleep(interval)
+      refresh_models()
+  thread = threading.Thread(target=run, name="dkt-model-refresh",
+                            daemon=True)
+  thread.start()
+  return thread
+
+
 class Inference():
   """docstring for Inference class"""
-  course_ids = []
-  lu_encoders = {}
-  nb_skills = {}
-  nb_features = {}
-  models = {}
-  lu_ids = {}
 
   @staticmethod
   def predict(course_id = None,user_id = None,
   user_events = None, session_id = None):
     """returns prediction scores for all lus for a given course"""
     if course_id:
-      if course_id not in Inference.course_ids:
-        Inference.set_params(course_id)
-      if Inference.models[course_id] is not None:
+      def encode_user_events(course_model):
         if session_id and not user_events:
           encoded_user_events = Dataset.process_db_user_events(
-            Inference.lu_encoders[course_id],
+            course_model.lu_encoder,
             user_id=user_id,session_id = session_id,
-            features_depth=Inference.nb_features[course_id])
+            features_depth=course_model.nb_features)
         elif user_events and not session_id:
           encoded_user_events = Dataset.process_request_user_events(
-            Inference.lu_encoders[course_id],
+            course_model.lu_encoder,
             user_id=user_id,user_events = user_events,
-            features_depth=Inference.nb_features[course_id]
+            features_depth=course_model.nb_features
           )
-        lu_scores = Inference.models[course_id].predict(
-          encoded_user_events)[:,-1,:]
-        flatten_scores = (lu_scores.flatten().tolist())
-        response = {}
-        for i in range(len(Inference.lu_ids[course_id])):
-          response[Inference.lu_ids[course_id][i]]=flatten_scores[i]
-        response_sorted = {k: v for k, v in sorted(
-          response.items(), key=lambda item: item[1],reverse=True)}
-        return response_sorted
-
-      else:
-        raise Exception("The course does not have learning units")
+        return encoded_user_events.numpy()[0]
+
+      course_model, lu_scores = model_server.predict(
+        course_id, encode_user_events)
+      flatten_scores = (lu_scores.flatten().tolist())
+      response = {}
+      for i in range(len(course_model.lu_ids)):
+        response[course_model.lu_ids[i]]=flatten_scores[i]
+      response_sorted = {k: v for k, v in sorted(
+        response.items(), key=lambda item: item[1],reverse=True)}
+      return response_sorted
     else:
       raise Exception("Course id is required")
 
@@ -69,53 +178,66 @@ class Inference():
     return dkt_model
 
   @staticmethod
-  def set_params(course_id):
-    """loads model params and model weights"""
-    Inference.course_ids.append(course_id)
+  def load_course_model(course_id):
+    """loads model params and model weights from the local model files,
+    which are kept in sync with GCS by sync_model_files and
+    refresh_models"""
     base_path = MODEL_PARAMS_DIR+"/"+course_id+"/"
-    download_blob(MODEL_WEIGHTS_PATH+"/"+course_id,
-    MODEL_PARAMS_DIR+"/"+course_id)
     if os.path.exists(base_path):
       with open(base_path+"params.json","rb") as params_file:
         model_params = ast.literal_eval(json.loads(params_file.read()))
-      Inference.nb_skills[course_id] = model_params["nb_skills"]
-      Inference.nb_features[course_id] = model_params["nb_features"]
-      Inference.lu_ids[course_id] = model_params["lu_ids"]
       model = Inference.get_model(
-        nb_features = Inference.nb_features[course_id],
-        nb_skills = Inference.nb_skills[course_id])
+        nb_features = model_params["nb_features"],
+        nb_skills = model_params["nb_skills"])
       model.load_weights(base_path+"weights/bestmodel")
-      Inference.models[course_id] = model
       with open(base_path+"lu_encoder.pkl","rb") as lu_encoder_file:
-        Inference.lu_encoders[course_id] = pickle.load(lu_encoder_file)
+        lu_encoder = pickle.load(lu_encoder_file)
+      return CourseModel(model, lu_encoder, model_params["lu_ids"],
+                         model_params["nb_features"],
+                         model_params["nb_skills"])
+    Logger.info(
+      "No model weights found for the given course. Using default weights"
+      )
+    lu_ids = get_learning_units(course_id)
+    if len(lu_ids)>0:
+      lu_encoder = LabelEncoder().fit(lu_ids)
+      model = Inference.get_model(
+      nb_features = 2*len(lu_ids)+1,
+      nb_skills = len(lu_ids))
     else:
-      Logger.info(
-        "No model weights found for the given course. Using default weights"
-        )
-      lu_ids = get_learning_units(course_id)
-      if len(lu_ids)>0:
-        Inference.lu_encoders[course_id] = LabelEncoder().fit(lu_ids)
-        Inference.models[course_id] = Inference.get_model(
-        nb_features = 2*len(lu_ids)+1,
-        nb_skills = len(lu_ids))
-      else:
-        Logger.info("The course does not have learning units")
-        Inference.lu_encoders[course_id] = None
-        Inference.models[course_id] = None
-      Inference.nb_skills[course_id] = len(lu_ids)
-      Inference.nb_features[course_id] = 2*len(lu_ids)+1
-      Inference.lu_ids[course_id] = lu_ids
+      Logger.info("The course does not have learning units")
+      lu_encoder = None
+      model = None
+    return CourseModel(model, lu_encoder, lu_ids, 2*len(lu_ids)+1,
+                       len(lu_ids))
+
+  @staticmethod
+  def set_params(course_id):
+    """reloads the model params and model weights of a course"""
+    model_server.invalidate(course_id)
+    model_server.get(course_id)
 
   @staticmethod
   def load_all_models():
-    """loads models for all possible courses"""
-    courses = get_all_courses()
+    """loads models for all possible courses in the background, up to the
+    size of the model cache"""
+    courses = get_all_courses()[:DKT_MAX_CACHED_MODELS]
     for course in courses:
       Logger.info("Loading model weights ----")
       Logger.info("Course id - %s" % course.id)
       Logger.info("Course Title - %s" % course.title)
-      Inference.set_params(course.id)
-
+    return model_server.warm([course.id for course in courses])
 
+  @staticmethod
+  def get_metrics():
+    """returns the model cache usage and the latency metrics per course"""
+    return model_server.stats()
 
 
+model_server = ModelServer(
+  Inference.load_course_model,
+  max_models=DKT_MAX_CACHED_MODELS,
+  max_bytes=DKT_MAX_CACHED_MODEL_BYTES,
+  max_batch_size=DKT_MAX_BATCH_SIZE,
+  max_wait=DKT_BATCH_WAIT_SECONDS,
+  warm_workers=DKT_WARM_WORKERS)
@@ -0,0 +1,343 @@
+"""Bounded cache of course DKT models with micro-batched predictions"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from common.utils.logging_handler import Logger
+
+MASK_VALUE = -1.
+
+
+def get_model_size(model):
+  """Returns the number of bytes of the weights of a keras model"""
+  if model is None:
+    return 0
+  return int(sum(weight.nbytes for weight in model.get_weights()))
+
+
+class CourseModel():
+  """DKT model of a course along with the parameters needed to encode the
+  user events of its learners"""
+
+  def __init__(self, model, lu_encoder, lu_ids, nb_features, nb_skills):
+    self.model = model
+    self.lu_encoder = lu_encoder
+    self.lu_ids = lu_ids
+    self.nb_features = nb_features
+    self.nb_skills = nb_skills
+    self.size = get_model_size(model)
+    self.batcher = None
+
+
+class LatencyMetrics():
+  """Prediction latency and batching counters of a course"""
+
+  def __init__(self, window=1000):
+    self.lock = threading.Lock()
+    self.latencies = deque(maxlen=window)
+    self.requests = 0
+    self.errors = 0
+    self.batches = 0
+    self.loads = 0
+    self.load_seconds = 0.
+    self.evictions = 0
+
+  def record_request(self, latency, error=False):
+    with self.lock:
+      self.requests += 1
+      self.errors += int(error)
+      self.latencies.append(latency)
+
+  def record_batch(self):
+    with self.lock:
+      self.batches += 1
+
+  def record_load(self, seconds):
+    with self.lock:
+      self.loads += 1
+      self.load_seconds += seconds
+
+  def record_eviction(self):
+    with self.lock:
+      self.evictions += 1
+
+  def summary(self):
+    """Returns the counters with the latency percentiles in milliseconds of
+    the most recent requests"""
+    with self.lock:
+      latencies = np.array(self.latencies) * 1000
+      summary = {
+          "requests": self.requests,
+          "errors": self.errors,
+          "batches": self.batches,
+          "mean_batch_size":
+              self.requests / self.batches if self.batches else 0.,
+          "loads": self.loads,
+          "load_seconds": self.load_seconds,
+          "evictions": self.evictions
+      }
+    for name, value in [("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)]:
+      summary[name] = float(np.percentile(latencies, value)) \
+        if len(latencies) else 0.
+    summary["max_ms"] = float(latencies.max()) if len(latencies) else 0.
+    return summary
+
+
+class PredictionRequest():
+  """Encoded user events of a learner waiting for a batched prediction"""
+
+  def __init__(self, inputs):
+    self.inputs = inputs
+    self.result = None
+    self.error = None
+    self.lead = False
+    self.done = threading.Event()
+
+
+class PredictionBatcher():
+  """Groups the concurrent predictions of a model into single batches
+
+  The first request to arrive while no batch is running leads the next
+  batch: it waits up to `max_wait` seconds, or until `max_batch_size`
+  requests are queued, and runs one prediction for all the queued requests.
+  The sequences of a batch are padded with the mask value of the model and
+  the scores of every learner are read at the last event of its sequence.
+  Requests queued after a batch was taken are led by the first of them.
+  """
+
+  def __init__(self, model, max_batch_size, max_wait, metrics=None):
+    self.model = model
+    self.max_batch_size = max_batch_size
+    self.max_wait = max_wait
+    self.metrics = metrics
+    self.condition = threading.Condition()
+    self.pending = []
+    self.leader_active = False
+
+  def predict(self, inputs):
+    """Returns the scores of every skill after the last event of a sequence
+
+    Args:
+      inputs: array of shape (number of events, number of features)
+    Returns:
+      array of shape (number of skills,)
+    """
+    request = PredictionRequest(inputs)
+    with self.condition:
+      self.pending.append(request)
+      if not self.leader_active:
+        self.leader_active = True
+        request.lead = True
+        request.done.set()
+      elif len(self.pending) >= self.max_batch_size:
+        self.condition.notify_all()
+    while True:
+      request.done.wait()
+      if not request.lead:
+        break
+      request.lead = False
+      request.done.clear()
+      self.run_batch()
+    if request.error is not None:
+      raise request.error
+    return request.result
+
+  def run_batch(self):
+    """Runs the prediction of the queued requests and hands the lead over to
+    the requests queued in the meantime"""
+    with self.condition:
+      self.condition.wait_for(
+          lambda: len(self.pending) >= self.max_batch_size,
+          timeout=self.max_wait)
+      batch = self.pending[:self.max_batch_size]
+      del self.pending[:self.max_batch_size]
+    try:
+      for request, result in zip(
+          batch, self.predict_batch([request.inputs for request in batch])):
+        request.result = result
+    except Exception as e: # pylint: disable=broad-except
+      for request in batch:
+        request.error = e
+    finally:
+      with self.condition:
+        if self.pending:
+          self.pending[0].lead = True
+          self.pending[0].done.set()
+        else:
+          self.leader_active = False
+      for request in batch:
+        request.done.set()
+
+  def predict_batch(self, inputs_list):
+    lengths = [len(inputs) for inputs in inputs_list]
+    batch = np.full(
+        (len(inputs_list), max(lengths), inputs_list[0].shape[-1]),
+        MASK_VALUE, dtype=np.float32)
+    for i, inputs in enumerate(inputs_list):
+      batch[i, :lengths[i]] = inputs
+    scores = np.asarray(self.model.predict_on_batch(batch))
+    if self.metrics is not None:
+      self.metrics.record_batch()
+    return [scores[i, length - 1] for i, length in enumerate(lengths)]
+
+
+class ModelServer():
+  """LRU cache of the course models bounded by the number of models and by
+  the memory taken by their weights
+
+  Models are loaded on first use, or ahead of it with `warm`, by
+  `load_model(course_id)` which returns a CourseModel. A course is loaded
+  once even when concurrent requests miss the cache together. The metrics
+  of at most `max_metrics` courses are kept, those of the least recently
+  used courses without a cached model are dropped first.
+  """
+
+  def __init__(self, load_model, max_models, max_bytes, max_batch_size,
+               max_wait, warm_workers=2, max_metrics=None):
+    self.load_model = load_model
+    self.max_models = max_models
+    self.max_bytes = max_bytes
+    self.max_batch_size = max_batch_size
+    self.max_wait = max_wait
+    self.models = OrderedDict()
+    self.size = 0
+    self.lock = threading.Lock()
+    self.load_locks = {}
+    self.metrics = OrderedDict()
+    self.max_metrics = max_metrics or 4 * max_models
+    self.warm_executor = ThreadPoolExecutor(max_workers=warm_workers)
+
+  def get_metrics(self, course_id):
+    with self.lock:
+      if course_id in self.metrics:
+        self.metrics.move_to_end(course_id)
+        return self.metrics[course_id]
+      metrics = self.metrics[course_id] = LatencyMetrics()
+      if len(self.metrics) > self.max_metrics:
+        for dropped_id in [i for i in self.metrics if i not in self.models][
+            :len(self.metrics) - self.max_metrics]:
+          del self.metrics[dropped_id]
+      return metrics
+
+  def get(self, course_id):
+    """Returns the model of a course, loading it on a cache miss"""
+    with self.lock:
+      if course_id in self.models:
+        self.models.move_to_end(course_id)
+        return self.models[course_id]
+      load_lock = self.load_locks.setdefault(course_id, threading.Lock())
+    with load_lock:
+      with self.lock:
+        if course_id in self.models:
+          self.models.move_to_end(course_id)
+          return self.models[course_id]
+      course_model = self.load(course_id)
+      with self.lock:
+        self.load_locks.pop(course_id, None)
+      return course_model
+
+  def load(self, course_id):
+    """Loads the model of a course and caches it in place of its current
+    model"""
+    metrics = self.get_metrics(course_id)
+    start_time = time.perf_counter()
+    course_model = self.load_model(course_id)
+    metrics.record_load(time.perf_counter() - start_time)
+    if course_model.model is not None:
+      course_model.batcher = PredictionBatcher(
+          course_model.model, self.max_batch_size, self.max_wait, metrics)
+    self.put(course_id, course_model)
+    return course_model
+
+  def put(self, course_id, course_model):
+    """Caches a model and evicts the least recently used models until the
+    cache fits its bounds again"""
+    with self.lock:
+      if course_id in self.models:
+        self.size -= self.models.pop(course_id).size
+      self.models[course_id] = course_model
+      self.size += course_model.size
+      while len(self.models) > 1 and (len(self.models) > self.max_models or
+                                      self.size > self.max_bytes):
+        evicted_id, evicted = self.models.popitem(last=False)
+        self.size -= evicted.size
+        if evicted_id in self.metrics:
+          self.metrics[evicted_id].record_eviction()
+        Logger.info(
+          f"Evicted the DKT model of course {evicted_id} from the cache")
+
+  def invalidate(self, course_id):
+    """Removes the model of a course, so that it is reloaded on next use"""
+    with self.lock:
+      if course_id in self.models:
+        self.size -= self.models.pop(course_id).size
+
+  def reload(self, course_ids):
+    """Loads again in the background the cached models of the courses, the
+    current models keep serving until they are replaced
+
+    Returns:
+      list of futures of the reloaded models
+    """
+    with self.lock:
+      cached_ids = [i for i in course_ids if i in self.models]
+    return [
+        self.warm_executor.submit(self.load, course_id)
+        for course_id in cached_ids
+    ]
+
+  def warm(self, course_ids):
+    """Loads the models of the courses in the background
+
+    Returns:
+      list of futures of the loaded models
+    """
+    return [
+        self.warm_executor.submit(self.get, course_id)
+        for course_id in course_ids
+    ]
+
+  def predict(self, course_id, inputs):
+    """Returns the model of a course and the scores of its learning units
+    after the events of a learner, batched with the concurrent predictions
+    of the course
+
+    Args:
+      course_id: id of the course
+      inputs: function returning the encoded events of the learner, an
+        array of shape (number of events, number of features), from the
+        model of the course
+    """
+    start_time = time.perf_counter()
+    error = True
+    try:
+      course_model = self.get(course_id)
+      if course_model.model is None:
+        raise Exception("The course does not have learning units") # pylint: disable=broad-exception-raised
+      scores = course_model.batcher.predict(inputs(course_model))
+      error = False
+      return course_model, scores
+    finally:
+      self.get_metrics(course_id).record_request(
+          time.perf_counter() - start_time, error=error)
+
+  def stats(self):
+    """Returns the cache usage and the metrics of every course"""
+    with self.lock:
+      cached = list(self.models)
+      cache = {
+          "models": len(self.models),
+          "max_models": self.max_models,
+          "bytes": self.size,
+          "max_bytes": self.max_bytes
+      }
+      metrics = dict(self.metrics)
+    return {
+        "cache": cache,
+        "courses": {
+            course_id: dict(course_metrics.summary(),
+                            cached=course_id in cached)
+            for course_id, course_metrics in metrics.items()
+        }
+    }
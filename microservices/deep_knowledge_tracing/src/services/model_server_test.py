@@ -0,0 +1,202 @@
+"""
+Unit test for model_server.py
+"""
+import threading
+import time
+import numpy as np
+import pytest
+from services.model_server import (CourseModel, ModelServer,
+                                   PredictionBatcher, MASK_VALUE)
+
+
+class FakeModel():
+  """Keras model returning the first features of every event as the skill
+  scores, optionally blocking or failing its predictions"""
+
+  def __init__(self, nb_skills=2, size=0, error=None):
+    self.nb_skills = nb_skills
+    self.size = size
+    self.error = error
+    self.batches = []
+    self.started = threading.Event()
+    self.release = threading.Event()
+    self.release.set()
+
+  def predict_on_batch(self, batch):
+    self.batches.append(batch)
+    self.started.set()
+    self.release.wait()
+    if self.error is not None:
+      raise self.error
+    return batch[:, :, :self.nb_skills]
+
+  def get_weights(self):
+    return [np.zeros(self.size, dtype=np.uint8)]
+
+
+def get_inputs(length, value):
+  return np.full((length, 3), value, dtype=np.float32)
+
+
+def wait_until(predicate, timeout=5):
+  deadline = time.time() + timeout
+  while not predicate():
+    assert time.time() < deadline, "timed out"
+    time.sleep(0.001)
+
+
+def run_in_threads(batcher, inputs_list):
+  results = [None] * len(inputs_list)
+  errors = [None] * len(inputs_list)
+
+  def run(i):
+    try:
+      results[i] = batcher.predict(inputs_list[i])
+    except Exception as e: # pylint: disable=broad-except
+      errors[i] = e
+
+  threads = [threading.Thread(target=run, args=(i,))
+             for i in range(len(inputs_list))]
+  for thread in threads:
+    thread.start()
+  return threads, results, errors
+
+
+def test_predict_batch_pads_and_reads_last_event():
+  model = FakeModel()
+  batcher = PredictionBatcher(model, max_batch_size=4, max_wait=0)
+  events = np.array([[1, 2, 3], [4, 5, 6]], dtype=np.float32)
+  scores = batcher.predict_batch([events, get_inputs(4, 7)])
+
+  batch = model.batches[0]
+  assert batch.shape == (2, 4, 3)
+  assert (batch[0, 2:] == MASK_VALUE).all()
+  assert np.array_equal(scores[0], [4, 5])
+  assert np.array_equal(scores[1], [7, 7])
+
+
+def test_concurrent_predictions_are_batched():
+  model = FakeModel()
+  batcher = PredictionBatcher(model, max_batch_size=4, max_wait=5)
+  threads, results, errors = run_in_threads(
+      batcher, [get_inputs(i + 1, i) for i in range(4)])
+  for thread in threads:
+    thread.join()
+
+  # the full batch runs without waiting for max_wait
+  assert len(model.batches) == 1
+  assert errors == [None] * 4
+  assert [result.tolist() for result in results] == [
+      [i, i] for i in range(4)]
+  assert not batcher.leader_active
+
+
+def test_lead_is_handed_to_requests_queued_during_a_batch():
+  model = FakeModel()
+  model.release.clear()
+  batcher = PredictionBatcher(model, max_batch_size=2, max_wait=0)
+  first_threads, first_results, _ = run_in_threads(
+      batcher, [get_inputs(1, 1)])
+  model.started.wait(5)
+  threads, results, errors = run_in_threads(
+      batcher, [get_inputs(1, 2), get_inputs(2, 3)])
+  wait_until(lambda: len(batcher.pending) == 2)
+  model.release.set()
+  for thread in first_threads + threads:
+    thread.join()
+
+  assert [len(batch) for batch in model.batches] == [1, 2]
+  assert first_results[0].tolist() == [1, 1]
+  assert errors == [None, None]
+  assert [result.tolist() for result in results] == [[2, 2], [3, 3]]
+  assert not batcher.leader_active and not batcher.pending
+
+
+def test_prediction_errors_are_raised_in_every_request():
+  model = FakeModel(error=ValueError("prediction failed"))
+  batcher = PredictionBatcher(model, max_batch_size=2, max_wait=5)
+  threads, _, errors = run_in_threads(
+      batcher, [get_inputs(1, 1), get_inputs(1, 2)])
+  for thread in threads:
+    thread.join()
+  assert all(isinstance(error, ValueError) for error in errors)
+
+  # the failed batch releases the lead
+  model.error = None
+  batcher.max_wait = 0
+  assert batcher.predict(get_inputs(1, 3)).tolist() == [3, 3]
+
+
+def get_server(sizes, **kwargs):
+  loads = []
+
+  def load_model(course_id):
+    loads.append(course_id)
+    return CourseModel(FakeModel(size=sizes[course_id]), None, [], 3, 2)
+
+  kwargs.setdefault("max_models", 2)
+  kwargs.setdefault("max_bytes", 250)
+  return ModelServer(load_model, max_batch_size=4, max_wait=0,
+                     **kwargs), loads
+
+
+def test_model_server_evicts_least_recently_used_models():
+  server, loads = get_server({"a": 100, "b": 100, "c": 100, "d": 200})
+  server.get("a")
+  server.get("b")
+  server.get("a")
+  server.get("c")
+  assert list(server.models) == ["a", "c"]
+  assert server.stats()["courses"]["b"]["evictions"] == 1
+
+  # models are evicted until the cached weights fit max_bytes
+  server.get("d")
+  assert list(server.models) == ["d"]
+  assert server.size == 200
+  assert loads == ["a", "b", "c", "d"]
+
+  server.get("b")
+  assert loads[-1] == "b"
+
+
+def test_model_server_loads_a_course_once():
+  server, loads = get_server({"a": 100})
+  threads = [threading.Thread(target=server.get, args=("a",))
+             for _ in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert loads == ["a"]
+
+
+def test_model_server_bounds_metrics():
+  server, _ = get_server({i: 1 for i in "abcd"}, max_models=1,
+                         max_metrics=2)
+  for course_id in "abcd":
+    server.get(course_id)
+  assert list(server.metrics) == ["c", "d"]
+
+
+def test_model_server_reloads_cached_models():
+  server, loads = get_server({"a": 100, "b": 100})
+  course_model = server.get("a")
+  for future in server.reload(["a", "b"]):
+    future.result()
+  assert loads == ["a", "a"]
+  assert server.models["a"] is not course_model
+  assert "b" not in server.models
+
+
+def test_model_server_predict_records_errors():
+  server, _ = get_server({"a": 100})
+
+  def encode_user_events(course_model):
+    raise ValueError("no user events")
+
+  with pytest.raises(ValueError):
+    server.predict("a", encode_user_events)
+  assert server.predict("a", lambda course_model: get_inputs(2, 1))[
+      1].tolist() == [1, 1]
+  metrics = server.stats()["courses"]["a"]
+  assert metrics["requests"] == 2 and metrics["errors"] == 1
@@ -36,7 +36,8 @@ class Trainer():
   def get_train_params(request_body):
     course_id = request_body.get("course_id","")
     dataset, length, nb_features, nb_skills,lu_encoder = Dataset.load_dataset(
-      course_id=course_id)
+      course_id=course_id,
+      refresh=request_body.get("refresh_dataset",False))
     Trainer.train_set,Trainer.test_set,Trainer.val_set = Dataset.split_dataset(
       dataset, length,
       test_fraction=Trainer.test_fraction,
@@ -34,6 +34,22 @@ IS_DEVELOPMENT = bool(os.getenv("IS_DEVELOPMENT", "").lower() \
 SERVICES = {
 }
 
+# assessment items are cached per learning unit, the item bank version
+# stamped in the cache by update_assessment_items invalidates them
+ITEM_BANK_TTL = int(os.getenv("ITEM_BANK_TTL", "600"))
+ITEM_BANK_VERSION_KEY_PREFIX = "irt_item_bank_version::"
+ITEM_BANK_VERSION_EXPIRY = 7 * 24 * 3600
+
+# learning units trained concurrently by a batch job, one process each
+IRT_TRAINING_PROCESSES = int(os.getenv("IRT_TRAINING_PROCESSES", "3"))
+
+# user abilities are written with a firestore BulkWriter
+ABILITY_WRITER_INITIAL_OPS_PER_SECOND = int(
+    os.getenv("ABILITY_WRITER_INITIAL_OPS_PER_SECOND", "500"))
+ABILITY_WRITER_MAX_OPS_PER_SECOND = int(
+    os.getenv("ABILITY_WRITER_MAX_OPS_PER_SECOND", "2000"))
+ABILITY_WRITER_MAX_ATTEMPTS = int(os.getenv("ABILITY_WRITER_MAX_ATTEMPTS", "5"))
+
 BATCH_JOB_LIMITS = {
       "cpu": "3",
       "memory": "7000Mi"
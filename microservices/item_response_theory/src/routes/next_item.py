@@ -3,8 +3,8 @@
 import traceback
 from typing import Optional
 from fastapi import APIRouter
-from services.next_item import next_item
-from schemas.next_item_schema import ActivityType
+from services.next_item import next_item, next_items
+from schemas.next_item_schema import ActivityType, NextItemsRequestModel
 from schemas.error_schema import (InternalServerErrorResponseModel,
                                   ValidationErrorResponseModel)
 from common.utils.logging_handler import Logger
@@ -39,3 +39,17 @@ def get_next_item(user_id: str,
     Logger.error(traceback.print_exc())
     raise InternalServerError(str(e)) from e
   return data
+
+
+@router.post("/batch")
+def get_next_items(input_data: NextItemsRequestModel):
+  """Return the next items of many learners of a learning unit"""
+  try:
+    item_ids = next_items(
+        input_data.learning_unit_id, input_data.activity_type,
+        [learner.dict() for learner in input_data.learners])
+  except Exception as e:
+    Logger.error(e)
+    Logger.error(traceback.print_exc())
+    raise InternalServerError(str(e)) from e
+  return {"data": {"item_ids": item_ids}}
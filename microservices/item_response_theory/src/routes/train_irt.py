@@ -1,5 +1,6 @@
 """Train IRT Model"""
 
+import time
 import traceback
 from typing import Optional
 from schemas.train_irt_schema import TrainIRTRequest
@@ -7,9 +8,11 @@ from schemas.error_schema import (InternalServerErrorResponseModel,
                                   ValidationErrorResponseModel,
                                   NotFoundErrorResponseModel)
 from services.update_assessment_items import update_assessment_items
-from services.update_user_abilities import update_user_abilites
+from services.update_user_abilities import (update_user_abilites,
+                                           UserAbilityWriter)
 from services.get_all_learning_units import get_all_learning_units
-from services.train import train_type_one, train_type_two
+from services.train import (train_type_one, train_type_two,
+                            train_learning_units)
 from fastapi import APIRouter
 import json
 from common.utils.errors import ResourceNotFoundException
@@ -18,7 +21,8 @@ from common.utils.kf_job_app import (kube_create_job,
                                      kube_get_namespaced_deployment_image_path)
 from common.utils.logging_handler import Logger
 from config import (JOB_NAMESPACE, GCP_PROJECT, CONTAINER_NAME, DEPLOYMENT_NAME,
-                    BATCH_JOB_LIMITS, BATCH_JOB_REQUESTS)
+                    BATCH_JOB_LIMITS, BATCH_JOB_REQUESTS,
+                    IRT_TRAINING_PROCESSES)
 
 router = APIRouter(
     prefix="/train",
@@ -62,12 +66,54 @@ def train_irt_on_level(request_body: TrainIRTRequest):
 
 
 def start_training_in_batch_job(request_body):
+  """Trains the IRT models of all the learning units of a level in a
+  process pool and writes the results of every learning unit as soon as its
+  training completes
+
+  Returns:
+    dict: with the training and writing time of every learning unit
+  """
   all_learning_units = get_all_learning_units(
       level=request_body["level"], doc_id=request_body["id"])
-  for index, lu in enumerate(all_learning_units):
-    print("Count: ", index)
-    train_irt(lu, request_body["update_collections"], "2pl", "2")
-  return {"success": True, "message": "Successfully trained the IRT Model"}
+  update_collections = request_body.get("update_collections")
+  processes = request_body.get("processes") or IRT_TRAINING_PROCESSES
+  Logger.info(f"Training {len(all_learning_units)} learning units with "
+              f"{processes} processes")
+  writer = UserAbilityWriter() if update_collections else None
+  reports = []
+  start_time = time.perf_counter()
+  try:
+    for report in train_learning_units(all_learning_units, "2pl", "2",
+                                       processes):
+      result = report.pop("result")
+      report["users"] = len(result["user_ability"]) if result else 0
+      report["items"] = len(result["item_difficulty"]) if result else 0
+      report["write_seconds"] = 0.
+      if update_collections and result:
+        write_start_time = time.perf_counter()
+        update_user_abilites(result["user_ability"], report["learning_unit"],
+                             writer)
+        update_assessment_items(result["item_difficulty"],
+                                result["item_discrimination"],
+                                result["item_type_dict"], "2pl")
+        report["write_seconds"] = round(
+            time.perf_counter() - write_start_time, 3)
+      Logger.info(f"Count: {len(reports)} {report}")
+      reports.append(report)
+  finally:
+    if writer is not None:
+      writer.close()
+  failed = [report["learning_unit"] for report in reports if report["error"]]
+  if failed:
+    raise Exception(f"IRT training failed for the learning units {failed}") # pylint: disable=broad-exception-raised
+  return {
+      "success": True,
+      "message": "Successfully trained the IRT Model",
+      "data": {
+          "total_seconds": round(time.perf_counter() - start_time, 3),
+          "learning_units": reports
+      }
+  }
 
 
 @router.post("/", responses={404: {"model": NotFoundErrorResponseModel}})
@@ -20,7 +20,8 @@ def main(argv):
     del argv  # Unused.
     job = BatchJobModel.find_by_uuid(FLAGS.container_name)
     request_body = json.loads(job.input_data)
-    start_training_in_batch_job(request_body)
+    result = start_training_in_batch_job(request_body)
+    job.result_data = result["data"]
     job.status = "succeeded"
     job.update()
     if JOB_NAMESPACE == "default":
@@ -1,6 +1,8 @@
 """Schema for next assessment item"""
 
 from enum import Enum
+from typing import List, Optional
+from pydantic import BaseModel
 
 # pylint: disable=invalid-name
 class ActivityType(str, Enum):
@@ -8,3 +10,28 @@ class ActivityType(str, Enum):
   answer_a_question= "answer_a_question"
   paraphrase_practice= "paraphrasing_practice"
   create_knowledge_notes= "create_knowledge_notes"
+
+
+class LearnerModel(BaseModel):
+  user_id: str
+  session_id: str
+  prev_context_count: Optional[int] = -1
+
+
+class NextItemsRequestModel(BaseModel):
+  learning_unit_id: str
+  activity_type: ActivityType
+  learners: List[LearnerModel]
+
+  class Config:
+    schema_extra = {
+        "example": {
+            "learning_unit_id": "sample_learning_unit_id",
+            "activity_type": "choose_the_fact",
+            "learners": [{
+                "user_id": "sample_user_id",
+                "session_id": "sample_session_id",
+                "prev_context_count": 1
+            }]
+        }
+    }
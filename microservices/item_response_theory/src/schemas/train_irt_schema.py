@@ -8,5 +8,7 @@ class TrainIRTRequest(BaseModel):
   level: str
   update_collections: Optional[bool] = False
   id : str
+  # number of learning units trained concurrently by the batch job
+  processes: Optional[int] = None
 
 
@@ -0,0 +1,196 @@
+"""Cache of the assessment items of a learning unit with their IRT
+parameters held as numpy arrays"""
+import threading
+import time
+import numpy as np
+from scipy.special import expit
+from common.utils.cache_service import get_key, set_key
+from common.utils.logging_handler import Logger
+from common_ml.item_selection import get_all_assessment_items, get_context
+from config import (ITEM_BANK_TTL, ITEM_BANK_VERSION_KEY_PREFIX,
+                    ITEM_BANK_VERSION_EXPIRY)
+
+EASY, MEDIUM, DIFFICULT = 0, 1, 2
+# position of every category in the order the categories are tried, indexed
+# by the category of the previous item and the correctness of its answer
+CATEGORY_POSITIONS = np.array([
+    # previous item easy: wrong -> easy, medium, difficult
+    # correct -> medium, difficult, easy
+    [[0, 1, 2], [2, 0, 1]],
+    # previous item medium: wrong -> easy, medium, difficult
+    # correct -> difficult, medium, easy
+    [[0, 1, 2], [2, 1, 0]],
+    # previous item difficult: wrong -> medium, easy, difficult
+    # correct -> difficult, medium, easy
+    [[1, 0, 2], [2, 1, 0]],
+])
+
+_item_banks = {}
+_item_banks_lock = threading.Lock()
+
+
+def irt_evaluation(difficulty, discrimination, thetas):
+  """ Evaluation of unidimensional IRT model.
+  Evaluates an IRT model and returns the exact values.  This function
+  supports only unidimemsional models
+  Assumes the model
+      P(theta) = 1.0 / (1 + exp(discrimination * (theta - difficulty)))
+  Args:
+      difficulty: (1d array) item difficulty parameters
+      discrimination:  (1d array | number) item discrimination parameters
+      thetas: (1d array) person abilities
+  Returns:
+      probabilities: (2d array) evaluation of sigmoid for given inputs
+  """
+  # If discrimination is a scalar, make it an array
+  if np.atleast_1d(discrimination).size == 1:
+    discrimination = np.full_like(difficulty, discrimination,
+                                  dtype="float")
+
+  kernel = thetas - difficulty[:, None]
+  kernel *= discrimination[:, None]
+  return expit(kernel)
+
+
+class ItemBank():
+  """Assessment items of a learning unit and activity type
+
+  The difficulty and discrimination of the items are contiguous arrays
+  indexed like `item_ids`, so the items of many learners are selected with
+  one vectorized evaluation of the IRT model.
+  """
+
+  def __init__(self, items, activity_type, version=None):
+    self.items = items
+    self.activity_type = activity_type
+    self.version = version
+    self.loaded_time = time.monotonic()
+    self.item_ids = [item.id for item in items]
+    self.id_to_idx = {item_id: i for i, item_id in enumerate(self.item_ids)}
+    self.difficulty = np.array(
+        [item.difficulty_score or 0.0 for item in items], dtype=np.float64)
+    self.discrimination = np.array(
+        [item.discrimination or 0.0 for item in items], dtype=np.float64)
+    self._contexts = None
+
+  def __len__(self):
+    return len(self.item_ids)
+
+  @property
+  def contexts(self):
+    """contexts of the items, computed on first use"""
+    if self._contexts is None:
+      self._contexts = np.array([
+          get_context(self.activity_type, item).strip() for item in self.items
+      ], dtype=object)
+    return self._contexts
+
+  def get_probabilities(self, abilities):
+    """returns the (learners, items) probabilities of a correct answer"""
+    return irt_evaluation(self.difficulty, self.discrimination,
+                          np.asarray(abilities, dtype=np.float64)).T
+
+  def get_categories(self, abilities):
+    """returns the (learners, items) categories of the items, the third of
+    the items with the lowest probabilities are easy and the third with the
+    highest are difficult"""
+    nb_items = len(self)
+    order = np.argsort(self.get_probabilities(abilities), axis=1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(nb_items)[None, :], axis=1)
+    if nb_items < 3:
+      return np.where(ranks < 1, EASY, DIFFICULT)
+    limit = nb_items // 3
+    categories = np.full(ranks.shape, MEDIUM)
+    categories[ranks < limit] = EASY
+    categories[ranks >= nb_items - limit] = DIFFICULT
+    return categories
+
+  def select_items(self, abilities, masks, prev_indices, prev_correct,
+                   same_contexts=None, rng=None):
+    """returns the index of the next item of every learner
+
+    Learners with a previous item get the first unused item of the
+    categories ordered by the category of that item and the correctness of
+    its answer, items of the same context as the previous items of the
+    learner come last. Learners without a previous item get an item of a
+    random category. Items are picked at random within a category.
+    Args:
+      abilities: (learners,) abilities
+      masks: (learners, items) True for the items already used
+      prev_indices: (learners,) index of the previous item, -1 if none
+      prev_correct: (learners,) whether the previous item was answered
+        correctly
+      same_contexts: (learners, items) True for the items with the context
+        of a previous item of the learner
+      rng: numpy random generator
+    Returns:
+      (learners,) item indices
+    """
+    rng = rng or np.random.default_rng()
+    nb_learners = len(abilities)
+    prev_indices = np.asarray(prev_indices)
+    categories = self.get_categories(abilities)
+    has_prev = prev_indices >= 0
+
+    prev_categories = categories[np.arange(nb_learners),
+                                 np.maximum(prev_indices, 0)]
+    positions = CATEGORY_POSITIONS[prev_categories,
+                                   np.asarray(prev_correct, dtype=int)]
+    priorities = np.take_along_axis(positions, categories, axis=1)
+
+    non_empty = np.unique(categories[0]) if nb_learners else []
+    random_categories = rng.choice(non_empty, size=nb_learners)
+    priorities = np.where(has_prev[:, None], priorities,
+                          categories != random_categories[:, None])
+
+    priorities = priorities + rng.random(priorities.shape)
+    if same_contexts is not None:
+      priorities += 3 * (same_contexts & has_prev[:, None])
+    priorities[masks] = np.inf
+    return np.argmin(priorities, axis=1)
+
+
+def get_item_bank_version(learning_unit_id):
+  """returns the version of the item bank of a learning unit, stamped in
+  the cache when its item parameters are updated"""
+  try:
+    return get_key(ITEM_BANK_VERSION_KEY_PREFIX + learning_unit_id)
+  except Exception as e: # pylint: disable=broad-except
+    Logger.error(f"Failed to read the item bank version: {e}")
+    return None
+
+
+def get_item_bank(learning_unit_id, activity_type):
+  """returns the cached item bank of a learning unit and activity type,
+  reloaded when its items were updated or its TTL expired"""
+  activity_type = getattr(activity_type, "value", activity_type)
+  key = (learning_unit_id, activity_type)
+  version = get_item_bank_version(learning_unit_id)
+  with _item_banks_lock:
+    item_bank = _item_banks.get(key)
+  if item_bank is not None and item_bank.version == version and \
+      time.monotonic() - item_bank.loaded_time < ITEM_BANK_TTL:
+    return item_bank
+  items = get_all_assessment_items(learning_unit_id, activity_type, None)
+  item_bank = ItemBank(items, activity_type, version)
+  with _item_banks_lock:
+    _item_banks[key] = item_bank
+  return item_bank
+
+
+def invalidate_item_banks(learning_unit_ids):
+  """drops the item banks of the learning units in this process and stamps
+  a new version of them for the other processes"""
+  learning_unit_ids = set(learning_unit_ids)
+  with _item_banks_lock:
+    for key in list(_item_banks):
+      if key[0] in learning_unit_ids:
+        del _item_banks[key]
+  version = time.time()
+  for learning_unit_id in learning_unit_ids:
+    try:
+      set_key(ITEM_BANK_VERSION_KEY_PREFIX + learning_unit_id, version,
+              expiry_time=ITEM_BANK_VERSION_EXPIRY)
+    except Exception as e: # pylint: disable=broad-except
+      Logger.error(f"Failed to update the item bank version: {e}")
@@ -1,6 +1,10 @@
 """Functions to train IRT Models"""
 
 # pylint: disable=protected-access
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Optional
 import pyro
 from py_irt.config import IrtConfig
@@ -8,6 +12,7 @@ from py_irt.training import IrtModelTrainer
 from collections import defaultdict
 from services.prepare_data import IRTData
 from girth_mcmc import GirthMCMC
+from common.utils.logging_handler import Logger
 
 def train_type_one(
     learning_unit: str, model_type: Optional[str] = "2pl"):
@@ -126,4 +131,61 @@ def train_type_two(learning_unit: str, model_type: Optional[str] = "2pl"):
   }
 
 
-  
\ No newline at end of file
+def train_learning_unit(learning_unit: str, model_type: Optional[str] = "2pl",
+                        method: Optional[str] = "2"):
+  """Trains the IRT model of a learning unit, in a worker process of
+  train_learning_units
+
+  Returns:
+    dict: learning unit id, training result with plain dicts so that it can
+      be sent back from the worker process, training time in seconds and
+      the error message if the training failed
+  """
+  start_time = time.perf_counter()
+  report = {"learning_unit": learning_unit, "result": None, "error": None}
+  try:
+    if method == "1":
+      result = train_type_one(learning_unit, model_type)
+    else:
+      result = train_type_two(learning_unit, model_type)
+    # the correctness defaultdicts have lambda factories that can not be
+    # pickled
+    report["result"] = {
+        key: {item_id: dict(item_value) if isinstance(item_value, dict)
+              else item_value for item_id, item_value in value.items()}
+        for key, value in result.items()
+    }
+  except Exception as e: # pylint: disable=broad-except
+    Logger.error(f"IRT training failed for learning unit {learning_unit}: "
+                 f"{e}")
+    Logger.error(traceback.format_exc())
+    report["error"] = str(e)
+  report["train_seconds"] = round(time.perf_counter() - start_time, 3)
+  return report
+
+
+def train_learning_units(learning_units, model_type: Optional[str] = "2pl",
+                         method: Optional[str] = "2", processes: int = 1):
+  """Trains the IRT models of many learning units concurrently
+
+  Every learning unit is trained in a worker process, the workers are
+  spawned rather than forked so that they do not share the firestore client
+  of the parent process.
+  Yields:
+    the report of train_learning_unit of every learning unit, in the order
+    the trainings complete
+  """
+  if processes <= 1 or len(learning_units) <= 1:
+    for learning_unit in learning_units:
+      yield train_learning_unit(learning_unit, model_type, method)
+    return
+  with ProcessPoolExecutor(
+      max_workers=min(processes, len(learning_units)),
+      mp_context=multiprocessing.get_context("spawn")) as executor:
+    futures = [
+        executor.submit(train_learning_unit, learning_unit, model_type,
+                        method)
+        for learning_unit in learning_units
+    ]
+    for future in as_completed(futures):
+      yield future.result()
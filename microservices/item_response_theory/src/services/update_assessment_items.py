@@ -2,6 +2,7 @@
 
 from common.models import ChooseTheFactItem, AnswerAQuestionItem, ParaphrasingPracticeItem, CreateKnowledgeNotesItem
 import fireo
+from services.item_bank import invalidate_item_banks
 
 def update_assessment_items(
     item_difficulty, item_discrimination, item_type_dict, model_type):
@@ -9,6 +10,7 @@ def update_assessment_items(
   print("Updating Assessment parameters")
   batch = fireo.batch()
   count = 0
+  learning_unit_ids = set()
   for assessment_id, _ in item_difficulty.items():
     if count >450:
       batch.commit()
@@ -22,6 +24,7 @@ def update_assessment_items(
         if model_type=="2pl":
           ctf_item.discrimination = float(item_discrimination[assessment_id])
         ctf_item.learning_unit = ctf_item.learning_unit.get()
+        learning_unit_ids.add(ctf_item.learning_unit.id)
         ctf_item.update(batch=batch)
     elif item_type=="answer_a_question":
       aaq_item = AnswerAQuestionItem.find_by_id(assessment_id)
@@ -30,6 +33,7 @@ def update_assessment_items(
         if model_type=="2pl":
           aaq_item.discrimination = float(item_discrimination[assessment_id])
         aaq_item.learning_unit = aaq_item.learning_unit.get()
+        learning_unit_ids.add(aaq_item.learning_unit.id)
         aaq_item.update(batch=batch)
     elif item_type=="paraphrasing_practice":
       paraphrase_item = ParaphrasingPracticeItem.find_by_id(assessment_id)
@@ -39,6 +43,7 @@ def update_assessment_items(
           paraphrase_item.discrimination = float(
             item_discrimination[assessment_id])
         paraphrase_item.learning_unit = paraphrase_item.learning_unit.get()
+        learning_unit_ids.add(paraphrase_item.learning_unit.id)
         paraphrase_item.update(batch=batch)
     elif item_type=="create_knowledge_notes":
       create_knowledge_notes_item = CreateKnowledgeNotesItem.\
@@ -51,7 +56,7 @@ def update_assessment_items(
             item_discrimination[assessment_id])
         create_knowledge_notes_item.learning_unit = \
           create_knowledge_notes_item.learning_unit.get()
+        learning_unit_ids.add(create_knowledge_notes_item.learning_unit.id)
         create_knowledge_notes_item.update(batch=batch)
   batch.commit()
-
-
+  invalidate_item_banks(learning_unit_ids)
@@ -1,33 +1,145 @@
 """Updates User abilities in firestore"""
-import fireo
-
+import datetime
+from fireo.database import db
+from fireo.queries.create_query import CreateQuery
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
 from common.models import UserAbility, LearningUnit, User
+from common.utils.logging_handler import Logger
+from config import (ABILITY_WRITER_INITIAL_OPS_PER_SECOND,
+                    ABILITY_WRITER_MAX_OPS_PER_SECOND,
+                    ABILITY_WRITER_MAX_ATTEMPTS)
+# pylint: disable = broad-exception-raised
+
+
+def get_document_data(ability_item):
+  """returns the firestore document data of a UserAbility, as written by
+  its save method"""
+  # pylint: disable = protected-access
+  return CreateQuery(UserAbility, ability_item,
+                     **ability_item._get_fields())._parse_field()
+
+
+class UserAbilityWriter():
+  """Upserts the abilities of the learners of many learning units with a
+  firestore BulkWriter
+
+  The learners of a learning unit are fetched with batched reads and kept
+  for the next learning units, and the existing abilities of a learning unit
+  are fetched with a single query, so no document is read per learner. The
+  BulkWriter sends the writes in parallel batches and ramps up from
+  `initial_ops_per_second` to `max_ops_per_second`.
+  """
+
+  def __init__(self,
+               initial_ops_per_second=ABILITY_WRITER_INITIAL_OPS_PER_SECOND,
+               max_ops_per_second=ABILITY_WRITER_MAX_OPS_PER_SECOND,
+               max_attempts=ABILITY_WRITER_MAX_ATTEMPTS):
+    self.max_attempts = max_attempts
+    self.writer = db.conn.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=initial_ops_per_second,
+        max_ops_per_second=max_ops_per_second))
+    self.writer.on_write_error(self._on_write_error)
+    self.users = {}
+    self.failures = []
+
+  def _on_write_error(self, failure, _):
+    if failure.attempts < self.max_attempts:
+      return True
+    self.failures.append(failure)
+    return False
+
+  def get_users(self, user_ids):
+    """returns the users with the given ids that exist, fetching the users
+    not fetched for a previous learning unit"""
+    missing_ids = [user_id for user_id in user_ids
+                   if user_id not in self.users]
+    if missing_ids:
+      found = User.find_by_ids(missing_ids)
+      for user_id in missing_ids:
+        self.users[user_id] = found.get(user_id)
+    return {user_id: self.users[user_id] for user_id in user_ids
+            if self.users[user_id] is not None}
+
+  @staticmethod
+  def get_ability_ids(learning_unit):
+    """returns the ids of the UserAbility documents of a learning unit by
+    user id"""
+    learning_unit_ref = db.conn.document(learning_unit.key)
+    snapshots = db.conn.collection(UserAbility.collection_name).where(
+        "learning_unit", "==", learning_unit_ref).select(["user"]).stream()
+    ability_ids = {}
+    for snapshot in snapshots:
+      user_ref = snapshot.get("user")
+      if user_ref is not None:
+        ability_ids[user_ref.id] = snapshot.id
+    return ability_ids
+
+  def write(self, user_ability, learning_unit_id):
+    """queues the abilities of the learners of a learning unit
+
+    Args:
+      user_ability: dict of user id to ability
+      learning_unit_id: id of the learning unit
+    Returns:
+      int: number of abilities written
+    """
+    learning_unit = LearningUnit.find_by_id(learning_unit_id)
+    if not learning_unit:
+      return 0
+    users = self.get_users(list(user_ability))
+    ability_ids = self.get_ability_ids(learning_unit)
+    collection = db.conn.collection(UserAbility.collection_name)
+    timestamp = datetime.datetime.utcnow()
+    for user_id, user in users.items():
+      ability = float(user_ability[user_id])
+      ability_id = ability_ids.get(user_id)
+      if ability_id:
+        self.writer.update(collection.document(ability_id), {
+            "ability": ability,
+            "last_modified_time": timestamp
+        })
+      else:
+        ability_item = UserAbility()
+        ability_item.user = user
+        ability_item.learning_unit = learning_unit
+        ability_item.ability = ability
+        ability_item.created_time = timestamp
+        ability_item.last_modified_time = timestamp
+        self.writer.set(collection.document(),
+                        get_document_data(ability_item))
+    return len(users)
+
+  def flush(self):
+    """waits for the queued writes, raising when some of them failed"""
+    self.writer.flush()
+    if self.failures:
+      failures, self.failures = self.failures, []
+      raise Exception(f"{len(failures)} writes of user abilities failed: "
+                      f"{failures[0].message}")
+
+  def close(self):
+    self.writer.close()
+
+
+def update_user_abilites(user_ability, learning_unit_id, writer=None):
+  """Updates User ability for a particular learning unit
 
-def update_user_abilites(user_ability, learning_unit_id):
-  """Updates User ability for a particular learning unit"""
-  print("Updating User Abilitites")
-  learning_unit = LearningUnit.find_by_id(learning_unit_id)
-  if learning_unit:
-    batch = fireo.batch()
-    count = 0
-    for user_id, ability in user_ability.items():
-      user = User.find_by_id(user_id)
-      if count >450:
-        batch.commit()
-        count = 0
-      count += 1
-      if user:
-        ability_item = UserAbility.collection.filter(
-          user=user.key).filter(learning_unit=learning_unit.key).get()
-        if ability_item:
-          ability_item.ability = float(ability)
-          ability_item.learning_unit = learning_unit
-          ability_item.user = user
-          ability_item.update(batch=batch)
-        else:
-          ability_item = UserAbility()
-          ability_item.user = user
-          ability_item.learning_unit = learning_unit
-          ability_item.ability = float(ability)
-          ability_item.save(batch=batch)
-    batch.commit()
+  Args:
+    user_ability: dict of user id to ability
+    learning_unit_id: id of the learning unit
+    writer: UserAbilityWriter shared by the learning units of a batch job,
+      a writer is created and closed for this learning unit when not given
+  Returns:
+    int: number of abilities written
+  """
+  Logger.info("Updating User Abilitites")
+  own_writer = writer is None
+  if own_writer:
+    writer = UserAbilityWriter()
+  try:
+    count = writer.write(user_ability, learning_unit_id)
+    writer.flush()
+  finally:
+    if own_writer:
+      writer.close()
+  return count
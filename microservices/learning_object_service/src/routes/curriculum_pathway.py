@@ -397,7 +397,7 @@ def get_curriculum_pathway(uuid: str,
         expansion_map.append("prerequisites")
       if achievements:
         expansion_list.append("achievements")
-      curriculum_pathway = ParentChildNodesHandler.load_nodes_data(
+      curriculum_pathway = ParentChildNodesHandler.load_nodes_data_by_level(
         curriculum_pathway,
         "curriculum_pathways",
         learner_profile,
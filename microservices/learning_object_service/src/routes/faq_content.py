@@ -1,5 +1,6 @@
 """ FAQ endpoints """
 import traceback
+from typing import Optional
 from fastapi import APIRouter, Query
 from schemas.error_schema import NotFoundErrorResponseModel
 from schemas.faq_schema import (GetFAQResponseModel, SearchFAQResponseModel,
@@ -10,8 +11,7 @@ from common.utils.errors import (ResourceNotFoundException, ValidationError)
 from common.utils.http_exceptions import (BadRequest, ResourceNotFound)
 from common.utils.logging_handler import Logger
 from common.utils.gcs_adapter import is_valid_path
-from common.utils.sorting_logic import get_sorted_list
-from common.utils.pagination_logic import get_slice
+from common.utils.cursor_pagination import fetch_page, get_total_count
 from config import (CONTENT_SERVING_BUCKET, ERROR_RESPONSES, FAQ_BASE_PATH)
 
 # pylint: disable = line-too-long
@@ -55,10 +55,13 @@ def get_faq_by_uuid(uuid: str):
     }})
 def filter_faq(skip: int = Query(0, ge=0, le=2000),
                limit: int = Query(10, ge=1, le=100),
-               curriculum_pathway_id: str = None):
+               curriculum_pathway_id: str = None,
+               page_token: Optional[str] = None):
   """Function to filter FAQs
   Args:
-    curriculum_pathway_id(str): ID of the CurriculumPathway"""
+    curriculum_pathway_id(str): ID of the CurriculumPathway
+    page_token(str): Token returned as next_page_token by the previous page,
+                     preferred over skip for deep pages"""
   try:
     collection_manager = FAQContent.collection.filter("is_deleted", "==", False)
     if curriculum_pathway_id is not None:
@@ -67,12 +70,19 @@ def filter_faq(skip: int = Query(0, ge=0, le=2000),
       collection_manager = collection_manager.filter("curriculum_pathway_id", "==",
                                                       curriculum_pathway_id)
 
-    sorted_list = get_sorted_list(sort_by="created_time",
-                                  sort_order="descending",
-                                  collection_manager=collection_manager)
-    faq_contents = get_slice(sorted_list,skip,limit)
-    count = 10000
-    response = {"records": faq_contents, "total_count": count}
+    # the total is only counted for the first request, the pages after it
+    # are fetched with the next_page_token
+    count = None if page_token else get_total_count(collection_manager)
+    next_page_token = None
+    if skip and not page_token:
+      faq_contents = collection_manager.order("-created_time").offset(
+          skip).fetch(limit)
+    else:
+      faq_contents, next_page_token = fetch_page(collection_manager, limit,
+                                                 page_token)
+    faq_contents = [i.get_fields(reformat_datetime=True) for i in faq_contents]
+    response = {"records": faq_contents, "total_count": count,
+                "next_page_token": next_page_token}
     return {
         "success": True,
         "message": "Successfully Fetched FAQs",
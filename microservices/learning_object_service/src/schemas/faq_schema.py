@@ -55,7 +55,8 @@ class GetFAQResponseModel(BaseModel):
 
 class TotalCountResponseModel(BaseModel):
   records: Optional[List[FullFAQModel]]
-  total_count: int
+  total_count: Optional[int]
+  next_page_token: Optional[str]
 
 class SearchFAQResponseModel(BaseModel):
   """Search FAQ Response Pydantic Model"""
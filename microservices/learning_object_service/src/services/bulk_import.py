@@ -545,7 +545,7 @@ def srl_redundency_cleaner():
         for ids in val:
           learning_object.child_nodes[key].remove(ids)
           delete_object = collection_references[key].find_by_uuid(ids)
-          collection_references[key].collection.delete(delete_object.key)
+          collection_references[key].delete_by_id(delete_object.id)
 
     learning_object.update()
 
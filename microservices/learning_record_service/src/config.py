@@ -44,8 +44,30 @@ BQ_LRS_DATASET = DATABASE_PREFIX + os.getenv("BQ_LRS_DATASET", "lrs")
 
 BQ_LRS_TABLE = os.getenv("BQ_LRS_TABLE", "statements")
 
+# stream large query results with the BigQuery Storage Read API
+BQ_STORAGE_READ_API_ENABLED = bool(os.getenv(
+    "BQ_STORAGE_READ_API_ENABLED", "true").lower() == "true")
+
 PAYLOAD_FILE_SIZE = 2097152  #2MB
 
+# xAPI statements are buffered and flushed to BigQuery in micro-batches by a
+# background worker unless STATEMENT_ASYNC_INGESTION is set to false
+STATEMENT_ASYNC_INGESTION = bool(os.getenv(
+    "STATEMENT_ASYNC_INGESTION", "true").lower() == "true")
+# flush once this many rows are buffered
+STATEMENT_BATCH_MAX_ROWS = int(os.getenv("STATEMENT_BATCH_MAX_ROWS", "500"))
+# flush once the oldest buffered row is this many seconds old
+STATEMENT_BATCH_MAX_WAIT = float(os.getenv("STATEMENT_BATCH_MAX_WAIT", "1"))
+# requests wait for buffer space up to STATEMENT_ENQUEUE_TIMEOUT seconds
+# once this many rows are pending, then they are rejected with 429
+STATEMENT_BUFFER_MAX_ROWS = int(os.getenv("STATEMENT_BUFFER_MAX_ROWS",
+                                          "10000"))
+STATEMENT_ENQUEUE_TIMEOUT = float(os.getenv("STATEMENT_ENQUEUE_TIMEOUT", "5"))
+STATEMENT_FLUSH_RETRIES = int(os.getenv("STATEMENT_FLUSH_RETRIES", "3"))
+# number of failed batches kept in the ingestion failure report
+STATEMENT_FAILURE_REPORT_SIZE = int(os.getenv("STATEMENT_FAILURE_REPORT_SIZE",
+                                              "100"))
+
 ERROR_RESPONSES = {
     500: {
         "model": InternalServerErrorResponseModel
@@ -21,6 +21,14 @@ from common.utils.auth_service import validate_token
 
 
 app = FastAPI()
+
+
+@app.on_event("shutdown")
+def flush_statement_buffer():
+  """Stores the buffered xAPI statements before the instance stops"""
+  statement.statement_buffer.close()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
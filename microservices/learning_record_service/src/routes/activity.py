@@ -210,7 +210,7 @@ def delete_activity(uuid: str):
   try:
     activity = Activity.find_by_uuid(uuid)
 
-    Activity.collection.delete(activity.key)
+    Activity.delete_by_id(activity.id)
 
     return {"success": True, "message": "Successfully deleted the Activity"}
 
@@ -199,7 +199,7 @@ def delete_activity_state(uuid: str):
   """
   try:
     activity_state = ActivityState.find_by_uuid(uuid)
-    ActivityState.collection.delete(activity_state.key)
+    ActivityState.delete_by_id(activity_state.id)
     return {
         "success": True,
         "message": "Successfully deleted the activity state"
@@ -4,31 +4,57 @@ from datetime import datetime
 import json
 from uuid import uuid4
 from fastapi import APIRouter, Request, Query
-from typing import List
+from typing import List, Optional
 from requests.exceptions import ConnectTimeout
-from common.models import Verb, Agent, Session
-from common.utils.errors import ResourceNotFoundException, ValidationError
+from common.utils.errors import (ResourceNotFoundException, ValidationError,
+                                 ResourceExhaustedError)
 from common.utils.http_exceptions import (InternalServerError, BadRequest,
-                                          ResourceNotFound, ConnectionTimeout)
+                                          ResourceNotFound, ConnectionTimeout,
+                                          ResourceExhausted)
 from common.utils.logging_handler import Logger
-from common.utils.collection_references import collection_references
-from utils.bq_handler import (insert_data_to_bq, fetch_data_using_query_from_bq)
+from utils.bq_handler import (insert_data_to_bq, build_statements_query,
+                              stream_data_using_query_from_bq,
+                              encode_seek_token)
+from services.statement_ingestion import (StatementBuffer,
+                                          validate_statement_references)
 from schemas.statement_schema import (GetAllStatementsResponseModel,
                                       LRSDetailsResponseModel,
                                       GetStatementResponseModel,
                                       InputStatementsModel,
-                                      PostStatementsResponseModel)
+                                      PostStatementsResponseModel,
+                                      StatementIngestionReportResponseModel)
 from schemas.error_schema import (NotFoundErrorResponseModel,
                                   ValidationErrorResponseModel,
                                   ConnectionTimeoutResponseModel)
 # pylint: disable = unused-import
-from config import PROJECT_ID, BQ_LRS_TABLE, BQ_LRS_DATASET, ERROR_RESPONSES
+from config import (PROJECT_ID, BQ_LRS_TABLE, BQ_LRS_DATASET, ERROR_RESPONSES,
+                    STATEMENT_ASYNC_INGESTION, STATEMENT_BATCH_MAX_ROWS,
+                    STATEMENT_BATCH_MAX_WAIT, STATEMENT_BUFFER_MAX_ROWS,
+                    STATEMENT_ENQUEUE_TIMEOUT, STATEMENT_FLUSH_RETRIES,
+                    STATEMENT_FAILURE_REPORT_SIZE)
 
 # pylint: disable = broad-except, line-too-long, bare-except
 
 router = APIRouter(tags=["xAPI Statement"], responses=ERROR_RESPONSES)
 
 
+def insert_statements_to_bq(rows):
+  """Inserts a micro-batch of statement rows to the LRS table, with the
+  statement uuids as insert ids so that retried batches are not duplicated"""
+  insert_data_to_bq(BQ_LRS_TABLE, rows,
+                    row_ids=[row["uuid"] for row in rows])
+
+
+statement_buffer = StatementBuffer(
+    insert_statements_to_bq,
+    max_batch_rows=STATEMENT_BATCH_MAX_ROWS,
+    max_wait=STATEMENT_BATCH_MAX_WAIT,
+    max_buffer_rows=STATEMENT_BUFFER_MAX_ROWS,
+    enqueue_timeout=STATEMENT_ENQUEUE_TIMEOUT,
+    max_retries=STATEMENT_FLUSH_RETRIES,
+    failure_report_size=STATEMENT_FAILURE_REPORT_SIZE)
+
+
 @router.get("/about", response_model=LRSDetailsResponseModel)
 def get_details_about_lrs():
   """
@@ -69,24 +95,13 @@ def get_xapi_statement(uuid: str):
   """
   try:
     # Query of the xAPI statement to be fetched from the LRS
-    query = f"""SELECT * FROM `{PROJECT_ID}.{BQ_LRS_DATASET}.{BQ_LRS_TABLE}` \
-      WHERE uuid = '{uuid}'"""
-    final_output = fetch_data_using_query_from_bq(query)
+    query, query_parameters = build_statements_query(
+        BQ_LRS_TABLE, filters={"uuid": uuid}, limit=1)
+    final_output = list(
+        stream_data_using_query_from_bq(query, query_parameters))
 
     if final_output:
-      final_output = final_output[0]
-
-      final_output["context"] = json.loads(final_output["context"])
-      final_output["result"] = json.loads(final_output["result"])
-      final_output["authority"] = json.loads(final_output["authority"])
-      final_output["verb"]["canonical_data"] = json.loads(
-          final_output["verb"]["canonical_data"])
-      final_output["object"]["canonical_data"] = json.loads(
-          final_output["object"]["canonical_data"])
-      final_output["stored"] = final_output["stored"].strftime(
-          "%Y-%m-%d %H:%M:%S %z")
-      final_output["timestamp"] = final_output["timestamp"].strftime(
-          "%Y-%m-%d %H:%M:%S %z")
+      final_output = format_statement_row(final_output[0])
     else:
       raise ResourceNotFoundException(f"xAPI Statement with '{uuid}' not found")
     return {
@@ -114,6 +129,9 @@ def get_xapi_statement(uuid: str):
 def get_all_xapi_statements(agent_uuid: str = None,
                             verb_name: str = None,
                             object_name: str = None,
+                            stored_from: Optional[datetime] = None,
+                            stored_to: Optional[datetime] = None,
+                            page_token: Optional[str] = None,
                             skip: int = Query(0, ge=0, le=2000),
                             limit: int = Query(10, ge=1, le=100)
 ):
@@ -126,48 +144,42 @@ def get_all_xapi_statements(agent_uuid: str = None,
                   agent or group
     verb (str): String matching the statement's verb identifier
     activity (str): String matching the statement's activity identifier
-    skip (int): No of xAPI statements to be skipped
+    stored_from (datetime): Only statements stored at or after this time
+    stored_to (datetime): Only statements stored before this time
+    page_token (str): next_page_token returned with the previous page
+    skip (int): No of xAPI statements to be skipped, ignored when page_token
+      is passed
     limit (int): Size of xAPI statements array to be returned
 
   Returns:
     GetAllStatementsResponseModel: List of xAPI Statement Objects
   """
   try:
-    where_clause = ""
-    if agent_uuid or verb_name or object_name:
-      where_clause = "WHERE "
-
-    if agent_uuid:
-      where_clause = where_clause + f" actor.uuid = '{agent_uuid}'"
-    if verb_name:
-      where_clause = where_clause + f" {'And' if agent_uuid else ''}\
-         verb.name = '{verb_name}'"
-
-    if object_name:
-      where_clause = where_clause + f"{'And' if agent_uuid or verb_name else ''}\
-         object.name = '{object_name}'"
-
-    query = f"""
-    SELECT * 
-    FROM `{PROJECT_ID}.{BQ_LRS_DATASET}.{BQ_LRS_TABLE}` {where_clause}
-    ORDER BY stored DESC
-    LIMIT {limit} OFFSET {skip}
-    """
-
-    final_output = fetch_data_using_query_from_bq(query)
-    for each_row in final_output:
-      each_row["context"] = json.loads(each_row["context"])
-      each_row["result"] = json.loads(each_row["result"])
-      each_row["authority"] = json.loads(each_row["authority"])
-      each_row["verb"]["canonical_data"] = json.loads(
-          each_row["verb"]["canonical_data"])
-      each_row["object"]["canonical_data"] = json.loads(
-          each_row["object"]["canonical_data"])
-      each_row["stored"] = each_row["stored"].strftime("%Y-%m-%d %H:%M:%S %z")
-      each_row["timestamp"] = each_row["timestamp"].strftime(
-          "%Y-%m-%d %H:%M:%S %z")
+    query, query_parameters = build_statements_query(
+        BQ_LRS_TABLE,
+        filters={
+            "actor.uuid": agent_uuid,
+            "verb.name": verb_name,
+            "object.name": object_name
+        },
+        stored_from=stored_from,
+        stored_to=stored_to,
+        page_token=page_token,
+        # one extra row tells whether there is a next page
+        limit=limit + 1,
+        offset=None if page_token else skip)
+
+    final_output = list(
+        stream_data_using_query_from_bq(query, query_parameters))
+    next_page_token = None
+    if len(final_output) > limit:
+      final_output = final_output[:limit]
+      next_page_token = encode_seek_token(final_output[-1]["stored"],
+                                          final_output[-1]["uuid"])
+    final_output = [format_statement_row(row) for row in final_output]
     count = 10000
-    response = {"records": final_output, "total_count": count}
+    response = {"records": final_output, "total_count": count,
+                "next_page_token": next_page_token}
     return {
         "success": True,
         "message": "Successfully fetched the statements",
@@ -183,6 +195,20 @@ def get_all_xapi_statements(agent_uuid: str = None,
     raise InternalServerError(str(e)) from e
 
 
+def format_statement_row(row):
+  """Decodes the JSON encoded columns of a statement row"""
+  for key in ["context", "result", "authority"]:
+    if isinstance(row.get(key), str):
+      row[key] = json.loads(row[key])
+  for key in ["verb", "object"]:
+    if isinstance(row.get(key, {}).get("canonical_data"), str):
+      row[key]["canonical_data"] = json.loads(row[key]["canonical_data"])
+  for key in ["stored", "timestamp"]:
+    if row.get(key):
+      row[key] = row[key].strftime("%Y-%m-%d %H:%M:%S %z")
+  return row
+
+
 def post_process_statement(statement):
   """Post Process the statement"""
 
@@ -224,23 +250,8 @@ def post_xapi_statements(req: Request,
     rows_to_be_inserted = []
     incoming_statements = [i.dict(exclude_none=True) for i in input_statements]
     output_resp = []
+    validate_statement_references(incoming_statements)
     for each_statement in incoming_statements:
-      # Validation for Agent uuid
-      Agent.find_by_uuid(each_statement["actor"]["uuid"])
-      # Validation for verb
-      verb_name = each_statement["verb"]["name"]
-      if not Verb.find_by_name(verb_name):
-        raise ResourceNotFoundException(
-        f"Verb with given name {verb_name} is not found"
-        )
-      # Validation for activity
-      collection_references[each_statement["object_type"]].find_by_uuid(
-        each_statement["object"]["uuid"]
-      )
-
-      # Validation for session
-      Session.find_by_uuid(each_statement["session_id"])
-
       #process statement json
       each_statement["context"] = json.dumps(each_statement.get("context", {}))
       each_statement["result"] = json.dumps(each_statement.get("result", {}))
@@ -254,8 +265,11 @@ def post_xapi_statements(req: Request,
 
       rows_to_be_inserted.append(each_statement)
 
-    Logger.info("Inserting Data to BigQuery")
-    insert_data_to_bq(BQ_LRS_TABLE, rows_to_be_inserted)
+    if STATEMENT_ASYNC_INGESTION:
+      statement_buffer.add(rows_to_be_inserted)
+    else:
+      Logger.info("Inserting Data to BigQuery")
+      insert_statements_to_bq(rows_to_be_inserted)
 
     return {
         "success": True,
@@ -271,6 +285,32 @@ def post_xapi_statements(req: Request,
     Logger.error(e)
     Logger.error(traceback.print_exc())
     raise ResourceNotFound(str(e)) from e
+  except ResourceExhaustedError as e:
+    Logger.error(e)
+    raise ResourceExhausted(str(e)) from e
+  except Exception as e:
+    Logger.error(e)
+    Logger.error(traceback.print_exc())
+    raise InternalServerError(str(e)) from e
+
+
+@router.get(
+    "/statements/ingestion-report",
+    response_model=StatementIngestionReportResponseModel)
+def get_statement_ingestion_report():
+  """
+  Get the counters of the buffered BigQuery ingestion of this instance and
+  the statement batches that could not be stored
+
+  Returns:
+    StatementIngestionReportResponseModel: Ingestion report
+  """
+  try:
+    return {
+        "success": True,
+        "message": "Successfully fetched the ingestion report",
+        "data": statement_buffer.get_report()
+    }
   except Exception as e:
     Logger.error(e)
     Logger.error(traceback.print_exc())
@@ -19,7 +19,7 @@ from schemas.schema_examples import (
     FULL_XAPI_STATEMENT, AGENT_XAPI_EXAMPLE, VERB_XAPI_EXAMPLE, TEST_USER,
     ACTIVITY_XAPI_EXAMPLE, BASIC_LEARNING_EXPERIENCE_EXAMPLE,
     BASIC_SESSION_EXAMPLE, BASIC_LEARNER_EXAMPLE, BASIC_LEARNER_PROFILE_EXAMPLE)
-from routes.statement import router
+from routes.statement import router, statement_buffer
 import datetime
 
 app = FastAPI()
@@ -88,7 +88,8 @@ def test_get_xapi_statement(mocker):
           100
   }]
   mocker.patch(
-      "routes.statement.fetch_data_using_query_from_bq", return_value=json_dict)
+      "routes.statement.stream_data_using_query_from_bq",
+      return_value=iter(json_dict))
   resp = client_with_emulator.get(url)
   resp_data = resp.json()
   del resp_data["data"]["stored"]
@@ -105,7 +106,7 @@ def test_get_xapi_statement_negative(mocker):
   uuid = "random_id"
   url = f"{api_url}/statement/{uuid}"
   mocker.patch(
-      "routes.statement.fetch_data_using_query_from_bq", return_value=False)
+      "routes.statement.stream_data_using_query_from_bq", return_value=[])
   resp = client_with_emulator.get(url)
   resp_data = resp.json()
   assert resp.status_code == 404, "Status code is not 200"
@@ -159,7 +160,8 @@ def test_get_all_xapi_statement(mocker):
           100
   }]
   mocker.patch(
-      "routes.statement.fetch_data_using_query_from_bq", return_value=json_dict)
+      "routes.statement.stream_data_using_query_from_bq",
+      return_value=iter(json_dict))
   resp = client_with_emulator.get(url, params=query_params)
   resp_data = resp.json()
   del resp_data["data"]["records"][0]["stored"]
@@ -176,7 +178,7 @@ def test_get_all_xapi_statement_negative(mocker):
   url = f"{api_url}/statements"
   query_params = {"skip": -1, "limit": 10}
   mocker.patch(
-      "routes.statement.fetch_data_using_query_from_bq", return_value=[])
+      "routes.statement.stream_data_using_query_from_bq", return_value=[])
   resp = client_with_emulator.get(url, params=query_params)
   resp_data = resp.json()
   assert resp.status_code == 422, "Status not 422"
@@ -238,7 +240,8 @@ def test_post_xapi_statements(mocker, firestore_emulator, clean_firestore):
   input_statement["session_id"] = session_id
   input_statements_list = [input_statement]
   url = f"{api_url}/statements"
-  mocker.patch("routes.statement.insert_data_to_bq", return_value=True)
+  insert_mock = mocker.patch("routes.statement.insert_data_to_bq",
+                             return_value=True)
   resp = client_with_emulator.post(url, json=input_statements_list)
   resp_data = resp.json()
   assert resp.status_code == 200, "Status code is not 200"
@@ -246,6 +249,19 @@ def test_post_xapi_statements(mocker, firestore_emulator, clean_firestore):
   assert resp_data["message"] == "Successfully added the given statement/s"
   assert resp_data["data"][0], "No statement created"
 
+  # statements are stored in BigQuery by the background worker
+  statement_buffer.flush()
+  insert_mock.assert_called_once()
+  assert insert_mock.call_args[0][1][0]["uuid"] == resp_data["data"][0]
+  assert insert_mock.call_args[1]["row_ids"] == resp_data["data"]
+
+  # unknown references are rejected before anything is buffered
+  input_statement["session_id"] = "unknown_session"
+  resp = client_with_emulator.post(url, json=[input_statement])
+  assert resp.status_code == 404, "Status code is not 404"
+  assert resp.json()["message"] == \
+    "Session with session_id unknown_session not found"
+
 
 def test_post_statements_negative():
   input_statement = {**BASIC_XAPI_STATEMENT}
@@ -203,7 +203,7 @@ def delete_verb(uuid: str):
   try:
     verb = Verb.find_by_uuid(uuid)
 
-    Verb.collection.delete(verb.key)
+    Verb.delete_by_id(verb.id)
 
     return {"success": True, "message": "Successfully deleted the verb"}
 
@@ -197,6 +197,7 @@ class GetStatementResponseModel(BaseModel):
 class TotalCountResponseModel(BaseModel):
   records: Optional[List[FullStatementModel]]
   total_count: int
+  next_page_token: Optional[str]
 
 class GetAllStatementsResponseModel(BaseModel):
   """Get all Statements Response Pydantic Model"""
@@ -222,3 +223,51 @@ Hierarchy.update_forward_refs()
 
 ChildNodes.update_forward_refs()
 LearningObjectChildNodes.update_forward_refs()
+
+
+class FailedStatementBatchModel(BaseModel):
+  """Failed BigQuery batch Pydantic Model"""
+  batch_id: str
+  failed_at: str
+  row_count: int
+  statement_uuids: List[str]
+  error: str
+
+
+class StatementIngestionReportModel(BaseModel):
+  """Statement ingestion report Pydantic Model"""
+  pending_rows: int
+  rows_flushed: int
+  rows_failed: int
+  batches_flushed: int
+  failed_batches: List[FailedStatementBatchModel]
+
+
+class StatementIngestionReportResponseModel(BaseModel):
+  """Statement ingestion report Response Pydantic Model"""
+  success: Optional[bool] = True
+  message: Optional[str] = "Successfully fetched the ingestion report"
+  data: StatementIngestionReportModel
+
+  class Config():
+    orm_mode = True
+    schema_extra = {
+        "example": {
+            "success": True,
+            "message": "Successfully fetched the ingestion report",
+            "data": {
+                "pending_rows": 0,
+                "rows_flushed": 1200,
+                "rows_failed": 2,
+                "batches_flushed": 4,
+                "failed_batches": [{
+                    "batch_id": "c0f7e4b2-8d2f-4c45-9a4b-1f0e7d0b6a11",
+                    "failed_at": "2023-03-10 10:20:30 ",
+                    "row_count": 2,
+                    "statement_uuids": ["qiw1vb7t1qwicubo",
+                                        "pb0vpvb1y32r1vp0"],
+                    "error": "Errors while inserting the data - ..."
+                }]
+            }
+        }
+    }
@@ -0,0 +1,251 @@
+"""
+Batched validation and buffered BigQuery ingestion of xAPI statements
+"""
+import collections
+import threading
+import time
+from datetime import datetime
+from uuid import uuid4
+from common.models import Agent, Session, Verb
+from common.utils.collection_references import collection_references
+from common.utils.errors import (ResourceNotFoundException,
+                                 ResourceExhaustedError)
+from common.utils.logging_handler import Logger
+
+# pylint: disable = broad-except
+
+# Maximum number of values in a Firestore "in" filter
+IN_QUERY_LIMIT = 30
+
+
+def find_existing_values(model, field, values):
+  """Returns the subset of values for which a document of the model exists
+
+  Values are looked up with "in" queries that only read the filtered field,
+  one query per IN_QUERY_LIMIT values.
+
+  Args:
+    model: FireO model class
+    field (str): field to look up
+    values (list): values of the field
+  Returns:
+    set: values found in the collection
+  """
+  values = list(dict.fromkeys(values))
+  column_name = model._meta.get_field(field).db_column_name # pylint: disable=protected-access
+  found = set()
+  for start in range(0, len(values), IN_QUERY_LIMIT):
+    collection_manager = model.collection.filter(
+        field, "in", values[start:start + IN_QUERY_LIMIT])
+    if "is_deleted" in model._meta.field_list: # pylint: disable=protected-access
+      collection_manager = collection_manager.filter("is_deleted", "==", False)
+    for snapshot in collection_manager.query().select([column_name]).stream():
+      found.add(snapshot.get(column_name))
+  return found
+
+
+def validate_statement_references(statements):
+  """Validates the agent, verb, object and session of every statement
+
+  Reference ids are deduplicated across the statements and validated with
+  batched reads per collection instead of four lookups per statement.
+
+  Args:
+    statements (list): xAPI statement dicts
+  Raises:
+    ResourceNotFoundException: If any of the referenced documents is missing
+  """
+  agent_uuids = [i["actor"]["uuid"] for i in statements]
+  verb_names = [i["verb"]["name"] for i in statements]
+  session_ids = [i["session_id"] for i in statements]
+  object_uuids = collections.defaultdict(list)
+  for statement in statements:
+    object_uuids[statement["object_type"]].append(statement["object"]["uuid"])
+
+  existing_agents = find_existing_values(Agent, "uuid", agent_uuids)
+  for uuid in agent_uuids:
+    if uuid not in existing_agents:
+      raise ResourceNotFoundException(f"Agent with uuid {uuid} not found")
+
+  existing_verbs = find_existing_values(Verb, "name", verb_names)
+  for verb_name in verb_names:
+    if verb_name not in existing_verbs:
+      raise ResourceNotFoundException(
+          f"Verb with given name {verb_name} is not found")
+
+  for object_type, uuids in object_uuids.items():
+    model = collection_references[object_type]
+    existing_objects = find_existing_values(model, "uuid", uuids)
+    for uuid in uuids:
+      if uuid not in existing_objects:
+        raise ResourceNotFoundException(
+            f"{model.__name__} with uuid {uuid} not found")
+
+  existing_sessions = find_existing_values(Session, "session_id", session_ids)
+  for session_id in session_ids:
+    if session_id not in existing_sessions:
+      raise ResourceNotFoundException(
+          f"Session with session_id {session_id} not found")
+
+
+class StatementBuffer():
+  """Buffers BigQuery rows and flushes them in micro-batches from a
+  background worker thread.
+
+  A batch is flushed once max_batch_rows rows are buffered or the oldest
+  buffered row is max_wait seconds old. Once max_buffer_rows rows are
+  pending, add waits up to enqueue_timeout seconds for the worker to make
+  room and then raises ResourceExhaustedError. A failed batch is retried as
+  a whole, so flush_fn must be idempotent, e.g. by inserting the rows with
+  their statement uuid as insert id. Batches that still fail after
+  max_retries attempts are kept in a bounded failure report.
+  """
+
+  def __init__(self,
+               flush_fn,
+               max_batch_rows=500,
+               max_wait=1.0,
+               max_buffer_rows=10000,
+               enqueue_timeout=5.0,
+               max_retries=3,
+               failure_report_size=100,
+               retry_delay=0.5):
+    self.flush_fn = flush_fn
+    self.max_batch_rows = max_batch_rows
+    self.max_wait = max_wait
+    self.max_buffer_rows = max_buffer_rows
+    self.enqueue_timeout = enqueue_timeout
+    self.max_retries = max_retries
+    self.retry_delay = retry_delay
+    self.failure_reports = collections.deque(maxlen=failure_report_size)
+    self.rows_flushed = 0
+    self.rows_failed = 0
+    self.batches_flushed = 0
+    self._rows = []
+    self._oldest_row_time = None
+    self._in_flight = 0
+    self._closed = False
+    self._worker = None
+    self._condition = threading.Condition()
+
+  def add(self, rows):
+    """Adds rows to the buffer, waiting for room if the buffer is full
+
+    Args:
+      rows (list): BigQuery rows
+    Raises:
+      ResourceExhaustedError: If there is no room after enqueue_timeout
+    """
+    deadline = time.monotonic() + self.enqueue_timeout
+    with self._condition:
+      # a request larger than the whole buffer is accepted once it is empty
+      while self._pending_rows() and \
+          self._pending_rows() + len(rows) > self.max_buffer_rows:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+          raise ResourceExhaustedError(
+              "Too many statements are waiting to be stored, retry later")
+        self._condition.wait(remaining)
+      if not self._rows:
+        self._oldest_row_time = time.monotonic()
+      self._rows.extend(rows)
+      self._ensure_worker()
+      self._condition.notify_all()
+
+  def flush(self):
+    """Synchronously flushes every buffered row and waits for the batches
+    being flushed by the worker"""
+    while True:
+      with self._condition:
+        batch = self._take_batch()
+        if not batch:
+          while self._in_flight:
+            self._condition.wait()
+          return
+      self._flush_batch(batch)
+
+  def close(self):
+    """Stops the worker after it flushed the buffered rows"""
+    with self._condition:
+      self._closed = True
+      self._condition.notify_all()
+      worker = self._worker
+    if worker is not None:
+      worker.join()
+    self.flush()
+
+  def get_report(self):
+    """Returns the ingestion counters and the failed batches"""
+    with self._condition:
+      return {
+          "pending_rows": self._pending_rows(),
+          "rows_flushed": self.rows_flushed,
+          "rows_failed": self.rows_failed,
+          "batches_flushed": self.batches_flushed,
+          "failed_batches": list(self.failure_reports)
+      }
+
+  def _pending_rows(self):
+    return len(self._rows) + self._in_flight
+
+  def _ensure_worker(self):
+    if self._worker is None or not self._worker.is_alive():
+      self._closed = False
+      self._worker = threading.Thread(
+          target=self._run, name="statement-buffer", daemon=True)
+      self._worker.start()
+
+  def _take_batch(self):
+    batch = self._rows[:self.max_batch_rows]
+    self._rows = self._rows[self.max_batch_rows:]
+    self._oldest_row_time = time.monotonic() if self._rows else None
+    self._in_flight += len(batch)
+    return batch
+
+  def _run(self):
+    while True:
+      with self._condition:
+        while not self._closed:
+          if len(self._rows) >= self.max_batch_rows:
+            break
+          if self._rows:
+            age = time.monotonic() - self._oldest_row_time
+            if age >= self.max_wait:
+              break
+            self._condition.wait(self.max_wait - age)
+          else:
+            self._condition.wait()
+        if self._closed:
+          return
+        batch = self._take_batch()
+      self._flush_batch(batch)
+
+  def _flush_batch(self, batch):
+    error = None
+    for attempt in range(self.max_retries):
+      try:
+        self.flush_fn(batch)
+        error = None
+        break
+      except Exception as e:
+        error = e
+        Logger.error(f"Failed to flush {len(batch)} statements, attempt "
+                     f"{attempt + 1} of {self.max_retries}: {e}")
+        if attempt + 1 < self.max_retries:
+          time.sleep(self.retry_delay * 2**attempt)
+
+    with self._condition:
+      self._in_flight -= len(batch)
+      if error is None:
+        self.rows_flushed += len(batch)
+        self.batches_flushed += 1
+      else:
+        self.rows_failed += len(batch)
+        self.failure_reports.append({
+            "batch_id": str(uuid4()),
+            "failed_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S %z"),
+            "row_count": len(batch),
+            "statement_uuids": [row.get("uuid") for row in batch],
+            "error": str(error)
+        })
+      self._condition.notify_all()
@@ -0,0 +1,73 @@
+"""
+  Unit tests for the buffered xAPI statement ingestion
+"""
+# pylint: disable=unused-argument
+import threading
+import time
+import pytest
+from common.utils.errors import ResourceExhaustedError
+from services.statement_ingestion import StatementBuffer
+
+
+def make_rows(count, prefix="row"):
+  return [{"uuid": f"{prefix}_{i}"} for i in range(count)]
+
+
+def test_statement_buffer_flushes_full_batches():
+  batches = []
+  buffer = StatementBuffer(batches.append, max_batch_rows=3, max_wait=60)
+  buffer.add(make_rows(7))
+  # two full batches are flushed by the worker without waiting for max_wait
+  deadline = time.monotonic() + 5
+  while len(batches) < 2 and time.monotonic() < deadline:
+    time.sleep(0.01)
+  assert [len(batch) for batch in batches] == [3, 3]
+
+  buffer.close()
+  assert [len(batch) for batch in batches] == [3, 3, 1]
+  assert buffer.get_report()["rows_flushed"] == 7
+  assert buffer.get_report()["pending_rows"] == 0
+
+
+def test_statement_buffer_flushes_after_max_wait():
+  flushed = threading.Event()
+  buffer = StatementBuffer(lambda rows: flushed.set(), max_batch_rows=100,
+                           max_wait=0.05)
+  buffer.add(make_rows(1))
+  assert flushed.wait(5), "Partial batch was not flushed after max_wait"
+  buffer.close()
+
+
+def test_statement_buffer_backpressure():
+  release = threading.Event()
+  buffer = StatementBuffer(lambda rows: release.wait(5), max_batch_rows=2,
+                           max_wait=0, max_buffer_rows=4,
+                           enqueue_timeout=0.05)
+  buffer.add(make_rows(4))
+  with pytest.raises(ResourceExhaustedError):
+    buffer.add(make_rows(1))
+  release.set()
+  buffer.flush()
+  buffer.add(make_rows(1))
+  buffer.close()
+  assert buffer.get_report()["rows_flushed"] == 5
+
+
+def test_statement_buffer_failure_report():
+  calls = []
+
+  def failing_insert(rows):
+    calls.append(rows)
+    raise ValueError("Errors while inserting the data - For row 0 -> invalid")
+
+  buffer = StatementBuffer(failing_insert, max_batch_rows=10, max_wait=60,
+                           max_retries=2, retry_delay=0)
+  buffer.add(make_rows(2))
+  buffer.close()
+
+  report = buffer.get_report()
+  assert len(calls) == 2
+  assert report["rows_failed"] == 2
+  assert report["rows_flushed"] == 0
+  assert report["failed_batches"][0]["statement_uuids"] == ["row_0", "row_1"]
+  assert "For row 0 -> invalid" in report["failed_batches"][0]["error"]
@@ -1,22 +1,45 @@
 """
 This file has the Bigquery setup related functions
 """
-from config import PROJECT_ID, BQ_LRS_DATASET
+import base64
+import datetime
+import json
+import re
+from config import PROJECT_ID, BQ_LRS_DATASET, BQ_STORAGE_READ_API_ENABLED
 from google.api_core.exceptions import (NotFound as GCP_Resource_NotFound,
                                         BadRequest as GCP_BadRequest)
+from google.cloud import bigquery
 from common.utils.bq_client import bq_client
+from common.utils.errors import ValidationError
+from common.utils.logging_handler import Logger
 
+# Columns of the statements table, selected explicitly instead of SELECT *
+STATEMENT_COLUMNS = [
+    "uuid", "actor", "verb", "object", "object_type", "result", "context",
+    "timestamp", "stored", "authority", "attachments", "result_success",
+    "result_completion", "result_score_raw", "result_score_min",
+    "result_score_max", "session_id"
+]
+# Column names can not be passed as query parameters, so only plain
+# column and struct field paths are accepted
+COLUMN_PATH_PATTERN = re.compile(r"^[a-z_]+(\.[a-z_]+)?$")
 
-def insert_data_to_bq(table_name, rows_to_insert):
+bqstorage_client = None
+
+
+def insert_data_to_bq(table_name, rows_to_insert, row_ids=None):
   """Function to insert data into BQ
   Args:
     table_name(str): Name of the BQ table
-    rows_to_insert(int): Number of rows to insert"""
+    rows_to_insert(int): Number of rows to insert
+    row_ids(list): Insert ids of the rows, BigQuery drops the rows already
+      inserted with the same id so that a retried insert is not duplicated"""
 
   try:
     table_id = f"{PROJECT_ID}.{BQ_LRS_DATASET}.{table_name}"
     client = bq_client()
-    output_res = client.insert_rows_json(table_id, rows_to_insert)
+    output_res = client.insert_rows_json(
+        table_id, rows_to_insert, row_ids=row_ids)
 
     if output_res and isinstance(output_res, list):
       error_msgs = ", ".join("For row " + str(i.get("index")) + " -> " +
@@ -89,3 +112,141 @@ def fetch_data_using_query_from_bq(query_string):
 
   except Exception as e:
     raise e
+
+
+def encode_seek_token(stored, uuid):
+  """Builds the page token of the page after the row with given stored
+  timestamp and uuid"""
+  token = {"stored": stored.isoformat(), "uuid": uuid}
+  return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+def decode_seek_token(page_token):
+  """Reads the (stored, uuid) seek position from a page token"""
+  try:
+    token = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+    return datetime.datetime.fromisoformat(token["stored"]), token["uuid"]
+  except (ValueError, KeyError, TypeError) as e:
+    raise ValidationError("Invalid value passed to \"page_token\"") from e
+
+
+def build_statements_query(table_name,
+                           columns=None,
+                           filters=None,
+                           stored_from=None,
+                           stored_to=None,
+                           page_token=None,
+                           limit=None,
+                           offset=None):
+  """Builds a parameterized query over the statements table
+  Rows are ordered by (stored, uuid) descending. Filters on stored, including
+  the seek position of page_token, let BigQuery prune partitions of a table
+  partitioned on stored.
+  Args:
+    table_name(str): Name of the BQ table
+    columns(list): Columns to be selected, all the statement columns if None
+    filters(dict): Column or struct field path to the value it must equal
+    stored_from(datetime): Only statements stored at or after this time
+    stored_to(datetime): Only statements stored before this time
+    page_token(str): Token returned by encode_seek_token for the last row of
+      the previous page
+    limit(int): Maximum number of rows
+    offset(int): Number of rows to skip, prefer page_token for deep pages
+  Returns:
+    (query(str), query_parameters(list))"""
+  columns = columns or STATEMENT_COLUMNS
+  where_clauses = []
+  query_parameters = []
+  for index, (column, value) in enumerate((filters or {}).items()):
+    if not COLUMN_PATH_PATTERN.match(column):
+      raise ValidationError(f"Invalid column {column}")
+    if value is None:
+      continue
+    where_clauses.append(f"{column} = @filter_{index}")
+    query_parameters.append(
+        bigquery.ScalarQueryParameter(f"filter_{index}", "STRING", value))
+
+  if stored_from:
+    where_clauses.append("stored >= @stored_from")
+    query_parameters.append(
+        bigquery.ScalarQueryParameter("stored_from", "TIMESTAMP", stored_from))
+  if stored_to:
+    where_clauses.append("stored < @stored_to")
+    query_parameters.append(
+        bigquery.ScalarQueryParameter("stored_to", "TIMESTAMP", stored_to))
+  if page_token:
+    last_stored, last_uuid = decode_seek_token(page_token)
+    # the first condition alone allows partition pruning
+    where_clauses.append("stored <= @last_stored AND "
+                         "(stored < @last_stored OR uuid < @last_uuid)")
+    query_parameters.append(
+        bigquery.ScalarQueryParameter("last_stored", "TIMESTAMP", last_stored))
+    query_parameters.append(
+        bigquery.ScalarQueryParameter("last_uuid", "STRING", last_uuid))
+
+  for column in columns:
+    if not COLUMN_PATH_PATTERN.match(column):
+      raise ValidationError(f"Invalid column {column}")
+  query = f"SELECT {', '.join(columns)} " \
+          f"FROM `{PROJECT_ID}.{BQ_LRS_DATASET}.{table_name}`"
+  if where_clauses:
+    query += " WHERE " + " AND ".join(where_clauses)
+  query += " ORDER BY stored DESC, uuid DESC"
+  if limit is not None:
+    query += " LIMIT @limit"
+    query_parameters.append(
+        bigquery.ScalarQueryParameter("limit", "INT64", limit))
+  if offset:
+    query += " OFFSET @offset"
+    query_parameters.append(
+        bigquery.ScalarQueryParameter("offset", "INT64", offset))
+  return query, query_parameters
+
+
+def get_bqstorage_client():
+  """Returns a shared BigQuery Storage Read API client or None if the API is
+  disabled or the client library is not installed"""
+  global bqstorage_client
+  if not BQ_STORAGE_READ_API_ENABLED:
+    return None
+  if bqstorage_client is None:
+    try:
+      # pylint: disable=import-outside-toplevel
+      from google.cloud import bigquery_storage
+      bqstorage_client = bigquery_storage.BigQueryReadClient()
+    except ImportError:
+      Logger.warning("google-cloud-bigquery-storage is not installed, "
+                     "reading query results with the REST API")
+      return None
+  return bqstorage_client
+
+
+def stream_data_using_query_from_bq(query_string, query_parameters=None):
+  """Function to iterate over the rows of a parameterized query
+  Results are streamed with the BigQuery Storage Read API when available
+  Args:
+    query_string(str): Query with @name placeholders
+    query_parameters(list): bigquery.ScalarQueryParameter of the query
+  Yields:
+    dict: one row of the result"""
+  try:
+    client = bq_client()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=query_parameters or [])
+    rows = client.query(query_string, job_config=job_config).result()
+    storage_client = get_bqstorage_client()
+    if storage_client is not None:
+      for record_batch in rows.to_arrow_iterable(
+          bqstorage_client=storage_client):
+        yield from record_batch.to_pylist()
+    else:
+      for row in rows:
+        yield dict(row)
+
+  except (GCP_BadRequest, GCP_Resource_NotFound) as e:
+    if isinstance(e.errors, list):
+      error_msgs = ", ".join(i.get("message") for i in e.errors)
+      message = f"Errors while getting the data: {error_msgs}"
+    else:
+      message = e.errors
+    raise ValueError(message) from e
@@ -0,0 +1,61 @@
+"""
+  Unit tests for the BigQuery statements query builder
+"""
+import datetime
+import pytest
+from google.cloud import bigquery
+from common.utils.errors import ValidationError
+from utils.bq_handler import (build_statements_query, encode_seek_token,
+                              decode_seek_token)
+
+
+def get_parameters(query_parameters):
+  return {i.name: i.value for i in query_parameters}
+
+
+def test_build_statements_query_filters():
+  stored_from = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+  query, query_parameters = build_statements_query(
+      "statements",
+      columns=["uuid", "verb", "stored"],
+      filters={"actor.uuid": "agent_id'; DROP TABLE x; --", "verb.name": None},
+      stored_from=stored_from,
+      limit=11)
+
+  assert query.startswith("SELECT uuid, verb, stored FROM ")
+  assert "actor.uuid = @filter_0" in query
+  assert "verb.name" not in query
+  assert "stored >= @stored_from" in query
+  assert query.endswith("ORDER BY stored DESC, uuid DESC LIMIT @limit")
+  assert "DROP TABLE" not in query
+  assert get_parameters(query_parameters) == {
+      "filter_0": "agent_id'; DROP TABLE x; --",
+      "stored_from": stored_from,
+      "limit": 11
+  }
+  assert all(
+      isinstance(i, bigquery.ScalarQueryParameter) for i in query_parameters)
+
+
+def test_build_statements_query_seek_pagination():
+  stored = datetime.datetime(2023, 3, 2, 10, 0, tzinfo=datetime.timezone.utc)
+  page_token = encode_seek_token(stored, "statement_id")
+  assert decode_seek_token(page_token) == (stored, "statement_id")
+
+  query, query_parameters = build_statements_query(
+      "statements", page_token=page_token, limit=10)
+  assert "stored <= @last_stored AND " \
+         "(stored < @last_stored OR uuid < @last_uuid)" in query
+  assert "OFFSET" not in query
+  parameters = get_parameters(query_parameters)
+  assert parameters["last_stored"] == stored
+  assert parameters["last_uuid"] == "statement_id"
+
+
+def test_build_statements_query_invalid_input():
+  with pytest.raises(ValidationError):
+    decode_seek_token("not a token")
+  with pytest.raises(ValidationError):
+    build_statements_query("statements", columns=["uuid; SELECT 1"])
+  with pytest.raises(ValidationError):
+    build_statements_query("statements", filters={"uuid = uuid OR 1": "1"})
@@ -31,4 +31,6 @@ CREATE TABLE IF NOT EXISTS statements (
         result_score_min FLOAT64,
         result_score_max FLOAT64,
         session_id STRING NOT NULL
-);
\ No newline at end of file
+)
+PARTITION BY DATE(stored)
+CLUSTER BY object_type, session_id;
\ No newline at end of file
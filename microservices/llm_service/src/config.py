@@ -155,3 +155,23 @@ Logger.info(f"LLM types loaded {LLM_TYPES}")
 
 DEFAULT_QUERY_CHAT_MODEL = VERTEX_LLM_TYPE_BISON_CHAT
 DEFAULT_QUERY_EMBEDDING_MODEL = VERTEX_LLM_TYPE_GECKO_EMBEDDING
+
+# also store numpy arrays of the ids and embeddings next to the Matching
+# Engine index data of query engines
+QUERY_INDEX_NPY_ENABLED = get_environ_flag("QUERY_INDEX_NPY_ENABLED", False)
+
+# embedding requests per minute of query engine index builds, below the
+# quota of 300 per minute so that query embeddings, which are not throttled,
+# keep headroom
+INDEX_EMBEDDING_CALLS_PER_MINUTE = int(
+    os.getenv("INDEX_EMBEDDING_CALLS_PER_MINUTE", "240"))
+
+# semantic cache of query responses, keyed on the normalized query embedding,
+# QUERY_SEMANTIC_CACHE_MAX_SIZE entries per query engine and model
+QUERY_SEMANTIC_CACHE_ENABLED = get_environ_flag(
+    "QUERY_SEMANTIC_CACHE_ENABLED", False)
+QUERY_SEMANTIC_CACHE_THRESHOLD = float(
+    os.getenv("QUERY_SEMANTIC_CACHE_THRESHOLD", "0.97"))
+QUERY_SEMANTIC_CACHE_TTL = int(os.getenv("QUERY_SEMANTIC_CACHE_TTL", "3600"))
+QUERY_SEMANTIC_CACHE_MAX_SIZE = int(
+    os.getenv("QUERY_SEMANTIC_CACHE_MAX_SIZE", "1000"))
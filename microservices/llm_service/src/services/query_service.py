@@ -14,13 +14,14 @@
 
 """ Query Engine Service """
 
+import asyncio
 import functools
 import gc
-import json
 import shutil
 import tempfile
 import time
 import os
+from collections import deque
 from typing import List, Optional, Generator, Tuple, Dict
 from concurrent.futures import ThreadPoolExecutor
 import numpy as np
@@ -34,7 +35,10 @@ from common.models import (UserQuery, QueryResult,
 from common.utils.errors import (ResourceNotFoundException,
                                  ValidationError)
 from common.utils.http_exceptions import InternalServerError
-from utils.errors import NoDocumentsIndexedException
+from utils.errors import (NoDocumentsIndexedException,
+                          EmbeddingGenerationException)
+from utils.rate_limiter import TokenBucket, AdaptiveBatchSize
+from utils.semantic_cache import SemanticCache
 from google.cloud import aiplatform, storage
 from google.cloud.exceptions import Conflict
 from vertexai.preview.language_models import TextEmbeddingModel
@@ -45,7 +49,11 @@ from services import llm_generate
 from services import query_prompts
 
 from config import (PROJECT_ID, DEFAULT_QUERY_CHAT_MODEL,
-                    DEFAULT_QUERY_EMBEDDING_MODEL, GOOGLE_LLM, REGION)
+                    DEFAULT_QUERY_EMBEDDING_MODEL, GOOGLE_LLM, REGION,
+                    QUERY_INDEX_NPY_ENABLED, QUERY_SEMANTIC_CACHE_ENABLED,
+                    QUERY_SEMANTIC_CACHE_THRESHOLD, QUERY_SEMANTIC_CACHE_TTL,
+                    QUERY_SEMANTIC_CACHE_MAX_SIZE,
+                    INDEX_EMBEDDING_CALLS_PER_MINUTE)
 
 # number of text chunks to process into an embeddings file
 MAX_NUM_TEXT_CHUNK_PROCESS = 1000
@@ -56,15 +64,40 @@ NUM_MATCH_RESULTS = 5
 # text chunk size for embedding data
 CHUNK_SIZE = 1000
 
-# Create a rate limit of 300 requests per minute.
-API_CALLS_PER_SECOND = 300 / 60
+# Rate limit of the embedding requests of index builds, the embeddings of
+# queries are not throttled and use the rest of the quota.
+API_CALLS_PER_SECOND = INDEX_EMBEDDING_CALLS_PER_MINUTE / 60
 
 # According to the docs, each request can process 5 instances per request
 ITEMS_PER_REQUEST = 5
 
+# number of concurrent embedding requests
+EMBEDDING_WORKERS = 4
+
+# attempts per embedding request, with exponential backoff between them
+EMBEDDING_MAX_RETRIES = 4
+EMBEDDING_RETRY_DELAY = 1
+
 # embedding dimensions generated by TextEmbeddingModel
 DIMENSIONS = 768
 
+# prefix of the Matching Engine index data in the index data bucket
+INDEX_DATA_PREFIX = "index"
+
+# prefix of the numpy copies of the embeddings, outside of the index data
+EMBEDDINGS_DATA_PREFIX = "embeddings"
+
+# shared by all index build threads so concurrent requests respect the quota
+embedding_rate_limiter = TokenBucket(API_CALLS_PER_SECOND,
+                                     capacity=EMBEDDING_WORKERS)
+
+# responses and references of answered queries, None when disabled
+query_response_cache = SemanticCache(
+    threshold=QUERY_SEMANTIC_CACHE_THRESHOLD,
+    ttl=QUERY_SEMANTIC_CACHE_TTL,
+    max_size=QUERY_SEMANTIC_CACHE_MAX_SIZE
+) if QUERY_SEMANTIC_CACHE_ENABLED else None
+
 async def query_generate(
             user_id: str,
             prompt: str,
@@ -90,14 +123,35 @@ async def query_generate(
   Raises:
     ResourceNotFoundException if the named query engine doesn't exist
   """
-  # get doc context for question
-  query_references = await _query_doc_matches(q_engine, prompt)
+  # generate embeddings for prompt, the request and its retries are run in a
+  # thread so that they do not block the event loop
+  query_embeddings = await asyncio.get_running_loop().run_in_executor(
+      None, _encode_texts_to_embeddings, [prompt], None)
+  query_embedding = query_embeddings[0]
+
+  # serve repeated questions from the semantic cache, the index id keeps
+  # answers from a previous build of the engine out
+  cache_namespace = (q_engine.id, q_engine.index_id, llm_type)
+  cached = None
+  if query_response_cache is not None:
+    cached = query_response_cache.get(cache_namespace, query_embedding)
+
+  if cached is not None:
+    Logger.info(f"semantic cache hit for query engine {q_engine.name}")
+    question_response, query_references = cached
+  else:
+    # get doc context for question
+    query_references = await _query_doc_matches(q_engine, query_embedding)
+
+    # generate question prompt for chat model
+    question_prompt = query_prompts.question_prompt(prompt, query_references)
 
-  # generate question prompt for chat model
-  question_prompt = query_prompts.question_prompt(prompt, query_references)
+    # send question prompt to model
+    question_response = await llm_generate.llm_chat(question_prompt, llm_type)
 
-  # send question prompt to model
-  question_response = await llm_generate.llm_chat(question_prompt, llm_type)
+    if query_response_cache is not None:
+      query_response_cache.set(cache_namespace, query_embedding,
+                               (question_response, query_references))
 
   # save query result
   query_ref_ids = []
@@ -127,33 +181,51 @@ async def query_generate(
   return query_result, query_references
 
 
+def invalidate_query_cache(q_engine_id: str):
+  """ drop the cached responses of a query engine after its index changed """
+  if query_response_cache is not None:
+    query_response_cache.invalidate(q_engine_id)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_index_endpoint(
+    endpoint_name: str) -> aiplatform.MatchingEngineIndexEndpoint:
+  """ create the client of an index endpoint once per query engine """
+  return aiplatform.MatchingEngineIndexEndpoint(endpoint_name)
+
+
 async def _query_doc_matches(q_engine: QueryEngine,
-                             query_prompt: str) -> List[dict]:
+                             query_embedding: List[float]) -> List[dict]:
   """
-  For a query prompt, retrieve text chunks with doc references
+  For a query embedding, retrieve text chunks with doc references
   from matching documents.
-  """
-  # generate embeddings for prompt
-  query_embeddings = _encode_texts_to_embeddings([query_prompt])
 
+  Matched chunks and their documents are fetched with one batched read each.
+  """
   # retrieve text matches for query
-  index_endpoint = aiplatform.MatchingEngineIndexEndpoint(q_engine.endpoint)
+  index_endpoint = _get_index_endpoint(q_engine.endpoint)
 
   match_indexes_list = index_endpoint.find_neighbors(
-      queries=query_embeddings,
+      queries=[query_embedding],
       deployed_index_id=q_engine.deployed_index_name,
       num_neighbors=NUM_MATCH_RESULTS
   )
+  match_indexes = [int(match.id) for match in match_indexes_list[0]]
 
   # assemble document chunk matches from match indexes
-  query_references = []
-  match_indexes = match_indexes_list[0]
-  for match in match_indexes:
-    doc_chunk = QueryDocumentChunk.find_by_index(q_engine.id, int(match.id))
-    if doc_chunk is None:
+  doc_chunks = QueryDocumentChunk.find_by_indexes(q_engine.id, match_indexes)
+  for index in match_indexes:
+    if index not in doc_chunks:
       raise ResourceNotFoundException(
-        f"Missing doc chunk match index {match.id} q_engine {q_engine.name}")
-    query_doc = QueryDocument.find_by_id(doc_chunk.query_document_id)
+        f"Missing doc chunk match index {index} q_engine {q_engine.name}")
+
+  query_docs = QueryDocument.find_by_ids(
+      [doc_chunk.query_document_id for doc_chunk in doc_chunks.values()])
+
+  query_references = []
+  for index in match_indexes:
+    doc_chunk = doc_chunks[index]
+    query_doc = query_docs.get(doc_chunk.query_document_id)
     if query_doc is None:
       raise ResourceNotFoundException(
         f"Query doc {doc_chunk.query_document_id} q_engine {q_engine.name}")
@@ -252,6 +324,7 @@ def query_engine_build(doc_url: str, query_engine: str, user_id: str,
       "query_engine_id", "==", q_engine.id
     ).delete()
     QueryEngine.delete_by_id(q_engine.id)
+    invalidate_query_cache(q_engine.id)
     raise InternalServerError(e) from e
 
   Logger.info(f"Completed query engine build for {query_engine}")
@@ -289,7 +362,7 @@ def build_doc_index(doc_url:str, query_engine: str) -> \
       bucket = storage_client.bucket(bucket_name)
       bucket.delete(force=True)
       bucket = storage_client.create_bucket(bucket_name, location=REGION)
-    bucket_uri = f"gs://{bucket.name}"
+    index_data_uri = f"gs://{bucket.name}/{INDEX_DATA_PREFIX}"
 
     # process docs at url and upload embeddings to GCS for indexing
     docs_processed, docs_not_processed = _process_documents(doc_url,
@@ -305,7 +378,8 @@ def build_doc_index(doc_url:str, query_engine: str) -> \
     index_name = query_engine.replace("-", "_") + "_MEindex"
 
     # create ME index and endpoint
-    _create_me_index_and_endpoint(index_name, bucket_uri, q_engine)
+    _create_me_index_and_endpoint(index_name, index_data_uri, q_engine)
+    invalidate_query_cache(q_engine.id)
 
     return docs_processed, docs_not_processed
 
@@ -314,7 +388,7 @@ def build_doc_index(doc_url:str, query_engine: str) -> \
     raise InternalServerError(str(e)) from e
 
 
-def _create_me_index_and_endpoint(index_name: str, bucket_uri: str,
+def _create_me_index_and_endpoint(index_name: str, index_data_uri: str,
                                   q_engine: QueryEngine):
   """ Create matching engine index and endpoint """
   # create ME index
@@ -325,7 +399,7 @@ def _create_me_index_and_endpoint(index_name: str, bucket_uri: str,
 
   tree_ah_index = aiplatform.MatchingEngineIndex.create_tree_ah_index(
       display_name=index_name,
-      contents_delta_uri=bucket_uri,
+      contents_delta_uri=index_data_uri,
       dimensions=DIMENSIONS,
       approximate_neighbors_count=150,
       distance_measure_type="DOT_PRODUCT_DISTANCE",
@@ -416,11 +490,10 @@ def _process_documents(doc_url: str, bucket_name: str,
 
       # copy data files up to bucket
       bucket = storage_client.get_bucket(bucket_name)
-      for root, _, files in os.walk(embeddings_dir):
-        for filename in files:
-          local_path = os.path.join(root, filename)
-          blob = bucket.blob(filename)
-          blob.upload_from_filename(local_path)
+      for local_path in Path(embeddings_dir).rglob("*"):
+        if local_path.is_file():
+          blob = bucket.blob(local_path.relative_to(embeddings_dir).as_posix())
+          blob.upload_from_filename(str(local_path))
 
       Logger.info(f"data uploaded for {doc_name}")
 
@@ -500,57 +573,134 @@ def _read_doc(doc_name:str, doc_filepath: str) -> List[str]:
 
   return doc_text_list
 
+@functools.lru_cache(maxsize=None)
+def _get_embedding_model(model_name: str) -> TextEmbeddingModel:
+  """ load an embedding model once and reuse it for every request """
+  Logger.info(f"loading embedding model {model_name}")
+  return TextEmbeddingModel.from_pretrained(model_name)
+
+
 def _encode_texts_to_embeddings(
-    sentence_list: List[str]) -> List[Optional[List[float]]]:
-  """ encode text using Vertex AI embedding model """
-  model = TextEmbeddingModel.from_pretrained(
+    sentence_list: List[str],
+    rate_limiter: Optional[TokenBucket] = embedding_rate_limiter
+    ) -> List[List[float]]:
+  """ encode text using Vertex AI embedding model, retrying failed requests,
+  every attempt takes a token of rate_limiter unless it is None
+
+  Raises:
+    EmbeddingGenerationException if the request still fails after
+      EMBEDDING_MAX_RETRIES attempts
+  """
+  model = _get_embedding_model(
       GOOGLE_LLM.get(DEFAULT_QUERY_EMBEDDING_MODEL))
+  for attempt in range(EMBEDDING_MAX_RETRIES):
+    if rate_limiter is not None:
+      rate_limiter.acquire()
+    try:
+      embeddings = model.get_embeddings(sentence_list)
+      return [embedding.values for embedding in embeddings]
+    except Exception as e:
+      Logger.error(f"embedding request for {len(sentence_list)} texts "
+                   f"failed, attempt {attempt + 1}: {e}")
+      if attempt + 1 < EMBEDDING_MAX_RETRIES:
+        time.sleep(EMBEDDING_RETRY_DELAY * 2**attempt)
+  raise EmbeddingGenerationException(
+      f"Failed to generate embeddings for {len(sentence_list)} texts")
+
+
+def _encode_batch(batch: List[str],
+                  batch_size: AdaptiveBatchSize) -> List[Optional[List[float]]]:
+  """ encode a batch, splitting it in halves when it keeps failing so a
+  single bad text does not drop the whole batch """
   try:
-    embeddings = model.get_embeddings(sentence_list)
-    return [embedding.values for embedding in embeddings]
-  except Exception:
-    return [None for _ in range(len(sentence_list))]
-
-
-# Generator function to yield batches of text_chunks
-def _generate_batches(text_chunks: List[str], batch_size: int
-    ) -> Generator[List[str], None, None]:
-  """ generate batches of text_chunks """
-  for i in range(0, len(text_chunks), batch_size):
-    yield text_chunks[i : i + batch_size]
+    embeddings = _encode_texts_to_embeddings(batch)
+    batch_size.record_success()
+    return embeddings
+  except EmbeddingGenerationException:
+    batch_size.record_failure()
+    if len(batch) == 1:
+      Logger.error("dropping text chunk that could not be embedded")
+      return [None]
+    middle = len(batch) // 2
+    return _encode_batch(batch[:middle], batch_size) + \
+        _encode_batch(batch[middle:], batch_size)
+
+
+def _iter_embeddings(text_chunks: List[str],
+                     batch_size: Optional[AdaptiveBatchSize] = None
+    ) -> Generator[Tuple[int, List[Optional[List[float]]]], None, None]:
+  """ stream embeddings for text chunks in order
+
+  Batches are requested concurrently by EMBEDDING_WORKERS threads sharing the
+  rate limiter, with at most 2 * EMBEDDING_WORKERS batches in flight. The
+  batch size shrinks after failed requests and grows back after successful
+  ones.
+
+  Yields:
+    (index of the first chunk of the batch, embeddings of the batch)
+  """
+  if batch_size is None:
+    batch_size = AdaptiveBatchSize(ITEMS_PER_REQUEST)
+  pending = deque()
+  chunk_index = 0
+  with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+    while chunk_index < len(text_chunks) or pending:
+      while chunk_index < len(text_chunks) and \
+          len(pending) < 2 * EMBEDDING_WORKERS:
+        batch = text_chunks[chunk_index:chunk_index + batch_size.size]
+        pending.append(
+            (chunk_index, executor.submit(_encode_batch, batch, batch_size)))
+        chunk_index += len(batch)
+      start_index, future = pending.popleft()
+      yield start_index, future.result()
 
 
 def _get_embedding_batched(
-    text_chunks: List[str], api_calls_per_second: int = 10, batch_size: int = 5
-) -> Tuple[List[bool], np.ndarray]:
-  """ get embbedings for a list of text strings """
-
-  embeddings_list: List[List[float]] = []
-
-  # Prepare the batches using a generator
-  batches = _generate_batches(text_chunks, batch_size)
-
-  seconds_per_job = 1 / api_calls_per_second
-
-  with ThreadPoolExecutor() as executor:
-    futures = []
-    for batch in batches:
-      futures.append(
-          executor.submit(functools.partial(_encode_texts_to_embeddings), batch)
-      )
-      time.sleep(seconds_per_job)
-
-    for future in futures:
-      embeddings_list.extend(future.result())
-
-  is_successful = [
-      embedding is not None for sentence, embedding in zip(
-        text_chunks, embeddings_list)
-  ]
-  embeddings_list_successful = np.stack(
-    [embedding for embedding in embeddings_list if embedding is not None]
-  )
-  return is_successful, embeddings_list_successful
+    text_chunks: List[str]) -> Tuple[List[bool], np.ndarray]:
+  """ get embbedings for a list of text strings
+
+  Returns:
+    Tuple of a success flag per text chunk, float32 array of the embeddings
+      of the successful chunks
+  """
+  embeddings = np.zeros((len(text_chunks), DIMENSIONS), dtype=np.float32)
+  is_successful = np.zeros(len(text_chunks), dtype=bool)
+  for start_index, batch_embeddings in _iter_embeddings(text_chunks):
+    for offset, embedding in enumerate(batch_embeddings):
+      if embedding is not None:
+        embeddings[start_index + offset] = embedding
+        is_successful[start_index + offset] = True
+
+  num_failed = len(text_chunks) - int(is_successful.sum())
+  if num_failed:
+    Logger.error(f"failed to embed {num_failed} of {len(text_chunks)} chunks")
+  return is_successful.tolist(), embeddings[is_successful]
+
+
+def _write_index_data(embeddings_dir: Path, file_stem: str, ids: np.ndarray,
+                      embeddings: np.ndarray):
+  """ write index data files for a set of embeddings
+
+  Matching Engine reads JSON lines under INDEX_DATA_PREFIX, which are
+  formatted for all rows at once with 7 significant digits (float32
+  precision). With QUERY_INDEX_NPY_ENABLED the ids and embeddings are also
+  stored as numpy arrays under EMBEDDINGS_DATA_PREFIX, for index backends
+  that load them directly, where Matching Engine does not read them.
+  """
+  if QUERY_INDEX_NPY_ENABLED:
+    npy_dir = embeddings_dir.joinpath(EMBEDDINGS_DATA_PREFIX)
+    npy_dir.mkdir(exist_ok=True)
+    np.save(npy_dir.joinpath(f"{file_stem}_ids.npy"), ids.astype(np.int64))
+    np.save(npy_dir.joinpath(f"{file_stem}_embeddings.npy"),
+            embeddings.astype(np.float32))
+
+  index_dir = embeddings_dir.joinpath(INDEX_DATA_PREFIX)
+  index_dir.mkdir(exist_ok=True)
+  values = np.char.mod("%.7g", embeddings.astype(np.float32))
+  with open(index_dir.joinpath(f"{file_stem}.json"), "w",
+            encoding="utf-8") as f:
+    for idx, row in zip(ids, values):
+      f.write(f'{{"id": "{idx}", "embedding": [{",".join(row)}]}}\n')
 
 
 def _generate_index_data(doc_name: str, text_chunks: List[str],
@@ -560,6 +710,10 @@ def _generate_index_data(doc_name: str, text_chunks: List[str],
   chunk_index = 0
   num_chunks = len(text_chunks)
 
+  # Create temporary folder to write embeddings to
+  embeddings_dir = Path(tempfile.mkdtemp())
+  doc_stem = Path(doc_name).stem
+
   # create a list of chunks to process
   while chunk_index < num_chunks:
     remaining_chunks = num_chunks - chunk_index
@@ -573,39 +727,15 @@ def _generate_index_data(doc_name: str, text_chunks: List[str],
     # generate an np array of chunk IDs starting from index base
     ids = np.arange(index_base, index_base + len(process_chunks))
 
-    # Create temporary folder to write embeddings to
-    embeddings_dir = Path(tempfile.mkdtemp())
-
     # Convert chunks to embeddings in batches, to manage API throttling
-    is_successful, chunk_embeddings = _get_embedding_batched(
-        text_chunks=process_chunks,
-        api_calls_per_second=API_CALLS_PER_SECOND,
-        batch_size=ITEMS_PER_REQUEST,
-    )
+    is_successful, chunk_embeddings = _get_embedding_batched(process_chunks)
 
     Logger.info(f"generated embeddings for chunks" \
         f" {chunk_index} to {end_chunk_index}")
 
-    # create JSON
-    embeddings_formatted = [
-      json.dumps(
-        {
-          "id": str(idx),
-          "embedding": [str(value) for value in embedding],
-        }
-      )
-      + "\n"
-      for idx, embedding in zip(ids[is_successful], chunk_embeddings)
-    ]
-
-    # Create output file
-    doc_stem = Path(doc_name).stem
-    chunk_path = embeddings_dir.joinpath(
-        f"{doc_stem}_{index_base}_index.json")
-
     # write embeddings for chunk to file
-    with open(chunk_path, "w", encoding="utf-8") as f:
-      f.writelines(embeddings_formatted)
+    _write_index_data(embeddings_dir, f"{doc_stem}_{index_base}_index",
+                      ids[is_successful], chunk_embeddings)
 
     Logger.info(f"wrote embeddings file for chunks {chunk_index} " \
         f"to {end_chunk_index}")
@@ -20,3 +20,11 @@ class NoDocumentsIndexedException(Exception):
   def __init__(self, message="No documents found"):
     self.message = message
     super().__init__(self.message)
+
+
+class EmbeddingGenerationException(Exception):
+  """Exception for embeddings that could not be generated"""
+
+  def __init__(self, message="Failed to generate embeddings"):
+    self.message = message
+    super().__init__(self.message)
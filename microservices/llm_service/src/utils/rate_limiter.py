@@ -0,0 +1,82 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Rate limiting and batch sizing helpers for model API calls"""
+
+import threading
+import time
+
+
+class TokenBucket():
+  """Thread safe token bucket
+
+  Tokens are added at `rate` tokens per second up to `capacity`. Callers
+  take a token before each API request and wait when the bucket is empty,
+  so short bursts are allowed while the average request rate stays at
+  `rate`.
+  """
+
+  def __init__(self, rate: float, capacity: float = 1,
+               timer=time.monotonic, sleep=time.sleep):
+    self.rate = rate
+    self.capacity = capacity
+    self.tokens = capacity
+    self._timer = timer
+    self._sleep = sleep
+    self._last_refill = timer()
+    self._lock = threading.Lock()
+
+  def _refill(self):
+    now = self._timer()
+    self.tokens = min(self.capacity,
+                      self.tokens + (now - self._last_refill) * self.rate)
+    self._last_refill = now
+
+  def acquire(self, tokens: float = 1):
+    """Takes tokens from the bucket, waiting until they are available
+
+    Tokens are reserved before waiting, so concurrent callers queue up
+    behind each other instead of competing for the next refill.
+    """
+    with self._lock:
+      self._refill()
+      self.tokens -= tokens
+      wait_time = -self.tokens / self.rate if self.tokens < 0 else 0
+    if wait_time > 0:
+      self._sleep(wait_time)
+
+
+class AdaptiveBatchSize():
+  """Batch size that halves after a failed request and grows back by one
+  after `grow_after` consecutive successful requests"""
+
+  def __init__(self, max_size: int, min_size: int = 1, grow_after: int = 5):
+    self.max_size = max_size
+    self.min_size = min_size
+    self.grow_after = grow_after
+    self.size = max_size
+    self._successes = 0
+    self._lock = threading.Lock()
+
+  def record_success(self):
+    with self._lock:
+      self._successes += 1
+      if self._successes >= self.grow_after and self.size < self.max_size:
+        self.size += 1
+        self._successes = 0
+
+  def record_failure(self):
+    with self._lock:
+      self._successes = 0
+      self.size = max(self.min_size, self.size // 2)
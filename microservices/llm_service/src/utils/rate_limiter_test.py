@@ -0,0 +1,58 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+  Unit tests for the rate limiting helpers
+"""
+from utils.rate_limiter import TokenBucket, AdaptiveBatchSize
+
+
+class FakeClock():
+  def __init__(self):
+    self.now = 0.0
+
+  def timer(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.now += seconds
+
+
+def test_token_bucket_limits_rate():
+  clock = FakeClock()
+  bucket = TokenBucket(rate=5, capacity=2, timer=clock.timer,
+                       sleep=clock.sleep)
+  # the initial burst does not wait
+  bucket.acquire()
+  bucket.acquire()
+  assert clock.now == 0
+  for _ in range(10):
+    bucket.acquire()
+  assert abs(clock.now - 2.0) < 1e-9
+
+
+def test_adaptive_batch_size():
+  batch_size = AdaptiveBatchSize(max_size=5, grow_after=2)
+  batch_size.record_failure()
+  assert batch_size.size == 2
+  batch_size.record_failure()
+  batch_size.record_failure()
+  assert batch_size.size == 1
+  for _ in range(4):
+    batch_size.record_success()
+  assert batch_size.size == 3
+  for _ in range(10):
+    batch_size.record_success()
+  assert batch_size.size == 5
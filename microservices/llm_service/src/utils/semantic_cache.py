@@ -0,0 +1,141 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process local cache of query responses keyed on query embeddings"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+import numpy as np
+
+
+def normalize_embedding(embedding: List[float]) -> np.ndarray:
+  """Returns the embedding as a unit length float32 vector"""
+  vector = np.asarray(embedding, dtype=np.float32)
+  norm = np.linalg.norm(vector)
+  return vector / norm if norm > 0 else vector
+
+
+class _Namespace():
+  """Entries of one namespace in LRU order, with their embeddings and
+  expiry times stacked in arrays that are rebuilt after entries change"""
+
+  def __init__(self):
+    # key -> (expiry time, unit embedding, value)
+    self.entries = OrderedDict()
+    self._keys = None
+    self._vectors = None
+    self._expiries = None
+
+  def changed(self):
+    self._keys = None
+
+  def arrays(self):
+    if self._keys is None:
+      self._keys = list(self.entries)
+      self._vectors = np.stack([self.entries[key][1] for key in self._keys])
+      self._expiries = np.array([self.entries[key][0] for key in self._keys])
+    return self._keys, self._vectors, self._expiries
+
+
+class SemanticCache():
+  """Thread safe LRU cache matching queries by embedding similarity
+
+  Entries are partitioned by a namespace (e.g. query engine, index and
+  model), each namespace keeping at most `max_size` entries. A lookup
+  returns the value of the most similar cached query of the namespace when
+  its cosine similarity with the query is at least `threshold`, so
+  rephrased repeats of a question are served from the cache. The entries of
+  a namespace are scored with a single matrix product. Entries expire `ttl`
+  seconds after they are stored.
+  """
+
+  def __init__(self, threshold: float = 0.97, ttl: float = 3600,
+               max_size: int = 1000, timer=time.monotonic):
+    self.threshold = threshold
+    self.ttl = ttl
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self._timer = timer
+    self._namespaces = {}
+    self._lock = threading.Lock()
+
+  def get(self, namespace: Hashable,
+          embedding: List[float]) -> Optional[Any]:
+    """Returns a copy of the value of the most similar cached query or None
+    if no cached query is similar enough"""
+    query = normalize_embedding(embedding)
+    with self._lock:
+      entries = self._namespaces.get(namespace)
+      best_key = None
+      if entries is not None:
+        keys, vectors, expiries = entries.arrays()
+        scores = vectors @ query
+        expired = expiries <= self._timer()
+        if expired.any():
+          for position in np.flatnonzero(expired):
+            del entries.entries[keys[position]]
+          entries.changed()
+          if not entries.entries:
+            del self._namespaces[namespace]
+          scores[expired] = -np.inf
+        best_position = int(np.argmax(scores))
+        if scores[best_position] >= self.threshold:
+          best_key = keys[best_position]
+      if best_key is None:
+        self.misses += 1
+        return None
+      self.hits += 1
+      entries.entries.move_to_end(best_key)
+      return copy.deepcopy(entries.entries[best_key][2])
+
+  def set(self, namespace: Hashable, embedding: List[float], value: Any):
+    """Stores a copy of value for the query embedding, evicting the least
+    recently used entries of the namespace when it is full"""
+    if self.max_size <= 0:
+      return
+    vector = normalize_embedding(embedding)
+    key = vector.tobytes()
+    with self._lock:
+      entries = self._namespaces.setdefault(namespace, _Namespace())
+      entries.entries.pop(key, None)
+      entries.entries[key] = (self._timer() + self.ttl, vector,
+                              copy.deepcopy(value))
+      while len(entries.entries) > self.max_size:
+        entries.entries.popitem(last=False)
+      entries.changed()
+
+  def invalidate(self, namespace: Hashable):
+    """Removes every entry of a namespace, and of the tuple namespaces
+    starting with it"""
+    with self._lock:
+      for key in list(self._namespaces):
+        if key == namespace or \
+            (isinstance(key, tuple) and key[:1] == (namespace,)):
+          del self._namespaces[key]
+
+  def stats(self) -> dict:
+    """Returns the size and hit/miss counters of the cache"""
+    with self._lock:
+      return {
+          "size": sum(len(entries.entries)
+                      for entries in self._namespaces.values()),
+          "namespaces": len(self._namespaces),
+          "max_size": self.max_size,
+          "hits": self.hits,
+          "misses": self.misses
+      }
@@ -0,0 +1,68 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+  Unit tests for the semantic query cache
+"""
+from utils.semantic_cache import SemanticCache
+
+
+def test_semantic_cache_matches_similar_queries():
+  cache = SemanticCache(threshold=0.95, ttl=60, max_size=10)
+  cache.set("engine_1", [1.0, 0.0, 0.0], ("answer", [{"chunk_id": "1"}]))
+
+  # scaled and slightly rotated embeddings hit the cached query
+  assert cache.get("engine_1", [2.0, 0.0, 0.0]) == \
+      ("answer", [{"chunk_id": "1"}])
+  assert cache.get("engine_1", [1.0, 0.1, 0.0]) is not None
+  # dissimilar queries and other namespaces miss
+  assert cache.get("engine_1", [0.0, 1.0, 0.0]) is None
+  assert cache.get("engine_2", [1.0, 0.0, 0.0]) is None
+  assert cache.stats()["hits"] == 2
+  assert cache.stats()["misses"] == 2
+
+  cache.invalidate("engine_1")
+  assert cache.get("engine_1", [1.0, 0.0, 0.0]) is None
+
+
+def test_semantic_cache_expiry_and_eviction():
+  now = [0.0]
+  cache = SemanticCache(threshold=0.99, ttl=10, max_size=2,
+                        timer=lambda: now[0])
+  cache.set("engine", [1.0, 0.0], "first")
+  cache.set("engine", [0.0, 1.0], "second")
+  cache.set("engine", [-1.0, 0.0], "third")
+  assert cache.get("engine", [1.0, 0.0]) is None
+  assert cache.get("engine", [0.0, 1.0]) == "second"
+
+  now[0] = 11
+  assert cache.get("engine", [0.0, 1.0]) is None
+  assert cache.stats()["size"] == 0
+
+
+def test_semantic_cache_namespaces_are_bounded_and_invalidated():
+  cache = SemanticCache(threshold=0.99, ttl=60, max_size=1)
+  cache.set(("engine_1", "index_1", "model"), [1.0, 0.0], "first")
+  cache.set(("engine_2", "index_1", "model"), [1.0, 0.0], "other")
+  # each namespace keeps its own max_size entries
+  cache.set(("engine_1", "index_1", "model"), [0.0, 1.0], "second")
+  assert cache.get(("engine_1", "index_1", "model"), [1.0, 0.0]) is None
+  assert cache.get(("engine_1", "index_1", "model"), [0.0, 1.0]) == "second"
+  assert cache.get(("engine_2", "index_1", "model"), [1.0, 0.0]) == "other"
+  # an engine rebuilt with another index does not see the old answers
+  assert cache.get(("engine_1", "index_2", "model"), [0.0, 1.0]) is None
+
+  cache.invalidate("engine_1")
+  assert cache.get(("engine_1", "index_1", "model"), [0.0, 1.0]) is None
+  assert cache.stats()["size"] == 1
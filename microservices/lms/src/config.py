@@ -83,3 +83,20 @@ except Exception as e:
 
 auth_client = UserCredentials(LMS_BACKEND_ROBOT_USERNAME,
                               LMS_BACKEND_ROBOT_PASSWORD)
+
+# section copies run their steps in a thread pool, the calls to the
+# classroom, drive and LTI APIs of all the copies of the process are rate
+# limited to the given calls per second
+SECTION_COPY_WORKERS = int(os.getenv("SECTION_COPY_WORKERS", "8"))
+SECTION_COPY_MAX_ATTEMPTS = int(os.getenv("SECTION_COPY_MAX_ATTEMPTS", "5"))
+SECTION_COPY_PROGRESS_INTERVAL = float(
+    os.getenv("SECTION_COPY_PROGRESS_INTERVAL", "2"))
+CLASSROOM_API_RATE = float(os.getenv("CLASSROOM_API_RATE", "10"))
+DRIVE_API_RATE = float(os.getenv("DRIVE_API_RATE", "10"))
+LTI_API_RATE = float(os.getenv("LTI_API_RATE", "10"))
+# a copy which is running but was not updated for this long can be resumed
+SECTION_COPY_STALE_SECONDS = int(
+    os.getenv("SECTION_COPY_STALE_SECONDS", "900"))
+
+# sections recomputed in parallel when backfilling the progress of learners
+PROGRESS_RECOMPUTE_WORKERS = int(os.getenv("PROGRESS_RECOMPUTE_WORKERS", "4"))
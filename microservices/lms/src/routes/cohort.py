@@ -1,14 +1,14 @@
 '''Cohort Endpoint'''
 import traceback
 import datetime
-from fastapi import APIRouter, Request
+from typing import Optional
+from fastapi import APIRouter, Request, BackgroundTasks, status
 from common.models import Cohort, CourseTemplate,CourseEnrollmentMapping
 from common.models.section import Section
 from common.utils.logging_handler import Logger
 from common.utils.errors import ResourceNotFoundException, ValidationError
 from common.utils.http_exceptions import ResourceNotFound, InternalServerError, BadRequest
 from common.utils import classroom_crud
-from common.utils.cache_service import set_key, get_key
 from common.utils.bq_helper import insert_rows_to_bq
 from schemas.cohort import (CohortListResponseModel, CohortModel,
                             CreateCohortResponseModel, InputCohortModel,
@@ -25,6 +25,7 @@ from utils.helper import (convert_cohort_to_cohort_model,
                           convert_section_to_section_model,
                           check_coursework_grade_catergory)
 from utils.user_helper import get_user_id
+from services import progress_service
 
 
 router = APIRouter(prefix="/cohorts",
@@ -46,8 +47,14 @@ router = APIRouter(prefix="/cohorts",
 
 
 @router.get("", response_model=CohortListResponseModel)
-def get_cohort_list(skip: int = 0, limit: int = 10):
+def get_cohort_list(skip: int = 0, limit: int = 10,
+                    page_token: Optional[str] = None):
   """Get a list of Cohort endpoint
+    Args:
+        skip (int): Number of cohorts to be skipped
+        limit (int): Number of cohorts to be returned
+        page_token (str): Token returned as next_page_token by the previous
+                          page, preferred over skip for deep pages
     Raises:
         HTTPException: 500 Internal Server Error if something fails.
 
@@ -62,7 +69,12 @@ def get_cohort_list(skip: int = 0, limit: int = 10):
     if limit < 1:
       raise ValidationError\
         ("Invalid value passed to \"limit\" query parameter")
-    fetched_cohort_list = Cohort.fetch_all(skip=skip, limit=limit)
+    next_page_token = None
+    if skip and not page_token:
+      fetched_cohort_list = Cohort.fetch_all(skip=skip, limit=limit)
+    else:
+      fetched_cohort_list, next_page_token = Cohort.fetch_page(
+          page_token=page_token, limit=limit)
     if fetched_cohort_list is None:
       return {
           "message":
@@ -72,7 +84,7 @@ def get_cohort_list(skip: int = 0, limit: int = 10):
     cohort_list = [
         convert_cohort_to_cohort_model(i) for i in fetched_cohort_list
     ]
-    return {"cohort_list": cohort_list}
+    return {"cohort_list": cohort_list, "next_page_token": next_page_token}
   except ValidationError as ve:
     raise BadRequest(str(ve)) from ve
   except ResourceNotFoundException as re:
@@ -305,42 +317,12 @@ def get_progress_percentage(cohort_id: str, user: str, request: Request):
     headers = {"Authorization": request.headers.get("Authorization")}
     user_id = get_user_id(user=user.strip(), headers=headers)
     Logger.info(f"user id : {user_id}")
-    section_with_progress_percentage = []
-    cached_progress_percentage = get_key(f"{cohort_id}::{user_id}")
-    if cached_progress_percentage is not None:
-      section_with_progress_percentage = cached_progress_percentage
-    else:
-      cohort = Cohort.find_by_id(cohort_id)
-      # Using the cohort object reference key query sections model to get a list
-      # of section of a perticular cohort
-      result = Section.fetch_all_by_cohort(cohort_key=cohort.key)
-      for section in result:
-        submitted_course_work_list = 0
-        record = CourseEnrollmentMapping.\
-          find_active_enrolled_student_record(section.key,user_id)
-        if record is not None:
-          course_work_list = len\
-            (classroom_crud.get_course_work_list(section.key.split("/")[1]))
-          submitted_course_work = classroom_crud.get_submitted_course_work_list(
-          section.key.split("/")[1], user_id,headers)
-          for submission_obj in submitted_course_work:
-            if submission_obj["state"] == "TURNED_IN":
-              submitted_course_work_list = submitted_course_work_list + 1
-          progress_percent=0
-          if course_work_list !=0:
-            progress_percent = round\
-          ((submitted_course_work_list / course_work_list) * 100, 2)
-          else:
-            progress_percent = 0
-          data = {"section_id":\
-          section.key.split("/")[1],"progress_percentage":\
-            progress_percent}
-          section_with_progress_percentage.append(data)
-      cached_value = set_key(f"{cohort_id}::{user_id}",\
-      section_with_progress_percentage, 3600)
-      Logger.info\
-      (f"progress percentage caching status for cohort_id \
-      {cohort_id}, user_id {user_id} : {cached_value}")
+    cohort = Cohort.find_by_id(cohort_id)
+    # Using the cohort object reference key query sections model to get a list
+    # of section of a perticular cohort
+    result = Section.fetch_all_by_cohort(cohort_key=cohort.key)
+    section_with_progress_percentage = progress_service.get_sections_progress(
+        result, user_id, "turned_in")
     return {"data":section_with_progress_percentage}
 
   except ResourceNotFoundException as err:
@@ -375,45 +357,10 @@ def get_progress_percentage_not_turned_in(\
   try:
     headers = {"Authorization": request.headers.get("Authorization")}
     user_id = get_user_id(user=user.strip(), headers=headers)
-    section_with_progress_percentage = []
-    cached_progress_percentage = get_key(\
-    f"not_turned_in::{cohort_id}::{user_id}")
-    if cached_progress_percentage is not None:
-      section_with_progress_percentage = cached_progress_percentage
-    else:
-      cohort = Cohort.find_by_id(cohort_id)
-      # Using the cohort object reference key query sections model to get a list
-      # of section of a perticular cohort
-      result = Section.fetch_all_by_cohort(cohort_key=cohort.key)
-      for section in result:
-        submitted_course_work_list = 0
-        record = CourseEnrollmentMapping.\
-          find_active_enrolled_student_record(section.key,user_id)
-        if record is not None:
-          course_work_list = len\
-            (classroom_crud.get_course_work_list(section.key.split("/")[1]))
-          submitted_course_work = classroom_crud.get_submitted_course_work_list(
-          section.key.split("/")[1], user_id,headers)
-          for submission_obj in submitted_course_work:
-            if "assignedGrade" in submission_obj:
-              submitted_course_work_list = submitted_course_work_list + 1
-          progress_percent=0
-          if course_work_list !=0:
-            progress_percent = round\
-          ((submitted_course_work_list / course_work_list) * 100, 2)
-          else:
-            progress_percent = 0
-          data = {"section_id":\
-          section.key.split("/")[1],"progress_percentage":\
-            progress_percent}
-          section_with_progress_percentage.append(data)
-      cached_value = set_key(\
-      f"not_turned_in::{cohort_id}::{user_id}",\
-      section_with_progress_percentage, 3600)
-      Logger.info\
-      (f"progress percentage caching status for \
-       not_turned_in cohort_id \
-      {cohort_id}, user_id {user_id} : {cached_value}")
+    cohort = Cohort.find_by_id(cohort_id)
+    result = Section.fetch_all_by_cohort(cohort_key=cohort.key)
+    section_with_progress_percentage = progress_service.get_sections_progress(
+        result, user_id, "graded")
     return {"data":section_with_progress_percentage}
 
   except ResourceNotFoundException as err:
@@ -427,6 +374,45 @@ def get_progress_percentage_not_turned_in(\
     Logger.error(err)
     raise InternalServerError(str(e)) from e
 
+@router.post("/{cohort_id}/progress/recompute",
+             status_code=status.HTTP_202_ACCEPTED)
+def recompute_progress(cohort_id: str, background_tasks: BackgroundTasks):
+  """Recompute the progress of all the learners of the sections of a cohort
+  from classroom, to backfill the progress kept up to date from the
+  classroom notifications
+
+  Args:
+    cohort_id : cohort_id for which progess is recomputed
+
+  Raises:
+    HTTPException: 404 if the cohort is not found
+    HTTPException: 500 Internal Server Error if something fails
+
+  Returns:
+    {"success": True, "message": "...", "data": None}
+  """
+  try:
+    cohort = Cohort.find_by_id(cohort_id)
+    sections = Section.fetch_all_by_cohort(cohort_key=cohort.key)
+    background_tasks.add_task(progress_service.recompute_sections_progress,
+                              sections)
+    Logger.info(f"Background Task called to recompute the progress of the "
+                f"{len(sections)} sections of cohort {cohort_id}")
+    return {
+        "success": True,
+        "message": f"Progress of the {len(sections)} sections of the cohort "
+                   "will be recomputed shortly",
+        "data": None
+    }
+  except ResourceNotFoundException as err:
+    Logger.error(err)
+    raise ResourceNotFound(str(err)) from err
+  except Exception as e:
+    Logger.error(e)
+    err = traceback.format_exc().replace("\n", " ")
+    Logger.error(err)
+    raise InternalServerError(str(e)) from e
+
 @router.get("/{cohort_id}/get_overall_grade/{user}",
       response_model=GetOverallPercentage)
 def get_overall_percentage(cohort_id: str, user: str, request: Request):
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, Request
 import datetime
 import traceback
+from typing import Optional
 from googleapiclient.errors import HttpError
 from common.models import CourseTemplate, Cohort, CourseTemplateEnrollmentMapping, User
 from common.utils.logging_handler import Logger
@@ -51,8 +52,14 @@ router = APIRouter(prefix="/course_templates",
 
 
 @router.get("", response_model=CourseTemplateListModel)
-def get_course_template_list(skip: int = 0, limit: int = 10):
+def get_course_template_list(skip: int = 0, limit: int = 10,
+                             page_token: Optional[str] = None):
   """Get a list of Course Template endpoint
+		Args:
+			skip (int): Number of course templates to be skipped
+			limit (int): Number of course templates to be returned
+			page_token (str): Token returned as next_page_token by the previous
+				page, preferred over skip for deep pages
 		Raises:
 			HTTPException: 500 Internal Server Error if something fails.
 		Returns:
@@ -67,14 +74,20 @@ def get_course_template_list(skip: int = 0, limit: int = 10):
     if limit < 1:
       raise ValidationError(
           "Invalid value passed to \"limit\" query parameter")
-    course_template_list = CourseTemplate.fetch_all(skip=skip, limit=limit)
+    next_page_token = None
+    if skip and not page_token:
+      course_template_list = CourseTemplate.fetch_all(skip=skip, limit=limit)
+    else:
+      course_template_list, next_page_token = CourseTemplate.fetch_page(
+          page_token=page_token, limit=limit)
     if course_template_list is None:
       return {
           "message":
           "Successfully get the course template list, but the list is empty.",
           "course_template_list": []
       }
-    return {"course_template_list": list(course_template_list)}
+    return {"course_template_list": list(course_template_list),
+            "next_page_token": next_page_token}
   except ValidationError as ve:
     raise BadRequest(str(ve)) from ve
   except Exception as e:
@@ -1,4 +1,5 @@
 '''LMS Job Endpoint'''
+from typing import Optional
 from fastapi import APIRouter
 from common.models import LmsJob
 from common.utils.logging_handler import Logger
@@ -31,8 +32,14 @@ router = APIRouter(
 
 
 @router.get("", response_model=LmsJobsListResponseModel)
-def get_lms_jobs_list(skip: int = 0, limit: int = 10):
+def get_lms_jobs_list(skip: int = 0, limit: int = 10,
+                      page_token: Optional[str] = None):
   """Get a list of LMS jobs endpoint
+    Args:
+        skip (int): Number of LMS jobs to be skipped
+        limit (int): Number of LMS jobs to be returned
+        page_token (str): Token returned as next_page_token by the previous
+                          page, preferred over skip for deep pages
     Raises:
         HTTPException: 500 Internal Server Error if something fails.
 
@@ -48,10 +55,15 @@ def get_lms_jobs_list(skip: int = 0, limit: int = 10):
       raise ValidationError\
         ("Invalid value passed to \"limit\" query parameter")
 
-    lms_job_data = LmsJob.fetch_all(skip=skip, limit=limit)
+    next_page_token = None
+    if skip and not page_token:
+      lms_job_data = LmsJob.fetch_all(skip=skip, limit=limit)
+    else:
+      lms_job_data, next_page_token = LmsJob.fetch_page(
+          page_token=page_token, limit=limit)
     lms_job_list = list(lms_job_data)
 
-    return {"data": lms_job_list}
+    return {"data": lms_job_list, "next_page_token": next_page_token}
   except ValidationError as ve:
     raise BadRequest(str(ve)) from ve
   except ResourceNotFoundException as re:
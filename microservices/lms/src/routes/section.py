@@ -1,6 +1,7 @@
 """ Section endpoints """
 import traceback
 import datetime
+from typing import Optional
 from common.models import Cohort, CourseTemplate, Section, LmsJob, CourseEnrollmentMapping
 from common.utils.errors import ResourceNotFoundException, ValidationError
 from common.utils.http_exceptions import (ClassroomHttpException,
@@ -28,6 +29,7 @@ from schemas.section import (
     DeleteFailedSectionSectionModel,UpdateInviteResponseModel,
     NullGradesResponseModel)
 from schemas.update_section import UpdateSection
+from services.section_copy import is_stale_job
 from services.section_service import (copy_course_background_task,
                                 copy_course_background_task_alpha,
                                 post_null_value_background_task,
@@ -215,6 +217,80 @@ def create_section_apha(sections_details: SectionDetails,
     raise InternalServerError(str(e)) from e
 
 
+@router.post("/copy_course/{lms_job_id}/resume",
+             status_code=status.HTTP_202_ACCEPTED)
+def resume_copy_course(lms_job_id: str, background_tasks: BackgroundTasks):
+  """Resume the course copy of a section API, after the copy steps that
+  were completed by the previous runs of the copy
+  Args:
+    lms_job_id (str): id of the LMS job of the course copy
+  Raises:
+    HTTPException: 404 if the LMS job is not found
+    HTTPException: 400 if the job is not a course copy, already succeeded
+      or is still running
+    HTTPException: 500 Internal Server Error if something fails
+  Returns:
+    {"success": True, "message": "...", "data": None}
+  """
+  try:
+    lms_job = LmsJob.find_by_id(lms_job_id)
+    if lms_job.job_type != "course_copy":
+      raise ValidationError(f"LMS job {lms_job_id} is not a course copy")
+    if lms_job.status == "success":
+      raise ValidationError(f"Course copy of LMS job {lms_job_id} "
+                            "already succeeded")
+    if lms_job.status in ("ready", "running") and not is_stale_job(lms_job):
+      raise ValidationError(f"Course copy of LMS job {lms_job_id} is still "
+                            "running")
+    sections_details = SectionDetails(**lms_job.input_data)
+    course_template_details = CourseTemplate.find_by_id(
+        sections_details.course_template)
+    cohort_details = Cohort.find_by_id(sections_details.cohort)
+    current_course = classroom_crud.get_course_by_id(
+        course_template_details.classroom_id)
+    if current_course is None:
+      raise ResourceNotFoundException(
+          "classroom with id" +
+          f" {course_template_details.classroom_id} is not found")
+
+    background_tasks.add_task(
+        copy_course_background_task,
+        course_template_details=course_template_details,
+        sections_details=sections_details,
+        cohort_details=cohort_details,
+        lms_job_id=lms_job.id,current_course=current_course,
+        message="Resume section copy background task completed")
+    info_msg = f"Background Task called to resume the course copy of LMS\
+                job {lms_job.id}"
+    Logger.info(info_msg)
+
+    lms_job.logs["info"].append(info_msg)
+    lms_job.status = "ready"
+    lms_job.update()
+
+    return {
+        "success": True,
+        "message": "Section copy will be resumed shortly, " +
+                    f"use this job id - '{lms_job.id}' for more info",
+        "data": None
+    }
+  except ResourceNotFoundException as err:
+    Logger.error(err)
+    raise ResourceNotFound(str(err)) from err
+  except ValidationError as ve:
+    Logger.error(ve)
+    raise BadRequest(str(ve)) from ve
+  except HttpError as hte:
+    Logger.error(hte)
+    raise ClassroomHttpException(status_code=hte.resp.status,
+                                 message=str(hte)) from hte
+  except Exception as e:
+    error = traceback.format_exc().replace("\n", " ")
+    Logger.error(error)
+    Logger.error(e)
+    raise InternalServerError(str(e)) from e
+
+
 @router.get("/{section_id}", response_model=GetSectiontResponseModel)
 def get_section(section_id: str):
   """Get a section details from db
@@ -475,10 +551,15 @@ def delete_section(section_id: str):
 
 
 @router.get("", response_model=SectionListResponseModel)
-def section_list(skip: int = 0, limit: int = 10):
+def section_list(skip: int = 0, limit: int = 10,
+                 page_token: Optional[str] = None):
   """Get a all section details from db
 
   Args:
+    skip (int): Number of sections to be skipped
+    limit (int): Number of sections to be returned
+    page_token (str): Token returned as next_page_token by the previous
+                      page, preferred over skip for deep pages
   Raises:
       HTTPException: 500 Internal Server Error if something fails
       HTTPException:
@@ -494,9 +575,13 @@ def section_list(skip: int = 0, limit: int = 10):
       raise ValidationError(
           "Invalid value passed to \"limit\" query parameter")
 
-    sections = Section.fetch_all(skip, limit)
+    next_page_token = None
+    if skip and not page_token:
+      sections = Section.fetch_all(skip, limit)
+    else:
+      sections, next_page_token = Section.fetch_page(page_token, limit)
     sections_list = list(map(convert_section_to_section_model, sections))
-    return {"data": sections_list}
+    return {"data": sections_list, "next_page_token": next_page_token}
   except ValidationError as ve:
     raise BadRequest(str(ve)) from ve
   except Exception as e:
@@ -9,7 +9,7 @@ from datetime import timedelta
 # disabling pylint rules that conflict with pytest fixtures
 # pylint: disable=unused-argument,redefined-outer-name,unused-import
 from common.models.section import Section
-from common.models import (CourseTemplate, Cohort, User,
+from common.models import (CourseTemplate, Cohort, User, LmsJob,
                            CourseEnrollmentMapping,
                            CourseTemplateEnrollmentMapping)
 from common.testing.client_with_emulator import client_with_emulator
@@ -708,7 +708,12 @@ def test_form_grade_import_form_with_response(client_with_emulator,
             return_value=FORM_RESPONSE_LIST):
           with mock.patch(
               "routes.section.classroom_crud.list_coursework_submissions_user",
-              return_value=LIST_COURSEWORK_SUBMISSION_USER):
+              return_value=LIST_COURSEWORK_SUBMISSION_USER), \
+              mock.patch(("routes.section.classroom_crud." +
+                          "list_coursework_submissions_users"),
+                         side_effect=lambda course_id, coursework_id, emails:
+                         {email: LIST_COURSEWORK_SUBMISSION_USER
+                          for email in emails}):
             with mock.patch(
                 "routes.section.classroom_crud.patch_student_submission"):
               resp = client_with_emulator.patch(url)
@@ -793,3 +798,53 @@ def test_update_invites(client_with_emulator,create_fake_data):
           resp = client_with_emulator.patch(url)
   print("Update invitest status code",resp.status_code,resp.json())
   assert resp.status_code == 200
+
+
+def create_copy_job(create_fake_data, status):
+  lms_job = LmsJob()
+  lms_job.job_type = "course_copy"
+  lms_job.status = status
+  lms_job.logs = {"info": [], "errors": []}
+  lms_job.input_data = {
+      "name": "section_name",
+      "description": "description",
+      "course_template": create_fake_data["course_template"],
+      "cohort": create_fake_data["cohort"],
+      "max_students": 50
+  }
+  lms_job.save()
+  return lms_job
+
+
+def test_resume_copy_course_job_not_found(client_with_emulator):
+  url = BASE_URL + "/sections/copy_course/fake_job_id/resume"
+  resp = client_with_emulator.post(url)
+  assert resp.status_code == 404
+
+
+def test_resume_copy_course_succeeded_job(client_with_emulator,
+                                          create_fake_data):
+  lms_job = create_copy_job(create_fake_data, "success")
+  url = BASE_URL + f"/sections/copy_course/{lms_job.id}/resume"
+  resp = client_with_emulator.post(url)
+  assert resp.status_code == 400
+
+
+def test_resume_copy_course_running_job(client_with_emulator,
+                                        create_fake_data):
+  lms_job = create_copy_job(create_fake_data, "running")
+  url = BASE_URL + f"/sections/copy_course/{lms_job.id}/resume"
+  resp = client_with_emulator.post(url)
+  assert resp.status_code == 400
+
+
+def test_resume_copy_course_failed_job(client_with_emulator,
+                                       create_fake_data):
+  lms_job = create_copy_job(create_fake_data, "failed")
+  url = BASE_URL + f"/sections/copy_course/{lms_job.id}/resume"
+  with mock.patch("routes.section.classroom_crud.get_course_by_id",
+                  return_value={"id": "cl_id"}), \
+      mock.patch("routes.section.copy_course_background_task"):
+    resp = client_with_emulator.post(url)
+  assert resp.status_code == 202
+  assert LmsJob.find_by_id(lms_job.id).status == "ready"
@@ -2,7 +2,7 @@
 import traceback
 from fastapi import APIRouter, Request
 from googleapiclient.errors import HttpError
-from services import student_service,section_service
+from services import student_service,section_service,progress_service
 from utils.user_helper import (
   course_enrollment_user_model,get_user_id)
 from utils.helper import bq_query_results_to_dict_list
@@ -112,15 +112,8 @@ def get_progress_percentage(section_id: str, user: str, request: Request):
   try:
     headers = {"Authorization": request.headers.get("Authorization")}
     user_id = get_user_id(user=user, headers=headers)
-    submitted_course_work_list = 0
-    course_work_list = len(classroom_crud.get_course_work_list(section_id))
-    submitted_course_work = classroom_crud.get_submitted_course_work_list(
-        section_id, user_id, headers)
-    for x in submitted_course_work:
-      if x["state"] == "TURNED_IN":
-        submitted_course_work_list = submitted_course_work_list + 1
-    return {"data":\
-    round((submitted_course_work_list / course_work_list) * 100, 2)}
+    section = Section.find_by_id(section_id)
+    return {"data": progress_service.get_section_progress(section, user_id)}
 
   except ResourceNotFoundException as err:
     Logger.error(err)
@@ -134,6 +127,43 @@ def get_progress_percentage(section_id: str, user: str, request: Request):
     raise InternalServerError(str(e)) from e
 
 
+@section_student_router.post("/{section_id}/progress/recompute")
+def recompute_progress(section_id: str):
+  """Recompute the progress of all the learners of a section from classroom,
+  to backfill the progress kept up to date from the classroom notifications
+
+  Args:
+    section_id : section id for which progess is recomputed
+
+  Raises:
+    HTTPException: 404 if the section is not found
+    HTTPException: 500 Internal Server Error if something fails
+
+  Returns:
+    {"success": True, "message": "...", "data": {"course_work_count": 0,
+      "learner_count": 0, ...}}
+  """
+  try:
+    section = Section.find_by_id(section_id)
+    return {
+        "success": True,
+        "message": f"Recomputed the progress of section {section_id}",
+        "data": progress_service.recompute_section_progress(section)
+    }
+  except ResourceNotFoundException as err:
+    Logger.error(err)
+    raise ResourceNotFound(str(err)) from err
+  except HttpError as hte:
+    Logger.error(hte)
+    raise ClassroomHttpException(status_code=hte.resp.status,
+                                 message=str(hte)) from hte
+  except Exception as e:
+    Logger.error(e)
+    err = traceback.format_exc().replace("\n", " ")
+    Logger.error(err)
+    raise InternalServerError(str(e)) from e
+
+
 @section_student_router.get("/{section_id}/students/{user}",
                             response_model=GetStudentDetailsResponseModel)
 def get_student_in_section(section_id: str, user: str, request: Request):
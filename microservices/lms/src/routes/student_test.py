@@ -82,22 +82,31 @@ def create_fake_data():
   }
 
 
-def test_get_progress_percentage(client_with_emulator):
-  url = BASE_URL + "/sections/9xieFlma8bcWYyLPOg0c/" + \
+def test_get_progress_percentage(client_with_emulator, create_fake_data):
+  url = BASE_URL + f"/sections/{create_fake_data['section']}/" + \
     "get_progress_percentage/clplmstestuser1@gmail.com"
   with mock.patch\
   ("routes.student.get_user_id",return_value="user_id"):
-    with mock.patch("routes.student.classroom_crud.get_course_work_list",
-                    return_value=[{}, {}]):
-      with mock.patch(
-          "routes.student.classroom_crud.get_submitted_course_work_list",
-          return_value=[{
-              "state": "TURNED_IN"
-          }, {
-              "state": "TURNED_IN"
-          }]):
-        resp = client_with_emulator.get(url)
+    with mock.patch(
+        "routes.student.progress_service.get_section_progress",
+        return_value=100.0) as get_section_progress:
+      resp = client_with_emulator.get(url)
+  assert resp.status_code == 200
+  assert resp.json()["data"] == 100.0
+  assert get_section_progress.call_args[0][1] == "user_id"
+
+
+def test_recompute_section_progress(client_with_emulator, create_fake_data):
+  url = BASE_URL + \
+    f"/sections/{create_fake_data['section']}/progress/recompute"
+  result = {"section_id": create_fake_data["section"],
+            "course_work_count": 2, "learner_count": 1, "seconds": 0.1}
+  with mock.patch(
+      "routes.student.progress_service.recompute_section_progress",
+      return_value=result):
+    resp = client_with_emulator.post(url)
   assert resp.status_code == 200
+  assert resp.json()["data"] == result
 
 def test_get_student_in_section(client_with_emulator,create_fake_data):
   url = (BASE_URL
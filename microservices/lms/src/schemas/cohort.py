@@ -57,6 +57,7 @@ class CohortListResponseModel(BaseModel):
   success: Optional[bool] = True
   message: Optional[str] = "Successfully get the Cohort list"
   cohort_list: Optional[list[CohortModel]]
+  next_page_token: Optional[str]
 
   class Config():
     orm_mode = True
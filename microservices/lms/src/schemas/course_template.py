@@ -83,6 +83,7 @@ class CourseTemplateListModel(BaseModel):
   success: Optional[bool] = True
   message: Optional[str] = "Successfully get the course template list"
   course_template_list: Optional[list[CourseTemplateModel]] = []
+  next_page_token: Optional[str]
 
   class Config():
     orm_mode = True
@@ -52,6 +52,7 @@ class LmsJobsListResponseModel(BaseModel):
   success: Optional[bool] = True
   message: Optional[str] = "Successfully fetched the LMS job list"
   data: Optional[list[LmsJobModel]]
+  next_page_token: Optional[str]
 
   class Config():
     orm_mode = True
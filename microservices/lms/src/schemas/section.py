@@ -78,6 +78,7 @@ class SectionListResponseModel(BaseModel):
   success: Optional[bool] = True
   message: Optional[str] = "Success list"
   data: Optional[list[Sections]] = []
+  next_page_token: Optional[str]
 
   class Config():
     orm_mode = True
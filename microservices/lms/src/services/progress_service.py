@@ -0,0 +1,158 @@
+"""Progress of learners in sections, served from the submissions recorded by
+the classroom notification service"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common.models import (CourseEnrollmentMapping, User, SectionProgress,
+                           SectionCourseWork)
+from common.models.section_progress import (save_classroom_progress,
+                                            count_submissions)
+from common.utils import classroom_crud
+from common.utils.logging_handler import Logger
+from config import PROGRESS_RECOMPUTE_WORKERS
+# pylint: disable = broad-exception-raised
+
+
+def get_submission_state(submission):
+  """returns the state of a classroom student submission as recorded in
+  SectionProgress"""
+  return {
+      "state": submission["state"],
+      "graded": "assignedGrade" in submission,
+      "update_time": submission.get("updateTime")
+  }
+
+
+def recompute_section_progress(section):
+  """recomputes the course work and the progress of all the learners of a
+  section from classroom, with one listing of the course work and one of
+  the submissions of the whole course
+
+  Args:
+    section: Section object
+  Returns:
+    dict: course work and learner counts of the section
+  """
+  start_time = time.perf_counter()
+  course_work_ids = [
+      course_work["id"]
+      for course_work in classroom_crud.get_course_work_list(section.id)
+  ]
+  submissions = {}
+  for submission in classroom_crud.list_course_submissions(
+      section.classroom_id):
+    submissions.setdefault(submission["userId"], {})[
+        submission["courseWorkId"]] = get_submission_state(submission)
+  save_classroom_progress(section.classroom_id, course_work_ids, submissions)
+  result = {
+      "section_id": section.id,
+      "course_work_count": len(course_work_ids),
+      "learner_count": len(submissions),
+      "seconds": round(time.perf_counter() - start_time, 3)
+  }
+  Logger.info(f"Recomputed the progress of section {section.id}: {result}")
+  return result
+
+
+def recompute_sections_progress(sections,
+                                max_workers=PROGRESS_RECOMPUTE_WORKERS):
+  """recomputes the progress of many sections in a thread pool, the
+  batched recompute path used to backfill the progress store
+
+  Returns:
+    list: result of recompute_section_progress for every section, or the
+      section id and the error for the sections which failed
+  """
+
+  def recompute(section):
+    try:
+      return recompute_section_progress(section)
+    except Exception as e: # pylint: disable=broad-except
+      Logger.error(f"Recomputing the progress of section {section.id} "
+                   f"failed with error - {e}")
+      return {"section_id": section.id, "error": str(e)}
+
+  if not sections:
+    return []
+  with ThreadPoolExecutor(
+      max_workers=min(max_workers, len(sections))) as executor:
+    return list(executor.map(recompute, sections))
+
+
+def get_gaia_id(user_id):
+  """returns the google id of a user, the id of the learners in the
+  submission events"""
+  user = User.find_by_id(user_id)
+  if user.gaia_id:
+    return user.gaia_id
+  return classroom_crud.get_user_profile_information(user.email)["id"]
+
+
+def get_progress_percentages(sections, gaia_id, progress_type):
+  """returns the progress percentage of a learner in every section, with
+  batched reads of the progress store. The sections whose classroom was
+  never backfilled are recomputed first. Only the submissions of the
+  published course work are counted."""
+  classroom_ids = [section.classroom_id for section in sections]
+  course_work = SectionCourseWork.find_by_ids(classroom_ids)
+  missing = [
+      section for section in sections
+      if section.classroom_id not in course_work or
+      not course_work[section.classroom_id].backfilled
+  ]
+  if missing:
+    errors = [
+        result for result in recompute_sections_progress(missing)
+        if "error" in result
+    ]
+    if errors:
+      raise Exception(f"Recomputing the progress of section "
+                      f"{errors[0]['section_id']} failed: "
+                      f"{errors[0]['error']}")
+    course_work.update(SectionCourseWork.find_by_ids(
+        [section.classroom_id for section in missing]))
+  progress = SectionProgress.find_by_classroom_and_gaia_ids(
+      [(classroom_id, gaia_id) for classroom_id in classroom_ids])
+
+  percentages = []
+  for section in sections:
+    course_work_ids = course_work[section.classroom_id].course_work or {}
+    section_progress = progress.get((section.classroom_id, gaia_id))
+    turned_in_count, graded_count = count_submissions(
+        getattr(section_progress, "submissions", None) or {},
+        course_work_ids)
+    count = turned_in_count if progress_type == "turned_in" else graded_count
+    progress_percent = 0
+    if course_work_ids:
+      progress_percent = round((count / len(course_work_ids)) * 100, 2)
+    percentages.append({
+        "section_id": section.id,
+        "progress_percentage": progress_percent
+    })
+  return percentages
+
+
+def get_sections_progress(sections, user_id, progress_type="turned_in"):
+  """returns the progress of a learner in the given sections in which the
+  learner is actively enrolled
+
+  Args:
+    sections: Section objects, of a cohort
+    user_id: id of the learner
+    progress_type: "turned_in" for the percentage of turned in course work,
+      "graded" for the percentage of graded course work
+  Returns:
+    list: dicts of section_id and progress_percentage
+  """
+  enrolled_keys = \
+    CourseEnrollmentMapping.find_active_enrolled_student_section_keys(user_id)
+  sections = [section for section in sections if section.key in enrolled_keys]
+  if not sections:
+    return []
+  return get_progress_percentages(sections, get_gaia_id(user_id),
+                                  progress_type)
+
+
+def get_section_progress(section, user_id, progress_type="turned_in"):
+  """returns the progress percentage of a learner in a section"""
+  return get_progress_percentages([section], get_gaia_id(user_id),
+                                  progress_type)[0]["progress_percentage"]
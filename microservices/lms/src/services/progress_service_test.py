@@ -0,0 +1,69 @@
+"""
+Unit test for progress_service.py
+"""
+import mock
+from services import progress_service
+
+
+class FakeSection():
+  def __init__(self, section_id, classroom_id):
+    self.id = section_id
+    self.classroom_id = classroom_id
+    self.key = f"sections/{section_id}"
+
+
+def fake_course_work(course_work_ids, backfilled=True):
+  return mock.Mock(course_work={i: True for i in course_work_ids},
+                   backfilled=backfilled)
+
+
+SUBMISSIONS = {
+    "cw1": {"state": "TURNED_IN", "graded": True},
+    "cw2": {"state": "CREATED", "graded": False},
+    # submission of a deleted course work
+    "cw9": {"state": "TURNED_IN", "graded": True}
+}
+
+
+def test_get_progress_percentages():
+  sections = [FakeSection("s1", "c1"), FakeSection("s2", "c2")]
+  course_work = {
+      "c1": fake_course_work(["cw1", "cw2", "cw3"]),
+      "c2": fake_course_work([])
+  }
+  progress = {("c1", "g1"): mock.Mock(submissions=SUBMISSIONS)}
+  with mock.patch("services.progress_service.SectionCourseWork.find_by_ids",
+                  return_value=course_work), \
+      mock.patch("services.progress_service.SectionProgress."
+                 "find_by_classroom_and_gaia_ids", return_value=progress), \
+      mock.patch("services.progress_service.recompute_sections_progress"
+                ) as recompute:
+    turned_in = progress_service.get_progress_percentages(
+        sections, "g1", "turned_in")
+    graded = progress_service.get_progress_percentages(
+        sections, "g1", "graded")
+  recompute.assert_not_called()
+  assert turned_in == [{"section_id": "s1", "progress_percentage": 33.33},
+                       {"section_id": "s2", "progress_percentage": 0}]
+  assert graded[0]["progress_percentage"] == 33.33
+
+
+def test_get_progress_percentages_recomputes_not_backfilled():
+  sections = [FakeSection("s1", "c1"), FakeSection("s2", "c2")]
+  # c1 was only seen through notifications, c2 was never seen
+  before = {"c1": fake_course_work(["cw1"], backfilled=False)}
+  after = {"c1": fake_course_work(["cw1", "cw2"]),
+           "c2": fake_course_work(["cw1"])}
+  with mock.patch("services.progress_service.SectionCourseWork.find_by_ids",
+                  side_effect=[before, after]), \
+      mock.patch("services.progress_service.SectionProgress."
+                 "find_by_classroom_and_gaia_ids",
+                 return_value={("c2", "g1"): mock.Mock(
+                     submissions=SUBMISSIONS)}), \
+      mock.patch("services.progress_service.recompute_sections_progress",
+                 return_value=[{}, {}]) as recompute:
+    percentages = progress_service.get_progress_percentages(
+        sections, "g1", "turned_in")
+  assert recompute.call_args[0][0] == sections
+  assert percentages == [{"section_id": "s1", "progress_percentage": 0},
+                         {"section_id": "s2", "progress_percentage": 100.0}]
@@ -0,0 +1,262 @@
+"""Engine running the steps of a section copy as a DAG, with the progress
+kept in the LmsJob of the copy"""
+import datetime
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from googleapiclient.errors import HttpError
+from common.utils.logging_handler import Logger
+from config import (SECTION_COPY_WORKERS, SECTION_COPY_MAX_ATTEMPTS,
+                    SECTION_COPY_PROGRESS_INTERVAL, CLASSROOM_API_RATE,
+                    DRIVE_API_RATE, LTI_API_RATE,
+                    SECTION_COPY_STALE_SECONDS)
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter():
+  """Token bucket shared by the copies running in the process, allowing
+  `rate` calls per second with bursts of up to `rate` calls"""
+
+  def __init__(self, rate):
+    self.rate = rate
+    self.tokens = rate
+    self.updated = time.monotonic()
+    self.lock = threading.Lock()
+
+  def acquire(self):
+    while True:
+      with self.lock:
+        now = time.monotonic()
+        self.tokens = min(self.rate,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+          self.tokens -= 1
+          return
+        wait_time = (1 - self.tokens) / self.rate
+      time.sleep(wait_time)
+
+
+rate_limiters = {
+    "classroom": RateLimiter(CLASSROOM_API_RATE),
+    "drive": RateLimiter(DRIVE_API_RATE),
+    "lti": RateLimiter(LTI_API_RATE)
+}
+
+
+class CopyStep():
+  """Step of a section copy
+
+  Args:
+    step_id: id of the step, stable across the runs of a copy so that the
+      steps completed by a previous run are skipped
+    run: function called with the dict of the results of the completed
+      steps, returning a dict result which is saved in the LmsJob. A result
+      with a true `error_flag` marks the copy as failed without failing the
+      steps depending on it
+    dependencies: ids of the steps to complete before this one, the step is
+      skipped when one of them fails
+    api: rate limiter of a step making a single API call. None for steps
+      making no or several API calls, which limit their calls with
+      call_with_retries
+    after: ids of the steps to finish before this one, whether they succeed
+      or fail, to order steps which do not use each other's results
+    retry: False for steps making a call which is not idempotent, they are
+      not retried on rate limit and server errors
+    saved_keys: keys of the result saved in the LmsJob, None to save the
+      whole result. A step whose result is not saved whole is run again when
+      the copy is resumed before all its dependents are completed
+  """
+
+  def __init__(self, step_id, run, dependencies=(), api="classroom",
+               after=(), retry=True, saved_keys=None):
+    self.step_id = step_id
+    self.run = run
+    self.dependencies = list(dependencies)
+    self.api = api
+    self.after = list(after)
+    self.retry = retry
+    self.saved_keys = saved_keys
+
+
+class CopyProgress():
+  """Progress of a section copy saved in the `progress` of its LmsJob
+
+  The results and timings of the steps are saved at most every
+  `save_interval` seconds while the copy runs and when it ends.
+  """
+
+  def __init__(self, lms_job, save_interval=SECTION_COPY_PROGRESS_INTERVAL):
+    self.lms_job = lms_job
+    self.logs = lms_job.logs
+    self.progress = lms_job.progress or {}
+    self.steps = self.progress.setdefault("steps", {})
+    self.save_interval = save_interval
+    self.saved_time = time.monotonic()
+    self.lock = threading.RLock()
+
+  def is_done(self, step_id):
+    return self.steps.get(step_id, {}).get("status") == "done"
+
+  def get_result(self, step_id):
+    return self.steps.get(step_id, {}).get("result")
+
+  def info(self, message):
+    with self.lock:
+      self.logs["info"].append(message)
+    Logger.info(message)
+
+  def error(self, message):
+    with self.lock:
+      self.logs["errors"].append(message)
+    Logger.error(message)
+
+  def record(self, step_id, status, seconds, result=None, saved_keys=None):
+    if result is not None and saved_keys is not None:
+      result = {key: result[key] for key in saved_keys if key in result}
+    with self.lock:
+      self.steps[step_id] = {
+          "status": status,
+          "seconds": round(seconds, 3),
+          "result": result
+      }
+      self.logs["info"].append(
+          f"Copy step {step_id} {status} in {seconds:.2f}s")
+    if time.monotonic() - self.saved_time >= self.save_interval:
+      self.save()
+
+  def save(self, **fields):
+    """saves the progress, logs and the given fields in the LmsJob"""
+    with self.lock:
+      for key, value in fields.items():
+        setattr(self.lms_job, key, value)
+      self.lms_job.progress = self.progress
+      self.lms_job.logs = self.logs
+      self.lms_job.update()
+      self.saved_time = time.monotonic()
+
+
+def is_stale_job(lms_job, stale_seconds=SECTION_COPY_STALE_SECONDS):
+  """checks if a copy which is ready or running was not updated for
+  `stale_seconds`, the process running it having likely stopped"""
+  last_modified_time = lms_job.last_modified_time
+  if last_modified_time is None:
+    return True
+  if last_modified_time.tzinfo is not None:
+    last_modified_time = last_modified_time.astimezone(
+        datetime.timezone.utc).replace(tzinfo=None)
+  return (datetime.datetime.utcnow() -
+          last_modified_time).total_seconds() > stale_seconds
+
+
+def call_with_retries(function, api=None,
+                      max_attempts=SECTION_COPY_MAX_ATTEMPTS):
+  """calls a function under the rate limiter of an API, retrying with
+  exponential backoff when the API answers with a rate limit or server
+  error, raised as an HttpError or returned as a requests response"""
+  for attempt in range(1, max_attempts + 1):
+    if api is not None:
+      rate_limiters[api].acquire()
+    try:
+      response = function()
+    except HttpError as error:
+      if error.resp.status not in RETRYABLE_STATUS_CODES or \
+          attempt == max_attempts:
+        raise
+      status_code = error.resp.status
+    else:
+      status_code = getattr(response, "status_code", None)
+      if status_code not in RETRYABLE_STATUS_CODES or \
+          attempt == max_attempts:
+        return response
+    Logger.info(f"Retrying after error {status_code} from the "
+                f"{api} API, attempt {attempt}")
+    time.sleep(min(2 ** attempt, 32))
+
+
+def run_copy_steps(steps, progress, max_workers=SECTION_COPY_WORKERS):
+  """runs the steps of a copy, every step as soon as its dependencies are
+  completed
+
+  Steps completed by a previous run of the copy are not run again, their
+  saved results are used instead. The steps depending on a failed step are
+  skipped.
+  Returns:
+    bool: True if a step failed or was skipped or returned an error flag
+  """
+  steps = {step.step_id: step for step in steps}
+  results = {}
+  error_flag = False
+  pending = {}
+  for step_id, step in steps.items():
+    rerun = step.saved_keys is not None and any(
+        step_id in other.dependencies and not progress.is_done(other_id)
+        for other_id, other in steps.items())
+    if progress.is_done(step_id) and not rerun:
+      results[step_id] = progress.get_result(step_id) or {}
+      error_flag = error_flag or bool(results[step_id].get("error_flag"))
+    else:
+      pending[step_id] = step
+  if len(results):
+    progress.info(f"Resuming the copy, {len(results)} of {len(steps)} "
+                  "steps were already completed")
+
+  def run_step(step):
+    start_time = time.perf_counter()
+    max_attempts = SECTION_COPY_MAX_ATTEMPTS if step.retry else 1
+    try:
+      if step.api is None:
+        result = step.run(results) or {}
+      else:
+        result = call_with_retries(lambda: step.run(results), step.api,
+                                   max_attempts) or {}
+    except Exception as e: # pylint: disable=broad-except
+      progress.error(f"Copy step {step.step_id} failed with error - {e}")
+      Logger.error(traceback.format_exc().replace("\n", " "))
+      progress.record(step.step_id, "failed",
+                      time.perf_counter() - start_time)
+      raise
+    progress.record(step.step_id, "done", time.perf_counter() - start_time,
+                    result, step.saved_keys)
+    return result
+
+  failed = set()
+
+  def is_finished(step_id):
+    return step_id in results or step_id in failed or step_id not in steps
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    running = {}
+    while pending or running:
+      skipped = True
+      while skipped:
+        skipped = False
+        for step_id, step in list(pending.items()):
+          if any(dependency in failed for dependency in step.dependencies):
+            del pending[step_id]
+            failed.add(step_id)
+            skipped = True
+            progress.record(step_id, "skipped", 0)
+          elif all(dependency in results
+                   for dependency in step.dependencies) and \
+              all(is_finished(after_id) for after_id in step.after):
+            del pending[step_id]
+            running[executor.submit(run_step, step)] = step_id
+      if not running:
+        # the remaining steps depend on steps which are not part of the copy
+        for step_id in pending:
+          progress.error(f"Copy step {step_id} has missing dependencies")
+        failed.update(pending)
+        break
+      done, _ = wait(running, return_when=FIRST_COMPLETED)
+      for future in done:
+        step_id = running.pop(future)
+        if future.exception() is not None:
+          failed.add(step_id)
+          continue
+        results[step_id] = future.result()
+        error_flag = error_flag or bool(results[step_id].get("error_flag"))
+  progress.save()
+  return error_flag or bool(failed)
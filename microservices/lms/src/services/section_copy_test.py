@@ -0,0 +1,145 @@
+"""
+Unit test for section_copy.py
+"""
+import datetime
+import mock
+from services.section_copy import (CopyStep, CopyProgress, run_copy_steps,
+                                   call_with_retries, is_stale_job)
+
+
+class FakeLmsJob():
+  """Stands in for an LmsJob, counting its updates"""
+
+  def __init__(self, progress=None):
+    self.logs = {"info": [], "errors": []}
+    self.progress = progress or {}
+    self.updates = 0
+
+  def update(self):
+    self.updates += 1
+
+
+def step_function(calls, step_id, result=None, fail=False):
+  def run(results):
+    calls.append(step_id)
+    if fail:
+      raise ValueError(f"{step_id} failed")
+    return result or {"id": step_id}
+  return run
+
+
+def get_statuses(lms_job):
+  return {
+      step_id: step["status"]
+      for step_id, step in lms_job.progress["steps"].items()
+  }
+
+
+def test_run_copy_steps_skips_dependents_of_failed_steps():
+  calls = []
+  lms_job = FakeLmsJob()
+  steps = [
+      CopyStep("a", step_function(calls, "a"), api=None),
+      CopyStep("b", step_function(calls, "b", fail=True), ["a"], api=None),
+      CopyStep("c", step_function(calls, "c"), ["b"], api=None),
+      CopyStep("d", step_function(calls, "d"), ["c"], api=None),
+      CopyStep("e", step_function(calls, "e"), ["a"], api=None)
+  ]
+  error_flag = run_copy_steps(steps, CopyProgress(lms_job, save_interval=0))
+  assert error_flag is True
+  assert sorted(calls) == ["a", "b", "e"]
+  assert get_statuses(lms_job) == {
+      "a": "done", "b": "failed", "c": "skipped", "d": "skipped", "e": "done"
+  }
+
+
+def test_run_copy_steps_after_is_ordering_only():
+  calls = []
+  lms_job = FakeLmsJob()
+  steps = [
+      CopyStep("a", step_function(calls, "a", fail=True), api=None),
+      CopyStep("b", step_function(calls, "b"), after=["a"], api=None),
+      CopyStep("c", step_function(calls, "c"), after=["b"], api=None)
+  ]
+  error_flag = run_copy_steps(steps, CopyProgress(lms_job, save_interval=0))
+  assert error_flag is True
+  assert calls == ["a", "b", "c"]
+
+
+def test_run_copy_steps_resumes_after_completed_steps():
+  calls = []
+  lms_job = FakeLmsJob(progress={"steps": {
+      "a": {"status": "done", "seconds": 1, "result": {"id": "a"}},
+      "b": {"status": "failed", "seconds": 1, "result": None}
+  }})
+  results = {}
+
+  def record_result(step_results):
+    results.update(step_results)
+    return {"id": "c"}
+
+  steps = [
+      CopyStep("a", step_function(calls, "a"), api=None),
+      CopyStep("b", step_function(calls, "b"), ["a"], api=None),
+      CopyStep("c", record_result, ["b"], api=None)
+  ]
+  error_flag = run_copy_steps(steps, CopyProgress(lms_job, save_interval=0))
+  assert error_flag is False
+  assert calls == ["b"]
+  assert results["a"] == {"id": "a"}
+  assert get_statuses(lms_job) == {"a": "done", "b": "done", "c": "done"}
+
+
+def test_run_copy_steps_saves_only_saved_keys():
+  calls = []
+  lms_job = FakeLmsJob()
+  steps = [
+      CopyStep("a", step_function(calls, "a", {"big": [1] * 10, "id": "a"}),
+               api=None, saved_keys=("id",)),
+      CopyStep("b", step_function(calls, "b", fail=True), ["a"], api=None)
+  ]
+  run_copy_steps(steps, CopyProgress(lms_job, save_interval=0))
+  assert lms_job.progress["steps"]["a"]["result"] == {"id": "a"}
+
+  # a is run again, its dependent b was not completed
+  calls.clear()
+  steps[1] = CopyStep("b", step_function(calls, "b"), ["a"], api=None)
+  run_copy_steps(steps, CopyProgress(lms_job, save_interval=0))
+  assert calls == ["a", "b"]
+
+
+def test_run_copy_steps_propagates_error_flag():
+  calls = []
+  lms_job = FakeLmsJob()
+  steps = [
+      CopyStep("a", step_function(calls, "a", {"error_flag": True}),
+               api=None),
+      CopyStep("b", step_function(calls, "b"), ["a"], api=None)
+  ]
+  error_flag = run_copy_steps(steps, CopyProgress(lms_job, save_interval=0))
+  assert error_flag is True
+  assert calls == ["a", "b"]
+
+  # the error flag of a step completed by a previous run is kept
+  calls.clear()
+  assert run_copy_steps(steps, CopyProgress(lms_job)) is True
+  assert not calls
+
+
+def test_call_with_retries_retries_server_error_responses():
+  responses = [mock.Mock(status_code=503), mock.Mock(status_code=200)]
+  with mock.patch("services.section_copy.time.sleep"):
+    response = call_with_retries(lambda: responses.pop(0), "lti")
+  assert response.status_code == 200
+
+  response = call_with_retries(lambda: mock.Mock(status_code=404), "lti")
+  assert response.status_code == 404
+
+
+def test_is_stale_job():
+  now = datetime.datetime.utcnow()
+  assert not is_stale_job(mock.Mock(last_modified_time=now))
+  assert is_stale_job(mock.Mock(
+      last_modified_time=now - datetime.timedelta(hours=1)))
+  assert not is_stale_job(mock.Mock(
+      last_modified_time=now.replace(tzinfo=datetime.timezone.utc)))
@@ -3,6 +3,7 @@ import traceback
 import datetime
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from common.utils import classroom_crud
 from common.utils.bq_helper import insert_rows_to_bq
 from common.utils.logging_handler import Logger
@@ -12,55 +13,136 @@ from common.utils.http_exceptions import (InternalServerError,
                                           ResourceNotFound)
 from common.utils.errors import ValidationError
 from services import common_service
+from services.section_copy import (CopyProgress, CopyStep, call_with_retries,
+                                   run_copy_steps)
 from config import BQ_TABLE_DICT, BQ_DATASET, auth_client
 from googleapiclient.errors import HttpError
 
 
 
-
 # disabling for linting to pass
 # pylint: disable = broad-except, line-too-long
-def copy_course_background_task(course_template_details,
-                                sections_details,
-                                cohort_details,
-                                lms_job_id,current_course,
-                                message=""):
-  """Create section  Background Task to copy course and updated database
-  for newly created section
-  Args:
-    course_template_details (template object): course template object which
-    will referenced in section
-    sections_details (str):Input section details provided by user in API
-    cohort_details(str):course template object which will
-    referenced in section
-    headers(str):Authentications headers
-  Raises:
-    HTTPException: 500 Internal Server Error if something fails
+def get_lti_assignment_details(coursework, section_id, course_template_details,
+                               cohort_details):
+  """Returns the details of the copies of the LTI assignments attached to a
+  coursework, with the due date of the coursework or the end date of the
+  cohort when the due date of the coursework is past"""
+  lti_assignment_details = {
+      "section_id": section_id,
+      "source_context_id": course_template_details.id,
+      "coursework_title": coursework["title"],
+      "start_date": None,
+      "end_date": None,
+      "due_date": None
+  }
 
-  Returns:
-    True : (bool) on success
-  """
-  lms_job = LmsJob.find_by_id(lms_job_id)
-  logs = lms_job.logs
-  Logger.info(current_course)
-  try:
-    # Create a new course
-    info_msg = f"Background Task started for the cohort id {cohort_details.id}\
-                course template {course_template_details.id} \
-                with section name{sections_details.name}"
+  # Update the due date of the course work if exists
+  if coursework.get("dueDate"):
+    coursework_due_date = coursework.get("dueDate")
+
+    if coursework.get("dueTime"):
+      coursework_due_time = coursework.get("dueTime")
+      coursework_due_datetime = datetime.datetime(
+          coursework_due_date.get("year"),
+          coursework_due_date.get("month"),
+          coursework_due_date.get("day"),
+          coursework_due_time.get("hours", 0),
+          coursework_due_time.get("minutes", 0))
+    else:
+      coursework_due_datetime = datetime.datetime(
+          coursework_due_date.get("year"),
+          coursework_due_date.get("month"),
+          coursework_due_date.get("day"))
+
+    curr_utc_timestamp = datetime.datetime.utcnow()
+    lti_assignment_details["start_date"] = (
+        cohort_details.start_date).strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    if coursework_due_datetime < curr_utc_timestamp:
+      # Due dates are supposed to be updated by the user before
+      # starting the copy course process
+      lti_assignment_details["end_date"] = lti_assignment_details[
+          "due_date"] = (
+              cohort_details.end_date).strftime("%Y-%m-%dT%H:%M:%S%z")
 
-    logs["info"].append(info_msg)
-    Logger.info(info_msg)
+    else:
+      lti_assignment_details["end_date"] = lti_assignment_details[
+          "due_date"] = coursework_due_datetime.strftime(
+              "%Y-%m-%dT%H:%M:%S%z")
+  return lti_assignment_details
 
-    new_course = classroom_crud.create_course(course_template_details.name,
-                                              sections_details.description,
-                                              sections_details.name, "me")
 
-    lms_job.classroom_id = new_course["id"]
-    lms_job.start_time = datetime.datetime.utcnow()
-    lms_job.status = "running"
-    lms_job.update()
+def update_lti_assignments_course_work_id(assignment_ids, coursework_id,
+                                          item_type, progress):
+  """Updates the copied LTI assignments with the id of the course work or
+  course work material they are attached to
+
+  Returns:
+    bool: True if an LTI assignment could not be updated
+  """
+  error_flag = False
+  for assignment_id in assignment_ids:
+    # pylint: disable=cell-var-from-loop
+    lti_assignment_req = call_with_retries(lambda: requests.patch(
+        f"http://classroom-shim/classroom-shim/api/v1/lti-assignment/{assignment_id}",
+        headers={
+            "Authorization": f"Bearer {auth_client.get_id_token()}"
+        },
+        json={"course_work_id": coursework_id},
+        timeout=60), "lti")
+
+    if lti_assignment_req.status_code != 200:
+      error_flag = True
+      progress.error(f"Failed to update assignment {assignment_id} with course work id \
+                          {coursework_id} due to error - {lti_assignment_req.text} with \
+                            status code - {lti_assignment_req.status_code} for {item_type}")
+      continue
+    progress.info(
+        f"Updated the {item_type} id for new LTI assignment - {assignment_id}")
+  return error_flag
+
+
+def get_copy_course_steps(course_template_details, sections_details,
+                          cohort_details, progress, coursework_list,
+                          coursework_material_list):
+  """Returns the steps copying a course template into a new section
+
+  The new course and the section are created first. Then the notifications
+  are enabled, the instructional designers are added, and the topics and
+  the attachments of every coursework and coursework material are copied
+  concurrently. Drive files and LTI assignments are the slow part of the
+  copy. The coursework and coursework materials are created one after the
+  other, in the order of the course template. The LTI assignments of each
+  one are then updated with the id of its copy.
+  """
+  template_classroom_id = course_template_details.classroom_id
 
+  def create_course(_):
+    if progress.lms_job.classroom_id:
+      # the course was created by a previous run of the copy
+      new_course = classroom_crud.get_course_by_id(
+          progress.lms_job.classroom_id)
+    else:
+      new_course = classroom_crud.create_course(course_template_details.name,
+                                                sections_details.description,
+                                                sections_details.name, "me")
+      progress.save(classroom_id=new_course["id"])
+    progress.info(
+        f"ID of target drive folder for section {new_course['teacherFolder']['id']}")
+    return {
+        "id": new_course["id"],
+        "enrollment_code": new_course["enrollmentCode"],
+        "alternate_link": new_course["alternateLink"],
+        "teacher_folder_id": new_course["teacherFolder"]["id"],
+        "section": new_course.get("section"),
+        "description": new_course.get("description")
+    }
+
+  def create_section(results):
+    if progress.lms_job.section_id:
+      # the section was created by a previous run of the copy
+      return {"id": progress.lms_job.section_id}
+    course = results["course"]
     # Create section with the required fields
     section = Section()
     section.name = course_template_details.name
@@ -70,270 +152,204 @@ def copy_course_background_task(course_template_details,
     # Reference document can be get using get() method
     section.course_template = course_template_details
     section.cohort = cohort_details
-    section.classroom_id = new_course["id"]
-    section.classroom_code = new_course["enrollmentCode"]
-    section.classroom_url = new_course["alternateLink"]
+    section.classroom_id = course["id"]
+    section.classroom_code = course["enrollment_code"]
+    section.classroom_url = course["alternate_link"]
     section.enrolled_students_count = 0
     section.status = "PROVISIONING"
     section_id = section.save().id
-    classroom_id = new_course["id"]
+    progress.save(section_id=section_id)
+    return {"id": section_id}
 
-    lms_job.section_id = section_id
-    lms_job.update()
+  def enable_notifications(feed_type):
+    def run(results):
+      # add new_course to pubsub topic for course work or roaster changes
+      classroom_crud.enable_notifications(results["course"]["id"], feed_type)
+    return run
 
-    error_flag = False
-    target_folder_id = new_course["teacherFolder"]["id"]
-    logs["info"].append(
-        f"ID of target drive folder for section {target_folder_id}")
-    Logger.info(f"ID of target drive folder for section {target_folder_id}")
-
-    # Get topics of current course
-    topics = classroom_crud.get_topics(course_template_details.classroom_id)
-    # add new_course to pubsub topic for both course work and roaster changes
-    classroom_crud.enable_notifications(new_course["id"], "COURSE_WORK_CHANGES")
-    classroom_crud.enable_notifications(new_course["id"],
-                                        "COURSE_ROSTER_CHANGES")
-    # add instructional designer
+  def add_instructional_designers(results):
+    section = Section.find_by_id(results["section"]["id"])
     list_course_template_enrollment_mapping = CourseTemplateEnrollmentMapping\
       .fetch_all_by_course_template(course_template_details.key)
-    if list_course_template_enrollment_mapping:
-      for course_template_mapping in list_course_template_enrollment_mapping:
-        try:
-          add_instructional_designer_into_section(section,
-                                                  course_template_mapping)
-        except Exception as error:
-          error = traceback.format_exc().replace("\n", " ")
-          Logger.error(f"Create teacher failed for \
-              for {course_template_details.instructional_designer}")
-          Logger.error(error)
-
-    #If topics are present in course create topics returns a dict
-    # with keys a current topicID and new topic id as values
-    if topics is not None:
-      topic_id_map = classroom_crud.create_topics(new_course["id"], topics)
-    # Calling function to get edit_url and view url of
-    # google form which returns
-    # a dictionary of view_links as keys and edit
-    #  links/  and file_id as values for all drive files
-    # url_mapping = classroom_crud.get_edit_url_and_view_url_mapping_of_folder(
-    #   current_course["teacherFolder"]["id"])
-
-    # Get coursework of current course and create a new course
-    coursework_list = classroom_crud.get_coursework_list(
-        course_template_details.classroom_id)
-
-    # final_coursewok=[]
-    for coursework in coursework_list:
-      coursework_lti_assignment_ids = []
+    course_template_mappings = list(
+        list_course_template_enrollment_mapping or [])
+    # the instructional designers are invited with batch requests
+    invitations = call_with_retries(lambda: classroom_crud.invite_users(
+        section.classroom_id,
+        [mapping.user.email for mapping in course_template_mappings],
+        "TEACHER"), "classroom") if course_template_mappings else {}
+    for course_template_mapping in course_template_mappings:
       try:
-        #Check if a coursework is linked to a topic if yes then
-        # replace the old topic id to new topic id using topic_id_map
-
-        lti_assignment_details = {
-            "section_id": section_id,
-            "source_context_id": course_template_details.id,
-            "coursework_title": coursework["title"],
-            "start_date": None,
-            "end_date": None,
-            "due_date": None
-        }
-
-        # Update the due date of the course work if exists
-        if coursework.get("dueDate"):
-          coursework_due_date = coursework.get("dueDate")
-
-          if coursework.get("dueTime"):
-            coursework_due_time = coursework.get("dueTime")
-            coursework_due_datetime = datetime.datetime(
-                coursework_due_date.get("year"),
-                coursework_due_date.get("month"),
-                coursework_due_date.get("day"),
-                coursework_due_time.get("hours", 0),
-                coursework_due_time.get("minutes", 0))
-          else:
-            coursework_due_datetime = datetime.datetime(
-                coursework_due_date.get("year"),
-                coursework_due_date.get("month"),
-                coursework_due_date.get("day"))
-
-          curr_utc_timestamp = datetime.datetime.utcnow()
-          lti_assignment_details["start_date"] = (
-              cohort_details.start_date).strftime("%Y-%m-%dT%H:%M:%S%z")
-
-          if coursework_due_datetime < curr_utc_timestamp:
-            # Commented for now as the due dates are supposed to be updated by the user before
-            # starting the copy course process
-
-            # coursework["dueDate"] = {
-            #   "year": cohort_details.end_date.year,
-            #   "month": cohort_details.end_date.month,
-            #   "day": cohort_details.end_date.day
-            # }
-            # coursework["dueTime"] = {
-            #   "hours": cohort_details.end_date.hour,
-            #   "minutes": cohort_details.end_date.minute
-            # }
-
-            lti_assignment_details["end_date"] = lti_assignment_details[
-                "due_date"] = (
-                    cohort_details.end_date).strftime("%Y-%m-%dT%H:%M:%S%z")
-
-          else:
-            lti_assignment_details["end_date"] = lti_assignment_details[
-                "due_date"] = coursework_due_datetime.strftime(
-                    "%Y-%m-%dT%H:%M:%S%z")
-
-        if "topicId" in coursework.keys():
-          coursework["topicId"] = topic_id_map[coursework["topicId"]]
-        #Check if a material is present in coursework
-        if "materials" in coursework.keys():
-          coursework_update_output = update_coursework_material(
-              materials=coursework["materials"],
-              target_folder_id=target_folder_id,
-              error_flag=error_flag,
-              lti_assignment_details=lti_assignment_details,
-              logs=logs)
-          coursework["materials"] = coursework_update_output["material"]
-          error_flag = coursework_update_output["error_flag"]
-          coursework_lti_assignment_ids.extend(
-              coursework_update_output["lti_assignment_ids"])
-        # final_coursewok.append(coursework)
-
-        coursework_data = classroom_crud.create_coursework(
-            new_course["id"], coursework)
-
-        for assignment_id in coursework_lti_assignment_ids:
-          coursework_id = coursework_data.get("id")
-          input_json = {"course_work_id": coursework_id}
-          # update assignment with new coursework id
-          lti_assignment_req = requests.patch(
-              f"http://classroom-shim/classroom-shim/api/v1/lti-assignment/{assignment_id}",
-              headers={
-                  "Authorization": f"Bearer {auth_client.get_id_token()}"
-              },
-              json=input_json,
-              timeout=60)
-
-          if lti_assignment_req.status_code != 200:
-            error_flag = True
-            error_msg = f"Failed to update assignment {assignment_id} with course work id \
-                          {coursework_id} due to error - {lti_assignment_req.text} with \
-                            status code - {lti_assignment_req.status_code} for course work"
-
-            logs["errors"].append(error_msg)
-            Logger.error(error_msg)
-
-          logs["info"].append(
-              f"Updated the course work id for new LTI assignment - {assignment_id}"
-          )
-          Logger.info(
-              f"Updated the course work id for new LTI assignment - {assignment_id}"
-          )
-
-      except Exception as error:
-        title = coursework["title"]
-        error_flag = True
-        logs["errors"].append(f"Error - {error} for '{title}'")
-        logs["errors"].append(f"Copy coursework failed for \
-              course_id {course_template_details.classroom_id} for '{title}'")
-        Logger.error(f"Copy coursework failed for \
-              course_id {course_template_details.classroom_id} for '{title}'")
+        invitation, error = invitations[course_template_mapping.user.email]
+        if error is not None:
+          raise error
+        add_instructional_designer_into_section(section,
+                                                course_template_mapping,
+                                                invitation)
+      except Exception:
         error = traceback.format_exc().replace("\n", " ")
+        Logger.error(f"Create teacher failed for \
+            for {course_template_details.instructional_designer}")
         Logger.error(error)
-        continue
-
-    # # Create coursework in new course
-    # # return final_coursewok
-    # if final_coursewok is not None:
-    #   classroom_crud.create_coursework(new_course["id"],final_coursewok)
-    # Get the list of courseworkMaterial
-    # final_coursewok_material = []
-    coursework_material_list = classroom_crud.get_coursework_material_list(
-        course_template_details.classroom_id)
-    for coursework_material in coursework_material_list:
-      coursework_material_lti_assignment_ids = []
-      try:
-        #Check if a coursework material is linked to a topic if yes then
-        # replace the old topic id to new topic id using topic_id_map
 
-        lti_assignment_details = {
-            "section_id": section_id,
-            "source_context_id": course_template_details.id,
-            "coursework_title": coursework_material["title"],
-            "start_date": None,
-            "end_date": None,
-            "due_date": None
-        }
-
-        if "topicId" in coursework_material.keys():
-          coursework_material["topicId"] = topic_id_map[
-              coursework_material["topicId"]]
-        #Check if a material is present in coursework
-        if "materials" in coursework_material.keys():
-
-          coursework_material_update_output = update_coursework_material(
-              materials=coursework_material["materials"],
-              target_folder_id=target_folder_id,
-              error_flag=error_flag,
-              lti_assignment_details=lti_assignment_details,
-              logs=logs)
-
-          coursework_material["materials"] = coursework_material_update_output[
-              "material"]
-          error_flag = coursework_update_output["error_flag"]
-          coursework_material_lti_assignment_ids.extend(
-              coursework_update_output["lti_assignment_ids"])
-          print("Updated coursework material attached")
-
-        coursework_material_data = classroom_crud.create_coursework_material(new_course["id"],
-                                                coursework_material)
-
-        for assignment_id in coursework_material_lti_assignment_ids:
-          coursework_id = coursework_material_data.get("id")
-          input_json = {"course_work_id": coursework_id}
-          # update assignment with new coursework id
-          lti_assignment_req = requests.patch(
-              f"http://classroom-shim/classroom-shim/api/v1/lti-assignment/{assignment_id}",
-              headers={
-                  "Authorization": f"Bearer {auth_client.get_id_token()}"
-              },
-              json=input_json,
-              timeout=60)
-
-          if lti_assignment_req.status_code != 200:
-            error_flag = True
-            error_msg = f"Failed to update assignment {assignment_id} with course work id \
-                          {coursework_id} due to error - {lti_assignment_req.text} with \
-                            status code - {lti_assignment_req.status_code} for course work material"
-
-            logs["errors"].append(error_msg)
-            Logger.error(error_msg)
+  def copy_topics(results):
+    # If topics are present in course create topics returns a dict
+    # with keys a current topicID and new topic id as values
+    topics = call_with_retries(
+        lambda: classroom_crud.get_topics(template_classroom_id), "classroom")
+    if topics is None:
+      return {"topic_id_map": {}}
+    topic_id_map = classroom_crud.create_topics(results["course"]["id"],
+                                                topics)
+    return {"topic_id_map": dict(topic_id_map)}
+
+  def copy_attachments(item):
+    def run(results):
+      lti_assignment_details = get_lti_assignment_details(
+          item, results["section"]["id"], course_template_details,
+          cohort_details)
+      output = update_coursework_material(
+          materials=item["materials"],
+          target_folder_id=results["course"]["teacher_folder_id"],
+          error_flag=False,
+          lti_assignment_details=lti_assignment_details,
+          logs=progress.logs)
+      return {
+          "materials": output["material"],
+          "lti_assignment_ids": output["lti_assignment_ids"],
+          "error_flag": output["error_flag"]
+      }
+    return run
+
+  def create_item(template_item, create, attachments_step_id):
+    def run(results):
+      # the template item is left unchanged for a resumed copy
+      item = dict(template_item)
+      # Check if a coursework is linked to a topic if yes then
+      # replace the old topic id to new topic id using topic_id_map
+      if "topicId" in item.keys():
+        item["topicId"] = results["topics"]["topic_id_map"][item["topicId"]]
+      if attachments_step_id:
+        item["materials"] = results[attachments_step_id]["materials"]
+      data = create(results["course"]["id"], item)
+      return {"id": data.get("id")}
+    return run
+
+  def update_lti_assignments(item_type, create_step_id, attachments_step_id):
+    def run(results):
+      error_flag = update_lti_assignments_course_work_id(
+          results[attachments_step_id]["lti_assignment_ids"],
+          results[create_step_id]["id"], item_type, progress)
+      return {"error_flag": error_flag}
+    return run
+
+  steps = [
+      CopyStep("course", create_course, retry=False),
+      CopyStep("section", create_section, ["course"], api=None),
+      CopyStep("notifications:COURSE_WORK_CHANGES",
+               enable_notifications("COURSE_WORK_CHANGES"), ["course"]),
+      CopyStep("notifications:COURSE_ROSTER_CHANGES",
+               enable_notifications("COURSE_ROSTER_CHANGES"), ["course"]),
+      CopyStep("instructional_designers", add_instructional_designers,
+               ["section"], api=None),
+      CopyStep("topics", copy_topics, ["course"], api=None)
+  ]
+  previous_create_step_id = None
+  for item_type, items, create in (
+      ("course work", coursework_list, classroom_crud.create_coursework),
+      ("course work material", coursework_material_list,
+       classroom_crud.create_coursework_material)):
+    for index, item in enumerate(items):
+      step_prefix = f"{item_type.replace(' ', '_')}:{item.get('id', index)}"
+      attachments_step_id = None
+      create_dependencies = ["course", "topics"]
+      if "materials" in item.keys():
+        attachments_step_id = f"{step_prefix}:attachments"
+        # the copied materials are not saved in the LmsJob, the attachments
+        # are copied again if the copy is resumed before the item is created
+        steps.append(CopyStep(attachments_step_id, copy_attachments(item),
+                              ["course", "section"], api=None,
+                              saved_keys=("lti_assignment_ids",
+                                          "error_flag")))
+        create_dependencies.append(attachments_step_id)
+      create_step_id = f"{step_prefix}:create"
+      # items are created in the order of the template, an item which fails
+      # to be created does not prevent the creation of the next ones
+      steps.append(CopyStep(create_step_id,
+                            create_item(item, create, attachments_step_id),
+                            create_dependencies,
+                            after=[previous_create_step_id]
+                            if previous_create_step_id else [],
+                            retry=False))
+      if attachments_step_id:
+        steps.append(CopyStep(
+            f"{step_prefix}:lti_assignments",
+            update_lti_assignments(item_type, create_step_id,
+                                   attachments_step_id),
+            [create_step_id, attachments_step_id], api=None))
+      previous_create_step_id = create_step_id
+  return steps
 
-          logs["info"].append(
-              f"Updated the id for course work material for new LTI assignment - {assignment_id}"
-          )
-          Logger.info(
-              f"Updated the id course work material for new LTI assignment - {assignment_id}"
-          )
 
-        # final_coursewok_material.append(coursework_material)
-      except Exception as error:
-        title = coursework_material["title"]
-        error_flag = True
-        Logger.error(f"Get coursework material failed for\
-        course_id {course_template_details.classroom_id} for {title}")
+def copy_course_background_task(course_template_details,
+                                sections_details,
+                                cohort_details,
+                                lms_job_id,current_course,
+                                message=""):
+  """Create section  Background Task to copy course and updated database
+  for newly created section
 
-        logs["errors"].append(f"Error - {error}")
-        logs["errors"].append(f"Get coursework material failed for\
-        course_id {course_template_details.classroom_id} for {title}")
-        error = traceback.format_exc().replace("\n", " ")
-        Logger.error(error)
-        continue
+  The copy runs as a DAG of steps whose results and timings are saved in
+  the progress of the LMS job, running the task again for the same LMS job
+  resumes the copy after the steps that were completed.
+  Args:
+    course_template_details (template object): course template object which
+    will referenced in section
+    sections_details (str):Input section details provided by user in API
+    cohort_details(str):course template object which will
+    referenced in section
+    lms_job_id(str): id of the LMS job of the copy
+  Raises:
+    HTTPException: 500 Internal Server Error if something fails
 
-    # # Create coursework in new course
-    # if final_coursewok_material is not None:
-    #   classroom_crud.create_coursework_material(new_course["id"],
-    #                                             final_coursewok_material)
+  Returns:
+    True : (bool) on success
+  """
+  lms_job = LmsJob.find_by_id(lms_job_id)
+  progress = CopyProgress(lms_job)
+  Logger.info(current_course)
+  try:
+    info_msg = f"Background Task started for the cohort id {cohort_details.id}\
+                course template {course_template_details.id} \
+                with section name{sections_details.name}"
+    progress.info(info_msg)
+    progress.save(start_time=datetime.datetime.utcnow(), status="running")
+
+    # Get coursework and coursework material of current course
+    with ThreadPoolExecutor(max_workers=2) as executor:
+      coursework_future = executor.submit(
+          classroom_crud.get_coursework_list,
+          course_template_details.classroom_id)
+      coursework_material_future = executor.submit(
+          classroom_crud.get_coursework_material_list,
+          course_template_details.classroom_id)
+      coursework_list = coursework_future.result()
+      coursework_material_list = coursework_material_future.result()
+    if coursework_list is None or coursework_material_list is None:
+      raise Exception("Failed to list the coursework of the course template") # pylint: disable=broad-exception-raised
+
+    steps = get_copy_course_steps(course_template_details, sections_details,
+                                  cohort_details, progress,
+                                  list(coursework_list),
+                                  list(coursework_material_list))
+    error_flag = run_copy_steps(steps, progress)
+    if progress.is_done("section"):
+      section = Section.find_by_id(progress.get_result("section")["id"])
+    else:
+      section = None
+    if section is None:
+      raise Exception("Failed to create the section of the course") # pylint: disable=broad-exception-raised
+    new_course = progress.get_result("course")
 
     # Classroom copy is successful then the section status is changed to active
     if error_flag:
@@ -343,9 +359,9 @@ def copy_course_background_task(course_template_details,
     section.update()
 
     rows=[{
-      "sectionId":section_id,\
+      "sectionId":section.id,\
       "courseId":new_course["id"],\
-      "classroomUrl":new_course["alternateLink"],\
+      "classroomUrl":new_course["alternate_link"],\
         "name":new_course["section"],\
         "description":new_course["description"],\
           "cohortId":cohort_details.id,\
@@ -360,36 +376,22 @@ def copy_course_background_task(course_template_details,
         dataset=BQ_DATASET,
         table_name=BQ_TABLE_DICT["BQ_COLL_SECTION_TABLE"])
     Logger.info(message)
-    Logger.info(f"Background Task Completed for section Creation for cohort\
-                {cohort_details.id}")
-    Logger.info(f"Section Details are section id {section_id},\
-                classroom id {classroom_id}")
-
-    logs["info"].append(
+    progress.info(
         f"Background Task Completed for section Creation for cohort\
                 {cohort_details.id}")
-    logs["info"].append(f"Section Details are section id {section_id},\
-                classroom id {classroom_id}")
-
-    lms_job.logs = logs
-    if error_flag:
-      lms_job.status = "failed"
-    else:
-      lms_job.status = "success"
-    lms_job.end_time = datetime.datetime.utcnow()
-    lms_job.update()
+    progress.info(f"Section Details are section id {section.id},\
+                classroom id {new_course['id']}")
 
+    progress.save(status="failed" if error_flag else "success",
+                  end_time=datetime.datetime.utcnow())
     return True
   except Exception as e:
     error = traceback.format_exc().replace("\n", " ")
     Logger.error(error)
     Logger.error(e)
 
-    logs["errors"].append(str(e))
-    lms_job.logs = logs
-    lms_job.end_time = datetime.datetime.utcnow()
-    lms_job.status = "failed"
-    lms_job.update()
+    progress.error(str(e))
+    progress.save(status="failed", end_time=datetime.datetime.utcnow())
 
     raise InternalServerError(str(e)) from e
 
@@ -954,7 +956,10 @@ def update_coursework_material(materials,
   for material in materials:
     if "driveFile" in material.keys():
       if material["driveFile"]["driveFile"]["id"] not in drive_ids:
-        classroom_crud.copy_material(material, target_folder_id)
+        # pylint: disable=cell-var-from-loop
+        call_with_retries(
+            lambda: classroom_crud.copy_material(material, target_folder_id),
+            "drive")
         drive_ids.append(material["driveFile"]["driveFile"]["id"])
         updated_material.append({"driveFile": material["driveFile"]})
 
@@ -976,7 +981,7 @@ def update_coursework_material(materials,
               f"LTI Course copy started for assignment - {lti_assignment_id}, coursework title - '{coursework_title}'")
           Logger.info(
               f"LTI Course copy started for assignment - {lti_assignment_id}, coursework title - '{coursework_title}'")
-          copy_assignment = requests.post(
+          copy_assignment = call_with_retries(lambda: requests.post(
               "http://classroom-shim/classroom-shim/api/v1/lti-assignment/copy",
               headers={
                   "Authorization": f"Bearer {auth_client.get_id_token()}"
@@ -989,7 +994,7 @@ def update_coursework_material(materials,
                   "end_date": lti_assignment_details.get("end_date"),
                   "due_date": lti_assignment_details.get("due_date")
               },
-              timeout=60)
+              timeout=60), "lti")
 
           if copy_assignment.status_code == 200:
             new_lti_assignment_id = copy_assignment.json().get("data").get(
@@ -1035,9 +1040,10 @@ def update_coursework_material(materials,
       form_l = form_url.split("/")
       form_id = form_l[-2]
       Logger.info(f"This is form ID {form_id}")
-      result1 = classroom_crud.drive_copy(
+      # pylint: disable=cell-var-from-loop
+      result1 = call_with_retries(lambda: classroom_crud.drive_copy(
           form_id, target_folder_id,
-          material["form"]["title"])
+          material["form"]["title"]), "drive")
       material["link"] = {
           "title": material["form"]["title"],
           "url": result1["webViewLink"]
@@ -1099,6 +1105,13 @@ def update_grades(material, section, coursework_id, lms_job_id, classroom_course
       logs["errors"].append("Responses not available for google form")
       Logger.error("Responses not available for google form")
 
+    # the submissions of all the respondents are listed with batch requests
+    respondents_submissions = classroom_crud.list_coursework_submissions_users(
+        section.classroom_id, coursework_id,
+        list({response["respondentEmail"]
+              for response in all_responses_of_form.get("responses", [])
+              if "respondentEmail" in response}))
+
     for response in all_responses_of_form.get("responses", []):
       try:
         if "respondentEmail" not in response.keys():
@@ -1109,8 +1122,11 @@ def update_grades(material, section, coursework_id, lms_job_id, classroom_course
           raise Exception(error_msg)
 
         respondent_email = response["respondentEmail"]
-        submissions = classroom_crud.list_coursework_submissions_user(
-            section.classroom_id, coursework_id, response["respondentEmail"])
+        submissions = respondents_submissions.get(respondent_email)
+        if submissions is None:
+          # the batch request of this respondent failed
+          submissions = classroom_crud.list_coursework_submissions_user(
+              section.classroom_id, coursework_id, respondent_email)
 
         if submissions:
           if submissions[0]["state"] == "TURNED_IN":
@@ -1239,19 +1255,23 @@ def validate_section(section):
   return True
 
 
-def add_instructional_designer_into_section(section, course_template_mapping):
+def add_instructional_designer_into_section(section, course_template_mapping,
+                                            invitation_object=None):
   """Add instructional designer into section
 
   Args:
       section (Section): section object
       course_template_mapping (CourseTemplateMapping):
       course template enrollment mapping object
+      invitation_object (dict): invitation of the instructional designer
+      when already created by a batch of invitations
 
   Returns:
       CourseEnrollmentMapping: enrollment mapping
   """
-  invitation_object = classroom_crud.invite_user(
-    section.classroom_id, course_template_mapping.user.email, "TEACHER")
+  if invitation_object is None:
+    invitation_object = classroom_crud.invite_user(
+      section.classroom_id, course_template_mapping.user.email, "TEACHER")
   classroom_crud.acceept_invite(invitation_object["id"],
                                 course_template_mapping.user.email)
   status = "active"
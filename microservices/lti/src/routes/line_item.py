@@ -1,7 +1,7 @@
 """Line item  Endpoints"""
 import traceback
 import requests
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.security import HTTPBearer
 from config import ERROR_RESPONSES, LTI_ISSUER_DOMAIN, auth_client
 from common.models import (LineItem, Result, Score, Tool, LTIContentItem,
@@ -9,6 +9,7 @@ from common.models import (LineItem, Result, Score, Tool, LTIContentItem,
 from common.utils.errors import (ResourceNotFoundException, ValidationError,
                                  InvalidTokenError)
 from common.utils.logging_handler import Logger
+from common.utils.cursor_pagination import fetch_page
 from common.utils.http_exceptions import (InternalServerError, ResourceNotFound,
                                           Unauthenticated)
 from schemas.line_item_schema import (LineItemModel, LineItemResponseModel,
@@ -43,19 +44,25 @@ router = APIRouter(tags=["Line item"], responses=ERROR_RESPONSES)
     "https://purl.imsglobal.org/spec/lti-ags/scope/lineitem.readonly"
 ])
 def get_all_line_items(context_id: str,
+                       request: Request,
+                       response: Response,
                        resource_id: str = None,
                        resource_link_id: str = None,
                        tag: str = None,
                        skip: int = 0,
                        limit: int = 1000,
+                       page_token: str = None,
                        token: auth_scheme = Depends()):
   """The get line items endpoint will return an array of line items
-  from firestore
+  from firestore. When more line items are available, the url of the next
+  page is sent in the `Link` header with `rel="next"`
   ### Args:
   skip: `int`
     Number of line items to be skipped <br/>
   limit: `int`
     Size of line items array to be returned <br/>
+  page_token: `str`
+    Token of the next page, taken from the `Link` header <br/>
   resource_id: `str`
     Tool resource ID in a line item <br/>
   resource_link_id: `str`
@@ -90,8 +97,15 @@ def get_all_line_items(context_id: str,
     if tag:
       collection_manager = collection_manager.filter("tag", "==", tag)
 
-    line_items = collection_manager.order("-created_time").offset(skip).fetch(
-        limit)
+    if skip and not page_token:
+      line_items = collection_manager.order("-created_time").offset(
+          skip).fetch(limit)
+    else:
+      line_items, next_page_token = fetch_page(collection_manager, limit,
+                                               page_token)
+      if next_page_token:
+        next_url = request.url.include_query_params(page_token=next_page_token)
+        response.headers["Link"] = f"<{next_url}>; rel=\"next\""
 
     line_items_list = []
     for i in line_items:
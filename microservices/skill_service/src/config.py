@@ -76,6 +76,17 @@ CREATE_KG_EMBEDDING_JOB_TYPE = "create_knowledge_graph_embedding"
 POPULATE_KNOWLEDGE_EMBEDDING_JOB_TYPE = "knowledge_embedding_db_update"
 ROLE_SKILL_MAPPING_JOB_TYPE = "role_skill_alignment"
 
+# rows written per bulk ingestion chunk, the progress of an ingestion is
+# checkpointed after every chunk
+BULK_INGEST_CHUNK_SIZE = int(os.getenv("BULK_INGEST_CHUNK_SIZE", "500"))
+# write rate of the Firestore BulkWriter used for ingestion
+BULK_INGEST_INITIAL_OPS_PER_SECOND = int(
+  os.getenv("BULK_INGEST_INITIAL_OPS_PER_SECOND", "500"))
+BULK_INGEST_MAX_OPS_PER_SECOND = int(
+  os.getenv("BULK_INGEST_MAX_OPS_PER_SECOND", "2000"))
+BULK_INGEST_MAX_ATTEMPTS = int(os.getenv("BULK_INGEST_MAX_ATTEMPTS", "5"))
+BULK_INGEST_CHECKPOINT_COLLECTION = DATABASE_PREFIX + "ingestion_checkpoints"
+
 # reranker ranks the results from a set of semantically similar results
 # retrieved.
 # If the reranker score crosses this threshold, then the document is
@@ -85,11 +96,31 @@ SKILL_PARSER_RERANKED_THRESHOLD = 0.2
 # If the ratio (number of mapped children nodes)/(total number of child nodes)
 # crosses this threshold, the parent node is semantically similar to the query.
 RATIO_THRESHOLD = 0.5
+# number of (skill, passage) pairs scored per cross encoder forward pass
+CROSS_ENCODER_BATCH_SIZE = int(os.getenv("CROSS_ENCODER_BATCH_SIZE", "64"))
+# passages with a bi-encoder cosine similarity to the skill below this
+# threshold are given a score of 0 without running the cross encoder,
+# no pre-filtering is done when unset
+PASSAGE_PREFILTER_THRESHOLD = os.getenv("PASSAGE_PREFILTER_THRESHOLD")
+if PASSAGE_PREFILTER_THRESHOLD:
+  PASSAGE_PREFILTER_THRESHOLD = float(PASSAGE_PREFILTER_THRESHOLD)
+else:
+  PASSAGE_PREFILTER_THRESHOLD = None
 
 DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
 CONTAINER_NAME = os.getenv("CONTAINER_NAME")
 MATCHING_ENGINE_BUCKET_NAME = os.getenv("MATCHING_ENGINE_BUCKET_NAME")
 
+# reuse stored embeddings of unchanged texts and update indexes with the
+# changed documents only
+EMBEDDING_INCREMENTAL_REFRESH = os.getenv(
+  "EMBEDDING_INCREMENTAL_REFRESH", "true").lower() == "true"
+# local directory or gs:// path of the embedding store and index manifests
+EMBEDDING_STORE_PATH = os.getenv(
+  "EMBEDDING_STORE_PATH",
+  f"gs://{MATCHING_ENGINE_BUCKET_NAME}/embedding-store"
+  if MATCHING_ENGINE_BUCKET_NAME else "/tmp/skill-service-embedding-store")
+
 SERVICES = {"matching-engine": {"host": "matching-engine", "port": 80}}
 
 # ANN service parameters
@@ -100,6 +131,18 @@ DISTANCE_MEASURE_TYPE = "DOT_PRODUCT_DISTANCE"
 LEAF_NODE_EMB_COUNT = 500
 LEAF_NODES_TO_SEARCH_PRECENT = 70
 
+# vector index backend used for search and alignment, "matching_engine" or
+# "local" for in process indexes built from the same embedding CSVs
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "matching_engine")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "/tmp/skill-service-indexes")
+# "flat" for exact inner product search or "hnsw" (requires hnswlib)
+LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "flat")
+# seconds for which the list of matching engine indexes is cached
+INDEX_METADATA_TTL = int(os.getenv("INDEX_METADATA_TTL", "300"))
+# polling interval bounds of matching engine index operations in seconds
+INDEX_OPERATION_MIN_POLL_INTERVAL = 30
+INDEX_OPERATION_MAX_POLL_INTERVAL = 300
+
 BI_ENCODER_MODELS = {
     "SKILL_PARSING": "all-mpnet-base-v2",
     "SEARCH": "all-mpnet-base-v2",
@@ -114,6 +157,11 @@ CROSS_ENCODER_MODELS = {
     "SKILL_TO_PASSAGE": "cross-encoder/ms-marco-MiniLM-L-12-v2"
 }
 
+# CPU inference optimization of the encoder models: "none", "int8" or "onnx"
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "none").lower()
+# maximum number of tokens of the inputs of all the shared encoder models
+ENCODER_MAX_SEQ_LENGTH = int(os.getenv("ENCODER_MAX_SEQ_LENGTH", "256"))
+
 PAYLOAD_FILE_SIZE = 2097152 #2MB
 
 ERROR_RESPONSES = {
@@ -0,0 +1,368 @@
+"""
+  Bulk writer used to ingest skill graph nodes from CSV files and external
+  sources
+"""
+import csv
+import datetime
+import hashlib
+import json
+import time
+from fireo.database import db
+from fireo.queries.create_query import CreateQuery
+from google.cloud import firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+from common.utils.gcs_adapter import get_blob_from_gcs_path
+from common.utils.collection_references import collection_references
+from common.utils.parent_child_nodes_handler import ParentChildNodesHandler
+from common.utils.logging_handler import Logger
+from config import (BULK_INGEST_CHUNK_SIZE, BULK_INGEST_INITIAL_OPS_PER_SECOND,
+                    BULK_INGEST_MAX_OPS_PER_SECOND, BULK_INGEST_MAX_ATTEMPTS,
+                    BULK_INGEST_CHECKPOINT_COLLECTION)
+# pylint: disable = broad-exception-raised
+
+REFERENCE_FIELDS = {"parent_nodes": "child_nodes",
+                    "child_nodes": "parent_nodes"}
+
+
+def stream_gcs_csv(csv_file_uri):
+  """streams the rows of a csv file in gcs as dicts without downloading the
+  whole file"""
+  blob = get_blob_from_gcs_path(csv_file_uri)
+  with blob.open("r", encoding="utf-8") as file:
+    yield from csv.DictReader(file, delimiter=",")
+
+
+class RowsDigest():
+  """Iterable over rows that hashes their content while they are read, so
+  that a validation pass over a file also identifies its content"""
+
+  def __init__(self, rows):
+    self.rows = rows
+    self._hash = hashlib.sha256()
+
+  def __iter__(self):
+    for row in self.rows:
+      self._hash.update(
+          json.dumps(row, sort_keys=True, default=str).encode("utf-8"))
+      yield row
+
+  def hexdigest(self):
+    return self._hash.hexdigest()
+
+
+def get_content_checkpoint_key(prefix, rows):
+  """returns a checkpoint key bound to the content of the rows, so that a
+  changed source is not resumed after the rows of a previous version"""
+  digest = RowsDigest(rows)
+  for _ in digest:
+    pass
+  return f"{prefix}:{digest.hexdigest()}"
+
+
+def get_document_data(node):
+  """returns the firestore document data of a FireO object, as written by
+  its save method"""
+  # pylint: disable = protected-access
+  return CreateQuery(type(node), node, **node._get_fields())._parse_field()
+
+
+def get_reference_changes(existing_fields, new_fields):
+  """returns the (reference field, collection, uuid, operation) changes of the
+  parent and child node references of a node, compared like
+  ParentChildNodesHandler.compare_and_update_nodes_references"""
+  changes = []
+  for field in REFERENCE_FIELDS:
+    new_references = new_fields.get(field) or {}
+    if field not in new_fields or (existing_fields and not new_references):
+      continue
+    existing_references = (existing_fields or {}).get(field) or {}
+    for collection_type, uuids in new_references.items():
+      existing_uuids = existing_references.get(collection_type) or []
+      for uuid in uuids:
+        if uuid not in existing_uuids:
+          changes.append((field, collection_type, uuid, "add"))
+      for uuid in existing_uuids:
+        if uuid not in uuids:
+          changes.append((field, collection_type, uuid, "remove"))
+  return changes
+
+
+class NodeIndex():
+  """In memory name and reference id to uuid index of a node collection
+
+  The index is loaded with a single streamed query so that references to
+  other nodes are resolved without one query per referenced name.
+  """
+
+  def __init__(self, data_model):
+    self.data_model = data_model
+    self.uuids_by_name = {}
+    self.uuids_by_reference_id = {}
+    collection = db.conn.collection(data_model.collection_name)
+    for snapshot in collection.select(
+        ["uuid", "name", "reference_id"]).stream():
+      fields = snapshot.to_dict()
+      self.add(fields.get("uuid") or snapshot.id, fields.get("name"),
+               fields.get("reference_id"))
+    Logger.info(f"Loaded {len(self.uuids_by_reference_id)} reference ids of "
+                f"{data_model.collection_name}")
+
+  def add(self, uuid, name, reference_id):
+    if name is not None:
+      uuids = self.uuids_by_name.setdefault(name, [])
+      if uuid not in uuids:
+        uuids.append(uuid)
+    if reference_id is not None:
+      self.uuids_by_reference_id.setdefault(reference_id, uuid)
+
+  def find_by_name(self, name):
+    return self.uuids_by_name.get(name, [])
+
+  def find_by_reference_id(self, reference_id):
+    return self.uuids_by_reference_id.get(reference_id)
+
+
+class IngestionCheckpoint():
+  """Number of rows of an ingestion written so far, stored in firestore so
+  that a failed ingestion resumes after the last written chunk"""
+
+  def __init__(self, key):
+    self.key = key
+    self.ref = db.conn.collection(BULK_INGEST_CHECKPOINT_COLLECTION).document(
+        hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+  def load(self):
+    snapshot = self.ref.get()
+    if not snapshot.exists:
+      return 0
+    return snapshot.to_dict().get("rows_done", 0)
+
+  def save(self, rows_done):
+    self.ref.set({
+        "key": self.key,
+        "rows_done": rows_done,
+        "last_modified_time": datetime.datetime.utcnow()
+    })
+
+  def delete(self):
+    self.ref.delete()
+
+
+class BulkNodeWriter():
+  """Upserts skill graph nodes with a firestore BulkWriter
+
+  Rows are written in chunks. Existing nodes of a chunk, matched by
+  reference id, are fetched with batched reads and every node of the chunk
+  is written once. Parent and child references of the ingested nodes are
+  updated on the referenced nodes in memory when they are part of the chunk
+  and with array union/remove updates otherwise, so no node is read per
+  reference. The BulkWriter sends the writes in parallel batches and ramps
+  up from `initial_ops_per_second` to `max_ops_per_second`.
+  """
+
+  def __init__(self,
+               chunk_size=BULK_INGEST_CHUNK_SIZE,
+               initial_ops_per_second=BULK_INGEST_INITIAL_OPS_PER_SECOND,
+               max_ops_per_second=BULK_INGEST_MAX_OPS_PER_SECOND,
+               max_attempts=BULK_INGEST_MAX_ATTEMPTS):
+    self.chunk_size = chunk_size
+    self.max_attempts = max_attempts
+    self.writer = db.conn.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=initial_ops_per_second,
+        max_ops_per_second=max_ops_per_second))
+    self.writer.on_write_error(self._on_write_error)
+    self.indexes = {}
+    self.failures = []
+    self._pending = []
+
+  def _on_write_error(self, failure, _):
+    if failure.attempts < self.max_attempts:
+      return True
+    self.failures.append(failure)
+    return False
+
+  def get_index(self, data_model):
+    if data_model not in self.indexes:
+      self.indexes[data_model] = NodeIndex(data_model)
+    return self.indexes[data_model]
+
+  def resolve_nodes(self, names, data_model, create_node=None):
+    """returns the uuids of the nodes with the given names, or reference ids
+    when no node has the name. Missing nodes are created from the node data
+    returned by `create_node(name)`"""
+    index = self.get_index(data_model)
+    uuids = []
+    for name in names:
+      name_uuids = index.find_by_name(name)
+      if name_uuids:
+        uuids.extend(name_uuids)
+        continue
+      uuid = index.find_by_reference_id(name)
+      if uuid is None and create_node is not None:
+        uuid = self.add_node(create_node(name), data_model)
+      if uuid is not None:
+        uuids.append(uuid)
+    return uuids
+
+  def add_node(self, node_data, data_model):
+    """adds a node to the current chunk, updating the node with the same
+    reference id if there is one, and returns its uuid"""
+    index = self.get_index(data_model)
+    uuid = index.find_by_reference_id(node_data.get("reference_id"))
+    is_new = uuid is None
+    if is_new:
+      uuid = db.conn.collection(data_model.collection_name).document().id
+      index.add(uuid, node_data.get("name"), node_data.get("reference_id"))
+    self._pending.append((data_model, uuid, node_data, is_new))
+    return uuid
+
+  def ingest(self, rows, data_model, to_node_data, checkpoint_key=None):
+    """upserts one node per row, resuming after the rows written by a
+    previous run with the same checkpoint key
+      Args:
+        rows: iterable of rows
+        data_model: FireO model of the nodes
+        to_node_data: function returning the node data of a row
+        checkpoint_key: str - identifies the ingestion, no checkpoints are
+          kept when not given
+      Returns:
+        dict: number of rows, rows skipped on resume, time and rows/sec
+    """
+    checkpoint = IngestionCheckpoint(checkpoint_key) if checkpoint_key \
+        else None
+    rows_done = checkpoint.load() if checkpoint else 0
+    if rows_done:
+      Logger.info(f"Resuming ingestion of {data_model.collection_name} "
+                  f"after {rows_done} rows")
+    start_time = time.perf_counter()
+    row_count = 0
+    chunk_rows = 0
+    for row_count, row in enumerate(rows, start=1):
+      if row_count <= rows_done:
+        continue
+      self.add_node(to_node_data(row), data_model)
+      chunk_rows += 1
+      if chunk_rows == self.chunk_size:
+        self.flush()
+        chunk_rows = 0
+        if checkpoint:
+          checkpoint.save(row_count)
+        self._log_progress(data_model, row_count, rows_done, start_time)
+    self.flush()
+    if checkpoint:
+      checkpoint.delete()
+    report = self._log_progress(data_model, row_count, rows_done, start_time)
+    report["rows_skipped"] = min(rows_done, row_count)
+    return report
+
+  def _log_progress(self, data_model, row_count, rows_done, start_time):
+    elapsed = time.perf_counter() - start_time
+    rows_written = max(row_count - rows_done, 0)
+    rows_per_second = rows_written / elapsed if elapsed else 0.0
+    Logger.info(f"Ingested {row_count} rows of {data_model.collection_name} "
+                f"({rows_per_second:.1f} rows/sec)")
+    return {
+        "rows": row_count,
+        "elapsed": round(elapsed, 3),
+        "rows_per_second": round(rows_per_second, 1)
+    }
+
+  def flush(self):
+    """writes the nodes of the current chunk and their references"""
+    if not self._pending:
+      return
+    pending, self._pending = self._pending, []
+    timestamp = datetime.datetime.utcnow()
+    nodes = {}
+    uuids_by_model = {}
+    for data_model, uuid, _, is_new in pending:
+      if not is_new:
+        uuids_by_model.setdefault(data_model, []).append(uuid)
+    for data_model, uuids in uuids_by_model.items():
+      for uuid, node in data_model.find_by_ids(uuids).items():
+        nodes[(data_model, uuid)] = node
+    # new nodes are created upfront so that references to them are always
+    # updated in memory instead of racing with their creation
+    created = set()
+    for data_model, uuid, node_data, is_new in pending:
+      if is_new and (data_model, uuid) not in nodes:
+        node = data_model.from_dict(node_data)
+        node.created_time = timestamp
+        nodes[(data_model, uuid)] = node
+        created.add((data_model, uuid))
+
+    reference_updates = {}
+    for data_model, uuid, node_data, _ in pending:
+      node = nodes.get((data_model, uuid))
+      if (data_model, uuid) in created:
+        created.remove((data_model, uuid))
+        existing_fields = None
+      elif node is None:
+        # the node of the reference id was deleted, it is created again
+        existing_fields = None
+        node = data_model.from_dict(node_data)
+        node.created_time = timestamp
+        nodes[(data_model, uuid)] = node
+      else:
+        existing_fields = node.get_fields()
+        for key, value in node_data.items():
+          setattr(node, key, value)
+      node.uuid = uuid
+      node.last_modified_time = timestamp
+
+      collection_name = ParentChildNodesHandler.get_collection_name(
+          data_model)
+      for field, collection_type, reference_uuid, operation in \
+          get_reference_changes(existing_fields, node_data):
+        reference_model = collection_references[collection_type]
+        reference_node = nodes.get((reference_model, reference_uuid))
+        reference_field = REFERENCE_FIELDS[field]
+        if reference_node is not None:
+          self._update_references(reference_node, reference_field,
+                                  collection_name, uuid, operation)
+          continue
+        path = f"{reference_field}.{collection_name}"
+        updates = reference_updates.setdefault(
+            (reference_model, reference_uuid), {}).setdefault(
+                path, {"add": [], "remove": []})
+        other_operation = "remove" if operation == "add" else "add"
+        if uuid in updates[other_operation]:
+          updates[other_operation].remove(uuid)
+        if uuid not in updates[operation]:
+          updates[operation].append(uuid)
+
+    for (data_model, uuid), node in nodes.items():
+      self.writer.set(
+          db.conn.collection(data_model.collection_name).document(uuid),
+          get_document_data(node), merge=True)
+    for (data_model, uuid), paths in reference_updates.items():
+      ref = db.conn.collection(data_model.collection_name).document(uuid)
+      for operation, transform in (("add", firestore.ArrayUnion),
+                                   ("remove", firestore.ArrayRemove)):
+        field_updates = {path: transform(updates[operation])
+                         for path, updates in paths.items()
+                         if updates[operation]}
+        if field_updates:
+          field_updates["last_modified_time"] = timestamp
+          self.writer.update(ref, field_updates)
+    self.writer.flush()
+    for data_model, uuid in list(nodes) + list(reference_updates):
+      data_model.invalidate_cache(uuid)
+
+    if self.failures:
+      failures, self.failures = self.failures, []
+      raise Exception(f"{len(failures)} writes failed during bulk ingestion: "
+                      f"{failures[0].message}")
+
+  def _update_references(self, node, field, collection_name, uuid, operation):
+    references = dict(getattr(node, field) or {})
+    uuids = list(references.get(collection_name) or [])
+    if operation == "add" and uuid not in uuids:
+      uuids.append(uuid)
+    elif operation == "remove" and uuid in uuids:
+      uuids.remove(uuid)
+    references[collection_name] = uuids
+    setattr(node, field, references)
+
+  def close(self):
+    self.writer.close()
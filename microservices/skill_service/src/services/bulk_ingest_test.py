@@ -0,0 +1,200 @@
+"""
+  Unit tests for the bulk node writer used by the ingestion services
+"""
+import itertools
+from unittest import mock
+import pytest
+from google.cloud import firestore
+with mock.patch(
+    "google.cloud.logging.Client", side_effect=mock.MagicMock()) as mok:
+  from services.bulk_ingest import (BulkNodeWriter, get_reference_changes,
+                                    get_content_checkpoint_key)
+
+
+class FakeNode():
+  """Stands in for a FireO node model"""
+  stored = {}
+  invalidated = []
+
+  def __init__(self, **fields):
+    self.__dict__.update(fields)
+
+  @classmethod
+  def from_dict(cls, data):
+    return cls(**data)
+
+  @classmethod
+  def find_by_ids(cls, uuids):
+    return {uuid: cls.stored[uuid] for uuid in uuids if uuid in cls.stored}
+
+  @classmethod
+  def invalidate_cache(cls, uuid):
+    FakeNode.invalidated.append(uuid)
+
+  def get_fields(self):
+    return dict(self.__dict__)
+
+
+class FakeSkill(FakeNode):
+  collection_name = "skills"
+  stored = {}
+
+
+class FakeCompetency(FakeNode):
+  collection_name = "competencies"
+  stored = {}
+
+
+class FakeCheckpoint():
+  saved = {}
+
+  def __init__(self, key):
+    self.key = key
+
+  def load(self):
+    return self.saved.get(self.key, 0)
+
+  def save(self, rows_done):
+    self.saved[self.key] = rows_done
+
+  def delete(self):
+    self.saved.pop(self.key, None)
+
+
+def make_snapshot(doc_id, fields):
+  return mock.Mock(id=doc_id, to_dict=mock.Mock(return_value=fields))
+
+
+@pytest.fixture
+def fake_db():
+  """patches firestore with collections streaming the given snapshots"""
+  snapshots = {}
+  new_ids = itertools.count()
+
+  def collection(name):
+    collection_ref = mock.MagicMock()
+    collection_ref.select.return_value.stream.side_effect = \
+        lambda: iter(snapshots.get(name, []))
+    collection_ref.document.side_effect = lambda uuid=None: mock.Mock(
+        id=uuid or f"new_{next(new_ids)}", path=f"{name}/{uuid}")
+    return collection_ref
+
+  db = mock.MagicMock()
+  db.conn.collection.side_effect = collection
+  FakeSkill.stored, FakeCompetency.stored = {}, {}
+  FakeNode.invalidated = []
+  with mock.patch("services.bulk_ingest.db", db), \
+      mock.patch.dict("services.bulk_ingest.collection_references",
+                      {"skills": FakeSkill, "competencies": FakeCompetency},
+                      clear=True), \
+      mock.patch("services.bulk_ingest.get_document_data",
+                 side_effect=lambda node: node.get_fields()), \
+      mock.patch("services.bulk_ingest.IngestionCheckpoint", FakeCheckpoint):
+    yield db, snapshots
+
+
+def test_get_reference_changes():
+  # all the references of a new node are added
+  assert get_reference_changes(None, {
+      "parent_nodes": {"competencies": ["c1"]},
+      "child_nodes": {}
+  }) == [("parent_nodes", "competencies", "c1", "add")]
+
+  existing_fields = {
+      "parent_nodes": {"competencies": ["c1", "c2"]},
+      "child_nodes": {"skills": ["s1"]}
+  }
+  assert get_reference_changes(existing_fields, {
+      "parent_nodes": {"competencies": ["c2", "c3"]},
+      "child_nodes": {"skills": []}
+  }) == [
+      ("parent_nodes", "competencies", "c3", "add"),
+      ("parent_nodes", "competencies", "c1", "remove"),
+      ("child_nodes", "skills", "s1", "remove"),
+  ]
+  # references missing from the new data are left unchanged
+  assert not get_reference_changes(existing_fields, {"name": "skill"})
+
+
+def test_resolve_nodes(fake_db):
+  db, snapshots = fake_db
+  snapshots["skills"] = [
+      make_snapshot("s1", {"uuid": "s1", "name": "Python",
+                           "reference_id": "r1"}),
+      make_snapshot("s2", {"name": "Java", "reference_id": "r2"})
+  ]
+  writer = BulkNodeWriter()
+  uuids = writer.resolve_nodes(
+      ["Python", "r2", "Go"], FakeSkill,
+      create_node=lambda name: {"name": name, "reference_id": name})
+  assert uuids == ["s1", "s2", "new_0"]
+  # names without a node are skipped when no node is created
+  assert writer.resolve_nodes(["Rust"], FakeSkill) == []
+  # created nodes are found by name, the collection is only read once
+  assert writer.resolve_nodes(["Go"], FakeSkill) == ["new_0"]
+  assert len(writer.get_index(FakeSkill).find_by_name("Python")) == 1
+  assert db.conn.collection.call_args_list.count(mock.call("skills")) == 2
+
+
+def test_flush_writes_nodes_and_references(fake_db):
+  FakeSkill.stored["s1"] = FakeSkill(
+      uuid="s1", name="Python", reference_id="r1",
+      parent_nodes={"competencies": ["c1"]})
+  _, snapshots = fake_db
+  snapshots["skills"] = [make_snapshot("s1", {"uuid": "s1", "name": "Python",
+                                              "reference_id": "r1"})]
+  writer = BulkNodeWriter()
+  uuid = writer.add_node({"name": "Python 3", "reference_id": "r1",
+                          "parent_nodes": {"competencies": ["c2"]}},
+                         FakeSkill)
+  assert uuid == "s1"
+  writer.flush()
+
+  set_call = writer.writer.set.call_args
+  assert set_call[0][0].path == "skills/s1"
+  assert set_call[0][1]["name"] == "Python 3"
+  assert set_call[0][1]["parent_nodes"] == {"competencies": ["c2"]}
+  assert set_call[1] == {"merge": True}
+
+  # references on nodes outside of the chunk are updated without reading
+  updates = {call[0][0].path: call[0][1]
+             for call in writer.writer.update.call_args_list}
+  assert updates["competencies/c2"]["child_nodes.skills"] == \
+      firestore.ArrayUnion(["s1"])
+  assert updates["competencies/c1"]["child_nodes.skills"] == \
+      firestore.ArrayRemove(["s1"])
+  writer.writer.flush.assert_called_once()
+  assert set(FakeNode.invalidated) == {"s1", "c1", "c2"}
+
+
+def test_ingest_resumes_after_checkpoint(fake_db):
+  rows = [{"name": f"skill {i}", "reference_id": f"r{i}"} for i in range(5)]
+  converted = []
+
+  def failing_to_node_data(row):
+    if row["reference_id"] == "r3":
+      raise ValueError("invalid row")
+    converted.append(row["reference_id"])
+    return row
+
+  writer = BulkNodeWriter(chunk_size=2)
+  with pytest.raises(ValueError):
+    writer.ingest(rows, FakeSkill, failing_to_node_data, "skills:v1")
+  assert FakeCheckpoint.saved["skills:v1"] == 2
+
+  converted.clear()
+  writer = BulkNodeWriter(chunk_size=2)
+  report = writer.ingest(rows, FakeSkill, lambda row: converted.append(
+      row["reference_id"]) or row, "skills:v1")
+  assert converted == ["r2", "r3", "r4"]
+  assert report["rows"] == 5
+  assert report["rows_skipped"] == 2
+  assert "skills:v1" not in FakeCheckpoint.saved
+
+
+def test_content_checkpoint_key():
+  rows = [{"id": "1", "name": "Python"}, {"id": "2", "name": "Java"}]
+  key = get_content_checkpoint_key("emsi", rows)
+  assert key == get_content_checkpoint_key("emsi", [dict(i) for i in rows])
+  assert key != get_content_checkpoint_key("emsi", rows[:1])
+  assert key.startswith("emsi:")
@@ -1,9 +1,11 @@
 """Module to create and save embedding to Embedding Database"""
 
-from sentence_transformers import SentenceTransformer, CrossEncoder
 from services.data_source import update_data_source_fields
+from services.model_registry import model_registry
+from services.vector_index import (get_vector_index, LocalIndex,
+                                   DEFAULT_NUM_NEIGHBORS)
+from services.embedding_store import get_embedding_store, IndexDelta
 import numpy as np
-from torch import nn
 import pandas as pd
 import json
 import uuid
@@ -18,42 +20,40 @@ from config import (
   APPROXIMATE_NEIGHBOR_COUNT,
   DISTANCE_MEASURE_TYPE,
   LEAF_NODE_EMB_COUNT,
-  LEAF_NODES_TO_SEARCH_PRECENT
+  LEAF_NODES_TO_SEARCH_PRECENT,
+  INDEX_OPERATION_MIN_POLL_INTERVAL,
+  INDEX_OPERATION_MAX_POLL_INTERVAL,
+  EMBEDDING_INCREMENTAL_REFRESH,
+  EMBEDDING_STORE_PATH,
+  ENCODER_MAX_SEQ_LENGTH
 )
 
 # pylint: disable=broad-exception-raised,consider-using-f-string
 
 class Embedding():
-  """Creates Embeddings and save to Embedding Database"""
-  bi_encoders = {
-    "all-mpnet-base-v2": SentenceTransformer("all-mpnet-base-v2"),
-    "msmarco-bert-base-dot-v5": SentenceTransformer(
-      "msmarco-bert-base-dot-v5")
-  }
-
-  cross_encoders = {
-    "cross-encoder/ms-marco-MiniLM-L-12-v2": CrossEncoder(
-                                "cross-encoder/ms-marco-MiniLM-L-12-v2",
-                                default_activation_function=nn.Sigmoid()),
-    "cross-encoder/nli-distilroberta-base": CrossEncoder(
-                                "cross-encoder/nli-distilroberta-base",
-                                default_activation_function=nn.Sigmoid()),
-    "cross-encoder/stsb-roberta-large": CrossEncoder(
-                                "cross-encoder/stsb-roberta-large",
-                                default_activation_function=nn.Sigmoid())
-  }
+  """Creates Embeddings and save to Embedding Database
+
+  The encoder models are loaded from the shared model registry on first use.
+  """
 
   def __init__(
       self,
       bi_encoder_model_name,
       cross_encoder_model_name,
-      max_seq_length = 256):
-    Embedding.bi_encoders[
-      bi_encoder_model_name].max_seq_length = max_seq_length
-    Embedding.cross_encoders[
-      cross_encoder_model_name].max_seq_length = max_seq_length
-    self.bi_encoder = Embedding.bi_encoders[bi_encoder_model_name]
-    self.cross_encoder = Embedding.cross_encoders[cross_encoder_model_name]
+      max_seq_length = ENCODER_MAX_SEQ_LENGTH):
+    self.bi_encoder_model_name = bi_encoder_model_name
+    self.cross_encoder_model_name = cross_encoder_model_name
+    self.max_seq_length = max_seq_length
+
+  @property
+  def bi_encoder(self):
+    return model_registry.get_bi_encoder(self.bi_encoder_model_name,
+                                         self.max_seq_length)
+
+  @property
+  def cross_encoder(self):
+    return model_registry.get_cross_encoder(self.cross_encoder_model_name,
+                                            self.max_seq_length)
 
   def generate_embeddings(self, docs):
     """
@@ -70,7 +70,38 @@ class Embedding():
     embeddings = embeddings / np.linalg.norm(embeddings, axis=1)[:, None]
     return embeddings
 
-  def search_docs(self, queries, top_k): # pylint: disable=W0613
+  def get_index_embedding_store(self, index_name):
+    """Returns the embedding store of an index for the bi-encoder model"""
+    return get_embedding_store(
+      f"{index_name}_{self.bi_encoder_model_name}_{self.max_seq_length}",
+      EMBEDDING_STORE_PATH)
+
+  def generate_embeddings_incremental(self, docs, index_name):
+    """
+    Method to generate document embeddings, reusing the stored embeddings of
+    texts of the index already encoded by the same model when incremental
+    refresh is on
+
+    Args:
+      docs (List[str]): List of texts to be converted into embeddings
+      index_name (str): index the embeddings are exported to
+
+    Returns:
+      embeddings: numpy array of generated embeddings
+    """
+    if not EMBEDDING_INCREMENTAL_REFRESH:
+      return self.generate_embeddings(docs)
+    return self.get_index_embedding_store(index_name).get_embeddings(
+      docs, self.generate_embeddings)
+
+  def create_index_delta(self, index_name):
+    """Returns the delta tracker of an index refresh or None when
+    incremental refresh is off"""
+    if not EMBEDDING_INCREMENTAL_REFRESH:
+      return None
+    return IndexDelta(EMBEDDING_STORE_PATH, index_name)
+
+  def search_docs(self, queries, top_k):
     """
     Given a list of queries, this method returns the top_k matches
     from the bi_encoder search result
@@ -83,45 +114,53 @@ class Embedding():
       doc_ids List(str) - Firestore document ids of each skill candidate
     """
     skill_embeddings = self.generate_embeddings(queries).tolist()
-    doc_ids = self.batch_search_ann_service(self.DB_INDEX, skill_embeddings)
+    doc_ids = self.batch_search_ann_service(self.DB_INDEX, skill_embeddings,
+                                            top_k)
     return doc_ids
 
+  def upsert_embeddings(self, docs, doc_ids):
+    """
+    Adds or replaces the embeddings of documents in the index of this
+    object without rebuilding it, with a delta update of the Matching Engine
+    index for the matching_engine backend
 
-  def batch_search_ann_service(self, index_name, query_embeddings):
+    Args:
+      docs (List[str]): List of texts to be converted into embeddings
+      doc_ids (List[str]): ids of the documents
+    """
+    embeddings = self.generate_embeddings(docs)
+    vector_index = get_vector_index()
+    if isinstance(vector_index, LocalIndex):
+      vector_index.upsert(self.DB_INDEX, doc_ids, embeddings)
+      return
+    index_exists, index_id = self.check_index_exist(self.DB_INDEX)
+    if not index_exists:
+      raise Exception("Please create an embeddings index first.")
+    delta = IndexDelta(EMBEDDING_STORE_PATH, self.DB_INDEX)
+    delta.changed_ids = list(doc_ids)
+    delta.changed_embeddings = list(embeddings)
+    index_desc = getattr(self, "index_description",
+                         f"Embeddings for {self.DB_INDEX}")
+    self.update_index_with_delta(index_id, self.DB_INDEX, index_desc, delta)
+
+
+  def batch_search_ann_service(self, index_name, query_embeddings,
+                               num_neighbors=DEFAULT_NUM_NEIGHBORS):
     """
     Given a list of query embeddings, this method retrieves the top k documents
-    from the ANN matching service
+    from the vector index backend
 
     Args:
       index_name (str) - index to search the matching service
       query_embeddings (List(List)) - n X 768 dimension query embedding vectors
+      num_neighbors (int) - number of documents retrieved by local indexes
 
     Results:
       prediction (json object) - json object containing the retrieved document
                 ids for each query vector
     """
-    Logger.info(type(query_embeddings))
-    index_exists, index_id = self.check_index_exist(index_name, True)
-    if index_exists:
-      prediction = json.loads(
-        requests.post(
-          url="http://{}:{}/matching-engine/api/v1/query/result".\
-              format(
-              SERVICES["matching-engine"]["host"],
-              SERVICES["matching-engine"]["port"]
-            ),
-          json={
-            "deployed_index_id": index_id,
-            "index_endpoint_id": EMBEDDING_ENDPOINT_ID,
-            "queries": query_embeddings
-            },
-          timeout=10
-          ).content
-        )
-      Logger.info(prediction)
-      return prediction["data"]
-    else:
-      raise Exception("Please create an embeddings index first.")
+    return get_vector_index().search(index_name, query_embeddings,
+                                     num_neighbors)
 
 
   def rerank_docs(self, query_doc_list):
@@ -141,7 +180,7 @@ class Embedding():
 
   def check_index_exist(self, display_name, check_deployed=False):
     """
-    Check if an index with a "display_name" exists in ANN service
+    Check if an index with a "display_name" exists in the vector index backend
 
     Args:
       display_name - display name for the index
@@ -151,31 +190,10 @@ class Embedding():
       exists (bool) - True if index exists, else False
       index_id (str) - index id with the display name
     """
-    exists = False
-    index_id = None
-    data = json.loads(
-      requests.get(
-        url="http://{}:{}/matching-engine/api/v1/index".\
-            format(
-            SERVICES["matching-engine"]["host"],
-            SERVICES["matching-engine"]["port"],
-          ),
-          timeout=10
-        ).content)["data"]
-    for index_info in data:
-      if check_deployed:
-        if index_info["display_name"] == display_name and index_info[
-          "deployed_indexes"]:
-          exists = True
-          index_id = index_info["deployed_indexes"][0]["deployed_index_id"]
-      else:
-        if index_info["display_name"] == display_name:
-          exists = True
-          index_id = index_info["index_id"]
-    return (exists, index_id)
+    return get_vector_index().check_index_exist(display_name, check_deployed)
 
   def populate_embedding_db(
-      self, gcs_path, index_name, index_desc, object_type=None):
+      self, gcs_path, index_name, index_desc, object_type=None, delta=None):
     """Populate the embedding database and deploy the index
     to index endpoint
     Args:
@@ -183,8 +201,42 @@ class Embedding():
       index_name: str - Name of index to create/update
       index_desc: str - Description of index
       object_type: str - type of object (skill/knowledge)
+      delta: IndexDelta - changed documents, when given an existing index is
+        updated with the changes only
     Returns:
       None"""
+    vector_index = get_vector_index()
+    if isinstance(vector_index, LocalIndex):
+      if delta is not None and delta.is_empty():
+        Logger.info(f"No document changed since the last refresh of "
+                    f"{index_name}")
+      elif delta is not None and not delta.full_rebuild and \
+          vector_index.check_index_exist(index_name)[0]:
+        if delta.changed_ids:
+          vector_index.upsert(index_name, delta.changed_ids,
+                              delta.changed_embeddings)
+        vector_index.remove(index_name, delta.deleted_ids)
+      else:
+        vector_index.build_from_csv(index_name, gcs_path)
+      if object_type:
+        _ = update_data_source_fields(object_type, self.DB_INDEX, index_name)
+      self.save_index_delta(index_name, delta)
+      return
+
+    if delta is not None and not delta.full_rebuild:
+      index_exists, index_id = self.check_index_exist(index_name)
+      if index_exists:
+        if delta.is_empty():
+          Logger.info(f"No document changed since the last refresh of "
+                      f"{index_name}")
+        else:
+          self.update_index_with_delta(index_id, index_name, index_desc,
+                                       delta)
+        if object_type:
+          _ = update_data_source_fields(object_type, self.DB_INDEX, index_id)
+        self.save_index_delta(index_name, delta)
+        return
+
     output = self.update_matching_engine_index(
       gcs_path, index_name, index_desc)
     Logger.info("INDEX CREATED : {}".format(output))
@@ -203,6 +255,17 @@ class Embedding():
       self.DB_INDEX + "-deployed-index",
       output["name"],
       index_endpoint_id=EMBEDDING_ENDPOINT_ID)
+    vector_index.invalidate_metadata()
+    self.save_index_delta(index_name, delta)
+
+  def save_index_delta(self, index_name, delta):
+    """Stores the manifests of a refreshed index and writes its embedding
+    store once, without the embeddings no file of the index uses anymore"""
+    if delta is None:
+      return
+    delta.save_manifests()
+    self.get_index_embedding_store(index_name).save(
+      delta.get_exported_hashes())
 
 
   def update_matching_engine_index(
@@ -236,6 +299,44 @@ class Embedding():
         timeout=10).content)["data"]
     return prediction
 
+  def update_index_with_delta(self, index_id, index_name, index_desc, delta):
+    """Updates an existing Matching Engine index with the changed and
+    deleted documents only
+    Args:
+      index_id: str - Id of index to update
+      index_name: str - Name of index to update
+      index_desc: str - Description of index
+      delta: IndexDelta - changed documents
+    Returns:
+      None"""
+    delta_path = "gs://{}/matching-engine-delta/{}/{}".format(
+      MATCHING_ENGINE_BUCKET_NAME, index_name, uuid.uuid4())
+    delta.write_files(delta_path)
+    Logger.info("Updating index {} with {} changed and {} deleted "
+                "documents from {}".format(index_name, len(delta.changed_ids),
+                                           len(delta.deleted_ids), delta_path))
+    output = json.loads(
+      requests.put(
+        url="http://{}:{}/matching-engine/api/v1/index/{}".\
+            format(
+            SERVICES["matching-engine"]["host"],
+            SERVICES["matching-engine"]["port"],
+            index_id
+          ),
+        json={
+          "display_name": index_name,
+          "description": index_desc,
+          "embeddings_gcs_path": delta_path,
+          "embeddings_dimension": EMBEDDINGS_DIMENSION,
+          "approximate_neighbor_count": APPROXIMATE_NEIGHBOR_COUNT,
+          "distance_measure_type": DISTANCE_MEASURE_TYPE,
+          "leaf_node_embedding_count": LEAF_NODE_EMB_COUNT,
+          "leaf_nodes_to_search_percent": LEAF_NODES_TO_SEARCH_PRECENT
+          },
+        timeout=10).content)["data"]
+    if not self.wait_for_process_creation(output["name"]):
+      raise Exception("Failed to update index")
+
   def wait_for_process_creation(self, operation_id):
     """Polls and waits till the operation is completed
     Args:
@@ -244,8 +345,11 @@ class Embedding():
       boolean: True if operation is successful"""
     Logger.info("Started Polling Process")
     running = True
+    poll_interval = INDEX_OPERATION_MIN_POLL_INTERVAL
     while running:
-      time.sleep(300)
+      time.sleep(poll_interval)
+      poll_interval = min(2 * poll_interval,
+                          INDEX_OPERATION_MAX_POLL_INTERVAL)
       prediction = json.loads(
         requests.get(
           url="http://{}:{}/matching-engine/api/v1/index/operation/".\
@@ -332,22 +436,25 @@ class Embedding():
     self.wait_for_process_creation(prediction["name"])
 
   def export_embedding_csv(
-      self, docs, doc_ids, index_name, file_name=None):
+      self, docs, doc_ids, index_name, file_name=None, delta=None):
     """Generates the embedding and exports the csv to GCS
     Args:
       docs: List[str]: List of all texts
       doc_ids: List[str] of doc ids
       index_name: str - Name of Index to store embeddings
       file_name: str - Name of csv file
+      delta: IndexDelta - collects the documents changed since the last
+        export of the file
     return:
       output: str - GCS bucket in which CSV is stored
     """
-    if file_name:
-      file_name = file_name + ".csv"
-    else:
-      file_name = str(uuid.uuid4()) + ".csv"
+    if not file_name:
+      file_name = str(uuid.uuid4())
 
-    embeddings = self.generate_embeddings(docs)
+    embeddings = self.generate_embeddings_incremental(docs, index_name)
+    if delta is not None:
+      delta.add_file(file_name, doc_ids, docs, embeddings)
+    file_name = file_name + ".csv"
     df = pd.DataFrame(doc_ids)
     df = pd.concat([df, pd.DataFrame(embeddings)], axis=1)
     df.to_csv(file_name, index=False,header=False)
@@ -0,0 +1,211 @@
+"""Content hash keyed embedding store used for incremental index refreshes"""
+
+import functools
+import hashlib
+import json
+import re
+import threading
+import fsspec
+import numpy as np
+from common.utils.logging_handler import Logger
+
+
+def get_text_hash(text):
+  """Returns the sha256 hex digest of a text"""
+  return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def join_path(*parts):
+  return "/".join(part.strip("/") if i else part.rstrip("/")
+                  for i, part in enumerate(parts))
+
+
+def open_file(path, mode="r"):
+  """Opens a local or gs:// file, creating the parent directories of files
+  opened for writing"""
+  fs, fs_path = fsspec.core.url_to_fs(path)
+  if "w" in mode:
+    fs.makedirs(fs_path.rsplit("/", 1)[0], exist_ok=True)
+  return fs.open(fs_path, mode)
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_store(model_key, base_path):
+  """Returns the process wide store of a model"""
+  return EmbeddingStore(model_key, base_path)
+
+
+class EmbeddingStore():
+  """Embeddings of a model keyed by the hash of the embedded text
+
+  The store is a single .npz file per index and model (and max sequence
+  length) in `base_path`, a local directory or a gs:// path. Texts that
+  were already embedded with the same model are served from the store, so
+  only new or changed texts are encoded. New embeddings are kept in memory
+  until `save` is called at the end of an index refresh.
+  """
+
+  def __init__(self, model_key, base_path):
+    self.path = join_path(
+        base_path, re.sub(r"[^A-Za-z0-9_.-]", "_", model_key) + ".npz")
+    self._hashes = None
+    self._embeddings = None
+    self._positions = None
+    self._dirty = False
+    self._lock = threading.Lock()
+
+  def _load(self):
+    if self._hashes is not None:
+      return
+    try:
+      with open_file(self.path, "rb") as store_file:
+        data = np.load(store_file)
+        self._hashes = data["hashes"]
+        self._embeddings = data["embeddings"]
+    except FileNotFoundError:
+      self._hashes = np.array([], dtype=str)
+      self._embeddings = None
+    self._positions = {text_hash: i for i, text_hash in enumerate(
+        self._hashes)}
+
+  def save(self, keep_hashes=None):
+    """Writes the store if it changed, after dropping the embeddings of the
+    texts that are not in keep_hashes
+      Args:
+        keep_hashes: Set[str] - text hashes still exported to the index,
+          every embedding is kept if None
+    """
+    with self._lock:
+      self._load()
+      if keep_hashes is not None and len(self._hashes):
+        keep = np.isin(self._hashes, list(keep_hashes))
+        if not keep.all():
+          Logger.info(f"Embedding store {self.path}: pruning "
+                      f"{int((~keep).sum())} unused embeddings")
+          self._hashes = self._hashes[keep]
+          self._embeddings = self._embeddings[keep]
+          self._positions = {text_hash: i for i, text_hash in enumerate(
+              self._hashes)}
+          self._dirty = True
+      if not self._dirty:
+        return
+      with open_file(self.path, "wb") as store_file:
+        np.savez(store_file, hashes=self._hashes, embeddings=self._embeddings)
+      self._dirty = False
+
+  def get_embeddings(self, texts, encode_fn):
+    """Returns the embeddings of the texts, encoding only the texts missing
+    from the store
+      Args:
+        texts: List[str] - texts to embed
+        encode_fn: function encoding a list of texts to a numpy array
+      Returns:
+        embeddings: float32 numpy array with one row per text
+    """
+    text_hashes = [get_text_hash(text) for text in texts]
+    with self._lock:
+      self._load()
+      missing = {}
+      for text, text_hash in zip(texts, text_hashes):
+        if text_hash not in self._positions:
+          missing.setdefault(text_hash, text)
+      Logger.info(f"Embedding store {self.path}: {len(texts)} texts, "
+                  f"{len(missing)} to encode")
+      if missing:
+        new_embeddings = np.asarray(encode_fn(list(missing.values())),
+                                    dtype=np.float32)
+        for text_hash in missing:
+          self._positions[text_hash] = len(self._positions)
+        self._hashes = np.concatenate(
+            [self._hashes, np.array(list(missing), dtype=str)])
+        self._embeddings = new_embeddings if self._embeddings is None else \
+            np.concatenate([self._embeddings, new_embeddings])
+        self._dirty = True
+      if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+      return self._embeddings[[self._positions[i] for i in text_hashes]]
+
+
+class IndexDelta():
+  """Changes of the documents of an index since its last refresh
+
+  The text hash of every document exported to an index file is kept in a
+  manifest next to the embedding store. Comparing the exported documents
+  with the manifest gives the new or changed documents and the deleted ones.
+  If any exported file has no manifest yet the index needs a full rebuild.
+  """
+
+  def __init__(self, base_path, index_name):
+    self.base_path = base_path
+    self.index_name = index_name
+    self.full_rebuild = False
+    self.changed_ids = []
+    self.changed_embeddings = []
+    self._removed_ids = set()
+    self._manifests = {}
+
+  @property
+  def deleted_ids(self):
+    """Ids no longer exported to any file of the index"""
+    exported_ids = set()
+    for text_hashes in self._manifests.values():
+      exported_ids.update(text_hashes)
+    return sorted(self._removed_ids - exported_ids)
+
+  def get_manifest_path(self, file_name):
+    return join_path(self.base_path, "manifests", self.index_name,
+                     file_name + ".json")
+
+  def get_exported_hashes(self):
+    """Returns the text hashes of the documents of every file of the index,
+    the stored manifests updated with the files of this refresh"""
+    manifests = {}
+    fs, fs_path = fsspec.core.url_to_fs(self.get_manifest_path("*"))
+    for manifest_path in fs.glob(fs_path):
+      with fs.open(manifest_path) as f:
+        manifests[manifest_path.rsplit("/", 1)[-1][:-len(".json")]] = \
+            json.load(f)
+    manifests.update(self._manifests)
+    return {text_hash for text_hashes in manifests.values()
+            for text_hash in text_hashes.values()}
+
+  def add_file(self, file_name, doc_ids, texts, embeddings):
+    """Compares the documents exported to an index file with its manifest"""
+    text_hashes = {doc_id: get_text_hash(text)
+                   for doc_id, text in zip(doc_ids, texts)}
+    try:
+      with open_file(self.get_manifest_path(file_name)) as f:
+        previous_hashes = json.load(f)
+    except FileNotFoundError:
+      self.full_rebuild = True
+      previous_hashes = {}
+    for i, doc_id in enumerate(doc_ids):
+      if previous_hashes.get(doc_id) != text_hashes[doc_id]:
+        self.changed_ids.append(doc_id)
+        self.changed_embeddings.append(embeddings[i])
+    self._removed_ids.update(
+        doc_id for doc_id in previous_hashes if doc_id not in text_hashes)
+    self._manifests[file_name] = text_hashes
+
+  def is_empty(self):
+    return not self.full_rebuild and not self.changed_ids and \
+        not self.deleted_ids
+
+  def write_files(self, delta_path):
+    """Writes the changed embeddings as a CSV file and the deleted ids in a
+    `delete` directory, the layout of a Matching Engine delta update"""
+    with open_file(join_path(delta_path, "embeddings.csv"), "w") as f:
+      for doc_id, embedding in zip(self.changed_ids,
+                                   self.changed_embeddings):
+        f.write(",".join([doc_id] + [repr(float(i)) for i in embedding]))
+        f.write("\n")
+    if self.deleted_ids:
+      with open_file(join_path(delta_path, "delete", "ids.txt"), "w") as f:
+        f.write("\n".join(self.deleted_ids) + "\n")
+
+  def save_manifests(self):
+    """Stores the text hashes of the exported documents once the index has
+    been updated"""
+    for file_name, text_hashes in self._manifests.items():
+      with open_file(self.get_manifest_path(file_name), "w") as f:
+        json.dump(text_hashes, f)
@@ -0,0 +1,82 @@
+"""
+  Unit tests for the content hash keyed embedding store
+"""
+import json
+from unittest import mock
+import numpy as np
+with mock.patch(
+    "google.cloud.logging.Client", side_effect=mock.MagicMock()) as mok:
+  from services.embedding_store import EmbeddingStore, IndexDelta
+
+
+def encode(texts):
+  return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_embedding_store_encodes_missing_texts(tmp_path):
+  encoded = []
+
+  def encode_fn(texts):
+    encoded.append(list(texts))
+    return encode(texts)
+
+  store = EmbeddingStore("model/name_512", str(tmp_path))
+  embeddings = store.get_embeddings(["a", "bb", "a"], encode_fn)
+  assert encoded == [["a", "bb"]]
+  assert embeddings.tolist() == [[1, 1], [2, 1], [1, 1]]
+  store.save()
+
+  # a new store reads the saved embeddings and encodes the new text only
+  store = EmbeddingStore("model/name_512", str(tmp_path))
+  embeddings = store.get_embeddings(["bb", "ccc"], encode_fn)
+  assert encoded[1:] == [["ccc"]]
+  assert embeddings.tolist() == [[2, 1], [3, 1]]
+
+
+def test_index_delta(tmp_path):
+  delta = IndexDelta(str(tmp_path), "skill")
+  delta.add_file("skill", ["1", "2"], ["a", "b"], encode(["a", "b"]))
+  assert delta.full_rebuild
+  delta.save_manifests()
+
+  delta = IndexDelta(str(tmp_path), "skill")
+  delta.add_file("skill", ["1", "3"], ["a", "cc"], encode(["a", "cc"]))
+  assert not delta.full_rebuild
+  assert not delta.is_empty()
+  assert delta.changed_ids == ["3"]
+  assert delta.deleted_ids == ["2"]
+
+  delta.write_files(str(tmp_path / "delta"))
+  with open(tmp_path / "delta" / "embeddings.csv", encoding="utf-8") as f:
+    assert f.read() == "3,2.0,1.0\n"
+  with open(tmp_path / "delta" / "delete" / "ids.txt", encoding="utf-8") as f:
+    assert f.read() == "2\n"
+  delta.save_manifests()
+  with open(delta.get_manifest_path("skill"), encoding="utf-8") as f:
+    assert set(json.load(f)) == {"1", "3"}
+
+  delta = IndexDelta(str(tmp_path), "skill")
+  delta.add_file("skill", ["1", "3"], ["a", "cc"], encode(["a", "cc"]))
+  assert delta.is_empty()
+
+
+def test_embedding_store_saves_and_prunes(tmp_path):
+  store = EmbeddingStore("skill_model_512", str(tmp_path))
+  store.get_embeddings(["a", "bb", "ccc"], encode)
+  # nothing is written before the refresh is saved
+  assert not list(tmp_path.iterdir())
+
+  delta = IndexDelta(str(tmp_path), "skill")
+  delta.add_file("skill", ["1", "2"], ["a", "bb"], encode(["a", "bb"]))
+  delta.save_manifests()
+  store.save(delta.get_exported_hashes())
+
+  encoded = []
+
+  def encode_fn(texts):
+    encoded.extend(texts)
+    return encode(texts)
+
+  store = EmbeddingStore("skill_model_512", str(tmp_path))
+  store.get_embeddings(["a", "bb", "ccc"], encode_fn)
+  assert encoded == ["ccc"]
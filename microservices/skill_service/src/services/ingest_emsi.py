@@ -2,84 +2,50 @@
   Service for emsi data ingestion route
 """
 import requests
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from common.models import Skill
+from services.bulk_ingest import BulkNodeWriter, get_content_checkpoint_key
 from services.data_source import upsert_data_source_doc
 from config import CLIENT_ID, CLIENT_SECRET, EMSI_AUTH_URL, EMSI_URL
 # pylint: disable = broad-except
 
 
-class AnyncSkillInserts:
-  """Class to insert skills_list in async fashion with insert_data() function"""
-
-  def __init__(self):
-    self.inserted_skills = []
-    pass
-
-  def insert(self, skill):
-    obj = Skill()
-    skill = dict(skill)
-
-    if skill.get("tags"):
-      skill_description = skill.get("tags")[0].get("value")
-    else:
-      skill_description = ""
-    skill_dict = {
-        "uuid": "",
-        "name": skill.get("name"),
-        "description": skill_description,
-        "keywords": [],
-        "author": "",
-        "creator": "",
-        "alignments": {
-            "standard_alignment": {},
-           "credential_alignment": {},
-            "skill_alignment": {},
-            "knowledge_alignment": {},
-            "role_alignment": {},
-            "organizational_alignment": {},
-        },
-        "organizations": [],
-        "certifications": [],
-        "occupations": {
-            "occupations_major_group": [],
-            "occupations_minor_group": [],
-            "broad_occupation": [],
-            "detailed_occupation": [],
-        },
-        "onet_job": "",
-        "type": skill.get("type"),
-        "parent_nodes": {"competencies": []},
-        "reference_id": skill.get("id"),
-        "source_uri": skill.get("infoUrl"),
-        "source_name": "emsi"
-    }
-    obj = obj.from_dict(skill_dict)
-    obj.save()
-    obj.uuid = obj.id
-    obj.update()
-    self.inserted_skills.append(skill)
-
-  async def start_insert_process(self, skills_list):
-    with ThreadPoolExecutor(max_workers=30) as executor:
-      loop = asyncio.get_event_loop()
-      tasks = []
-      for skill in skills_list:
-        runner = loop.run_in_executor(executor, self.insert, skill)
-        tasks.append(runner)
-
-      for _ in await asyncio.gather(*tasks):
-        pass
-
-  def insert_data(self, skills_list):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    future = asyncio.ensure_future(self.start_insert_process(skills_list))
-    loop.run_until_complete(future)
-
-  def get_inserted_skills_count(self):
-    return len(self.inserted_skills)
+def emsi_skill_to_node_data(skill):
+  """transforms an emsi skill to the data of a skill node"""
+  skill = dict(skill)
+
+  if skill.get("tags"):
+    skill_description = skill.get("tags")[0].get("value")
+  else:
+    skill_description = ""
+  return {
+      "name": skill.get("name"),
+      "description": skill_description,
+      "keywords": [],
+      "author": "",
+      "creator": "",
+      "alignments": {
+          "standard_alignment": {},
+          "credential_alignment": {},
+          "skill_alignment": {},
+          "knowledge_alignment": {},
+          "role_alignment": {},
+          "organizational_alignment": {},
+      },
+      "organizations": [],
+      "certifications": [],
+      "occupations": {
+          "occupations_major_group": [],
+          "occupations_minor_group": [],
+          "broad_occupation": [],
+          "detailed_occupation": [],
+      },
+      "onet_job": "",
+      "type": skill.get("type"),
+      "parent_nodes": {"competencies": []},
+      "reference_id": skill.get("id"),
+      "source_uri": skill.get("infoUrl"),
+      "source_name": "emsi"
+  }
 
 
 def auth_emsi():
@@ -114,9 +80,14 @@ def ingest_emsi(size):
   token = auth_emsi()
   emsi_skills = fetch_emsi_skills(token, size)
 
-  async_inserts = AnyncSkillInserts()
-  async_inserts.insert_data(emsi_skills)
-  inserted_skills_length = async_inserts.get_inserted_skills_count()
+  bulk_writer = BulkNodeWriter()
+  try:
+    report = bulk_writer.ingest(
+        emsi_skills, Skill, emsi_skill_to_node_data,
+        checkpoint_key=get_content_checkpoint_key("emsi", emsi_skills))
+  finally:
+    bulk_writer.close()
+  inserted_skills_length = report["rows"]
 
   # Insert/Update doc in data_sources collection after ingestion:
   _ = upsert_data_source_doc("skill", "emsi")
@@ -0,0 +1,186 @@
+"""Process wide registry of the lazily loaded encoder models"""
+
+import os
+import threading
+import time
+from common.utils.logging_handler import Logger
+from config import MODEL_QUANTIZATION, ENCODER_MAX_SEQ_LENGTH
+
+# pylint: disable=import-outside-toplevel,broad-except
+
+BI_ENCODER = "bi_encoder"
+CROSS_ENCODER = "cross_encoder"
+
+
+def get_process_rss():
+  """Returns the resident memory of the process in bytes or None if it
+  cannot be read"""
+  try:
+    with open("/proc/self/statm", encoding="utf-8") as statm_file:
+      resident_pages = int(statm_file.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError, IndexError):
+    return None
+
+
+def get_parameter_bytes(module):
+  """Returns the memory used by the parameters and buffers of a torch module,
+  quantized weights are packed and not counted"""
+  try:
+    tensors = list(module.parameters()) + list(module.buffers())
+  except AttributeError:
+    return None
+  return sum(i.numel() * i.element_size() for i in tensors)
+
+
+class OnnxCrossEncoderModel():
+  """ONNX Runtime sequence classification model usable as the model of a
+  CrossEncoder"""
+
+  def __init__(self, model_name):
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    self.ort_model = ORTModelForSequenceClassification.from_pretrained(
+        model_name, export=True)
+    self.config = self.ort_model.config
+
+  def __call__(self, **features):
+    features.pop("return_dict", None)
+    return self.ort_model(**features)
+
+  def eval(self):
+    return self
+
+  def to(self, device): # pylint: disable=unused-argument
+    return self
+
+  def parameters(self):
+    return []
+
+  def buffers(self):
+    return []
+
+
+class ModelRegistry():
+  """Loads every encoder model on first use and shares it across the process
+
+  Identical checkpoints requested from different modules resolve to the same
+  instance. Depending on `quantization` the models are optimized for CPU
+  inference after loading:
+    "int8": dynamic int8 quantization of the linear layers of all models
+    "onnx": cross encoders run with ONNX Runtime (requires `optimum`,
+            falling back to "int8" without it), bi-encoders use "int8"
+  The load time and memory of every model are logged and kept in `stats`.
+  All the models truncate their inputs to `max_seq_length` tokens, set once
+  when they are loaded so that shared models are never mutated by callers.
+  """
+
+  def __init__(self, quantization="none", max_seq_length=None):
+    self.quantization = quantization
+    self.max_seq_length = max_seq_length
+    self._models = {}
+    self._stats = {}
+    self._locks = {}
+    self._lock = threading.Lock()
+
+  def get_bi_encoder(self, model_name, max_seq_length=None):
+    """Returns the shared SentenceTransformer of a checkpoint
+
+    Raises:
+      ValueError: if max_seq_length differs from the registry's
+    """
+    return self._get(BI_ENCODER, model_name, max_seq_length)
+
+  def get_cross_encoder(self, model_name, max_seq_length=None):
+    """Returns the shared CrossEncoder of a checkpoint, with a sigmoid
+    activation
+
+    Raises:
+      ValueError: if max_seq_length differs from the registry's
+    """
+    return self._get(CROSS_ENCODER, model_name, max_seq_length)
+
+  def stats(self):
+    """Returns the load time and memory of the loaded models"""
+    with self._lock:
+      return [dict(stats) for stats in self._stats.values()]
+
+  def _get(self, model_type, model_name, max_seq_length):
+    if max_seq_length is not None and max_seq_length != self.max_seq_length:
+      raise ValueError(
+          f"{model_name} requested with max_seq_length {max_seq_length}, "
+          f"the shared models use {self.max_seq_length}")
+    key = (model_type, model_name)
+    model = self._models.get(key)
+    if model is not None:
+      return model
+    with self._lock:
+      model_lock = self._locks.setdefault(key, threading.Lock())
+    # models are loaded under a per checkpoint lock so that concurrent
+    # requests load each checkpoint once without blocking other checkpoints
+    with model_lock:
+      model = self._models.get(key)
+      if model is None:
+        model = self._load(model_type, model_name)
+    return model
+
+  def _load(self, model_type, model_name):
+    start_time = time.perf_counter()
+    start_rss = get_process_rss()
+    quantization = self.quantization
+    if model_type == BI_ENCODER:
+      from sentence_transformers import SentenceTransformer
+      model = SentenceTransformer(model_name)
+      if self.max_seq_length is not None:
+        model.max_seq_length = self.max_seq_length
+      if quantization in ("int8", "onnx"):
+        model = self._quantize(model)
+        quantization = "int8"
+      module = model
+    else:
+      model, quantization = self._load_cross_encoder(model_name, quantization)
+      module = model.model
+
+    end_rss = get_process_rss()
+    stats = {
+        "model_type": model_type,
+        "model_name": model_name,
+        "max_seq_length": self.max_seq_length,
+        "quantization": quantization,
+        "load_time": round(time.perf_counter() - start_time, 3),
+        "parameter_bytes": get_parameter_bytes(module),
+        "rss_increase_bytes": end_rss - start_rss
+                              if start_rss is not None and end_rss is not None
+                              else None
+    }
+    Logger.info(f"Loaded {model_type} {model_name}: {stats}")
+    with self._lock:
+      self._models[(model_type, model_name)] = model
+      self._stats[(model_type, model_name)] = stats
+    return model
+
+  def _load_cross_encoder(self, model_name, quantization):
+    from sentence_transformers import CrossEncoder
+    from torch import nn
+    # cross encoders truncate the text pairs to max_length tokens
+    model = CrossEncoder(model_name, max_length=self.max_seq_length,
+                         default_activation_function=nn.Sigmoid())
+    if quantization == "onnx":
+      try:
+        model.model = OnnxCrossEncoderModel(model_name)
+        return model, "onnx"
+      except Exception as e:
+        Logger.error(f"ONNX export of {model_name} failed, using int8 "
+                     f"quantization instead: {e}")
+        quantization = "int8"
+    if quantization == "int8":
+      model.model = self._quantize(model.model)
+      return model, "int8"
+    return model, "none"
+
+  def _quantize(self, module):
+    import torch
+    return torch.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+model_registry = ModelRegistry(MODEL_QUANTIZATION, ENCODER_MAX_SEQ_LENGTH)
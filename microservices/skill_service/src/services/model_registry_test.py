@@ -0,0 +1,61 @@
+"""
+  Unit tests for the model registry
+"""
+import threading
+from unittest import mock
+import pytest
+with mock.patch(
+    "google.cloud.logging.Client", side_effect=mock.MagicMock()) as mok:
+  from services.model_registry import ModelRegistry, CROSS_ENCODER
+
+
+class FakeCrossEncoder():
+  def __init__(self):
+    self.model = mock.MagicMock()
+    self.model.parameters.return_value = []
+    self.model.buffers.return_value = []
+
+
+def test_model_registry_loads_each_checkpoint_once():
+  registry = ModelRegistry()
+  with mock.patch.object(
+      ModelRegistry, "_load_cross_encoder",
+      side_effect=lambda name, quantization: (FakeCrossEncoder(), "none")
+  ) as load_cross_encoder:
+    models = []
+    threads = [
+        threading.Thread(target=lambda: models.append(
+            registry.get_cross_encoder("cross-encoder/model")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    other_model = registry.get_cross_encoder("cross-encoder/other-model")
+
+  assert load_cross_encoder.call_count == 2
+  assert all(model is models[0] for model in models)
+  assert other_model is not models[0]
+
+  stats = registry.stats()
+  assert [i["model_name"] for i in stats] == [
+      "cross-encoder/model", "cross-encoder/other-model"]
+  assert stats[0]["model_type"] == CROSS_ENCODER
+  assert stats[0]["parameter_bytes"] == 0
+  assert stats[0]["load_time"] >= 0
+
+
+def test_model_registry_shares_models_across_max_seq_length():
+  registry = ModelRegistry(max_seq_length=256)
+  with mock.patch.object(
+      ModelRegistry, "_load_cross_encoder",
+      side_effect=lambda name, quantization: (FakeCrossEncoder(), "none")
+  ) as load_cross_encoder:
+    model = registry.get_cross_encoder("cross-encoder/model")
+    assert registry.get_cross_encoder("cross-encoder/model", 256) is model
+    with pytest.raises(ValueError):
+      registry.get_cross_encoder("cross-encoder/model", 512)
+
+  assert load_cross_encoder.call_count == 1
+  assert [i["max_seq_length"] for i in registry.stats()] == [256]
@@ -79,10 +79,12 @@ class SearchSkillGraph(Embedding):
     Logger.info("Len texts: {}".format(len(texts)))
     Logger.info("Len ids: {}".format(len(doc_ids)))
     if doc_ids:
+      delta = self.create_index_delta(self.DB_INDEX)
       gcs_path = self.export_embedding_csv(
-        texts, doc_ids, self.DB_INDEX , self.DB_INDEX)
+        texts, doc_ids, self.DB_INDEX , self.DB_INDEX, delta=delta)
       self.populate_embedding_db(
-        gcs_path, self.DB_INDEX, self.index_description, self.level)
+        gcs_path, self.DB_INDEX, self.index_description, self.level,
+        delta=delta)
     else:
       print("No documents found to generate embeddings.")
 
@@ -253,10 +255,12 @@ class KnowledgeGraph(Embedding):
       doc_ids.append(doc.id)
     Logger.info("Len texts: {}".format(len(texts)))
     Logger.info("Len ids: {}".format(len(doc_ids)))
+    delta = self.create_index_delta(self.level)
     gcs_path = self.export_embedding_csv(
-            texts, doc_ids, self.level , self.level)
+            texts, doc_ids, self.level , self.level, delta=delta)
     self.populate_embedding_db(
-          gcs_path, self.level, self.index_description, object_type="knowledge")
+          gcs_path, self.level, self.index_description, object_type="knowledge",
+          delta=delta)
 
   def populate_level_embeddings_in_db(self):
     """Populates Embedding database index for a given level
@@ -1,17 +1,18 @@
 """Map skill to skill"""
 from common.models import Skill
 from common.utils.errors import ValidationError, ResourceNotFoundException
-from sentence_transformers import CrossEncoder
-from torch import nn
+from services.model_registry import model_registry
 
 # pylint: disable = invalid-name
 
 class SkillSimilarity():
   """Class for skill similarity"""
 
-  cross_encoder = CrossEncoder(
-      "cross-encoder/ms-marco-MiniLM-L-12-v2",
-      default_activation_function=nn.Sigmoid())
+  CROSS_ENCODER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-12-v2"
+
+  @property
+  def cross_encoder(self):
+    return model_registry.get_cross_encoder(self.CROSS_ENCODER_MODEL_NAME)
 
   def get_skill_data(self, skill_id_1, skill_id_2, source):
     skill_data_1 = Skill.find_by_id(skill_id_1)
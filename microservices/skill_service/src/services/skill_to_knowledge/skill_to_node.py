@@ -1,9 +1,11 @@
 """Maps skill to nodes from topic tree of learning resource."""
 
+import numpy as np
 from common.models.knowledge import Concept, KnowledgeServiceLearningObjective, KnowledgeServiceLearningUnit, SubConcept
 from common.models import (Skill, KnowledgeServiceLearningContent)
+from common.utils.errors import ResourceNotFoundException
 from common.utils.logging_handler import Logger
-from common.utils.parent_child_nodes_handler import ParentChildNodesHandler
+from config import RERANKER_THRESHOLD
 from services.skill_to_knowledge.skill_to_node_data import (Skill_Passage,
                                                             Skill_LU, Skill_LO,
                                                             Skill_SubConcept,
@@ -11,6 +13,14 @@ from services.skill_to_knowledge.skill_to_node_data import (Skill_Passage,
 
 # pylint: disable=broad-exception-raised,invalid-name
 
+# child node keys and models of the topic tree of a learning resource
+TREE_LEVELS = [("concepts", Concept), ("sub_concepts", SubConcept),
+               ("learning_objectives", KnowledgeServiceLearningObjective),
+               ("learning_units", KnowledgeServiceLearningUnit)]
+
+MAPPED_NODE_KEYS = ["mapped_passages", "mapped_lus", "mapped_los",
+                    "mapped_subconcepts", "mapped_concepts"]
+
 class Skill_Query:
   """Skill class for query inputs"""
 
@@ -176,95 +186,75 @@ class SkillNodeAlignment:
                   all_mapped_lus - list containing all mapped learning unit
                                    firestore document ids
     """
-    response = {}
+    # collect the topic trees of all the learning resources with batched
+    # reads, one level at a time
+    learning_resources = KnowledgeServiceLearningContent.find_by_ids(
+        learning_resource_ids)
     for learning_resource_id in learning_resource_ids:
-      skill_to_passage_nodes = []
-      skill_to_lu_nodes = []
-      skill_to_lo_nodes = []
-      skill_to_subconcept_nodes = []
-      skill_to_concept_nodes = []
-      skill_to_lr_nodes = []
-      learning_resource = KnowledgeServiceLearningContent.find_by_id(
-        learning_resource_id)
-      lr_mapped = False
-      #learning_resource.load_tree()
-      lr_fields = learning_resource.get_fields()
-      lr_data = ParentChildNodesHandler.return_child_nodes_data(lr_fields)
-      lr_specific_concepts = []
-      for concept_dict in lr_data["child_nodes"]["concepts"]:
-        concept = Concept.find_by_uuid(concept_dict["uuid"])
-        concept_specific_subconcepts = []
-        for sub_concept_dict in concept_dict["child_nodes"]["sub_concepts"]:
-          sub_concept = SubConcept.find_by_uuid(sub_concept_dict["uuid"])
-          subconcept_specific_los = []
-          for learning_objective_dict in sub_concept_dict\
-            ["child_nodes"]["learning_objectives"]:
-            learning_objective = KnowledgeServiceLearningObjective.\
-              find_by_uuid(learning_objective_dict["uuid"])
-            lo_specific_lus = []
-            for learning_unit_dict in learning_objective_dict\
-              ["child_nodes"]["learning_units"]:
-              learning_unit = KnowledgeServiceLearningUnit.\
-                find_by_uuid(learning_unit_dict["uuid"])
-              passages = learning_unit.text.split("<p>")
-              lu_specific_passages = []
-              for i, passage in enumerate(passages):
-                metadata = {"passage_text": passage, "skill_description": query}
-                passage_id = learning_unit.id + "##" + str(i)
-                passage_title = learning_unit.title + "_##Passage_" + str(i)
-                skill_to_passage_node = Skill_Passage(passage_id, passage_title,
-                                                      metadata)
-                lu_specific_passages.append(skill_to_passage_node)
-                if skill_to_passage_node.mapped:
-                  skill_to_passage_nodes.append(skill_to_passage_node)
-                  if not lr_mapped:
-                    lr_mapped = True
-                    skill_to_lr_nodes.append(learning_resource_id)
-              skill_to_lu_node = Skill_LU(learning_unit.id, learning_unit.title,
-                                          lu_specific_passages)
-              if skill_to_lu_node.mapped:
-                skill_to_lu_nodes.append(skill_to_lu_node)
-              lo_specific_lus.append(skill_to_lu_node)
-            skill_to_lo_node = Skill_LO(learning_objective.id,
-                                        learning_objective.title,
-                                        lo_specific_lus)
-            if skill_to_lo_node.mapped:
-              skill_to_lo_nodes.append(skill_to_lo_node)
-            subconcept_specific_los.append(skill_to_lo_node)
-          skill_to_subconcept_node = Skill_SubConcept(sub_concept.id,
-                                                      sub_concept.title,
-                                                      subconcept_specific_los)
-          if skill_to_subconcept_node.mapped:
-            skill_to_subconcept_nodes.append(skill_to_subconcept_node)
-          concept_specific_subconcepts.append(skill_to_subconcept_node)
-        skill_to_concept_node = Skill_Concept(concept.id, concept.title,
-                                              concept_specific_subconcepts)
-        if skill_to_concept_node.mapped:
-          skill_to_concept_nodes.append(skill_to_concept_node)
-        lr_specific_concepts.append(skill_to_concept_node)
+      if learning_resource_id not in learning_resources:
+        raise ResourceNotFoundException(
+            f"Learning resource with id {learning_resource_id} not found")
+    parents = [learning_resources[i] for i in learning_resource_ids]
+    lr_index = np.arange(len(parents))
+    levels = []
+    for child_key, model in TREE_LEVELS:
+      child_uuids, parent_index = [], []
+      for i, parent in enumerate(parents):
+        for child_uuid in (parent.child_nodes or {}).get(child_key, []):
+          child_uuids.append(child_uuid)
+          parent_index.append(i)
+      children = model.find_by_uuids(child_uuids)
+      parents = [children[child_uuid] for child_uuid in child_uuids]
+      parent_index = np.array(parent_index, dtype=int)
+      lr_index = lr_index[parent_index]
+      levels.append((parents, parent_index, lr_index))
 
-      response[learning_resource_id] = {}
-      response[learning_resource_id]["mapped_passages"] = \
-        self.filter_nodes(skill_to_passage_nodes)
-      response[learning_resource_id]["mapped_lus"] = \
-        self.filter_nodes(skill_to_lu_nodes)
-      response[learning_resource_id]["mapped_los"] = \
-        self.filter_nodes(skill_to_lo_nodes)
-      response[learning_resource_id]["mapped_subconcepts"] = \
-        self.filter_nodes(skill_to_subconcept_nodes)
-      response[learning_resource_id]["mapped_concepts"] = \
-        self.filter_nodes(skill_to_concept_nodes)
-    return response
+    # score every passage of the learning units in batches
+    learning_units = parents
+    passages, passage_lu_index = [], []
+    for i, learning_unit in enumerate(learning_units):
+      for j, passage in enumerate(learning_unit.text.split("<p>")):
+        passages.append((learning_unit.id + "##" + str(j),
+                         learning_unit.title + "_##Passage_" + str(j),
+                         passage))
+        passage_lu_index.append(i)
+    passage_lu_index = np.array(passage_lu_index, dtype=int)
+    lengths = np.array([len(text.split(" ")) for _, _, text in passages],
+                       dtype=int)
+    scores = Skill_Passage.score_passages(query,
+                                          [text for _, _, text in passages])
+    mapped = scores >= RERANKER_THRESHOLD
+    node_levels = [(
+        [Skill_Passage.from_scores(passage_id, title, length, score,
+                                   is_mapped)
+         for (passage_id, title, _), length, score, is_mapped in zip(
+             passages, lengths, scores, mapped)],
+        levels[-1][2][passage_lu_index])]
 
-  def filter_nodes(self, list_nodes):
-    """Returns dictionary of only those nodes which are mapped to the skill.
-      Args:
-        list_nodes: list of Node objects
+    # aggregate the scores from the passages up to the concepts
+    parent_index = passage_lu_index
+    for (nodes, node_parent_index, node_lr_index), node_class in zip(
+        reversed(levels), (Skill_LU, Skill_LO, Skill_SubConcept,
+                           Skill_Concept)):
+      lengths, scores, mapped = node_class.aggregate_scores(
+          lengths, scores, mapped, parent_index, len(nodes))
+      node_levels.append((
+          [node_class.from_scores(node.id, node.title, length, score,
+                                  is_mapped)
+           for node, length, score, is_mapped in zip(
+               nodes, lengths, scores, mapped)],
+          node_lr_index))
+      parent_index = node_parent_index
 
-      Returns:
-        list of mapped Node dictionary elements
-    """
-    return [node.get_item_dict() for node in list_nodes if node.mapped]
+    response = {learning_resource_id: {key: [] for key in MAPPED_NODE_KEYS}
+                for learning_resource_id in learning_resource_ids}
+    for response_key, (nodes, node_lr_index) in zip(
+        MAPPED_NODE_KEYS, node_levels):
+      for node, i in zip(nodes, node_lr_index):
+        if node.mapped:
+          response[learning_resource_ids[i]][response_key].append(
+              node.get_item_dict())
+    return response
 
 
 def batch_update_skill_to_nodes(request_body):
@@ -2,6 +2,7 @@
 
 # pylint: disable=invalid-name
 
+import numpy as np
 from config import RERANKER_THRESHOLD, RATIO_THRESHOLD
 from services.skill_to_knowledge.skill_to_node_data.skill_to_passage import Skill_Passage
 
@@ -9,6 +10,36 @@ from services.skill_to_knowledge.skill_to_node_data.skill_to_passage import Skil
 class Skill_LU(Skill_Passage):
   """Skill to LU node alignment"""
 
+  @classmethod
+  def aggregate_scores(cls, lengths, scores, mapped, parent_index,
+                       num_parents):
+    """Vectorized calculate_length, calculate_score and check_mapping for all
+    the parent nodes of a level of the tree at once
+      Args:
+        lengths: numpy array of the lengths of the child nodes
+        scores: numpy array of the scores of the child nodes
+        mapped: numpy bool array of the child nodes mapped to the skill
+        parent_index: numpy array of the parent position of each child node
+        num_parents: number of parent nodes
+      Returns:
+        lengths, scores, mapped: numpy arrays for the parent nodes
+    """
+    def sum_by_parent(weights):
+      return np.bincount(parent_index, weights=weights, minlength=num_parents)
+
+    counts = np.bincount(parent_index, minlength=num_parents)
+    parent_lengths = sum_by_parent(lengths)
+    parent_scores = np.zeros(num_parents)
+    np.divide(sum_by_parent(lengths * scores), parent_lengths,
+              out=parent_scores, where=parent_lengths > 0)
+    parent_scores = np.round(parent_scores, 3)
+    mapped_ratio = np.zeros(num_parents)
+    np.divide(sum_by_parent(mapped.astype(float)), counts,
+              out=mapped_ratio, where=counts > 0)
+    parent_mapped = (counts > 0) & ((mapped_ratio >= RATIO_THRESHOLD) |
+                                    (parent_scores >= RERANKER_THRESHOLD))
+    return parent_lengths.astype(int), parent_scores, parent_mapped
+
   def calculate_length(self, metadata) -> None:
     """Calculates the number of words in the LU text
       Args:
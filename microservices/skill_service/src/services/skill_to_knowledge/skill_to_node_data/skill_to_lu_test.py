@@ -57,3 +57,20 @@ def test_check_mapping(clean_firestore, mocker, get_objects):
   expected_response = False
   response = get_objects[0].check_mapping(metadata)
   assert expected_response == response, "Expected response not same"
+
+def test_aggregate_scores(clean_firestore, mocker, get_objects):
+  passages = [
+    Skill_Passage.from_scores("lu_1##0", "passage_0", 10, 0.9, True),
+    Skill_Passage.from_scores("lu_1##1", "passage_1", 30, 0.1, False),
+    Skill_Passage.from_scores("lu_2##0", "passage_0", 5, 0.2, False)
+  ]
+  lengths, scores, mapped = Skill_LU.aggregate_scores(
+    np.array([i.length for i in passages]),
+    np.array([i.score for i in passages]),
+    np.array([i.mapped for i in passages]),
+    np.array([0, 0, 1]), 3)
+
+  expected_lu = Skill_LU("lu_1", "lu_1", passages[:2])
+  assert lengths.tolist() == [40, 5, 0]
+  assert scores.tolist() == [expected_lu.score, 0.2, 0.0]
+  assert mapped.tolist() == [expected_lu.mapped, False, False]
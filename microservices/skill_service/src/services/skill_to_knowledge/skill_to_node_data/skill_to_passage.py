@@ -2,15 +2,17 @@
 
 # pylint: disable=invalid-name
 
-from services.embedding import Embedding
+import numpy as np
+from services.model_registry import model_registry
 
-from config import RERANKER_THRESHOLD
+from config import (RERANKER_THRESHOLD, CROSS_ENCODER_BATCH_SIZE,
+                    PASSAGE_PREFILTER_THRESHOLD)
 
 # pylint: disable=redefined-builtin
 class Skill_Passage:
   """Skill to passage node alignment"""
-  model = Embedding.cross_encoders["cross-encoder/ms-marco-MiniLM-L-12-v2"]
-
+  CROSS_ENCODER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-12-v2"
+  PREFILTER_MODEL_NAME = "all-mpnet-base-v2"
 
   def __init__(self, id, title, metadata) -> None:
     """Initialize all the instance variables with the necessary attributes
@@ -22,6 +24,64 @@ class Skill_Passage:
     self.score = self.calculate_score(metadata)
     self.mapped = self.check_mapping(metadata)
 
+  @classmethod
+  def from_scores(cls, id, title, length, score, mapped):
+    """Creates a node from precomputed values instead of scoring it
+      Args:
+        id: node id
+        title: node title
+        length: number of words in the knowledge node text
+        score: similarity score between node and skill
+        mapped: whether the node is mapped to the skill
+      Returns:
+        node of this class
+    """
+    node = cls.__new__(cls)
+    node.id = id
+    node.title = title
+    node.length = int(length)
+    node.score = float(score)
+    node.mapped = bool(mapped)
+    return node
+
+  @classmethod
+  def score_passages(cls, skill_description, passage_texts,
+                     batch_size=CROSS_ENCODER_BATCH_SIZE,
+                     prefilter_threshold=PASSAGE_PREFILTER_THRESHOLD):
+    """Calculates the similarity scores between many passages and a skill
+      Pairs are sorted by passage length so that each padded cross encoder
+      batch holds passages of similar length.
+      Args:
+        skill_description: skill description
+        passage_texts: list of passage texts
+        batch_size: number of pairs per cross encoder forward pass
+        prefilter_threshold: passages with a bi-encoder cosine similarity
+                below this threshold get a score of 0 without running the
+                cross encoder, no pre-filtering if None
+      Returns:
+        scores: numpy array of scores rounded like calculate_score
+    """
+    scores = np.zeros(len(passage_texts))
+    candidates = np.arange(len(passage_texts))
+    if prefilter_threshold is not None and len(passage_texts):
+      prefilter_model = model_registry.get_bi_encoder(
+          cls.PREFILTER_MODEL_NAME)
+      embeddings = prefilter_model.encode(
+          [skill_description] + list(passage_texts), batch_size=batch_size,
+          convert_to_numpy=True, show_progress_bar=False)
+      embeddings = embeddings / np.linalg.norm(embeddings, axis=1)[:, None]
+      similarities = embeddings[1:] @ embeddings[0]
+      candidates = candidates[similarities >= prefilter_threshold]
+    if len(candidates):
+      lengths = np.array([len(passage_texts[i]) for i in candidates])
+      candidates = candidates[np.argsort(lengths, kind="stable")]
+      pairs = [[skill_description, passage_texts[i]] for i in candidates]
+      model = model_registry.get_cross_encoder(cls.CROSS_ENCODER_MODEL_NAME)
+      scores[candidates] = model.predict(
+          pairs, batch_size=batch_size, show_progress_bar=False,
+          convert_to_numpy=True)
+    return np.round(scores, 3)
+
   def calculate_length(self, metadata) -> int:
     """Calculates the number of words in the Passage text
       Args:
@@ -43,7 +103,9 @@ class Skill_Passage:
       Returns:
         score: returns the weighted semantic similarity score
     """
-    score = Skill_Passage.model.predict(
+    model = model_registry.get_cross_encoder(
+        Skill_Passage.CROSS_ENCODER_MODEL_NAME)
+    score = model.predict(
         [metadata["skill_description"], metadata["passage_text"]]).tolist()
     return round(score, 3)
 
@@ -19,7 +19,6 @@ from common.testing.firestore_emulator import (firestore_emulator,
 from unittest import mock
 with mock.patch(
     "google.cloud.logging.Client", side_effect=mock.MagicMock()) as mok:
-  from services.skill_to_knowledge.skill_to_node_data import Skill_Passage
   from services.skill_to_knowledge.skill_to_node import SkillNodeAlignment
 
 os.environ["FIRESTORE_EMULATOR_HOST"] = "localhost:8080"
@@ -307,13 +306,3 @@ def test_map_nodes(clean_firestore, mocker, add_data,
   print(expected_response)
   assert expected_response == response, "Expected response not same"
 
-
-def test_filter_nodes(clean_firestore, mocker, add_data, add_skill, get_skill_node_alignment_object):
-  passage_id = str(add_data[1].id) +"##0"
-  passage_title = str(add_data[1].title) + "_##Passage_0"
-  metadata = {"passage_text": "test passage", "skill_description": "test description" }
-  list_nodes = [Skill_Passage(passage_id, passage_title, metadata)]
-
-  expected_response = []
-  response = get_skill_node_alignment_object.filter_nodes(list_nodes)
-  assert expected_response == response, "Expected response not same"
@@ -257,6 +257,7 @@ class SkillKnowledgeAlignment(Embedding):
     learning_resource_ids = req_body.get("learning_resource_ids", [])
     if learning_resource_ids:
       try:
+        delta = self.create_index_delta(self.DB_INDEX)
         for lr_id in learning_resource_ids:
           learning_units = self.get_learning_units(lr_id)
           all_passages = []
@@ -268,11 +269,13 @@ class SkillKnowledgeAlignment(Embedding):
             all_passage_ids.extend(passage_ids)
 
           gcs_path = self.export_embedding_csv(
-            all_passages, all_passage_ids, self.DB_INDEX , str(lr_id))
+            all_passages, all_passage_ids, self.DB_INDEX , str(lr_id),
+            delta=delta)
 
         Logger.info(f"Upload all CSV to GCS: {gcs_path}")
         self.populate_embedding_db(
-          gcs_path, self.DB_INDEX, self.INDEX_DESCRIPTION, "knowledge")
+          gcs_path, self.DB_INDEX, self.INDEX_DESCRIPTION, "knowledge",
+          delta=delta)
       except Exception as e:
         raise Exception(str(e))
     else:
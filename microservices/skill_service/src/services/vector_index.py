@@ -0,0 +1,316 @@
+"""Vector index backends used to search the embedding indexes"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import requests
+from common.utils.logging_handler import Logger
+from config import (SERVICES, EMBEDDING_ENDPOINT_ID, VECTOR_INDEX_BACKEND,
+                    LOCAL_INDEX_DIR, LOCAL_INDEX_TYPE, INDEX_METADATA_TTL)
+
+# pylint: disable=broad-exception-raised,consider-using-f-string,import-outside-toplevel
+
+MATCHING_ENGINE_BACKEND = "matching_engine"
+LOCAL_BACKEND = "local"
+DEFAULT_NUM_NEIGHBORS = 10
+
+
+def format_neighbors(ids, distances):
+  """Formats the neighbors of a query like the matching engine service
+    Args:
+      ids: List[str] - neighbor ids, nearest first
+      distances: List[float] - dot product of each neighbor with the query
+    Returns:
+      dict: rank (str) to dict with id and distance of the neighbor
+  """
+  return {
+    str(rank): {"id": str(neighbor_id), "distance": float(distance)}
+    for rank, (neighbor_id, distance) in enumerate(zip(ids, distances))
+  }
+
+
+class MatchingEngineIndex():
+  """Vector index served by the matching engine microservice
+
+  The list of indexes is cached for `metadata_ttl` seconds so that a search
+  does not list all the indexes of the project.
+  """
+
+  def __init__(self, metadata_ttl=INDEX_METADATA_TTL):
+    self.metadata_ttl = metadata_ttl
+    self._indexes = None
+    self._indexes_time = 0
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def get_url(path):
+    return "http://{}:{}/matching-engine/api/v1/{}".format(
+      SERVICES["matching-engine"]["host"],
+      SERVICES["matching-engine"]["port"], path)
+
+  def list_indexes(self):
+    """Returns the (cached) metadata of all the matching engine indexes"""
+    with self._lock:
+      if self._indexes is None or \
+          time.monotonic() - self._indexes_time > self.metadata_ttl:
+        self._indexes = json.loads(
+          requests.get(url=self.get_url("index"), timeout=10).content)["data"]
+        self._indexes_time = time.monotonic()
+      return self._indexes
+
+  def invalidate_metadata(self):
+    with self._lock:
+      self._indexes = None
+
+  def check_index_exist(self, display_name, check_deployed=False):
+    """
+    Check if an index with a "display_name" exists
+
+    Args:
+      display_name - display name for the index
+      check_deployed (bool) - check if the index is deployed or not
+
+    Returns:
+      exists (bool) - True if index exists, else False
+      index_id (str) - index id with the display name
+    """
+    exists = False
+    index_id = None
+    for index_info in self.list_indexes():
+      if check_deployed:
+        if index_info["display_name"] == display_name and index_info[
+          "deployed_indexes"]:
+          exists = True
+          index_id = index_info["deployed_indexes"][0]["deployed_index_id"]
+      else:
+        if index_info["display_name"] == display_name:
+          exists = True
+          index_id = index_info["index_id"]
+    return (exists, index_id)
+
+  def search(self, index_name, query_embeddings,
+             num_neighbors=DEFAULT_NUM_NEIGHBORS): # pylint: disable=unused-argument
+    """Returns the neighbors of each query embedding, the matching engine
+    service returns its default number of neighbors"""
+    index_exists, index_id = self.check_index_exist(index_name, True)
+    if not index_exists:
+      raise Exception("Please create an embeddings index first.")
+    prediction = json.loads(
+      requests.post(
+        url=self.get_url("query/result"),
+        json={
+          "deployed_index_id": index_id,
+          "index_endpoint_id": EMBEDDING_ENDPOINT_ID,
+          "queries": query_embeddings
+          },
+        timeout=10
+        ).content
+      )
+    return prediction["data"]
+
+
+class LocalIndex():
+  """In process vector index stored in `base_dir`
+
+  Every index is a directory holding the ids and the float32 embeddings as
+  .npy files. Embeddings are memory mapped and searched by exact inner
+  product ("flat"), or with an HNSW graph ("hnsw", requires `hnswlib`)
+  that is persisted next to them. Loaded indexes are cached in memory until
+  the embeddings file is replaced, e.g. by another process, and upserts
+  rewrite the arrays atomically.
+  """
+
+  def __init__(self, base_dir=LOCAL_INDEX_DIR, index_type=LOCAL_INDEX_TYPE):
+    self.base_dir = base_dir
+    self.index_type = index_type
+    if index_type == "hnsw":
+      try:
+        import hnswlib # pylint: disable=unused-import
+      except ImportError:
+        Logger.error("hnswlib is not installed, using flat local indexes")
+        self.index_type = "flat"
+    self._indexes = {}
+    self._index_mtimes = {}
+    self._lock = threading.RLock()
+
+  def get_path(self, index_name, file_name=""):
+    return os.path.join(self.base_dir, index_name, file_name)
+
+  def check_index_exist(self, display_name, check_deployed=False): # pylint: disable=unused-argument
+    """Returns whether the index exists, local indexes need no deployment"""
+    exists = display_name in self._indexes or os.path.exists(
+      self.get_path(display_name, "embeddings.npy"))
+    return (exists, display_name if exists else None)
+
+  def search(self, index_name, query_embeddings,
+             num_neighbors=DEFAULT_NUM_NEIGHBORS):
+    """Returns the num_neighbors ids with the largest inner product with
+    each query embedding"""
+    index = self._load(index_name)
+    if index is None:
+      raise Exception("Please create an embeddings index first.")
+    ids, embeddings, _, hnsw_index = index
+    queries = np.asarray(query_embeddings, dtype=np.float32)
+    num_neighbors = min(num_neighbors, len(ids))
+    if num_neighbors == 0:
+      return [{} for _ in queries]
+
+    if hnsw_index is not None:
+      hnsw_index.set_ef(max(50, num_neighbors))
+      positions, distances = hnsw_index.knn_query(queries, k=num_neighbors)
+      scores = 1 - distances
+    else:
+      all_scores = queries @ embeddings.T
+      positions = np.argpartition(
+        -all_scores, num_neighbors - 1, axis=1)[:, :num_neighbors]
+      scores = np.take_along_axis(all_scores, positions, axis=1)
+      order = np.argsort(-scores, axis=1)
+      positions = np.take_along_axis(positions, order, axis=1)
+      scores = np.take_along_axis(scores, order, axis=1)
+    return [format_neighbors(ids[row_positions], row_scores)
+            for row_positions, row_scores in zip(positions, scores)]
+
+  def build_from_csv(self, index_name, embeddings_path):
+    """Replaces the index with the embedding CSV files (id followed by the
+    embedding values, no header) found in a local or gs:// directory"""
+    if embeddings_path.startswith("gs://"):
+      import gcsfs
+      file_paths = ["gs://" + i for i in
+                    gcsfs.GCSFileSystem().glob(embeddings_path + "/*.csv")]
+    else:
+      file_paths = [os.path.join(embeddings_path, i)
+                    for i in sorted(os.listdir(embeddings_path))
+                    if i.endswith(".csv")]
+    frames = [pd.read_csv(i, header=None, dtype={0: str})
+              for i in file_paths]
+    if not frames:
+      raise Exception(f"No embedding CSV files found at {embeddings_path}")
+    df = pd.concat(frames).drop_duplicates(subset=0, keep="last")
+    with self._lock:
+      self._save(index_name, df[0].to_numpy(dtype=str),
+                 df.iloc[:, 1:].to_numpy(dtype=np.float32))
+    Logger.info(f"Built local index {index_name} with {len(df)} embeddings")
+
+  def upsert(self, index_name, doc_ids, embeddings):
+    """Adds or replaces the embeddings of the given ids"""
+    doc_ids = np.asarray(doc_ids, dtype=str)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    with self._lock:
+      index = self._load(index_name)
+      if index is None:
+        self._save(index_name, doc_ids, embeddings)
+        return
+      ids, old_embeddings, positions, hnsw_index = index
+      new_positions = {}
+      for doc_id in doc_ids:
+        if doc_id not in positions and doc_id not in new_positions:
+          new_positions[doc_id] = len(ids) + len(new_positions)
+      all_ids = np.concatenate(
+        [ids, np.asarray(list(new_positions), dtype=str)])
+      all_embeddings = np.empty((len(all_ids), embeddings.shape[1]),
+                                dtype=np.float32)
+      all_embeddings[:len(ids)] = old_embeddings
+      row_positions = np.array(
+        [positions.get(i, new_positions.get(i)) for i in doc_ids], dtype=int)
+      all_embeddings[row_positions] = embeddings
+      self._save(index_name, all_ids, all_embeddings, hnsw_index,
+                 row_positions)
+
+  def remove(self, index_name, doc_ids):
+    """Removes the embeddings of the given ids"""
+    with self._lock:
+      index = self._load(index_name)
+      if index is None:
+        return
+      ids, embeddings, _, _ = index
+      keep = ~np.isin(ids, np.asarray(doc_ids, dtype=str))
+      if not keep.all():
+        self._save(index_name, ids[keep], np.asarray(embeddings[keep]))
+
+  def _save(self, index_name, ids, embeddings, hnsw_index=None,
+            updated_positions=None):
+    """Writes the index files, updating the HNSW graph in place when only
+    some rows changed"""
+    os.makedirs(self.get_path(index_name), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=self.get_path(index_name))
+    try:
+      np.save(os.path.join(tmp_dir, "ids.npy"), ids)
+      np.save(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+      if self.index_type == "hnsw":
+        if hnsw_index is None or updated_positions is None:
+          hnsw_index = self._build_hnsw(embeddings)
+        else:
+          if len(ids) > hnsw_index.get_max_elements():
+            hnsw_index.resize_index(2 * len(ids))
+          hnsw_index.add_items(embeddings[updated_positions],
+                               updated_positions)
+        hnsw_index.save_index(os.path.join(tmp_dir, "hnsw.bin"))
+      # embeddings.npy is replaced last, its mtime marks a complete index
+      for file_name in sorted(os.listdir(tmp_dir),
+                              key=lambda i: i == "embeddings.npy"):
+        os.replace(os.path.join(tmp_dir, file_name),
+                   self.get_path(index_name, file_name))
+    finally:
+      shutil.rmtree(tmp_dir, ignore_errors=True)
+    self._indexes.pop(index_name, None)
+
+  def _build_hnsw(self, embeddings):
+    import hnswlib
+    hnsw_index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+    hnsw_index.init_index(max_elements=max(len(embeddings), 1),
+                          ef_construction=200, M=16)
+    hnsw_index.add_items(embeddings, np.arange(len(embeddings)))
+    return hnsw_index
+
+  def _load(self, index_name):
+    """Returns the cached (ids, embeddings, positions by id, hnsw index) of
+    an index or None if it does not exist. The index is read again when
+    its embeddings file changed since it was cached."""
+    with self._lock:
+      try:
+        mtime = os.stat(self.get_path(index_name, "embeddings.npy")).st_mtime_ns
+      except FileNotFoundError:
+        self._indexes.pop(index_name, None)
+        return None
+      index = self._indexes.get(index_name)
+      if index is not None and self._index_mtimes.get(index_name) == mtime:
+        return index
+      ids = np.load(self.get_path(index_name, "ids.npy"))
+      embeddings = np.load(self.get_path(index_name, "embeddings.npy"),
+                           mmap_mode="r")
+      hnsw_index = None
+      if self.index_type == "hnsw":
+        import hnswlib
+        hnsw_path = self.get_path(index_name, "hnsw.bin")
+        if os.path.exists(hnsw_path):
+          hnsw_index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+          hnsw_index.load_index(hnsw_path, max_elements=len(ids))
+        if hnsw_index is None or hnsw_index.get_current_count() != len(ids):
+          hnsw_index = self._build_hnsw(embeddings)
+          hnsw_index.save_index(hnsw_path)
+      positions = {doc_id: i for i, doc_id in enumerate(ids)}
+      index = (ids, embeddings, positions, hnsw_index)
+      self._indexes[index_name] = index
+      self._index_mtimes[index_name] = mtime
+      return index
+
+
+_vector_index = None
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index():
+  """Returns the vector index backend selected by VECTOR_INDEX_BACKEND"""
+  global _vector_index # pylint: disable=global-statement
+  with _vector_index_lock:
+    if _vector_index is None:
+      if VECTOR_INDEX_BACKEND == LOCAL_BACKEND:
+        _vector_index = LocalIndex()
+      else:
+        _vector_index = MatchingEngineIndex()
+    return _vector_index
@@ -0,0 +1,70 @@
+"""
+  Unit tests for the local vector index backend
+"""
+import os
+from unittest import mock
+import numpy as np
+with mock.patch(
+    "google.cloud.logging.Client", side_effect=mock.MagicMock()) as mok:
+  from services.vector_index import LocalIndex
+
+
+def get_embeddings(count, dimension=8, seed=0):
+  embeddings = np.random.default_rng(seed).normal(size=(count, dimension))
+  return embeddings / np.linalg.norm(embeddings, axis=1)[:, None]
+
+
+def test_local_index_build_and_search(tmp_path):
+  embeddings = get_embeddings(50)
+  csv_dir = tmp_path / "csv"
+  os.makedirs(csv_dir)
+  for part in range(2):
+    with open(csv_dir / f"part_{part}.csv", "w", encoding="utf-8") as f:
+      for i in range(part * 25, (part + 1) * 25):
+        f.write(",".join([f"doc_{i}"] + [str(v) for v in embeddings[i]]))
+        f.write("\n")
+
+  index = LocalIndex(str(tmp_path / "indexes"), "flat")
+  assert index.check_index_exist("skill") == (False, None)
+  index.build_from_csv("skill", str(csv_dir))
+  assert index.check_index_exist("skill", True) == (True, "skill")
+
+  result = index.search("skill", embeddings[[3, 40]].tolist(), 5)
+  assert len(result) == 2
+  assert result[0]["0"]["id"] == "doc_3"
+  assert result[1]["0"]["id"] == "doc_40"
+  assert abs(result[0]["0"]["distance"] - 1) < 1e-5
+  distances = [result[0][str(i)]["distance"] for i in range(5)]
+  assert distances == sorted(distances, reverse=True)
+
+  # a new index object reads the persisted files
+  assert LocalIndex(str(tmp_path / "indexes"), "flat").search(
+      "skill", embeddings[[7]].tolist(), 1)[0]["0"]["id"] == "doc_7"
+
+
+def test_local_index_upsert(tmp_path):
+  embeddings = get_embeddings(10)
+  index = LocalIndex(str(tmp_path), "flat")
+  index.upsert("skill", [f"doc_{i}" for i in range(5)], embeddings[:5])
+  # doc_0 is replaced and doc_5 to doc_9 are added
+  index.upsert("skill", ["doc_0"] + [f"doc_{i}" for i in range(5, 10)],
+               np.concatenate([embeddings[9:], embeddings[5:]]))
+
+  result = index.search("skill", embeddings[[9, 6]].tolist(), 2)
+  assert {result[0]["0"]["id"], result[0]["1"]["id"]} == {"doc_0", "doc_9"}
+  assert result[1]["0"]["id"] == "doc_6"
+  assert len(np.load(tmp_path / "skill" / "ids.npy")) == 10
+
+
+def test_local_index_reloads_replaced_files(tmp_path):
+  embeddings = get_embeddings(4)
+  index = LocalIndex(str(tmp_path), "flat")
+  index.upsert("skill", ["doc_0", "doc_1"], embeddings[:2])
+  assert index.search("skill", embeddings[[0]].tolist(), 1)[0]["0"]["id"] \
+    == "doc_0"
+
+  # another process rewrites the index
+  LocalIndex(str(tmp_path), "flat").upsert("skill", ["doc_3"],
+                                           embeddings[3:])
+  assert index.search("skill", embeddings[[3]].tolist(), 1)[0]["0"]["id"] \
+    == "doc_3"
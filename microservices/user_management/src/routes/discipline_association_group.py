@@ -7,6 +7,7 @@ from common.models import AssociationGroup, User, CurriculumPathway, UserGroup
 from common.utils.errors import (ResourceNotFoundException, ValidationError,
                                 ConflictError)
 from common.utils.logging_handler import Logger
+from common.utils.cursor_pagination import fetch_page, get_total_count
 from common.utils.http_exceptions import (Conflict, InternalServerError,
                                           BadRequest, ResourceNotFound)
 from common.utils.assessor_handler import (
@@ -45,6 +46,7 @@ ALLOWED_FILTER_BY_TYPE_VALUES = Literal["instructor", "assessor"]
     name="Get All Discipline Association Groups")
 def get_discipline_association_groups(skip: int = Query(0, ge=0, le=2000),
                                       limit: int = Query(10, ge=1, le=100),
+                                      page_token: Optional[str] = None,
                                       fetch_tree: Optional[bool] = False):
   """The get association groups endpoint will return an array of Discipline
   association groups from firestore
@@ -52,6 +54,8 @@ def get_discipline_association_groups(skip: int = Query(0, ge=0, le=2000),
   ### Args:
       skip (int): Number of objects to be skipped
       limit (int): Size of group array to be returned
+      page_token (str): Token returned as next_page_token by the previous
+                        page, preferred over skip for deep pages
       fetch_tree (bool): To fetch the entire object
                         instead of the UUID of the object
 
@@ -67,7 +71,16 @@ def get_discipline_association_groups(skip: int = Query(0, ge=0, le=2000),
     collection_manager = collection_manager.filter("association_type", "==",
                                                    "discipline")
 
-    groups = collection_manager.order("-created_time").offset(skip).fetch(limit)
+    # the total is only counted for the first request, the pages after it
+    # are fetched with the next_page_token
+    count = None if page_token else get_total_count(collection_manager)
+    next_page_token = None
+    if skip and not page_token:
+      groups = collection_manager.order("-created_time").offset(skip).fetch(
+          limit)
+    else:
+      groups, next_page_token = fetch_page(collection_manager, limit,
+                                           page_token)
 
     if fetch_tree:
       association_groups = []
@@ -78,8 +91,8 @@ def get_discipline_association_groups(skip: int = Query(0, ge=0, le=2000),
     else:
       association_groups = [i.get_fields(reformat_datetime=True) for i \
                           in groups]
-    count = 10000
-    response = {"records": association_groups, "total_count": count}
+    response = {"records": association_groups, "total_count": count,
+                "next_page_token": next_page_token}
     return {
         "success": True,
         "message": "Successfully fetched the association groups",
@@ -151,7 +151,8 @@ class AddDisciplineToAssociationGroupModel(
 
 class TotalCountResponseModel(BaseModel):
   records: Optional[List[FullDisciplineAssociationGroupModel]]
-  total_count: int
+  total_count: Optional[int]
+  next_page_token: Optional[str]
 
 class AllAssociationGroupResponseModel(BaseModel):
   """Association Group Response Pydantic Model"""
@@ -228,7 +228,8 @@ class DeleteLearnerAssociationGroup(BaseModel):
 
 class TotalCountResponseModel(BaseModel):
   records: Optional[List[FullLearnerAssociationGroupModel]]
-  total_count: int
+  total_count: Optional[int]
+  next_page_token: Optional[str]
 
 class AllAssociationGroupResponseModel(BaseModel):
   """Association Group Response Pydantic Model"""